@@ -1,9 +1,25 @@
+import functools
+import io
+import itertools
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import altair as alt
+import plotly.graph_objects as go
 from scipy import stats
+from scipy.optimize import curve_fit
+from scipy.signal import savgol_filter
+from scipy.interpolate import RegularGridInterpolator
+from scipy.stats import qmc
 from mpl_toolkits.mplot3d import Axes3D
 
 # Set page configuration
@@ -187,6 +203,2891 @@ def interpolate_value(df, column_name, value_column, lookup_value):
             return df[value_column].iloc[-1]
 
 
+# Helper functions for unit conversion
+# Factor that converts one of each unit to the SI base unit of its quantity
+UNIT_FACTORS = {
+    'velocity': {'m/s': 1.0, 'ft/s': 0.3048, 'km/h': 1 / 3.6, 'mph': 0.44704, 'm/min': 1 / 60, 'cm/s': 0.01},
+    'length': {'m': 1.0, 'cm': 0.01, 'mm': 0.001, 'ft': 0.3048, 'in': 0.0254},
+    'area': {'m²': 1.0, 'cm²': 1e-4, 'mm²': 1e-6},
+    'volume': {'m³': 1.0, 'L': 1e-3, 'cc': 1e-6, 'cm³': 1e-6, 'ml': 1e-6},
+    'mass': {'kg': 1.0, 'g': 1e-3, 'tonnes': 1000.0, 'lb': 0.45359237},
+    'density': {'kg/m³': 1.0, 'g/cc': 1000.0, 'g/cm³': 1000.0, 'lb/ft³': 16.018463},
+    'mass_flow': {'kg/s': 1.0, 'kg/min': 1 / 60, 'kg/h': 1 / 3600, 'tonnes/h': 1 / 3.6},
+    'volume_flow': {'m³/s': 1.0, 'm³/min': 1 / 60, 'm³/h': 1 / 3600, 'L/s': 1e-3, 'cfm': 4.719474e-4},
+    'time': {'s': 1.0, 'min': 60.0, 'h': 3600.0},
+    'pressure': {'Pa': 1.0, 'kPa': 1000.0, 'mm H2O': 9.80665, 'bar': 1e5},
+    'power': {'W': 1.0, 'kW': 1000.0, 'hp': 745.699872},
+    'energy': {'J': 1.0, 'kJ': 1000.0, 'Wh': 3600.0, 'kWh': 3.6e6}
+}
+UNIT_QUANTITIES = {unit: quantity for quantity, units in UNIT_FACTORS.items() for unit in units}
+
+
+def unit_factor(from_unit, to_unit):
+    """Multiplier that converts values in from_unit to to_unit."""
+    if from_unit not in UNIT_QUANTITIES or to_unit not in UNIT_QUANTITIES:
+        unknown = from_unit if from_unit not in UNIT_QUANTITIES else to_unit
+        raise ValueError(f"Unknown unit: {unknown}")
+    quantity = UNIT_QUANTITIES[from_unit]
+    if UNIT_QUANTITIES[to_unit] != quantity:
+        raise ValueError(f"Cannot convert {from_unit} ({quantity}) to {to_unit} ({UNIT_QUANTITIES[to_unit]})")
+    return UNIT_FACTORS[quantity][from_unit] / UNIT_FACTORS[quantity][to_unit]
+
+
+def convert_units(values, from_unit, to_unit):
+    """Convert a scalar or array between units with a single multiplication."""
+    return np.asarray(values, dtype=float) * unit_factor(from_unit, to_unit)
+
+
+def with_units(values, unit):
+    """Tag an array with its unit so later conversions cannot mix up units."""
+    if unit not in UNIT_QUANTITIES:
+        raise ValueError(f"Unknown unit: {unit}")
+    return {'values': np.asarray(values, dtype=float), 'unit': unit}
+
+
+def to_units(measurement, unit):
+    """Convert a unit-tagged array from with_units() to another unit."""
+    return {'values': convert_units(measurement['values'], measurement['unit'], unit), 'unit': unit}
+
+
+# Helper functions for plotting large data logs
+# Above this many rows, scatter plots switch to a 2D histogram on rectangular bins (np.histogram2d)
+SCATTER_AGGREGATION_THRESHOLD = 500
+# Maximum number of text labels drawn on a single plot
+MAX_SCATTER_LABELS = 12
+
+
+def grain_group_summary(data, x_column, y_column, group_column='Grain/Seed'):
+    """Summarise a data log per grain: point count and median (x, y) position."""
+    summary = data.groupby(group_column, sort=False).agg(
+        count=(x_column, 'size'),
+        x=(x_column, 'median'),
+        y=(y_column, 'median')
+    )
+    return summary.sort_values('count', ascending=False)
+
+
+def annotate_representative_points(ax, data, x_column, y_column, group_column='Grain/Seed',
+                                   max_labels=MAX_SCATTER_LABELS):
+    """Label points on a plot without drawing one annotation per row.
+
+    Small logs keep one label per row. Larger logs are labelled once per grain at the
+    median position of that grain, and only the most frequent grains get a label.
+    """
+    if len(data) <= max_labels:
+        for txt, x_val, y_val in zip(data[group_column], data[x_column], data[y_column]):
+            ax.annotate(txt, (x_val, y_val), xytext=(5, 5), textcoords='offset points')
+        return
+
+    summary = grain_group_summary(data, x_column, y_column, group_column).head(max_labels)
+    ax.scatter(summary['x'], summary['y'], marker='D', s=60, facecolor='white', edgecolor='black', zorder=3)
+    for grain, row in summary.iterrows():
+        ax.annotate(f"{grain} (n={int(row['count'])})", (row['x'], row['y']),
+                    xytext=(6, 6), textcoords='offset points', fontsize=9,
+                    bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.8))
+
+
+def plot_aggregated_scatter(ax, data, x_column, y_column, color_column=None, cmap='viridis',
+                            threshold=SCATTER_AGGREGATION_THRESHOLD, bins=80, **scatter_kwargs):
+    """Draw a scatter plot, switching to a binned 2D histogram for large logs.
+
+    When the log has more rows than `threshold`, the points are binned on a regular grid.
+    If `color_column` is given, each cell is coloured by the mean of that column,
+    otherwise by the number of points it holds. Returns the mappable (for a colorbar)
+    and a flag telling whether the aggregated mode was used.
+    """
+    x_values = data[x_column].to_numpy(dtype=float)
+    y_values = data[y_column].to_numpy(dtype=float)
+
+    if len(data) <= threshold:
+        color_values = data[color_column] if color_column is not None else None
+        mappable = ax.scatter(x_values, y_values, c=color_values, cmap=cmap if color_column else None,
+                              **scatter_kwargs)
+        return mappable, False
+
+    counts, x_edges, y_edges = np.histogram2d(x_values, y_values, bins=bins)
+    if color_column is not None:
+        # Mean of the colour column per cell = weighted sum / count
+        sums, _, _ = np.histogram2d(x_values, y_values, bins=[x_edges, y_edges],
+                                    weights=data[color_column].to_numpy(dtype=float))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cell_values = np.where(counts > 0, sums / counts, np.nan)
+        norm = None
+    else:
+        cell_values = np.where(counts > 0, counts, np.nan)
+        norm = 'log'
+
+    mappable = ax.pcolormesh(x_edges, y_edges, cell_values.T, cmap=cmap, norm=norm, shading='flat')
+    return mappable, True
+
+
+# Helper functions for sorption isotherms (equilibrium moisture content)
+# Coefficients give EMC in % d.b. for air temperature T in °C and relative humidity RH as a fraction (0-1).
+# Henderson and Chung-Pfost values follow the ASAE D245 tables; Oswin and GAB values were
+# fitted to the same data over 10-60 °C and 20-90% RH.
+EMC_MODEL_PARAMETERS = {
+    'Henderson': ('A', 'N', 'C'),
+    'Chung-Pfost': ('A', 'B', 'C'),
+    'Oswin': ('A', 'B', 'C'),
+    'GAB': ('A', 'B', 'C')
+}
+
+EMC_MODEL_COEFFICIENTS = {
+    'Henderson': {
+        'Wheat': (4.3295e-5, 2.1119, 41.565),
+        'Rice': (1.9187e-5, 2.4451, 51.161),
+        'Corn': (8.6541e-5, 1.8634, 49.810),
+        'Soybean': (30.5327e-5, 1.2164, 134.136),
+        'Barley': (2.2919e-5, 2.0123, 195.267)
+    },
+    'Chung-Pfost': {
+        'Wheat': (529.43, 17.609, 50.998),
+        'Rice': (594.61, 21.732, 35.703),
+        'Corn': (312.40, 16.958, 30.205),
+        'Soybean': (328.30, 13.917, 100.288),
+        'Barley': (761.66, 19.889, 99.924)
+    },
+    'Oswin': {
+        'Wheat': (14.801, -0.0671, 3.420),
+        'Rice': (13.615, -0.0566, 3.877),
+        'Corn': (14.029, -0.0737, 3.087),
+        'Soybean': (9.957, -0.0379, 2.147),
+        'Barley': (11.724, -0.0269, 3.276)
+    },
+    'GAB': {
+        'Wheat': (10.991, 0.610, 306.95),
+        'Rice': (10.186, 0.569, 420.49),
+        'Corn': (10.750, 0.626, 210.59),
+        'Soybean': (6.925, 0.804, 141.07),
+        'Barley': (7.890, 0.694, 542.43)
+    }
+}
+
+
+def emc_henderson(temperature, rh, a, n, c):
+    """Modified Henderson: 1 - RH = exp[-A (T + C) Me^N]."""
+    return (-np.log(1 - rh) / (a * (temperature + c))) ** (1 / n)
+
+
+def emc_chung_pfost(temperature, rh, a, b, c):
+    """Modified Chung-Pfost: RH = exp[-A / (T + C) × exp(-B Me)], B per decimal d.b."""
+    return -100 / b * np.log(-(temperature + c) * np.log(rh) / a)
+
+
+def emc_oswin(temperature, rh, a, b, c):
+    """Modified Oswin: Me = (A + B T) × [RH / (1 - RH)]^(1/C)."""
+    return (a + b * temperature) * (rh / (1 - rh)) ** (1 / c)
+
+
+def emc_gab(temperature, rh, a, b, c):
+    """Modified GAB: Me = A B (C/T) RH / [(1 - B RH)(1 - B RH + (C/T) B RH)]."""
+    c_t = c / np.maximum(temperature, 0.1)
+    return a * b * c_t * rh / ((1 - b * rh) * (1 - b * rh + c_t * b * rh))
+
+
+EMC_MODELS = {
+    'Henderson': emc_henderson,
+    'Chung-Pfost': emc_chung_pfost,
+    'Oswin': emc_oswin,
+    'GAB': emc_gab
+}
+
+
+def equilibrium_moisture_content(temperature, rh, grain='Wheat', model='Henderson', coefficients=None):
+    """Equilibrium moisture content (% d.b.) for arrays of air temperature (°C) and RH (fraction).
+
+    Temperature and RH are broadcast against each other. Coefficients default to the
+    per-grain table for the chosen model.
+    """
+    if coefficients is None:
+        coefficients = EMC_MODEL_COEFFICIENTS[model][grain]
+    temperature = np.asarray(temperature, dtype=float)
+    rh = np.clip(np.asarray(rh, dtype=float), 1e-4, 1 - 1e-4)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        emc = EMC_MODELS[model](temperature, rh, *coefficients)
+    return np.clip(emc, 0, None)
+
+
+def fit_emc_model(rh, temperature, emc, model='Henderson', initial_guess=None):
+    """Fit sorption isotherm coefficients to logged (RH, T, EMC) data.
+
+    RH is a fraction (0-1), T in °C and EMC in % d.b. Returns a dictionary with the fitted
+    coefficients, their standard errors, R², RMSE and the residuals.
+    """
+    rh = np.clip(np.asarray(rh, dtype=float), 1e-4, 1 - 1e-4)
+    temperature = np.asarray(temperature, dtype=float)
+    emc = np.asarray(emc, dtype=float)
+    if initial_guess is None:
+        # Start from the mean of the tabulated grains for this model
+        initial_guess = np.mean(list(EMC_MODEL_COEFFICIENTS[model].values()), axis=0)
+
+    model_function = EMC_MODELS[model]
+
+    def isotherm(x, *coefficients):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            predicted = model_function(x[0], x[1], *coefficients)
+        return np.nan_to_num(predicted, nan=1e6, posinf=1e6, neginf=-1e6)
+
+    coefficients, covariance = curve_fit(isotherm, (temperature, rh), emc, p0=initial_guess, maxfev=20000)
+    predicted = isotherm((temperature, rh), *coefficients)
+    residuals = emc - predicted
+    ss_res = np.sum(residuals ** 2)
+    ss_tot = np.sum((emc - emc.mean()) ** 2)
+
+    return {
+        'model': model,
+        'coefficients': tuple(coefficients),
+        'std_errors': tuple(np.sqrt(np.diag(covariance))) if np.all(np.isfinite(covariance))
+        else (np.nan,) * len(coefficients),
+        'r_squared': 1 - ss_res / ss_tot if ss_tot > 0 else np.nan,
+        'rmse': np.sqrt(ss_res / len(emc)),
+        'residuals': residuals
+    }
+
+
+@st.cache_data
+def emc_isotherm_surface(model, coefficients, t_min=0.0, t_max=100.0, rh_min=0.01, rh_max=0.99,
+                         t_points=101, rh_points=99):
+    """Evaluate an isotherm over a (T, RH) grid. Cached per model, coefficients and grid."""
+    t_grid = np.linspace(t_min, t_max, t_points)
+    rh_grid = np.linspace(rh_min, rh_max, rh_points)
+    emc_grid = equilibrium_moisture_content(t_grid[:, None], rh_grid[None, :], model=model,
+                                            coefficients=coefficients)
+    return t_grid, rh_grid, emc_grid
+
+
+def lookup_emc(temperature, rh, grain='Wheat', model='Henderson', coefficients=None):
+    """Look up Me (% d.b.) for many (T, RH) states from the cached isotherm surface."""
+    if coefficients is None:
+        coefficients = EMC_MODEL_COEFFICIENTS[model][grain]
+    t_grid, rh_grid, emc_grid = emc_isotherm_surface(model, tuple(coefficients))
+    temperature, rh = np.broadcast_arrays(np.asarray(temperature, dtype=float), np.asarray(rh, dtype=float))
+    points = np.column_stack([np.clip(temperature.ravel(), t_grid[0], t_grid[-1]),
+                              np.clip(rh.ravel(), rh_grid[0], rh_grid[-1])])
+    interpolator = RegularGridInterpolator((t_grid, rh_grid), emc_grid)
+    return interpolator(points).reshape(temperature.shape)
+
+
+# Helper functions for moist air properties
+# Inputs are arrays of temperature (°C), pressure (kPa) and relative humidity (fraction 0-1)
+DRY_AIR_GAS_CONSTANT = 287.055  # J/(kg·K)
+WATER_VAPOR_GAS_CONSTANT = 461.495  # J/(kg·K)
+STANDARD_AIR_TEMPERATURE = 20.0  # °C
+STANDARD_AIR_PRESSURE = 101.325  # kPa
+STANDARD_AIR_RH = 0.0
+
+
+def saturation_vapor_pressure(temperature):
+    """Saturation vapour pressure (kPa) over water (T ≥ 0 °C) or ice (T < 0 °C), Hyland-Wexler."""
+    t_kelvin = np.asarray(temperature, dtype=float) + 273.15
+    ln_over_water = (-5.8002206e3 / t_kelvin + 1.3914993 - 4.8640239e-2 * t_kelvin
+                     + 4.1764768e-5 * t_kelvin ** 2 - 1.4452093e-8 * t_kelvin ** 3
+                     + 6.5459673 * np.log(t_kelvin))
+    ln_over_ice = (-5.6745359e3 / t_kelvin + 6.3925247 - 9.677843e-3 * t_kelvin
+                   + 6.2215701e-7 * t_kelvin ** 2 + 2.0747825e-9 * t_kelvin ** 3
+                   - 9.484024e-13 * t_kelvin ** 4 + 4.1635019 * np.log(t_kelvin))
+    return np.exp(np.where(t_kelvin >= 273.15, ln_over_water, ln_over_ice)) / 1000
+
+
+def humidity_ratio(vapor_pressure, pressure=STANDARD_AIR_PRESSURE):
+    """Humidity ratio (kg water / kg dry air) from vapour pressure and total pressure (kPa)."""
+    return 0.621945 * vapor_pressure / (pressure - vapor_pressure)
+
+
+def vapor_pressure_from_humidity_ratio(humidity_ratio, pressure=STANDARD_AIR_PRESSURE):
+    """Vapour pressure (kPa) from humidity ratio (kg water / kg dry air) and total pressure (kPa)."""
+    humidity_ratio = np.asarray(humidity_ratio, dtype=float)
+    return pressure * humidity_ratio / (0.621945 + humidity_ratio)
+
+
+def moist_air_enthalpy(temperature, humidity_ratio):
+    """Specific enthalpy of moist air (kJ/kg dry air): h = 1.006·t + W·(2501 + 1.86·t)."""
+    temperature = np.asarray(temperature, dtype=float)
+    return (DRY_AIR_SPECIFIC_HEAT * temperature
+            + np.asarray(humidity_ratio, dtype=float) * (2.501e6 + WATER_VAPOR_SPECIFIC_HEAT * temperature)) / 1000
+
+
+def dew_point_temperature(vapor_pressure, iterations=6):
+    """Dew (frost below 0 °C) point (°C) of air with the given vapour pressure (kPa).
+
+    Starts from the Magnus approximation and refines it by Newton's method on the Hyland-Wexler
+    saturation pressure curve, so the result matches saturation_vapor_pressure exactly.
+    """
+    log_pressure = np.log(np.maximum(np.asarray(vapor_pressure, dtype=float), 1e-9))
+    gamma = log_pressure - np.log(0.61094)
+    dew_point = 243.04 * gamma / (17.625 - gamma)
+    for _ in range(iterations):
+        step = 1e-3
+        value = np.log(saturation_vapor_pressure(dew_point))
+        slope = (np.log(saturation_vapor_pressure(dew_point + step)) - value) / step
+        dew_point = dew_point - (value - log_pressure) / slope
+    return dew_point
+
+
+def adiabatic_saturation_humidity_ratio(temperature, wet_bulb, pressure=STANDARD_AIR_PRESSURE):
+    """Humidity ratio of air at dry bulb t and thermodynamic wet bulb t* (ASHRAE psychrometric relation).
+
+    W = ((2501 - 2.326·t*)·Ws* - 1.006·(t - t*)) / (2501 + 1.86·t - 4.186·t*)
+    """
+    temperature, wet_bulb = np.asarray(temperature, dtype=float), np.asarray(wet_bulb, dtype=float)
+    saturated = humidity_ratio(saturation_vapor_pressure(wet_bulb), pressure)
+    return (((2501 - 2.326 * wet_bulb) * saturated - 1.006 * (temperature - wet_bulb))
+            / (2501 + 1.86 * temperature - 4.186 * wet_bulb))
+
+
+def wet_bulb_temperature(temperature, humidity_ratio_value, pressure=STANDARD_AIR_PRESSURE, iterations=8):
+    """Thermodynamic wet bulb temperature (°C), bracketed between the dew point and the dry bulb.
+
+    Newton steps on the psychrometric relation, falling back to bisection whenever a step leaves
+    the bracket, so every element converges in a few evaluations.
+    """
+    temperature, humidity_ratio_value, pressure = np.broadcast_arrays(
+        np.asarray(temperature, dtype=float), np.asarray(humidity_ratio_value, dtype=float),
+        np.asarray(pressure, dtype=float))
+    low = np.minimum(dew_point_temperature(vapor_pressure_from_humidity_ratio(humidity_ratio_value, pressure)),
+                     temperature) - 0.5
+    high = temperature.copy()
+    wet_bulb = (low + high) / 2
+    for _ in range(iterations):
+        step = 1e-4
+        error = adiabatic_saturation_humidity_ratio(temperature, wet_bulb, pressure) - humidity_ratio_value
+        slope = (adiabatic_saturation_humidity_ratio(temperature, wet_bulb + step, pressure)
+                 - humidity_ratio_value - error) / step
+        low = np.where(error < 0, wet_bulb, low)
+        high = np.where(error < 0, high, wet_bulb)
+        newton = wet_bulb - error / slope
+        wet_bulb = np.where((newton >= low) & (newton <= high), newton, (low + high) / 2)
+    return wet_bulb
+
+
+def psychrometric_state(temperature, pressure=STANDARD_AIR_PRESSURE, rh=None, humidity_ratio_value=None,
+                        wet_bulb=None):
+    """Full psychrometric state of moist air from dry bulb (°C), pressure (kPa) and one humidity measure.
+
+    Give exactly one of rh (fraction), humidity_ratio_value (kg/kg dry air) or wet_bulb (°C). All inputs
+    broadcast as NumPy arrays, so a year of hourly weather or a 1 Hz logger series is one call. Returns a
+    dictionary with saturation and vapour pressures (kPa), humidity ratio, RH, enthalpy (kJ/kg dry air),
+    dew point and wet bulb (°C), specific volume (m³/kg dry air) and density (kg/m³).
+    """
+    if sum(value is not None for value in (rh, humidity_ratio_value, wet_bulb)) != 1:
+        raise ValueError("Give exactly one of rh, humidity_ratio_value or wet_bulb")
+    temperature = np.asarray(temperature, dtype=float)
+    pressure = np.asarray(pressure, dtype=float)
+    saturation_pressure = saturation_vapor_pressure(temperature)
+    if rh is not None:
+        vapor_pressure = np.clip(np.asarray(rh, dtype=float), 0, 1) * saturation_pressure
+        humidity_ratio_value = humidity_ratio(vapor_pressure, pressure)
+    else:
+        if wet_bulb is not None:
+            humidity_ratio_value = np.maximum(adiabatic_saturation_humidity_ratio(temperature, wet_bulb, pressure), 0)
+        humidity_ratio_value = np.asarray(humidity_ratio_value, dtype=float)
+        vapor_pressure = np.minimum(vapor_pressure_from_humidity_ratio(humidity_ratio_value, pressure),
+                                    saturation_pressure)
+    if wet_bulb is None:
+        wet_bulb = wet_bulb_temperature(temperature, humidity_ratio_value, pressure)
+    t_kelvin = temperature + 273.15
+    dry_air_pressure = pressure - vapor_pressure
+
+    return {
+        'saturation_pressure': saturation_pressure,
+        'vapor_pressure': vapor_pressure,
+        'humidity_ratio': humidity_ratio_value,
+        'rh': vapor_pressure / saturation_pressure,
+        'enthalpy': moist_air_enthalpy(temperature, humidity_ratio_value),
+        'dew_point': dew_point_temperature(vapor_pressure),
+        'wet_bulb': np.broadcast_to(np.asarray(wet_bulb, dtype=float), np.shape(vapor_pressure)),
+        'specific_volume': DRY_AIR_GAS_CONSTANT * t_kelvin / (1000 * dry_air_pressure),
+        'density': 1000 * (dry_air_pressure / (DRY_AIR_GAS_CONSTANT * t_kelvin)
+                           + vapor_pressure / (WATER_VAPOR_GAS_CONSTANT * t_kelvin))
+    }
+
+
+def evaporative_cooler_outlet(temperature, rh, saturation_efficiency=0.8, pressure=STANDARD_AIR_PRESSURE):
+    """Air leaving an evaporative pad (or an adiabatic dryer bed) for inlet dry bulb (°C) and RH (fraction).
+
+    The air follows its wet bulb line: t_out = t - η·(t - t_wb), and the outlet humidity ratio is
+    the one whose wet bulb is still t_wb. Returns the inlet and outlet states and the water picked
+    up (kg/kg dry air).
+    """
+    inlet = psychrometric_state(temperature, pressure, rh=rh)
+    temperature = np.asarray(temperature, dtype=float)
+    outlet_temperature = temperature - np.asarray(saturation_efficiency, dtype=float) * (temperature
+                                                                                         - inlet['wet_bulb'])
+    outlet = psychrometric_state(outlet_temperature, pressure, wet_bulb=inlet['wet_bulb'])
+    return {'inlet': inlet, 'outlet': outlet, 'outlet_temperature': outlet_temperature,
+            'moisture_pickup': outlet['humidity_ratio'] - inlet['humidity_ratio']}
+
+
+def adiabatic_moisture_pickup(ambient_temp, ambient_rh, drying_temp, exhaust_temp, pressure=STANDARD_AIR_PRESSURE):
+    """Moisture picked up by heated drying air cooled adiabatically from t₁ to the exhaust temperature t₂.
+
+    Heating from t₀ to t₁ keeps the humidity ratio; drying then follows the wet bulb line of the heated
+    air. Returns the heated and exhaust air states and the pickup (kg water / kg dry air).
+    """
+    ambient = psychrometric_state(ambient_temp, pressure, rh=ambient_rh)
+    heated = psychrometric_state(drying_temp, pressure, humidity_ratio_value=ambient['humidity_ratio'])
+    exhaust = psychrometric_state(exhaust_temp, pressure, wet_bulb=heated['wet_bulb'])
+    return {'ambient': ambient, 'heated': heated, 'exhaust': exhaust,
+            'moisture_pickup': exhaust['humidity_ratio'] - heated['humidity_ratio']}
+
+
+def example_hourly_weather(year=2025, mean_temperature=28.0, annual_swing=6.0, daily_swing=5.0, seed=0):
+    """Synthetic hourly dry bulb (°C) and RH (%) for one year: annual and daily cycles plus noise.
+
+    RH moves opposite to temperature through the day, as it does at a near-constant dew point.
+    """
+    rng = np.random.default_rng(seed)
+    time_index = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq="h", inclusive="left")
+    day = time_index.dayofyear.to_numpy() / 365.25
+    hour = time_index.hour.to_numpy()
+    daily = np.cos(2 * np.pi * (hour - 15) / 24)
+    temperature = (mean_temperature - annual_swing * np.cos(2 * np.pi * (day - 0.05)) + daily_swing * daily
+                   + rng.normal(0, 1.0, len(time_index)))
+    rh = np.clip(60 + 15 * np.sin(2 * np.pi * (day - 0.3)) - 18 * daily + rng.normal(0, 5, len(time_index)), 5, 100)
+    return pd.DataFrame({'Time': time_index, 'Temperature (°C)': temperature, 'Relative Humidity (%)': rh})
+
+
+def air_dynamic_viscosity(temperature):
+    """Dynamic viscosity of air (Pa·s) from Sutherland's law."""
+    t_kelvin = np.asarray(temperature, dtype=float) + 273.15
+    return 1.716e-5 * (t_kelvin / 273.15) ** 1.5 * (273.15 + 110.4) / (t_kelvin + 110.4)
+
+
+def air_properties(temperature, pressure=STANDARD_AIR_PRESSURE, rh=0.0):
+    """Moist air properties for arrays of temperature (°C), pressure (kPa) and RH (fraction).
+
+    Returns a dictionary with vapour pressure (kPa), humidity ratio (kg/kg dry air), density
+    (kg/m³ of moist air), specific volume (m³/kg dry air) and dynamic viscosity (Pa·s).
+    Water vapour changes air viscosity by less than 1% below 50 °C, so the dry air value is used.
+    """
+    temperature, pressure, rh = np.broadcast_arrays(np.asarray(temperature, dtype=float),
+                                                    np.asarray(pressure, dtype=float),
+                                                    np.clip(np.asarray(rh, dtype=float), 0, 1))
+    t_kelvin = temperature + 273.15
+    vapor_pressure = rh * saturation_vapor_pressure(temperature)
+    dry_air_pressure = pressure - vapor_pressure
+
+    return {
+        'vapor_pressure': vapor_pressure,
+        'humidity_ratio': humidity_ratio(vapor_pressure, pressure),
+        'density': 1000 * (dry_air_pressure / (DRY_AIR_GAS_CONSTANT * t_kelvin)
+                           + vapor_pressure / (WATER_VAPOR_GAS_CONSTANT * t_kelvin)),
+        'specific_volume': DRY_AIR_GAS_CONSTANT * t_kelvin / (1000 * dry_air_pressure),
+        'viscosity': air_dynamic_viscosity(temperature)
+    }
+
+
+def pressure_at_elevation(elevation):
+    """Standard atmospheric pressure (kPa) at an elevation above sea level (m)."""
+    return STANDARD_AIR_PRESSURE * (1 - 2.25577e-5 * np.asarray(elevation, dtype=float)) ** 5.2559
+
+
+def normalize_terminal_velocity(velocity, temperature, pressure, rh=0.0):
+    """Convert terminal velocities measured in the given air to standard air (20 °C, 101.325 kPa, dry).
+
+    Grains settle in the Newton regime, where Vt is proportional to 1/√ρa, so velocities scale
+    with √(ρa / ρa,std).
+    """
+    measured_density = air_properties(temperature, pressure, rh)['density']
+    standard_density = air_properties(STANDARD_AIR_TEMPERATURE, STANDARD_AIR_PRESSURE, STANDARD_AIR_RH)['density']
+    return np.asarray(velocity, dtype=float) * np.sqrt(measured_density / standard_density)
+
+
+# Helper functions for terminal velocity (coupled drag coefficient and Reynolds number)
+GRAVITY = 9.81  # m/s²
+STOKES_REYNOLDS_LIMIT = 0.2
+NEWTON_REYNOLDS_LIMIT = 1000.0
+
+
+def sphere_drag_coefficient(reynolds):
+    """Drag coefficient of a sphere across the Stokes, intermediate and Newton regimes.
+
+    Uses the Clift-Gauvin correlation, which reduces to Stokes' law (24/Re) at low Re and
+    levels off near 0.44 in the Newton regime, so Cd is continuous between regimes.
+    """
+    reynolds = np.maximum(reynolds, 1e-12)
+    return 24 / reynolds * (1 + 0.15 * reynolds ** 0.687) + 0.42 / (1 + 42500 * reynolds ** -1.16)
+
+
+def ganser_shape_factors(sphericity):
+    """Stokes (K1) and Newton (K2) shape factors of Ganser's drag correlation."""
+    sphericity = np.clip(sphericity, 0.1, 1.0)
+    k1 = 1 / (1 / 3 + 2 / 3 * sphericity ** -0.5)
+    k2 = 10 ** (1.8148 * (-np.log10(sphericity)) ** 0.5743)
+    return k1, k2
+
+
+def particle_drag_coefficient(reynolds, sphericity=1.0):
+    """Drag coefficient of a non-spherical particle: Cd = K2 × Cd_sphere(Re × K1 × K2)."""
+    k1, k2 = ganser_shape_factors(sphericity)
+    return k2 * sphere_drag_coefficient(reynolds * k1 * k2)
+
+
+def flow_regime(reynolds):
+    """Name the flow regime for an array of particle Reynolds numbers."""
+    return np.where(reynolds < STOKES_REYNOLDS_LIMIT, 'Stokes',
+                    np.where(reynolds < NEWTON_REYNOLDS_LIMIT, 'Intermediate', 'Newton'))
+
+
+def solve_terminal_velocity(diameter, particle_density, sphericity=1.0, air_density=1.2, air_viscosity=1.8e-5,
+                            tolerance=1e-8, max_iterations=200):
+    """Solve terminal velocity for whole particle populations at once.
+
+    Vt = √[4 g d (ρp - ρa) / (3 Cd ρa)] and Cd depends on Re = ρa Vt d / μ, so the two are
+    iterated together from a Newton-regime starting guess. All inputs broadcast against each
+    other (diameter in m, densities in kg/m³, viscosity in Pa·s). Returns a dictionary with the
+    velocities, Reynolds numbers, drag coefficients and convergence diagnostics.
+    """
+    diameter, particle_density, sphericity, air_density, air_viscosity = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in
+          (diameter, particle_density, sphericity, air_density, air_viscosity)))
+
+    weight_term = 4 * GRAVITY * diameter * np.maximum(particle_density - air_density, 0) / (3 * air_density)
+    reynolds_per_velocity = air_density * diameter / air_viscosity
+    k1, k2 = ganser_shape_factors(sphericity)
+    velocity = np.sqrt(weight_term / 0.44)
+    relative_change = np.full(velocity.shape, np.inf)
+
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        drag_coefficient = k2 * sphere_drag_coefficient(reynolds_per_velocity * velocity * k1 * k2)
+        new_velocity = np.sqrt(weight_term / drag_coefficient)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            relative_change = np.where(new_velocity > 0, np.abs(new_velocity - velocity) / new_velocity, 0.0)
+        velocity = new_velocity
+        if relative_change.max(initial=0.0) < tolerance:
+            break
+
+    reynolds = air_density * velocity * diameter / air_viscosity
+    drag_coefficient = particle_drag_coefficient(reynolds, sphericity)
+    residual = velocity ** 2 * drag_coefficient - weight_term
+
+    return {
+        'velocity': velocity,
+        'reynolds': reynolds,
+        'drag_coefficient': drag_coefficient,
+        'regime': flow_regime(reynolds),
+        'iterations': iterations,
+        'max_relative_change': float(relative_change.max(initial=0.0)),
+        'max_residual': float(np.abs(residual).max(initial=0.0)),
+        'unconverged': int(np.count_nonzero(relative_change >= tolerance))
+    }
+
+
+# Helper functions for the terminal velocity log and fitted velocity models
+# The log is kept per session unless TERMINAL_VELOCITY_LOG names a CSV file, which every session then shares
+TERMINAL_VELOCITY_LOG_PATH = os.environ.get('TERMINAL_VELOCITY_LOG') or None
+TERMINAL_VELOCITY_LOG_COLUMNS = ['Grain/Seed', 'Moisture Content (% d.b.)', 'Terminal Velocity (m/s)',
+                                 'Density (kg/m³)', 'Size (mm)']
+# Predictors of the linear model Vt = b0 + b1·M + b2·size + b3·density
+TERMINAL_VELOCITY_FEATURES = ['Moisture Content (% d.b.)', 'Size (mm)', 'Density (kg/m³)']
+# Grains with fewer rows than this are predicted with the model pooled over all grains
+MIN_ROWS_PER_GRAIN_MODEL = 6
+POOLED_MODEL_NAME = 'All grains'
+# Ridge penalty on the slopes, in pseudo-rows; it keeps small logs stable and fades as rows accumulate
+MODEL_RIDGE_PSEUDO_ROWS = 2.0
+TERMINAL_VELOCITY_SEED_DATA = {
+    'Grain/Seed': ['Wheat', 'Rice', 'Corn', 'Soybean', 'Millet'],
+    'Moisture Content (% d.b.)': [14.0, 12.0, 15.0, 12.5, 11.0],
+    'Terminal Velocity (m/s)': [9.5, 8.2, 12.3, 10.8, 6.5],
+    'Density (kg/m³)': [1250, 1150, 1300, 1180, 1100],
+    'Size (mm)': [4.0, 7.0, 10.0, 7.5, 2.5]
+}
+
+
+def load_terminal_velocity_log(path=TERMINAL_VELOCITY_LOG_PATH):
+    """Read the persisted terminal velocity log, or None if it is not persisted or nothing has been saved yet."""
+    if path is None or not os.path.exists(path):
+        return None
+    return pd.read_csv(path)[TERMINAL_VELOCITY_LOG_COLUMNS]
+
+
+def initial_terminal_velocity_log():
+    """Persisted log if one exists, otherwise the seed table of typical grains."""
+    log = load_terminal_velocity_log()
+    return log if log is not None and not log.empty else pd.DataFrame(TERMINAL_VELOCITY_SEED_DATA)
+
+
+def append_terminal_velocity_log(rows, earlier_rows, path=TERMINAL_VELOCITY_LOG_PATH):
+    """Append rows to the persisted log; nothing is written if the log is not persisted.
+
+    earlier_rows are the rows logged before the first save (the seed table). The file is created exclusively
+    with the header, earlier_rows and rows, so sessions saving at the same time cannot write them twice.
+    """
+    if path is None:
+        return
+    try:
+        with open(path, 'x', newline='', encoding='utf-8') as log_file:
+            pd.concat([earlier_rows, rows])[TERMINAL_VELOCITY_LOG_COLUMNS].to_csv(log_file, index=False)
+    except FileExistsError:
+        rows[TERMINAL_VELOCITY_LOG_COLUMNS].to_csv(path, mode='a', header=False, index=False)
+
+
+def update_terminal_velocity_models(models, rows):
+    """Add rows to the per-grain sufficient statistics (XᵀX, Xᵀy, yᵀy) without refitting old rows.
+
+    models maps grain -> statistics and includes a pooled entry for all grains. Returns the updated dictionary.
+    """
+    models = dict(models)
+    rows = rows.dropna(subset=TERMINAL_VELOCITY_FEATURES + ['Terminal Velocity (m/s)'])
+    groups = list(rows.groupby('Grain/Seed')) + [(POOLED_MODEL_NAME, rows)]
+    for grain, group in groups:
+        x = np.column_stack([np.ones(len(group)), group[TERMINAL_VELOCITY_FEATURES].to_numpy(dtype=float)])
+        y = group['Terminal Velocity (m/s)'].to_numpy(dtype=float)
+        previous = models.get(grain, {'xtx': np.zeros((4, 4)), 'xty': np.zeros(4), 'yty': 0.0, 'n': 0})
+        models[grain] = {
+            'xtx': previous['xtx'] + x.T @ x,
+            'xty': previous['xty'] + x.T @ y,
+            'yty': previous['yty'] + y @ y,
+            'n': previous['n'] + len(y)
+        }
+    return models
+
+
+def terminal_velocity_model_fit(statistics):
+    """Ridge-regularised least-squares coefficients, R² and RMSE from accumulated sufficient statistics.
+
+    The slopes are solved on centred statistics with a penalty of MODEL_RIDGE_PSEUDO_ROWS times each
+    predictor's variance. Collinear predictors (e.g. a grain logged at a single density) give the
+    minimum-norm solution.
+    """
+    n = statistics['n']
+    means = statistics['xtx'][0, 1:] / n
+    mean_velocity = statistics['xty'][0] / n
+    centred_xtx = statistics['xtx'][1:, 1:] - n * np.outer(means, means)
+    centred_xty = statistics['xty'][1:] - n * means * mean_velocity
+    penalty = MODEL_RIDGE_PSEUDO_ROWS * np.diag(np.diag(centred_xtx)) / n
+    slopes = np.linalg.lstsq(centred_xtx + penalty, centred_xty, rcond=None)[0]
+    coefficients = np.concatenate([[mean_velocity - slopes @ means], slopes])
+    ss_res = max(statistics['yty'] - 2 * coefficients @ statistics['xty']
+                 + coefficients @ statistics['xtx'] @ coefficients, 0.0)
+    ss_tot = statistics['yty'] - statistics['xty'][0] ** 2 / n
+    return {
+        'coefficients': coefficients,
+        'n': n,
+        'r_squared': 1 - ss_res / ss_tot if ss_tot > 1e-12 else np.nan,
+        'rmse': np.sqrt(ss_res / n)
+    }
+
+
+def predict_terminal_velocity(models, grain, moisture, size, density):
+    """Predict terminal velocity (m/s) for arrays of moisture (% d.b.), size (mm) and density (kg/m³).
+
+    Uses the grain's own model when it has enough rows, otherwise the pooled model. Returns the
+    predictions and the name of the model used.
+    """
+    statistics = models.get(grain)
+    model_name = grain
+    if statistics is None or statistics['n'] < MIN_ROWS_PER_GRAIN_MODEL:
+        statistics = models[POOLED_MODEL_NAME]
+        model_name = POOLED_MODEL_NAME
+    coefficients = terminal_velocity_model_fit(statistics)['coefficients']
+    moisture, size, density = np.broadcast_arrays(np.asarray(moisture, dtype=float),
+                                                  np.asarray(size, dtype=float),
+                                                  np.asarray(density, dtype=float))
+    return coefficients[0] + coefficients[1] * moisture + coefficients[2] * size + coefficients[3] * density, model_name
+
+
+# Helper functions for aspirator separation (Monte Carlo over terminal velocity distributions)
+# Typical terminal velocities of impurities (m/s): component -> (mean, standard deviation)
+IMPURITY_VELOCITY_DEFAULTS = {
+    'Chaff': (2.5, 0.8),
+    'Dust': (1.0, 0.4),
+    'Shrivelled kernels': (6.0, 1.2),
+    'Straw pieces': (4.0, 1.0)
+}
+
+
+def sample_terminal_velocities(distribution, size, rng):
+    """Draw particle terminal velocities (m/s) from a distribution.
+
+    distribution is either a (mean, standard deviation) tuple for a normal distribution, or an array of
+    measured/simulated velocities that is resampled with Gaussian kernel smoothing (Silverman bandwidth).
+    """
+    if isinstance(distribution, tuple):
+        mean, std = distribution
+        velocities = rng.normal(mean, std, size)
+    else:
+        measured = np.asarray(distribution, dtype=float)
+        measured = measured[np.isfinite(measured)]
+        bandwidth = 1.06 * measured.std() * len(measured) ** -0.2 if len(measured) > 1 else 0.0
+        velocities = rng.choice(measured, size) + rng.normal(0.0, bandwidth, size)
+    return np.clip(velocities, 0.01, None)
+
+
+def lift_thresholds(velocities, turbulence_intensity, rng):
+    """Sorted air speeds above which each particle is lifted out of the grain stream.
+
+    The local air speed fluctuates as U(1 + Tu·z) with z ~ N(0, 1), so a particle is lifted when
+    U > Vt / (1 + Tu·z). With the thresholds sorted, the lifted fraction at any U is a binary search.
+    """
+    factor = 1 + turbulence_intensity * rng.standard_normal(len(velocities))
+    with np.errstate(divide='ignore'):
+        thresholds = np.where(factor > 0, velocities / factor, np.inf)
+    return np.sort(thresholds)
+
+
+def aspirator_partition_curve(velocities, air_speed, turbulence_intensity):
+    """Probability that a particle with terminal velocity Vt is lifted at air speed U (partition curve)."""
+    velocities = np.asarray(velocities, dtype=float)
+    if turbulence_intensity <= 0:
+        return (velocities < air_speed).astype(float)
+    return stats.norm.sf((velocities / air_speed - 1) / turbulence_intensity)
+
+
+@st.cache_data
+def aspirator_separation_curves(grain_distribution, impurity_distributions, impurity_fractions, air_speeds,
+                                particles=1000000, turbulence_intensity=0.1, seed=0):
+    """Monte Carlo grain loss and impurity carry-over curves over a range of aspirator air speeds.
+
+    impurity_distributions maps component -> distribution (see sample_terminal_velocities) and
+    impurity_fractions maps component -> mass fraction of the feed. Results are cached per distribution,
+    so changing the operating air speed only reads the curves again.
+    Returns one row per air speed with grain loss (% of grain lifted out), carry-over of each impurity
+    (% left in the cleaned grain), mass-weighted impurity carry-over, cleaned grain purity and the
+    misplaced material (% of feed).
+    """
+    rng = np.random.default_rng(seed)
+    air_speeds = np.asarray(air_speeds, dtype=float)
+
+    def lifted_fraction(distribution):
+        velocities = sample_terminal_velocities(distribution, particles, rng)
+        thresholds = lift_thresholds(velocities, turbulence_intensity, rng)
+        return np.searchsorted(thresholds, air_speeds, side='left') / particles
+
+    grain_mass = 1 - sum(impurity_fractions.values())
+    grain_lost = lifted_fraction(grain_distribution)
+    curves = pd.DataFrame({'Air Speed (m/s)': air_speeds, 'Grain Loss (%)': grain_lost * 100})
+
+    carried_mass = np.zeros_like(air_speeds)
+    for name, distribution in impurity_distributions.items():
+        carry_over = 1 - lifted_fraction(distribution)
+        curves[f'{name} Carry-over (%)'] = carry_over * 100
+        carried_mass += impurity_fractions[name] * carry_over
+
+    impurity_mass = 1 - grain_mass
+    curves['Impurity Carry-over (%)'] = carried_mass / impurity_mass * 100 if impurity_mass > 0 else 0.0
+    cleaned_grain = grain_mass * (1 - grain_lost)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        curves['Cleaned Grain Purity (%)'] = cleaned_grain / (cleaned_grain + carried_mass) * 100
+    curves['Misplaced Material (%)'] = (grain_mass * grain_lost + carried_mass) * 100
+    return curves
+
+
+def separation_cut_velocity(curves):
+    """Air speeds that misplace the least material and where grain loss equals impurity carry-over."""
+    speeds = curves['Air Speed (m/s)'].to_numpy()
+    best_speed = speeds[curves['Misplaced Material (%)'].to_numpy().argmin()]
+
+    gap = (curves['Grain Loss (%)'] - curves['Impurity Carry-over (%)']).to_numpy()
+    crossing = np.argmax(gap >= 0)
+    if gap[crossing] < 0:
+        equal_error_speed = np.nan
+    elif crossing == 0:
+        equal_error_speed = speeds[0]
+    else:
+        fraction = -gap[crossing - 1] / (gap[crossing] - gap[crossing - 1])
+        equal_error_speed = speeds[crossing - 1] + fraction * (speeds[crossing] - speeds[crossing - 1])
+    return best_speed, equal_error_speed
+
+
+# Helper functions for dilute-phase pneumatic conveying
+# Inputs are SI: solids rate (kg/s), velocities (m/s), pipe and particle diameters (m), lengths (m)
+STANDARD_PIPE_DIAMETERS_MM = [50, 65, 80, 100, 125, 150, 200, 250, 300]
+
+
+def saltation_velocity(solids_rate, pipe_diameter, particle_diameter, air_density=1.2):
+    """Minimum horizontal (pickup) air velocity below which solids settle in the pipe (Rizk correlation).
+
+    Rizk: μ = 10^-δ Fr^χ with Fr = U/√(gD), δ = 1.44d + 1.96, χ = 1.1d + 2.5 (d in mm). Writing the
+    loading ratio μ = ṁs/(ρa U A) gives the saltation velocity in closed form.
+    """
+    pipe_diameter = np.asarray(pipe_diameter, dtype=float)
+    d_mm = np.asarray(particle_diameter, dtype=float) * 1000
+    delta = 1.44 * d_mm + 1.96
+    chi = 1.1 * d_mm + 2.5
+    air_mass_velocity = solids_rate / (air_density * np.pi * pipe_diameter ** 2 / 4)
+    return (air_mass_velocity * 10 ** delta * (GRAVITY * pipe_diameter) ** (chi / 2)) ** (1 / (chi + 1))
+
+
+def choking_velocity(solids_rate, pipe_diameter, terminal_velocity, particle_density, air_density=1.2,
+                     iterations=60):
+    """Saturation (choking) air velocity for vertical conveying from the Yang correlation.
+
+    Solves 2gD(ε^-4.7 - 1) / (U/ε - Vt)² = 6.81e5 (ρa/ρp)^2.2 together with the solids continuity
+    U/ε - Vt = Gs/(ρp(1 - ε)) for the choking voidage ε by bisection, element-wise over arrays.
+    """
+    pipe_diameter, terminal_velocity = np.broadcast_arrays(np.asarray(pipe_diameter, dtype=float),
+                                                           np.asarray(terminal_velocity, dtype=float))
+    solids_flux = solids_rate / (np.pi * pipe_diameter ** 2 / 4)
+    yang_constant = 6.81e5 * (air_density / particle_density) ** 2.2
+
+    low = np.full(pipe_diameter.shape, 1e-6)
+    high = np.full(pipe_diameter.shape, 1 - 1e-9)
+    for _ in range(iterations):
+        voidage = (low + high) / 2
+        slip = solids_flux / (particle_density * (1 - voidage))
+        residual = 2 * GRAVITY * pipe_diameter * (voidage ** -4.7 - 1) - yang_constant * slip ** 2
+        low = np.where(residual > 0, voidage, low)
+        high = np.where(residual > 0, high, voidage)
+    voidage = (low + high) / 2
+    return voidage * (terminal_velocity + solids_flux / (particle_density * (1 - voidage)))
+
+
+def pneumatic_conveying_pressure_drop(solids_rate, air_velocity, pipe_diameter, particle_diameter, particle_density,
+                                      terminal_velocity, horizontal_length, vertical_length, bends,
+                                      air_density=1.2, air_viscosity=1.8e-5, bend_loss_factor=1.0):
+    """Pressure drop (Pa) of a dilute-phase pipeline, by segment, for arrays of air velocity and pipe diameter.
+
+    Acceleration of gas and solids from rest at the feed point; gas friction with a smooth-pipe friction factor;
+    horizontal solids friction from Hinkle's particle velocity and friction factor; vertical solids friction
+    from Konno and Saito plus the weight of the suspension; and each bend as B(1 + μ)ρaU²/2.
+    """
+    air_velocity, pipe_diameter = np.broadcast_arrays(np.asarray(air_velocity, dtype=float),
+                                                      np.asarray(pipe_diameter, dtype=float))
+    area = np.pi * pipe_diameter ** 2 / 4
+    solids_flux = solids_rate / area
+    loading_ratio = solids_flux / (air_density * air_velocity)
+    dynamic_pressure = air_density * air_velocity ** 2 / 2
+
+    # Particle velocities: Hinkle (horizontal) and slip equal to terminal velocity (vertical)
+    horizontal_particle_velocity = air_velocity * (1 - 0.0638 * particle_diameter ** 0.3 * particle_density ** 0.5)
+    vertical_particle_velocity = np.maximum(air_velocity - terminal_velocity, 1e-3)
+
+    acceleration = dynamic_pressure + solids_flux * horizontal_particle_velocity / 2
+
+    reynolds = air_density * air_velocity * pipe_diameter / air_viscosity
+    gas_friction_factor = (-1.8 * np.log10(6.9 / reynolds)) ** -2 / 4  # Fanning, Haaland for smooth pipe
+    gas_friction = 2 * gas_friction_factor * air_density * air_velocity ** 2 / pipe_diameter
+
+    slip_reynolds = air_density * (air_velocity - horizontal_particle_velocity) * particle_diameter / air_viscosity
+    particle_friction_factor = (3 / 8 * air_density / particle_density * pipe_diameter / particle_diameter
+                                * sphere_drag_coefficient(slip_reynolds)
+                                * ((air_velocity - horizontal_particle_velocity) / horizontal_particle_velocity) ** 2)
+    horizontal_solids_friction = (2 * particle_friction_factor * solids_flux * horizontal_particle_velocity
+                                  / pipe_diameter)
+    horizontal = (gas_friction + horizontal_solids_friction) * horizontal_length
+
+    vertical_solids_friction = 0.057 * solids_flux * np.sqrt(GRAVITY / pipe_diameter)
+    suspension_weight = (solids_flux / vertical_particle_velocity + air_density) * GRAVITY
+    vertical = (gas_friction + vertical_solids_friction + suspension_weight) * vertical_length
+
+    bend = bends * bend_loss_factor * (1 + loading_ratio) * dynamic_pressure
+
+    return {
+        'loading_ratio': loading_ratio,
+        'horizontal_particle_velocity': horizontal_particle_velocity,
+        'vertical_particle_velocity': vertical_particle_velocity,
+        'acceleration': acceleration,
+        'horizontal': horizontal,
+        'vertical': vertical,
+        'bends': bend,
+        'total': acceleration + horizontal + vertical + bend
+    }
+
+
+def pneumatic_conveying_sweep(solids_rate, pipe_diameters, air_velocities, particle_diameter, particle_density,
+                              terminal_velocity, horizontal_length, vertical_length, bends, air_density=1.2,
+                              air_viscosity=1.8e-5, bend_loss_factor=1.0, safety_factor=1.3, blower_efficiency=0.6,
+                              max_pressure_drop=80000.0, max_loading_ratio=15.0):
+    """Evaluate every pipe diameter × air velocity combination at once.
+
+    A design is feasible when the air velocity is at least safety_factor times both the saltation and the
+    choking velocity of that pipe, the loading ratio stays dilute (≤ max_loading_ratio) and the total pressure
+    drop stays below max_pressure_drop (the limit of the incompressible dilute-phase model).
+    Returns a long-format DataFrame with blower power and specific energy for each combination.
+    """
+    pipe_diameters = np.asarray(pipe_diameters, dtype=float)
+    diameter_grid, velocity_grid = np.meshgrid(pipe_diameters, np.asarray(air_velocities, dtype=float),
+                                               indexing='ij')
+
+    pressure = pneumatic_conveying_pressure_drop(solids_rate, velocity_grid, diameter_grid, particle_diameter,
+                                                 particle_density, terminal_velocity, horizontal_length,
+                                                 vertical_length, bends, air_density, air_viscosity,
+                                                 bend_loss_factor)
+    minimum_velocity = np.maximum(saltation_velocity(solids_rate, pipe_diameters, particle_diameter, air_density),
+                                  choking_velocity(solids_rate, pipe_diameters, terminal_velocity, particle_density,
+                                                   air_density))[:, None] * safety_factor
+    air_flow = velocity_grid * np.pi * diameter_grid ** 2 / 4
+    blower_power = air_flow * pressure['total'] / blower_efficiency
+
+    return pd.DataFrame({
+        'Pipe Diameter (mm)': (diameter_grid * 1000).ravel(),
+        'Air Velocity (m/s)': velocity_grid.ravel(),
+        'Minimum Air Velocity (m/s)': np.broadcast_to(minimum_velocity, velocity_grid.shape).ravel(),
+        'Air Flow (m³/min)': (air_flow * 60).ravel(),
+        'Solids Loading Ratio': pressure['loading_ratio'].ravel(),
+        'Pressure Drop (kPa)': (pressure['total'] / 1000).ravel(),
+        'Blower Power (kW)': (blower_power / 1000).ravel(),
+        'Specific Energy (kWh/t)': (blower_power / 1000 / (solids_rate * 3.6)).ravel(),
+        'Feasible': ((velocity_grid >= minimum_velocity) & (pressure['total'] <= max_pressure_drop)
+                     & (pressure['loading_ratio'] <= max_loading_ratio)).ravel()
+    })
+
+
+# Helper functions for screen cleaner evaluation
+CLEANING_STREAMS = ('Feed', 'Good Outlet', 'Chaff Outlet')
+GRADING_STREAMS = ('Feed', 'Overflow', 'Underflow')
+
+
+def separation_effectiveness(X, Y, Z):
+    """Effectiveness of a two-outlet separation from mass fractions of the desired material.
+
+    X, Y and Z are the fractions in the feed, the accepted outlet (good grain / overflow) and the rejected
+    outlet (chaff / underflow). Returns arrays for the effectiveness with reference to the accepted
+    outlet (Eg or Eo), the rejected outlet (Ec or Eu) and their product (Ecl or overall grading).
+    Undefined combinations (e.g. Y = Z) are NaN.
+    """
+    X, Y, Z = (np.asarray(value, dtype=float) for value in (X, Y, Z))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        accepted = (Y * (X - Z)) / (X * (Y - Z))
+        rejected = ((Y - X) * (1 - Z)) / ((Y - Z) * (1 - X))
+    return {'accepted': accepted, 'rejected': rejected, 'overall': accepted * rejected}
+
+
+@st.cache_data
+def effectiveness_volume(x_range=(0.01, 0.99), y_range=(0.01, 0.99), z_range=(0.01, 0.99), points=100):
+    """Effectiveness over a full X × Y × Z grid by broadcasting. Cached per grid specification.
+
+    Points outside the physically valid region Z < X < Y are masked with NaN. Returns the axes, a
+    dictionary of (points, points, points) arrays indexed [x, y, z], and the validity mask.
+    """
+    x = np.linspace(*x_range, points)
+    y = np.linspace(*y_range, points)
+    z = np.linspace(*z_range, points)
+    X, Y, Z = x[:, None, None], y[None, :, None], z[None, None, :]
+    valid = (Z < X) & (X < Y)
+    effectiveness = separation_effectiveness(X, Y, Z)
+    return x, y, z, {key: np.where(valid, value, np.nan) for key, value in effectiveness.items()}, valid
+
+
+def separation_sample_problems(samples, streams=CLEANING_STREAMS, desired_column='Good Grains (g)',
+                               total_column='Total (g)', run_column='Run', stream_column='Stream'):
+    """Messages describing why a sample table cannot be evaluated; empty if it can.
+
+    Masses that are not numbers count as missing.
+    """
+    problems = []
+    unknown = sorted(set(samples[stream_column].dropna().astype(str)) - set(streams))
+    if unknown:
+        problems.append(f"Unknown Stream values: {', '.join(unknown)}. Use {', '.join(streams)}.")
+    valid = samples.assign(**{column: pd.to_numeric(samples[column], errors='coerce')
+                              for column in (desired_column, total_column)}).dropna(
+        subset=[run_column, stream_column, desired_column, total_column])
+    if not (valid[total_column] > 0).any():
+        problems.append("There are no samples with a run, a stream and a positive total mass.")
+    return problems
+
+
+def evaluate_separation_samples(samples, streams=CLEANING_STREAMS, desired_column='Good Grains (g)',
+                                total_column='Total (g)', run_column='Run', stream_column='Stream'):
+    """Evaluate any number of runs, each with any number of samples per stream, in one call.
+
+    samples is a long table with one row per weighed sample. For every run the stream fractions are the
+    pooled desired mass over pooled total mass (equal to the ratio of the averages), the spread is the
+    standard deviation of the individual sample fractions, and the standard errors of X, Y and Z are
+    propagated to the effectiveness values by central differences. Streams a run has no samples for give
+    NaN; a ValueError lists the problems of a table that cannot be evaluated (separation_sample_problems()).
+    Samples whose masses are not numbers are left out.
+    """
+    problems = separation_sample_problems(samples, streams, desired_column, total_column, run_column,
+                                          stream_column)
+    if problems:
+        raise ValueError(" ".join(problems))
+    samples = samples.assign(**{column: pd.to_numeric(samples[column], errors='coerce')
+                                for column in (desired_column, total_column)})
+    samples = samples.dropna(subset=[run_column, stream_column, desired_column, total_column])
+    samples = samples[samples[total_column] > 0]
+    grouped = samples.assign(fraction=samples[desired_column] / samples[total_column]).groupby(
+        [run_column, stream_column])
+    summary = grouped.agg(desired=(desired_column, 'sum'), total=(total_column, 'sum'),
+                          spread=('fraction', 'std'), count=('fraction', 'size')).unstack(stream_column)
+    summary = summary.reindex(columns=pd.MultiIndex.from_product([['desired', 'total', 'spread', 'count'],
+                                                                  list(streams)]))
+
+    fractions = [(summary['desired'][stream] / summary['total'][stream]).to_numpy() for stream in streams]
+    spreads = [summary['spread'][stream].fillna(0.0).to_numpy() for stream in streams]
+    counts = [summary['count'][stream].fillna(0).to_numpy() for stream in streams]
+    standard_errors = [spread / np.sqrt(np.maximum(count, 1)) for spread, count in zip(spreads, counts)]
+
+    effectiveness, effectiveness_errors = effectiveness_uncertainty(fractions, standard_errors)
+
+    results = pd.DataFrame({run_column: summary.index})
+    for label, fraction, spread, count, standard_error in zip(['X', 'Y', 'Z'], fractions, spreads, counts,
+                                                             standard_errors):
+        results[label] = fraction
+        results[f'{label} SD'] = spread
+        results[f'{label} SE'] = standard_error
+        results[f'{label} Samples'] = count.astype(int)
+    for key in effectiveness:
+        results[f'E {key}'] = effectiveness[key]
+        results[f'E {key} SE'] = effectiveness_errors[key]
+    return results
+
+
+def effectiveness_uncertainty(fractions, standard_errors, step=1e-6):
+    """Effectiveness values and their standard errors propagated from independent errors in X, Y and Z."""
+    effectiveness = separation_effectiveness(*fractions)
+    variances = {key: np.zeros(np.shape(fractions[0])) for key in effectiveness}
+    for index, standard_error in enumerate(standard_errors):
+        upper = list(fractions)
+        lower = list(fractions)
+        upper[index] = fractions[index] + step
+        lower[index] = fractions[index] - step
+        upper_effectiveness = separation_effectiveness(*upper)
+        lower_effectiveness = separation_effectiveness(*lower)
+        for key in effectiveness:
+            derivative = (upper_effectiveness[key] - lower_effectiveness[key]) / (2 * step)
+            variances[key] += (derivative * standard_error) ** 2
+    return effectiveness, {key: np.sqrt(variance) for key, variance in variances.items()}
+
+
+# Mass balance constraints on [A, B, C, AX, BY, CZ]: total A = B + C and desired material AX = BY + CZ
+SEPARATION_BALANCE_MATRIX = np.array([[1.0, -1.0, -1.0, 0.0, 0.0, 0.0],
+                                      [0.0, 0.0, 0.0, 1.0, -1.0, -1.0]])
+
+
+def reconcile_separation_balance(masses, fractions, mass_errors, fraction_errors, confidence=0.95):
+    """Reconcile stream masses and fractions of many runs to satisfy both mass balances.
+
+    masses and fractions are (runs, 3) arrays ordered feed, accepted outlet, rejected outlet, with
+    standard deviations of the same shape. Working on total and desired-material flows makes both
+    constraints linear, so each run is a weighted least-squares projection x̂ = x - VMᵀ(MVMᵀ)⁻¹Mx,
+    solved for all runs together. The global test (χ², 2 degrees of freedom) flags runs with a gross
+    error, and normalised adjustments above the Šidák-corrected critical value point at the suspect
+    measurements.
+    """
+    masses, fractions = np.asarray(masses, dtype=float), np.asarray(fractions, dtype=float)
+    mass_variance = np.asarray(mass_errors, dtype=float) ** 2
+    fraction_variance = np.asarray(fraction_errors, dtype=float) ** 2
+    runs = len(masses)
+
+    measured = np.concatenate([masses, masses * fractions], axis=1)
+    covariance = np.zeros((runs, 6, 6))
+    streams = np.arange(3)
+    covariance[:, streams, streams] = mass_variance
+    covariance[:, streams + 3, streams + 3] = fractions ** 2 * mass_variance + masses ** 2 * fraction_variance
+    covariance[:, streams, streams + 3] = fractions * mass_variance
+    covariance[:, streams + 3, streams] = fractions * mass_variance
+
+    M = SEPARATION_BALANCE_MATRIX
+    imbalance = measured @ M.T
+    balance_covariance = M @ covariance @ M.T
+    gain = covariance @ M.T @ np.linalg.inv(balance_covariance)
+    reconciled = measured - np.einsum('rij,rj->ri', gain, imbalance)
+    adjustment_covariance = gain @ M @ covariance
+    reconciled_covariance = covariance - adjustment_covariance
+
+    adjustment_sd = np.sqrt(np.clip(np.diagonal(adjustment_covariance, axis1=1, axis2=2), 0, None))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normalized_adjustments = np.where(adjustment_sd > 0, (reconciled - measured) / adjustment_sd, 0.0)
+    global_test = np.einsum('ri,rij,rj->r', imbalance, np.linalg.inv(balance_covariance), imbalance)
+    measurement_critical = stats.norm.ppf(1 - (1 - confidence ** (1 / 6)) / 2)
+
+    # Fractions and their standard errors from the reconciled flows (delta method)
+    total, desired = reconciled[:, :3], reconciled[:, 3:]
+    total_var = reconciled_covariance[:, streams, streams]
+    desired_var = reconciled_covariance[:, streams + 3, streams + 3]
+    cross = reconciled_covariance[:, streams, streams + 3]
+    reconciled_fractions = desired / total
+    fraction_variance = (desired_var / total ** 2 + desired ** 2 * total_var / total ** 4
+                         - 2 * desired * cross / total ** 3)
+
+    return {
+        'masses': total,
+        'fractions': reconciled_fractions,
+        'fraction_errors': np.sqrt(np.clip(fraction_variance, 0, None)),
+        'imbalance': imbalance,
+        'normalized_adjustments': normalized_adjustments,
+        'global_test': global_test,
+        'gross_error': global_test > stats.chi2.ppf(confidence, 2),
+        'suspect_measurements': np.abs(normalized_adjustments) > measurement_critical
+    }
+
+
+def reconcile_separation_results(results, stream_masses, streams=CLEANING_STREAMS, mass_relative_error=0.01,
+                                 min_fraction_error=0.005, run_column='Run'):
+    """Reconcile per-run sample results with measured stream masses and recompute the effectiveness.
+
+    results comes from evaluate_separation_samples(); stream_masses has a run column and one
+    '<stream> Mass (kg)' column per stream. Runs without stream masses are dropped.
+    """
+    mass_columns = [f'{stream} Mass (kg)' for stream in streams]
+    merged = results.merge(stream_masses[[run_column] + mass_columns].dropna(), on=run_column)
+    masses = merged[mass_columns].to_numpy(dtype=float)
+    fractions = merged[['X', 'Y', 'Z']].to_numpy(dtype=float)
+    fraction_errors = np.maximum(merged[['X SE', 'Y SE', 'Z SE']].to_numpy(dtype=float), min_fraction_error)
+
+    balance = reconcile_separation_balance(masses, fractions, masses * mass_relative_error, fraction_errors)
+    effectiveness, effectiveness_errors = effectiveness_uncertainty(list(balance['fractions'].T),
+                                                                    list(balance['fraction_errors'].T))
+
+    reconciled = pd.DataFrame({run_column: merged[run_column]})
+    for index, (stream, label) in enumerate(zip(streams, ['X', 'Y', 'Z'])):
+        reconciled[f'{stream} Mass (kg)'] = masses[:, index]
+        reconciled[f'Reconciled {stream} Mass (kg)'] = balance['masses'][:, index]
+        reconciled[f'{label} Measured'] = fractions[:, index]
+        reconciled[label] = balance['fractions'][:, index]
+        reconciled[f'{label} SE'] = balance['fraction_errors'][:, index]
+    reconciled['Total Imbalance (kg)'] = balance['imbalance'][:, 0]
+    reconciled['Desired Material Imbalance (kg)'] = balance['imbalance'][:, 1]
+    reconciled['Global Test (χ²)'] = balance['global_test']
+    reconciled['Gross Error'] = balance['gross_error']
+    measurement_names = [f'{stream} mass' for stream in streams] + [f'{label}' for label in ['X', 'Y', 'Z']]
+    reconciled['Suspect Measurements'] = [', '.join(name for name, flag in zip(measurement_names, flags) if flag)
+                                          for flags in balance['suspect_measurements']]
+    for key in effectiveness:
+        reconciled[f'E {key} Measured'] = merged[f'E {key}']
+        reconciled[f'E {key}'] = effectiveness[key]
+        reconciled[f'E {key} SE'] = effectiveness_errors[key]
+    return reconciled
+
+
+def separation_stream_flows(feed, X, Y, Z):
+    """Outlet flows and their desired/undesired split from the feed flow and the three fractions.
+
+    The accepted outlet follows from the two mass balances, B = A(X - Z)/(Y - Z), and C = A - B.
+    Works on scalars or arrays; undefined combinations (Y = Z) are NaN.
+    """
+    feed, X, Y, Z = (np.asarray(value, dtype=float) for value in (feed, X, Y, Z))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        accepted = feed * (X - Z) / (Y - Z)
+    rejected = feed - accepted
+    return {
+        'feed': feed,
+        'accepted': accepted,
+        'rejected': rejected,
+        'accepted_desired': accepted * Y,
+        'accepted_undesired': accepted * (1 - Y),
+        'rejected_desired': rejected * Z,
+        'rejected_undesired': rejected * (1 - Z)
+    }
+
+
+@st.cache_data
+def material_flow_sankey(feed, X, Y, Z, streams=CLEANING_STREAMS, material_names=('Good Grain', 'Impurities'),
+                         unit='kg/h'):
+    """Plotly Sankey diagram of the feed split into both outlets and into desired and undesired material.
+
+    Built entirely from the computed flows, so it renders offline. Cached per flow specification.
+    """
+    flows = separation_stream_flows(feed, X, Y, Z)
+    labels = [f"{streams[0]}<br>{flows['feed']:.2f} {unit}",
+              f"{streams[1]}<br>{flows['accepted']:.2f} {unit}",
+              f"{streams[2]}<br>{flows['rejected']:.2f} {unit}",
+              f"{material_names[0]}<br>{flows['accepted_desired'] + flows['rejected_desired']:.2f} {unit}",
+              f"{material_names[1]}<br>{flows['accepted_undesired'] + flows['rejected_undesired']:.2f} {unit}"]
+    desired_colour, undesired_colour = 'rgba(46, 139, 87, 0.5)', 'rgba(160, 82, 45, 0.5)'
+    # Feed -> outlets, then outlets -> material; each link carries only one material so the colours trace it
+    links = [(0, 1, 'accepted_desired', desired_colour), (0, 1, 'accepted_undesired', undesired_colour),
+             (0, 2, 'rejected_desired', desired_colour), (0, 2, 'rejected_undesired', undesired_colour),
+             (1, 3, 'accepted_desired', desired_colour), (1, 4, 'accepted_undesired', undesired_colour),
+             (2, 3, 'rejected_desired', desired_colour), (2, 4, 'rejected_undesired', undesired_colour)]
+    fig = go.Figure(go.Sankey(
+        arrangement='fixed',
+        node=dict(label=labels, pad=20, thickness=20, line=dict(color='black', width=0.5),
+                  color=['#4682B4', '#2E8B57', '#A0522D', '#3CB371', '#CD853F'],
+                  x=[0.01, 0.5, 0.5, 0.99, 0.99], y=[0.5, 0.3, 0.8, 0.3, 0.8]),
+        link=dict(source=[link[0] for link in links], target=[link[1] for link in links],
+                  value=[max(float(flows[link[2]]), 0.0) for link in links],
+                  color=[link[3] for link in links],
+                  label=[material_names[0] if link[3] == desired_colour else material_names[1] for link in links]),
+        valueformat='.2f', valuesuffix=f' {unit}'
+    ))
+    fig.update_layout(title_text="Material Flow Through Cleaner/Grader", font_size=12, height=450)
+    return fig
+
+
+def size_distribution_classes(sizes=None, weights=None, mean=None, sd=None, classes=60, size_range=None):
+    """Mass fractions of a particle size distribution on equal-width size classes.
+
+    Either measured sizes (with optional mass weights, e.g. grain volumes or sieve masses) are binned, or a
+    normal distribution with the given mean and standard deviation is integrated over the classes.
+    Returns the class mid-sizes and mass fractions summing to one.
+    """
+    if sizes is not None:
+        sizes = np.asarray(sizes, dtype=float)
+        weights = np.ones_like(sizes) if weights is None else np.asarray(weights, dtype=float)
+        if not weights.sum() > 0:
+            raise ValueError("At least one size with a positive weight is needed.")
+        size_range = size_range or (sizes.min() * 0.95, sizes.max() * 1.05)
+        edges = np.linspace(*size_range, classes + 1)
+        fractions, _ = np.histogram(sizes, bins=edges, weights=weights)
+    else:
+        size_range = size_range or (max(mean - 4 * sd, 0.0), mean + 4 * sd)
+        edges = np.linspace(*size_range, classes + 1)
+        fractions = np.diff(stats.norm.cdf(edges, mean, sd))
+    return (edges[:-1] + edges[1:]) / 2, fractions / fractions.sum()
+
+
+def screen_passage_probability(sizes, apertures, open_area=0.5):
+    """Probability that a particle passes an aperture in a single presentation (Gaudin).
+
+    p = f₀(1 - d/a)² for d < a and zero otherwise, with f₀ the open-area fraction of the deck.
+    """
+    ratio = np.asarray(sizes, dtype=float) / np.asarray(apertures, dtype=float)
+    return open_area * np.clip(1 - ratio, 0, None) ** 2
+
+
+def simulate_screen_decks(class_sizes, feed_fractions, apertures, lengths, feed_rate, width=1.0, open_area=0.5,
+                          presentations_per_metre=40.0, reference_loading=3000.0):
+    """Probabilistic simulation of a stack of screen decks for many deck configurations at once.
+
+    apertures (mm) and lengths (m) are (configurations, decks) arrays ordered top deck first; size classes
+    broadcast along the last axis. On each deck a particle gets n = presentations_per_metre × length
+    presentations, reduced as n / (1 + q/q₀) by the deck loading q (kg/h per metre of width) to account for
+    crowding, so the fraction passing is 1 - (1 - p)ⁿ. Oversize leaves as the deck overflow and undersize
+    feeds the next deck. Returns the outlet flows (configurations, decks + 1, classes) in kg/h, the last
+    outlet being the pan, and the passing fractions (configurations, decks, classes).
+    """
+    apertures, lengths = np.atleast_2d(apertures).astype(float), np.atleast_2d(lengths).astype(float)
+    apertures, lengths = np.broadcast_arrays(apertures, lengths)
+    class_sizes = np.asarray(class_sizes, dtype=float)
+    flow = np.broadcast_to(feed_rate * np.asarray(feed_fractions, dtype=float),
+                           (apertures.shape[0], class_sizes.size)).copy()
+
+    outlets, passing_fractions = [], []
+    for deck in range(apertures.shape[1]):
+        probability = screen_passage_probability(class_sizes, apertures[:, deck, None], open_area)
+        loading = flow.sum(axis=1, keepdims=True) / width
+        presentations = presentations_per_metre * lengths[:, deck, None] / (1 + loading / reference_loading)
+        passing = 1 - (1 - probability) ** presentations
+        outlets.append(flow * (1 - passing))
+        passing_fractions.append(passing)
+        flow = flow * passing
+    outlets.append(flow)
+    return {'outlets': np.stack(outlets, axis=1), 'passing': np.stack(passing_fractions, axis=1)}
+
+
+def screen_deck_effectiveness(outlets, class_sizes, desired_range, accepted_outlet):
+    """Grading effectiveness of one outlet of a deck stack for a desired size range.
+
+    The accepted outlet plays the role of the overflow in the two-outlet formulas and all other outlets
+    are pooled as the rejected stream. Returns X, Y, Z, the recovery of desired material and the
+    effectiveness dictionary from separation_effectiveness().
+    """
+    class_sizes = np.asarray(class_sizes, dtype=float)
+    desired = (class_sizes >= desired_range[0]) & (class_sizes <= desired_range[1])
+    outlet_mass = outlets.sum(axis=-1)
+    outlet_desired = outlets[..., desired].sum(axis=-1)
+    feed_mass, feed_desired = outlet_mass.sum(axis=-1), outlet_desired.sum(axis=-1)
+    accepted_mass, accepted_desired = outlet_mass[..., accepted_outlet], outlet_desired[..., accepted_outlet]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        X = feed_desired / feed_mass
+        Y = accepted_desired / accepted_mass
+        Z = (feed_desired - accepted_desired) / (feed_mass - accepted_mass)
+        recovery = accepted_desired / feed_desired
+    return {'X': X, 'Y': Y, 'Z': Z, 'recovery': recovery, 'effectiveness': separation_effectiveness(X, Y, Z)}
+
+
+# Largest screen selection run, and the time to simulate one deck of one configuration for one size class
+# (about 1.5 s for 300,000 three-deck stacks of 30 classes)
+SCREEN_SELECTION_MAX_CONFIGURATIONS = 300000
+SCREEN_SELECTION_SECONDS_PER_DECK_CLASS = 5e-8
+
+
+@st.cache_data
+def optimize_screen_decks(class_sizes, feed_fractions, feed_rate, candidate_apertures, candidate_lengths, decks,
+                          desired_range, accepted_outlet, width=1.0, open_area=0.5, presentations_per_metre=40.0,
+                          reference_loading=3000.0, chunk_size=20000):
+    """Rank every deck stack built from the candidate apertures (decreasing down the stack) and lengths.
+
+    Configurations are simulated vectorized, chunk_size at a time. Returns a DataFrame sorted by overall
+    effectiveness. Cached per lot and candidate set.
+    """
+    aperture_sets = np.array(list(itertools.combinations(sorted(candidate_apertures, reverse=True), decks)))
+    length_sets = np.array(list(itertools.product(candidate_lengths, repeat=decks)))
+    apertures = np.repeat(aperture_sets, len(length_sets), axis=0)
+    lengths = np.tile(length_sets, (len(aperture_sets), 1))
+
+    # Simulate in chunks of configurations to bound memory for large candidate sets
+    chunks = []
+    for start in range(0, len(apertures), chunk_size):
+        simulation = simulate_screen_decks(class_sizes, feed_fractions, apertures[start:start + chunk_size],
+                                           lengths[start:start + chunk_size], feed_rate, width, open_area,
+                                           presentations_per_metre, reference_loading)
+        chunks.append(screen_deck_effectiveness(simulation['outlets'], class_sizes, desired_range,
+                                                accepted_outlet))
+    performance = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in ('Y', 'recovery')}
+    performance['effectiveness'] = {key: np.concatenate([chunk['effectiveness'][key] for chunk in chunks])
+                                    for key in ('accepted', 'rejected', 'overall')}
+
+    ranking = pd.DataFrame({f'Deck {deck + 1} Aperture (mm)': apertures[:, deck] for deck in range(decks)})
+    for deck in range(decks):
+        ranking[f'Deck {deck + 1} Length (m)'] = lengths[:, deck]
+    ranking['Total Screen Length (m)'] = lengths.sum(axis=1)
+    ranking['Accepted Purity Y'] = performance['Y']
+    ranking['Desired Recovery'] = performance['recovery']
+    ranking['Eo'] = performance['effectiveness']['accepted']
+    ranking['Eu'] = performance['effectiveness']['rejected']
+    ranking['Eg'] = performance['effectiveness']['overall']
+    return ranking.sort_values(['Eg', 'Total Screen Length (m)'], ascending=[False, True]).reset_index(drop=True)
+
+
+# Rows read per chunk when aggregating timed run logs
+RUN_LOG_CHUNK_ROWS = 100000
+
+
+def aggregate_run_log(chunks, time_column, outlet_columns, bin_seconds=60.0, run_column='Run'):
+    """Aggregate a timed run log chunk by chunk into fixed time bins per run and outlet.
+
+    chunks is any iterable of DataFrames (e.g. pd.read_csv(..., chunksize=RUN_LOG_CHUNK_ROWS)); each row is
+    the mass collected from every outlet in the interval ending at its time stamp. Times may be elapsed
+    seconds or date-times. Only the per-bin sums and per-run extents are kept, so memory does not grow with
+    the log length. Returns the binned log (Run, Time (min), one column per outlet, Total) and a per-run
+    table of first/last time stamp and interval count.
+    """
+    partial_bins, partial_runs = [], []
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=[time_column])
+        times = chunk[time_column]
+        if not pd.api.types.is_numeric_dtype(times):
+            times = (pd.to_datetime(times) - pd.Timestamp('1970-01-01')).dt.total_seconds()
+        runs = chunk[run_column] if run_column in chunk else pd.Series('Run 1', index=chunk.index)
+        masses = chunk[list(outlet_columns)].apply(pd.to_numeric, errors='coerce').fillna(0.0)
+        masses[run_column] = runs.to_numpy()
+        # Each row closes its interval, so a stamp on a bin boundary belongs to the bin it ends
+        masses['bin'] = np.ceil(times.to_numpy(dtype=float) / bin_seconds).astype(np.int64) - 1
+        partial_bins.append(masses.groupby([run_column, 'bin']).sum())
+        extents = pd.DataFrame({run_column: runs.to_numpy(), 'time': times.to_numpy(dtype=float)})
+        partial_runs.append(extents.groupby(run_column)['time'].agg(['min', 'max', 'size']))
+
+    if not partial_bins:
+        return pd.DataFrame(columns=[run_column, 'Time (min)', *outlet_columns, 'Total']), pd.DataFrame()
+    bins = pd.concat(partial_bins).groupby(level=[0, 1]).sum().reset_index()
+    runs = pd.concat(partial_runs).groupby(level=0).agg({'min': 'min', 'max': 'max', 'size': 'sum'})
+
+    # Time of each bin relative to the first bin of its run
+    bins['Time (min)'] = (bins['bin'] - bins.groupby(run_column)['bin'].transform('min') + 1) * bin_seconds / 60
+    bins['Total'] = bins[list(outlet_columns)].sum(axis=1)
+    return bins[[run_column, 'Time (min)', *outlet_columns, 'Total']], runs
+
+
+@st.cache_data(max_entries=8)
+def aggregate_run_log_csv(log_bytes, time_column, outlet_columns, bin_seconds=60.0):
+    """aggregate_run_log() of a run log CSV file, read in chunks and cached on its contents and the settings.
+
+    log_bytes is the content of the file, or None for the example log (example_run_log()).
+    """
+    chunks = (pd.read_csv(io.BytesIO(log_bytes), chunksize=RUN_LOG_CHUNK_ROWS) if log_bytes is not None
+              else [example_run_log()])
+    return aggregate_run_log(chunks, time_column, list(outlet_columns), bin_seconds)
+
+
+def run_log_capacity(bins, runs, outlet_columns, bin_seconds=60.0, tolerance=0.05, window=5, run_column='Run'):
+    """Capacity, steady-state throughput, start-up/shut-down transients and outlet split for every run.
+
+    Throughput per bin is smoothed with a centred rolling mean of `window` bins. The steady-state level is
+    the median smoothed throughput of the middle half of the run; the start-up transient ends after the
+    last smoothed bin outside ±tolerance of that level in the first half, and the shut-down transient
+    starts at the first such bin in the second half. Split columns are named after the outlet column without
+    its unit. Returns (summary per run, binned log with throughput and outlet split columns added).
+    """
+    bins = bins.copy()
+    bins['Throughput (kg/h)'] = bins['Total'] / bin_seconds * 3600
+    bins['Smoothed Throughput (kg/h)'] = bins.groupby(run_column)['Throughput (kg/h)'].transform(
+        lambda series: series.rolling(window, center=True, min_periods=1).mean())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for outlet in outlet_columns:
+            bins[f"{outlet.rsplit(' (', 1)[0]} Split (%)"] = bins[outlet] / bins['Total'] * 100
+
+    rows = []
+    for run, group in bins.groupby(run_column, sort=False):
+        smoothed = group['Smoothed Throughput (kg/h)'].to_numpy()
+        times = group['Time (min)'].to_numpy()
+        count = len(group)
+        steady = np.median(smoothed[count // 4:max(3 * count // 4, count // 4 + 1)])
+        outside = np.abs(smoothed - steady) > tolerance * steady
+        first_half = np.flatnonzero(outside[:count // 2])
+        second_half = np.flatnonzero(outside[count // 2:])
+        start = first_half[-1] + 1 if first_half.size else 0
+        stop = count // 2 + second_half[0] if second_half.size else count
+        steady_bins = group.iloc[start:stop]
+
+        extent = runs.loc[run]
+        interval = (extent['max'] - extent['min']) / max(extent['size'] - 1, 1)
+        duration = extent['max'] - extent['min'] + interval
+        total_mass = group['Total'].sum()
+        row = {
+            run_column: run,
+            'Intervals Logged': int(extent['size']),
+            'Duration (min)': duration / 60,
+            'Total Mass (kg)': total_mass,
+            'Capacity (kg/h)': total_mass / duration * 3600 if duration > 0 else np.nan,
+            'Steady-State Throughput (kg/h)': steady_bins['Throughput (kg/h)'].mean(),
+            'Throughput CV (%)': steady_bins['Throughput (kg/h)'].std() / steady_bins['Throughput (kg/h)'].mean() * 100,
+            'Start-up Transient (min)': times[start - 1] if start > 0 else 0.0,
+            'Shut-down Transient (min)': times[-1] - times[stop - 1] if stop < count else 0.0,
+            'Start-up Deficit (kg)': (steady * bin_seconds / 3600 * start - group['Total'].iloc[:start].sum())
+        }
+        for outlet in outlet_columns:
+            row[f"{outlet.rsplit(' (', 1)[0]} Split (%)"] = steady_bins[outlet].sum() / steady_bins['Total'].sum() * 100
+        rows.append(row)
+    return pd.DataFrame(rows), bins
+
+
+def example_run_log(hours=3.0, interval_seconds=5.0, capacity=1200.0, outlets=('Good Outlet (kg)',
+                    'Chaff Outlet (kg)', 'Overflow (kg)'), split=(0.9, 0.07, 0.03), seed=0):
+    """Synthetic timed run log with a start-up ramp, noisy steady running and a shut-down tail."""
+    rng = np.random.default_rng(seed)
+    times = np.arange(interval_seconds, hours * 3600 + interval_seconds / 2, interval_seconds)
+    ramp = 1 - np.exp(-times / 300)
+    tail = np.clip((hours * 3600 - times) / 240, 0, 1)
+    rate = capacity * ramp * tail * (1 + 0.05 * rng.standard_normal(times.size))
+    drift = 0.02 * np.sin(2 * np.pi * times / 3600)
+    log = pd.DataFrame({'Time (s)': times})
+    shares = np.array(split)[:, None] + np.array([-1.0, 0.7, 0.3])[:, None] * drift
+    for outlet, share in zip(outlets, shares):
+        log[outlet] = np.clip(rate * share * interval_seconds / 3600, 0, None)
+    return log
+
+
+# Helper functions for drying kinetics
+def fit_drying_constant(times, moisture, equilibrium_moisture=None, fit_equilibrium=False, iterations=100,
+                        tolerance=1e-10):
+    """Least-squares fit of (M - Me)/(M0 - Me) = e^(-kθ) over whole drying curves, many runs at once.
+
+    times (h) and moisture (% db) are (runs, points) arrays, padded with NaN where a run has fewer readings;
+    θ is counted from each run's first reading and M0 is that reading. Me is either given (scalar or one
+    value per run) or fitted together with k when fit_equilibrium is True. All runs are solved together
+    with a batched Levenberg-Marquardt iteration on the analytic Jacobian. Returns a dictionary of per-run
+    arrays: k and its standard error, Me and its standard error (zero when fixed), the fitted curve,
+    residuals, RMSE, R², number of points and a convergence flag.
+    """
+    times, moisture = np.atleast_2d(np.asarray(times, dtype=float)), np.atleast_2d(np.asarray(moisture, dtype=float))
+    valid = np.isfinite(times) & np.isfinite(moisture)
+    first = np.argmax(valid, axis=1)
+    rows = np.arange(len(times))
+    theta = np.where(valid, times - times[rows, first][:, None], 0.0)
+    initial = moisture[rows, first][:, None]
+    observed = np.where(valid, moisture, 0.0)
+    weights = valid.astype(float)
+    points = valid.sum(axis=1)
+
+    if equilibrium_moisture is None:
+        equilibrium = np.nanmin(moisture, axis=1) - 0.1 * (initial[:, 0] - np.nanmin(moisture, axis=1))
+    else:
+        equilibrium = np.broadcast_to(np.asarray(equilibrium_moisture, dtype=float), rows.shape).copy()
+
+    # Starting k from the log-linear regression through the origin over readings above Me
+    ratio = (observed - equilibrium[:, None]) / (initial - equilibrium[:, None])
+    usable = valid & (ratio > 0) & (theta > 0)
+    log_ratio = np.log(np.where(usable, ratio, 1.0))
+    k = np.clip(-np.sum(theta * log_ratio, axis=1) / np.maximum(np.sum(np.where(usable, theta ** 2, 0), axis=1),
+                                                                   1e-12), 1e-4, None)
+
+    fitted_parameters = 2 if fit_equilibrium else 1
+    damping = np.full(rows.shape, 1e-3)
+
+    def model(k_values, equilibrium_values):
+        decay = np.exp(-k_values[:, None] * theta)
+        return equilibrium_values[:, None] + (initial - equilibrium_values[:, None]) * decay, decay
+
+    error = np.sum(weights * (observed - model(k, equilibrium)[0]) ** 2, axis=1)
+    converged = np.zeros(rows.shape, dtype=bool)
+    # Iterate only the runs still converging; the 1×1 or 2×2 damped normal equations are solved in closed form
+    active = rows
+    for _ in range(iterations):
+        run_theta, run_initial, run_observed = theta[active], initial[active], observed[active]
+        run_weights, run_damping, run_error = weights[active], damping[active], error[active]
+        run_k, run_equilibrium = k[active], equilibrium[active]
+        decay = np.exp(-run_k[:, None] * run_theta)
+        residual = run_weights * (run_observed - run_equilibrium[:, None]
+                                  - (run_initial - run_equilibrium[:, None]) * decay)
+        k_derivative = -(run_initial - run_equilibrium[:, None]) * run_theta * decay * run_weights
+        k_normal = np.sum(k_derivative ** 2, axis=1)
+        k_gradient = np.sum(k_derivative * residual, axis=1)
+        k_diagonal = k_normal + run_damping * np.maximum(k_normal, 1e-12)
+        if fit_equilibrium:
+            equilibrium_derivative = (1 - decay) * run_weights
+            equilibrium_normal = np.sum(equilibrium_derivative ** 2, axis=1)
+            cross_normal = np.sum(k_derivative * equilibrium_derivative, axis=1)
+            equilibrium_gradient = np.sum(equilibrium_derivative * residual, axis=1)
+            equilibrium_diagonal = equilibrium_normal + run_damping * np.maximum(equilibrium_normal, 1e-12)
+            determinant = k_diagonal * equilibrium_diagonal - cross_normal ** 2
+            k_step = (equilibrium_diagonal * k_gradient - cross_normal * equilibrium_gradient) / determinant
+            trial_equilibrium = run_equilibrium + (k_diagonal * equilibrium_gradient
+                                                   - cross_normal * k_gradient) / determinant
+        else:
+            k_step = k_gradient / k_diagonal
+            trial_equilibrium = run_equilibrium
+        trial_k = np.clip(run_k + k_step, 1e-8, None)
+        trial_error = np.sum(run_weights * (run_observed - trial_equilibrium[:, None]
+                                            - (run_initial - trial_equilibrium[:, None])
+                                            * np.exp(-trial_k[:, None] * run_theta)) ** 2, axis=1)
+        improved = trial_error < run_error
+        k[active] = np.where(improved, trial_k, run_k)
+        equilibrium[active] = np.where(improved, trial_equilibrium, run_equilibrium)
+        error[active] = np.where(improved, trial_error, run_error)
+        damping[active] = np.where(improved, run_damping / 10, run_damping * 10)
+        converged[active] = ((improved & (run_error - trial_error < tolerance * np.maximum(run_error, 1e-12)))
+                             | (damping[active] > 1e10))
+        active = active[~converged[active]]
+        if active.size == 0:
+            break
+
+    predicted, decay = model(k, equilibrium)
+    jacobian = [-(initial - equilibrium[:, None]) * theta * decay]
+    if fit_equilibrium:
+        jacobian.append(1 - decay)
+    jacobian = np.stack(jacobian, axis=-1) * weights[..., None]
+    degrees_of_freedom = np.maximum(points - fitted_parameters, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = (np.linalg.pinv(np.einsum('rpi,rpj->rij', jacobian, jacobian))
+                      * (error / degrees_of_freedom)[:, None, None])
+        total = np.sum(weights * (observed - np.sum(observed * weights, axis=1, keepdims=True)
+                                  / points[:, None]) ** 2, axis=1)
+        r_squared = 1 - error / total
+    standard_errors = np.sqrt(np.clip(np.einsum('rii->ri', covariance), 0, None))
+
+    return {
+        'k': k,
+        'k_se': standard_errors[:, 0],
+        'equilibrium_moisture': equilibrium,
+        'equilibrium_moisture_se': standard_errors[:, 1] if fit_equilibrium else np.zeros(rows.shape),
+        'fitted': np.where(valid, predicted, np.nan),
+        'residuals': np.where(valid, observed - predicted, np.nan),
+        'rmse': np.sqrt(error / points),
+        'r_squared': r_squared,
+        'points': points,
+        'converged': converged
+    }
+
+
+# Thin-layer drying models for the moisture ratio MR = (M - Me)/(M0 - Me) against time t (h)
+def mr_newton(t, k):
+    """Newton (Lewis): MR = exp(-k t)."""
+    return np.exp(-k * t)
+
+
+def mr_page(t, k, n):
+    """Page: MR = exp(-k tⁿ)."""
+    return np.exp(-k * t ** n)
+
+
+def mr_modified_page(t, k, n):
+    """Modified Page: MR = exp[-(k t)ⁿ]."""
+    return np.exp(-(k * t) ** n)
+
+
+def mr_henderson_pabis(t, a, k):
+    """Henderson-Pabis: MR = a exp(-k t)."""
+    return a * np.exp(-k * t)
+
+
+def mr_two_term(t, a, k0, b, k1):
+    """Two-term: MR = a exp(-k₀ t) + b exp(-k₁ t)."""
+    return a * np.exp(-k0 * t) + b * np.exp(-k1 * t)
+
+
+def mr_logarithmic(t, a, k, c):
+    """Logarithmic: MR = a exp(-k t) + c."""
+    return a * np.exp(-k * t) + c
+
+
+def mr_midilli(t, a, k, n, b):
+    """Midilli: MR = a exp(-k tⁿ) + b t."""
+    return a * np.exp(-k * t ** n) + b * t
+
+
+THIN_LAYER_MODELS = {
+    'Newton (Lewis)': mr_newton,
+    'Page': mr_page,
+    'Modified Page': mr_modified_page,
+    'Henderson-Pabis': mr_henderson_pabis,
+    'Two-term': mr_two_term,
+    'Logarithmic': mr_logarithmic,
+    'Midilli': mr_midilli
+}
+
+THIN_LAYER_MODEL_PARAMETERS = {
+    'Newton (Lewis)': ('k',),
+    'Page': ('k', 'n'),
+    'Modified Page': ('k', 'n'),
+    'Henderson-Pabis': ('a', 'k'),
+    'Two-term': ('a', 'k0', 'b', 'k1'),
+    'Logarithmic': ('a', 'k', 'c'),
+    'Midilli': ('a', 'k', 'n', 'b')
+}
+
+THIN_LAYER_INITIAL_GUESSES = {
+    'Newton (Lewis)': (0.5,),
+    'Page': (0.5, 1.0),
+    'Modified Page': (0.5, 1.0),
+    'Henderson-Pabis': (1.0, 0.5),
+    'Two-term': (0.5, 0.2, 0.5, 2.0),
+    'Logarithmic': (1.0, 0.5, 0.0),
+    'Midilli': (1.0, 0.5, 1.0, 0.0)
+}
+
+
+def fit_thin_layer_model(times, moisture_ratio, model='Page', initial_guess=None):
+    """Fit one thin-layer model to a drying run (t in h, MR as a fraction).
+
+    Returns a dictionary with the coefficients, their standard errors, R², RMSE, AIC and the residuals.
+    Runs where the fit fails to converge return NaN statistics.
+    """
+    times = np.asarray(times, dtype=float)
+    moisture_ratio = np.asarray(moisture_ratio, dtype=float)
+    model_function = THIN_LAYER_MODELS[model]
+    initial_guess = THIN_LAYER_INITIAL_GUESSES[model] if initial_guess is None else initial_guess
+    parameters = len(initial_guess)
+
+    def thin_layer(t, *coefficients):
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            predicted = model_function(t, *coefficients)
+        return np.nan_to_num(predicted, nan=1e6, posinf=1e6, neginf=-1e6)
+
+    try:
+        coefficients, covariance = curve_fit(thin_layer, times, moisture_ratio, p0=initial_guess, maxfev=20000)
+    except (RuntimeError, ValueError, TypeError):
+        return {'model': model, 'coefficients': (np.nan,) * parameters, 'std_errors': (np.nan,) * parameters,
+                'r_squared': np.nan, 'rmse': np.nan, 'aic': np.nan, 'residuals': np.full(times.shape, np.nan)}
+
+    residuals = moisture_ratio - thin_layer(times, *coefficients)
+    ss_res = np.sum(residuals ** 2)
+    ss_tot = np.sum((moisture_ratio - moisture_ratio.mean()) ** 2)
+    points = len(times)
+    return {
+        'model': model,
+        'coefficients': tuple(coefficients),
+        'std_errors': tuple(np.sqrt(np.diag(covariance))) if np.all(np.isfinite(covariance))
+        else (np.nan,) * parameters,
+        'r_squared': 1 - ss_res / ss_tot if ss_tot > 0 else np.nan,
+        'rmse': np.sqrt(ss_res / points),
+        'aic': points * np.log(max(ss_res, 1e-300) / points) + 2 * parameters,
+        'residuals': residuals
+    }
+
+
+# Fewest runs worth fitting in worker processes: a run takes 15-50 ms to fit with every model, while a new
+# worker takes about 3 s to start, as it imports this script
+PARALLEL_FIT_MIN_RUNS = 400
+
+
+# Worker processes shared by the batch fitting helpers
+@st.cache_resource
+def worker_pool():
+    """One pool of spawned worker processes, up to one per CPU, shared by every session and kept between reruns.
+
+    Workers are spawned rather than forked from the threaded server, and only as they are needed. Each worker
+    imports this script once, so the functions sent to it must be defined at the top level.
+    """
+    return ProcessPoolExecutor(os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
+
+
+def map_chunks(function, chunks, processes=1):
+    """Results of function for every chunk, in order, computed in the worker pool when processes > 1.
+
+    An exception raised in a worker is raised here. If a worker dies the pool is discarded and
+    BrokenProcessPool is raised, so the next call starts a fresh pool.
+    """
+    if processes <= 1 or len(chunks) < 2:
+        return [function(chunk) for chunk in chunks]
+    try:
+        return list(worker_pool().map(function, chunks))
+    except BrokenProcessPool:
+        worker_pool.clear()
+        raise
+
+
+def fit_thin_layer_chunk(models, runs):
+    """Fit every thin-layer model to each run in runs, a list of (name, times in h, moisture ratio)."""
+    rows = []
+    for name, times, moisture_ratio in runs:
+        for model in models:
+            result = fit_thin_layer_model(times, moisture_ratio, model)
+            rows.append({'Run': name, 'Model': model, 'Points': len(times),
+                         'Coefficients': dict(zip(THIN_LAYER_MODEL_PARAMETERS[model], result['coefficients'])),
+                         'Standard Errors': dict(zip(THIN_LAYER_MODEL_PARAMETERS[model], result['std_errors'])),
+                         'R²': result['r_squared'], 'RMSE': result['rmse'], 'AIC': result['aic']})
+    return rows
+
+
+def fit_thin_layer_runs(runs, models=tuple(THIN_LAYER_MODELS), processes=1):
+    """Fit every thin-layer model to every run and rank the models within each run.
+
+    runs maps run name -> (times in h, moisture ratio). With processes > 1 and at least PARALLEL_FIT_MIN_RUNS
+    runs, the runs are split into chunks fitted in worker processes (map_chunks()). Returns a long DataFrame
+    with one row per run and model, including the coefficients as a dictionary and the rank by AIC (ties by
+    RMSE).
+    """
+    items = [(name, *runs[name]) for name in runs]
+    chunk_count = processes if processes > 1 and len(items) >= max(2 * processes, PARALLEL_FIT_MIN_RUNS) else 1
+    chunks = [items[index::chunk_count] for index in range(chunk_count)]
+    rows = [row for chunk_rows in map_chunks(functools.partial(fit_thin_layer_chunk, tuple(models)), chunks,
+                                             processes) for row in chunk_rows]
+
+    table = pd.DataFrame(rows)
+    table['Rank'] = (table.sort_values(['AIC', 'RMSE'], na_position='last').groupby('Run', sort=False)
+                     .cumcount().add(1).reindex(table.index))
+    return table.sort_values(['Run', 'Rank']).reset_index(drop=True)
+
+
+def cached_thin_layer_fits(runs, processes=1):
+    """Thin-layer fits for many runs, fitting only runs whose data have not been fitted before.
+
+    Fits are kept in st.session_state.thin_layer_fits keyed by the run data, so renamed or repeated runs are
+    not refitted, and the best model of every run is kept by name in st.session_state.thin_layer_best_fits
+    for reuse in simulations.
+    """
+    cache = st.session_state.setdefault('thin_layer_fits', {})
+    best_fits = st.session_state.setdefault('thin_layer_best_fits', {})
+    keys = {name: (tuple(np.round(times, 9)), tuple(np.round(ratio, 9))) for name, (times, ratio) in runs.items()}
+    missing = {name: runs[name] for name, key in keys.items() if key not in cache}
+    if missing:
+        fitted = fit_thin_layer_runs(missing, processes=processes)
+        for name, group in fitted.groupby('Run', sort=False):
+            cache[keys[name]] = group.drop(columns='Run')
+    table = pd.concat([cache[key].assign(Run=name) for name, key in keys.items()], ignore_index=True)
+    for name, group in table.groupby('Run', sort=False):
+        best = group.sort_values('Rank').iloc[0]
+        best_fits[name] = {'model': best['Model'], 'coefficients': best['Coefficients']}
+    return table[['Run'] + [column for column in table.columns if column != 'Run']]
+
+
+def local_polynomial_smooth(times, values, window=7, degree=2):
+    """Smoothed values and first derivatives of a (possibly unevenly sampled) series.
+
+    A polynomial of the given degree is least-squares fitted to the `window` readings centred on each
+    reading (shifted inwards at the ends), and its value and slope are taken at that reading, i.e.
+    Savitzky-Golay smoothing. Evenly sampled series use scipy's savgol_filter; otherwise the window
+    moments are gathered with one index array and all the small normal-equation systems are solved as
+    a batch.
+    """
+    times, values = np.asarray(times, dtype=float), np.asarray(values, dtype=float)
+    n = len(times)
+    window = min(int(window), n)
+    degree = min(int(degree), window - 1)
+    if n < 2 or degree < 1:
+        return values.copy(), np.full(n, np.nan)
+    steps = np.diff(times)
+    if window % 2 and np.allclose(steps, steps.mean(), rtol=1e-6, atol=0):
+        return (savgol_filter(values, window, degree, mode='interp'),
+                savgol_filter(values, window, degree, deriv=1, delta=steps.mean(), mode='interp'))
+
+    start = np.clip(np.arange(n) - window // 2, 0, n - window)
+    index = start[:, None] + np.arange(window)
+    # Centre and scale the time axis of every window for well-conditioned normal equations
+    offsets = times[index] - times[:, None]
+    scale = np.maximum(np.abs(offsets).max(axis=1, keepdims=True), 1e-12)
+    offsets /= scale
+    window_values = values[index]
+    moments = [np.full(n, float(window))]
+    weighted = [window_values.sum(axis=1)]
+    power = np.ones_like(offsets)
+    for order in range(1, 2 * degree + 1):
+        power *= offsets
+        moments.append(power.sum(axis=1))
+        if order <= degree:
+            weighted.append((power * window_values).sum(axis=1))
+    normal = np.stack([np.stack(moments[row:row + degree + 1], axis=1) for row in range(degree + 1)], axis=1)
+    coefficients = np.linalg.solve(normal, np.stack(weighted, axis=1)[:, :, None])[:, :, 0]
+    return coefficients[:, 0], coefficients[:, 1] / scale[:, 0]
+
+
+def drying_curve_analytics(times, moisture=None, masses=None, dry_weight=None, ambient_temps=None,
+                           drying_temps=None, exhaust_temps=None, equilibrium_moisture=0.0, initial_moisture=None,
+                           smoothing_window=1):
+    """Drying-curve quantities of one run from arrays of readings, in one pass.
+
+    times are in minutes. Moisture (% db) is given directly or from sample masses and the dry weight,
+    M = (m - Wd)/Wd × 100. Temperatures (°C) may be arrays or constants; HUF = (t₁ - t₂)/(t₁ - t₀) and
+    COP = (t₂ - t₀)/(t₁ - t₀). The moisture ratio (M - Me)/(M₀ - Me) uses initial_moisture or the first
+    reading as M₀. Drying rates (% db/h) are returned two ways: between consecutive readings at the
+    interval midpoints, and at every reading as -dM/dθ of a local quadratic over smoothing_window readings
+    (central differences when the window is below 3), with the smoothed moisture curve.
+    """
+    times = np.asarray(times, dtype=float)
+    if moisture is None:
+        moisture = (np.asarray(masses, dtype=float) - dry_weight) / dry_weight * 100
+    moisture = np.asarray(moisture, dtype=float)
+    hours = times / 60
+    initial_moisture = moisture[0] if initial_moisture is None else initial_moisture
+
+    results = {'moisture': moisture,
+               'moisture_ratio': (moisture - equilibrium_moisture) / (initial_moisture - equilibrium_moisture),
+               'midpoint_times': (times[1:] + times[:-1]) / 2}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        interval_hours = np.diff(hours)
+        results['interval_rates'] = np.where(interval_hours > 0, -np.diff(moisture) / interval_hours, 0.0)
+        if ambient_temps is not None and drying_temps is not None and exhaust_temps is not None:
+            ambient_temps, drying_temps, exhaust_temps = (
+                np.broadcast_to(np.asarray(value, dtype=float), times.shape)
+                for value in (ambient_temps, drying_temps, exhaust_temps))
+            results['exhaust_temps'] = exhaust_temps
+            results['huf'] = (drying_temps - exhaust_temps) / (drying_temps - ambient_temps)
+            results['cop'] = (exhaust_temps - ambient_temps) / (drying_temps - ambient_temps)
+
+    if smoothing_window >= 3 and len(times) >= 3:
+        smoothed, slope = local_polynomial_smooth(hours, moisture, smoothing_window)
+    else:
+        smoothed = moisture
+        slope = np.gradient(moisture, hours) if len(times) > 1 else np.full(len(times), np.nan)
+    results['smoothed_moisture'] = smoothed
+    results['drying_rate'] = -slope
+    return results
+
+
+# Multi-run drying workspace: metadata kept with every run
+DRYING_RUN_METADATA = {'Grain': '', 'Drying Temperature (°C)': np.nan, 'Tray Load (kg/m²)': np.nan, 'Me (% db)': 8.0,
+                       'Source': '', 'Notes': ''}
+
+
+def new_drying_run(data, **metadata):
+    """A workspace run with its readings, metadata and a slot for results derived on first use.
+
+    data has 'Time (min)' and 'Moisture Content (% db)' columns and optionally 't0 (°C)', 't1 (°C)' and
+    't2 (°C)'; metadata are DRYING_RUN_METADATA keys. Readings need both a numeric time and moisture, and a
+    run needs at least 3 of them for the drying constant and its standard error.
+    """
+    unknown = set(metadata) - set(DRYING_RUN_METADATA)
+    if unknown:
+        raise ValueError(f"Unknown run metadata: {', '.join(sorted(unknown))}")
+    readings = ['Time (min)', 'Moisture Content (% db)']
+    data = data.assign(**{column: pd.to_numeric(data[column], errors='coerce') for column in readings})
+    data = data.dropna(subset=readings).sort_values('Time (min)').reset_index(drop=True)
+    if len(data) < 3:
+        raise ValueError(f"{len(data)} readings with both time and moisture, at least 3 are needed")
+    return {'data': data, 'metadata': {**DRYING_RUN_METADATA, **metadata}, 'derived': None}
+
+
+def drying_workspace_results(runs, names, smoothing_window=5):
+    """Derived results of the named workspace runs, computing only those not computed before.
+
+    A run's results are stored in the run itself and keyed by its Me and the smoothing window, so they are
+    recomputed only when those change. The drying constants of all runs that need computing are fitted in
+    one batched fit_drying_constant() call. Returns the results by name and the number of runs computed.
+    """
+    stale = [name for name in names if runs[name]['derived'] is None
+             or runs[name]['derived']['key'] != (runs[name]['metadata']['Me (% db)'], smoothing_window)]
+    if stale:
+        invalid = [name for name in stale if not np.isfinite(pd.to_numeric(runs[name]['metadata']['Me (% db)'],
+                                                                        errors='coerce'))]
+        if invalid:
+            raise ValueError(f"Me (% db) is not a number for {', '.join(invalid)}")
+        points = max(len(runs[name]['data']) for name in stale)
+        hours, moisture = np.full((len(stale), points), np.nan), np.full((len(stale), points), np.nan)
+        for row, name in enumerate(stale):
+            data = runs[name]['data']
+            hours[row, :len(data)] = data['Time (min)'].to_numpy(dtype=float) / 60
+            moisture[row, :len(data)] = data['Moisture Content (% db)'].to_numpy(dtype=float)
+        fits = fit_drying_constant(hours, moisture, np.array([runs[name]['metadata']['Me (% db)'] for name in stale]))
+
+        for row, name in enumerate(stale):
+            run = runs[name]
+            data, me = run['data'], run['metadata']['Me (% db)']
+            has_temperatures = {'t0 (°C)', 't1 (°C)', 't2 (°C)'} <= set(data.columns)
+            curve = drying_curve_analytics(
+                data['Time (min)'].to_numpy(dtype=float), data['Moisture Content (% db)'].to_numpy(dtype=float),
+                ambient_temps=data['t0 (°C)'].to_numpy(dtype=float) if has_temperatures else None,
+                drying_temps=data['t1 (°C)'].to_numpy(dtype=float) if has_temperatures else None,
+                exhaust_temps=data['t2 (°C)'].to_numpy(dtype=float) if has_temperatures else None,
+                equilibrium_moisture=me, smoothing_window=smoothing_window)
+            times = data['Time (min)'].to_numpy(dtype=float)
+            ratio = curve['moisture_ratio']
+            duration = times[-1] - times[0]
+            half = np.flatnonzero(ratio <= 0.5)
+            half_time = (np.interp(0.5, [ratio[half[0]], ratio[half[0] - 1]], [times[half[0]], times[half[0] - 1]])
+                         - times[0] if half.size and half[0] > 0 else np.nan)
+            run['derived'] = {
+                'key': (me, smoothing_window),
+                'curve': curve,
+                'fitted': fits['fitted'][row, :len(data)],
+                'summary': {
+                    'Readings': len(data),
+                    'Duration (min)': duration,
+                    'Initial MC (% db)': curve['moisture'][0],
+                    'Final MC (% db)': curve['moisture'][-1],
+                    'K (1/h)': fits['k'][row],
+                    'K SE (1/h)': fits['k_se'][row],
+                    'R²': fits['r_squared'][row],
+                    'RMSE (% db)': fits['rmse'][row],
+                    'Half-Ratio Time (min)': half_time,
+                    'Mean Drying Rate (% db/h)': ((curve['moisture'][0] - curve['moisture'][-1]) / duration * 60
+                                                  if duration > 0 else np.nan),
+                    'Peak Drying Rate (% db/h)': np.nanmax(curve['drying_rate']) if len(data) > 1 else np.nan,
+                    'Mean HUF': np.nanmean(curve['huf']) if has_temperatures else np.nan,
+                    'Mean COP': np.nanmean(curve['cop']) if has_temperatures else np.nan
+                }
+            }
+    return {name: runs[name]['derived'] for name in names}, len(stale)
+
+
+def drying_workspace_table(runs, results):
+    """Metadata and summary metrics of workspace runs, one row per run."""
+    return pd.DataFrame([{'Run': name, **runs[name]['metadata'], **result['summary']}
+                         for name, result in results.items()])
+
+
+def example_drying_runs(seed=0):
+    """Synthetic drying runs of three grains at three drying temperatures (Arrhenius K, logger noise)."""
+    rng = np.random.default_rng(seed)
+    runs = {}
+    for grain, reference_k, activation_energy in [('Wheat', 0.35, 28.0), ('Paddy', 0.28, 32.0),
+                                                  ('Maize', 0.22, 30.0)]:
+        for temperature in (45.0, 55.0, 65.0):
+            k = reference_k * np.exp(-activation_energy * 1000 / UNIVERSAL_GAS_CONSTANT
+                                     * (1 / (temperature + 273.15) - 1 / (55 + 273.15)))
+            k *= rng.normal(1, 0.05)
+            me = 4 + 0.08 * (70 - temperature)
+            times = np.arange(0, 601, 15.0)
+            moisture = me + (30 - me) * np.exp(-k * times / 60) + rng.normal(0, 0.15, times.size)
+            exhaust = 25 + (temperature - 25) * (0.5 + 0.4 * (1 - np.exp(-times / 150)))
+            data = pd.DataFrame({'Time (min)': times, 'Moisture Content (% db)': moisture, 't0 (°C)': 25.0,
+                                 't1 (°C)': temperature, 't2 (°C)': exhaust + rng.normal(0, 0.2, times.size)})
+            runs[f"{grain} {temperature:.0f} °C"] = new_drying_run(data, **{
+                'Grain': grain, 'Drying Temperature (°C)': temperature, 'Tray Load (kg/m²)': 10.0,
+                'Me (% db)': round(me, 2), 'Source': 'Example'})
+    return runs
+
+
+# Live drying data logger: columns expected in the logger CSV
+DRYING_LOGGER_COLUMNS = ('Time (s)', 'Mass (g)', 't0 (°C)', 't1 (°C)', 't2 (°C)')
+# Logger files are only read from this directory (set DRYING_LOGGER_DIR to change it)
+DRYING_LOGGER_DIRECTORY = os.environ.get('DRYING_LOGGER_DIR', os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'logger_data'))
+
+
+def drying_logger_files(directory=DRYING_LOGGER_DIRECTORY):
+    """CSV files in the logger directory, leaving out links that resolve outside it."""
+    if not os.path.isdir(directory):
+        return []
+    directory = os.path.realpath(directory)
+    return sorted(name for name in os.listdir(directory) if name.lower().endswith('.csv')
+                  and os.path.dirname(os.path.realpath(os.path.join(directory, name))) == directory
+                  and os.path.isfile(os.path.join(directory, name)))
+
+
+def new_drying_logger_state(bin_seconds=60.0, window_seconds=600.0):
+    """Empty incremental state for a growing drying logger file."""
+    return {
+        'offset': 0, 'partial': '', 'header': None, 'rows': 0, 'start': None,
+        'bin_seconds': float(bin_seconds), 'window_seconds': float(window_seconds),
+        'bins': pd.DataFrame(columns=['time', *DRYING_LOGGER_COLUMNS[1:], 'count'], dtype=float),
+        'recent': pd.DataFrame(columns=list(DRYING_LOGGER_COLUMNS), dtype=float)
+    }
+
+
+def update_drying_logger(state, path, columns=DRYING_LOGGER_COLUMNS):
+    """Read only the bytes appended to the logger file since the last call and fold them into the state.
+
+    columns maps the file's time, mass, t₀, t₁ and t₂ columns (in that order). Complete lines are parsed;
+    a trailing partial line is kept for the next call. New readings are added to per-bin sums (so the
+    whole-run history stays at one row per bin) and to a buffer of the last window_seconds of raw readings.
+    If the file shrank it is treated as a new run. Returns the number of new readings.
+    """
+    if not os.path.exists(path):
+        return 0
+    if os.path.getsize(path) < state['offset']:
+        state.update(new_drying_logger_state(state['bin_seconds'], state['window_seconds']))
+    with open(path, 'rb') as logger_file:
+        logger_file.seek(state['offset'])
+        appended = logger_file.read()
+    state['offset'] += len(appended)
+    lines = (state['partial'] + appended.decode('utf-8', errors='replace')).split('\n')
+    state['partial'] = lines.pop()
+    if state['header'] is None:
+        if not lines:
+            return 0
+        state['header'] = lines.pop(0).strip()
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return 0
+
+    readings = pd.read_csv(io.StringIO(state['header'] + '\n' + '\n'.join(lines)))
+    readings = readings[list(columns)].set_axis(list(DRYING_LOGGER_COLUMNS), axis=1)
+    times = readings['Time (s)']
+    if not pd.api.types.is_numeric_dtype(times):
+        times = (pd.to_datetime(times) - pd.Timestamp('1970-01-01')).dt.total_seconds()
+    readings['Time (s)'] = times.astype(float)
+    readings = readings.apply(pd.to_numeric, errors='coerce').dropna()
+    if readings.empty:
+        return 0
+    if state['start'] is None:
+        state['start'] = float(readings['Time (s)'].iloc[0])
+    readings['Time (s)'] -= state['start']
+
+    grouped = readings.assign(time=readings['Time (s)'], count=1.0).drop(columns='Time (s)').groupby(
+        np.floor(readings['Time (s)'] / state['bin_seconds']).astype(np.int64)).sum()
+    state['bins'] = grouped.add(state['bins'], fill_value=0.0) if not state['bins'].empty else grouped
+    recent = pd.concat([state['recent'], readings], ignore_index=True) if not state['recent'].empty else readings
+    state['recent'] = recent[recent['Time (s)'] >= recent['Time (s)'].iloc[-1] - state['window_seconds']]
+    state['rows'] += len(readings)
+    return len(readings)
+
+
+def drying_logger_summary(state, dry_matter, equilibrium_moisture, window_bins=10):
+    """Moisture content, HUF, COP, drying rate and drying constant from the logger state.
+
+    Returns (history, current): history has one row per bin (bin means) with the rolling-window drying
+    constant fitted over the last window_bins bins ending at each bin, all windows in one batched fit;
+    current holds the latest values over the raw-reading window and the K fitted over the whole run.
+    """
+    bins = state['bins'].sort_index()
+    means = bins.drop(columns='count').div(bins['count'], axis=0).reset_index(drop=True)
+    curve = drying_curve_analytics(means['time'].to_numpy() / 60, masses=means['Mass (g)'].to_numpy(),
+                                   dry_weight=dry_matter, ambient_temps=means['t0 (°C)'].to_numpy(),
+                                   drying_temps=means['t1 (°C)'].to_numpy(),
+                                   exhaust_temps=means['t2 (°C)'].to_numpy(),
+                                   equilibrium_moisture=equilibrium_moisture, smoothing_window=5)
+    history = pd.DataFrame({'Time (min)': means['time'] / 60, 'Moisture Content (%db)': curve['moisture'],
+                            'HUF': curve['huf'], 'COP': curve['cop']})
+    for column in ('t0 (°C)', 't1 (°C)', 't2 (°C)'):
+        history[column] = means[column]
+    hours = history['Time (min)'].to_numpy() / 60
+    moisture = curve['moisture']
+    history['Drying Rate (% db/h)'] = curve['drying_rate']
+
+    history['Rolling K (1/h)'] = np.nan
+    if len(history) >= window_bins >= 3:
+        window_hours = np.lib.stride_tricks.sliding_window_view(hours, window_bins)
+        window_moisture = np.lib.stride_tricks.sliding_window_view(moisture, window_bins)
+        rolling = fit_drying_constant(window_hours, window_moisture, equilibrium_moisture)
+        history.loc[history.index[window_bins - 1:], 'Rolling K (1/h)'] = rolling['k']
+
+    recent = state['recent']
+    recent_moisture = (recent['Mass (g)'].to_numpy() - dry_matter) / dry_matter * 100
+    recent_hours = recent['Time (s)'].to_numpy() / 3600
+    current = {
+        'readings': state['rows'],
+        'elapsed_min': recent_hours[-1] * 60 if len(recent) else 0.0,
+        'moisture': recent_moisture[-min(len(recent), 10):].mean() if len(recent) else np.nan,
+        'huf': ((recent['t1 (°C)'] - recent['t2 (°C)']) / (recent['t1 (°C)'] - recent['t0 (°C)'])).mean(),
+        'cop': ((recent['t2 (°C)'] - recent['t0 (°C)']) / (recent['t1 (°C)'] - recent['t0 (°C)'])).mean(),
+        'drying_rate': (-np.polyfit(recent_hours, recent_moisture, 1)[0]
+                        if len(recent) > 2 and np.ptp(recent_hours) > 0 else np.nan),
+        'k': np.nan, 'k_se': np.nan
+    }
+    if len(history) >= 3:
+        run_fit = fit_drying_constant(hours, moisture, equilibrium_moisture)
+        current['k'], current['k_se'] = float(run_fit['k'][0]), float(run_fit['k_se'][0])
+    return history, current
+
+
+def write_demo_logger_rows(path, until_seconds, initial_mass=100.0, dry_matter=70.0, equilibrium_moisture=8.0,
+                           drying_constant=0.4, seed=0, run_seconds=12 * 3600):
+    """Stand-in for a logger: append 1 Hz readings up to until_seconds of run time to a CSV file.
+
+    The run ends after run_seconds, so the file stops growing there. Returns True once the run has ended.
+    """
+    until_seconds = min(until_seconds, run_seconds - 1)
+    written = 0
+    if os.path.exists(path):
+        with open(path, 'rb') as logger_file:
+            logger_file.seek(max(os.path.getsize(path) - 200, 0))
+            last_line = logger_file.read().decode().strip().split('\n')[-1]
+        written = int(float(last_line.split(',')[0])) + 1 if last_line[:1].isdigit() else 0
+    if until_seconds < written:
+        return written >= run_seconds
+    rng = np.random.default_rng(seed + written)
+    seconds = np.arange(written, int(until_seconds) + 1)
+    initial_moisture = (initial_mass - dry_matter) / dry_matter * 100
+    moisture = equilibrium_moisture + (initial_moisture - equilibrium_moisture) * np.exp(
+        -drying_constant * seconds / 3600)
+    moisture_factor = (moisture - equilibrium_moisture) / (initial_moisture - equilibrium_moisture)
+    readings = pd.DataFrame({
+        'Time (s)': seconds,
+        'Mass (g)': dry_matter * (1 + moisture / 100) + rng.normal(0, 0.05, seconds.size),
+        't0 (°C)': 25 + rng.normal(0, 0.2, seconds.size),
+        't1 (°C)': 60 + rng.normal(0, 0.3, seconds.size),
+        't2 (°C)': 60 - 25 * moisture_factor - 4 + rng.normal(0, 0.3, seconds.size)
+    })
+    readings.round(3).to_csv(path, mode='a', header=written == 0, index=False)
+    return int(until_seconds) + 1 >= run_seconds
+
+
+# Deep-bed (stacked tray) dryer simulation
+GRAIN_DRY_SPECIFIC_HEAT = 1300.0  # J/(kg dry matter·K)
+WATER_SPECIFIC_HEAT = 4186.0  # J/(kg·K)
+DRY_AIR_SPECIFIC_HEAT = 1006.0  # J/(kg·K)
+WATER_VAPOR_SPECIFIC_HEAT = 1860.0  # J/(kg·K)
+LATENT_HEAT_OF_VAPORIZATION = 2.45e6  # J/kg
+UNIVERSAL_GAS_CONSTANT = 8.314  # J/(mol·K)
+
+
+def affine_recurrence(alpha, beta, initial):
+    """All outputs of xᵢ₊₁ = αᵢ xᵢ + βᵢ along the last axis, by a parallel prefix scan of affine maps.
+
+    The scan composes maps in log₂(n) vectorized passes, so long chains are solved without a Python loop
+    over the elements and without dividing by cumulative products. Returns x₁ … xₙ.
+    """
+    a, b = np.array(alpha, dtype=float), np.array(beta, dtype=float)
+    shift = 1
+    while shift < a.shape[-1]:
+        b[..., shift:] = a[..., shift:] * b[..., :-shift] + b[..., shift:]
+        a[..., shift:] = a[..., shift:] * a[..., :-shift]
+        shift *= 2
+    return a * np.asarray(initial, dtype=float)[..., None] + b
+
+
+def coupled_affine_recurrence(maps, initial):
+    """All outputs of the coupled recurrence xᵢ₊₁ = a xᵢ + b yᵢ + e, yᵢ₊₁ = c xᵢ + d yᵢ + f along the last axis.
+
+    maps holds the coefficient arrays (a, b, c, d, e, f) of every step and initial the pair (x₀, y₀). The
+    maps are composed by the same prefix scan as affine_recurrence(). Returns x₁ … xₙ and y₁ … yₙ.
+    """
+    maps = np.array(np.broadcast_arrays(*maps), dtype=float)
+    shift = 1
+    while shift < maps.shape[-1]:
+        # Each map composed after the one shift places earlier
+        la, lb, lc, ld, le, lf = maps[..., shift:]
+        ea, eb, ec, ed, ee, ef = maps[..., :-shift]
+        maps[..., shift:] = (la * ea + lb * ec, la * eb + lb * ed, lc * ea + ld * ec, lc * eb + ld * ed,
+                             la * ee + lb * ef + le, lc * ee + ld * ef + lf)
+        shift *= 2
+    a, b, c, d, e, f = maps
+    x0, y0 = (np.asarray(value, dtype=float)[..., None] for value in initial)
+    return a * x0 + b * y0 + e, c * x0 + d * y0 + f
+
+
+def deep_bed_dryer_steps(initial_moisture, inlet_temperature, inlet_humidity_ratio, air_flow, trays=20, layers=10,
+                         tray_area=1.0, tray_loading=20.0, hours=10.0, time_step=1.0, drying_model='Newton (Lewis)',
+                         coefficients=(('k', 0.5),), activation_energy=25.0, initial_grain_temperature=25.0,
+                         grain='Wheat', isotherm_model='Henderson', pressure=STANDARD_AIR_PRESSURE,
+                         reference_temperature=None):
+    """Stacked-tray dryer with the drying air passing up through every tray in series, one step at a time.
+
+    Each tray is split into layers (cells, numbered in the air-flow direction). Over every time step of
+    time_step minutes:
+
+    - each cell dries by the thin-layer model under the air entering it in the previous step, using
+      the equivalent-time method with Me from the isotherm at that air state and the model time scaled
+      by an Arrhenius factor relative to the reference temperature (the inlet temperature by default);
+    - the air then passes through the cells in turn and leaves each in thermal equilibrium with the grain.
+      The energy balance of the cell conserves (ma·cp + mg·cg)·T + ma·W·hfg, and the water the cell gives up
+      is limited so the outlet air is at most saturated: where the thin-layer water would oversaturate it,
+      the cell is solved as an adiabatic-saturation step, so the air leaves saturated and the grain cannot
+      be cooled below the wet bulb by evaporation the air cannot carry. Unsaturated and (linearised)
+      saturated cells are both affine maps of the entering air state, so the air path is solved by one
+      prefix scan per Newton iteration, updating the set of saturated cells until it settles.
+
+    initial_moisture is in % db, temperatures in °C, air_flow in m³/min at the inlet and tray_loading in
+    kg of wet grain per m². coefficients are (name, value) pairs of the thin-layer model. inlet_temperature
+    and air_flow may be equal-length arrays of candidate operating points, which are simulated together.
+    Yields the dry air flow (kg/s) per candidate and the moisture (% db), grain temperature (°C) and outlet
+    air humidity ratio of every cell as (candidates, cells) arrays, for the initial state and every step.
+    Sending the generator a boolean mask over the current candidates keeps only those in the later steps.
+    """
+    coefficients = dict(coefficients)
+    inlet_temperature, air_flow = (np.atleast_1d(np.asarray(value, dtype=float))
+                                   for value in np.broadcast_arrays(inlet_temperature, air_flow))
+    if reference_temperature is None:
+        reference_temperature = inlet_temperature
+    candidates = len(inlet_temperature)
+    cells = trays * layers
+    steps = int(round(hours * 60 / time_step))
+    dt = time_step * 60
+
+    inlet_rh = inlet_humidity_ratio * pressure / (0.621945 + inlet_humidity_ratio) / saturation_vapor_pressure(
+        inlet_temperature)
+    inlet_air = air_properties(inlet_temperature, pressure, inlet_rh)
+    dry_air_flow = air_flow / 60 / inlet_air['specific_volume']  # kg dry air/s
+    dry_air_mass = dry_air_flow * dt  # kg dry air through every cell in a step
+    dry_matter = tray_loading * tray_area / (1 + initial_moisture / 100) / layers  # kg per cell
+
+    # Moisture-ratio curve of the model at the reference temperature, tabulated for the equivalent-time method
+    table_hours = np.concatenate([[0.0], np.geomspace(1e-4, 1000.0, 4000)])
+    with np.errstate(invalid='ignore', over='ignore'):
+        table_ratio = np.minimum.accumulate(np.nan_to_num(THIN_LAYER_MODELS[drying_model](table_hours,
+                                                                                          **coefficients),
+                                                          nan=0.0), axis=0)
+    table_ratio = np.clip(table_ratio, 0.0, 1.0)
+    half_time = np.interp(-0.5, -table_ratio, table_hours)
+    relaxation_rate = np.log(2) / max(half_time, 1e-6)  # 1/h, used when a cell rewets (M < Me)
+
+    # Saturation humidity ratio on a fine uniform grid, for the saturation limit of every cell
+    table_start, table_spacing = -40.0, 0.01
+    table_saturation = humidity_ratio(saturation_vapor_pressure(np.arange(table_start, 99.0, table_spacing)),
+                                      pressure)
+    table_slope = np.diff(table_saturation) / table_spacing
+
+    def saturation(temperature):
+        # Linear interpolation in the table, with the slope of the interpolant for Newton's method
+        position = np.minimum(np.maximum((temperature - table_start) / table_spacing, 0), len(table_slope) - 1e-9)
+        index = position.astype(int)
+        slope = table_slope[index]
+        return table_saturation[index] + (position - index) * table_spacing * slope, slope
+
+    t_grid, rh_grid, emc_grid = emc_isotherm_surface(isotherm_model,
+                                                     tuple(EMC_MODEL_COEFFICIENTS[isotherm_model][grain]))
+
+    def equilibrium_moisture(temperature, rh):
+        # Bilinear interpolation in the uniform isotherm grid, clipped to its edges
+        t_position = np.clip((temperature - t_grid[0]) / (t_grid[1] - t_grid[0]), 0, len(t_grid) - 1 - 1e-9)
+        rh_position = np.clip((rh - rh_grid[0]) / (rh_grid[1] - rh_grid[0]), 0, len(rh_grid) - 1 - 1e-9)
+        i, j = t_position.astype(int), rh_position.astype(int)
+        u, v = t_position - i, rh_position - j
+        return ((1 - u) * ((1 - v) * emc_grid[i, j] + v * emc_grid[i, j + 1])
+                + u * ((1 - v) * emc_grid[i + 1, j] + v * emc_grid[i + 1, j + 1]))
+
+    inlet_column = inlet_temperature[:, None]
+    reference_kelvin = np.broadcast_to(np.asarray(reference_temperature, dtype=float), (candidates,)) + 273.15
+    moisture = np.full((candidates, cells), float(initial_moisture))
+    grain_temperature = np.full((candidates, cells), float(initial_grain_temperature))
+    air_in_temperature = np.repeat(inlet_column, cells, axis=1)
+    air_in_humidity = np.full((candidates, cells), float(inlet_humidity_ratio))
+    latent_capacity = dry_air_mass * LATENT_HEAT_OF_VAPORIZATION  # J per unit humidity ratio
+    saturated_cells = np.zeros((candidates, cells), dtype=bool)
+    temperature_drift = np.zeros((candidates, cells))  # grain temperature change over the last step
+    keep = yield {'dry_air_flow': dry_air_flow, 'moisture': moisture, 'grain_temperature': grain_temperature,
+                  'air_humidity_ratio': air_in_humidity}
+
+    for _ in range(steps):
+        if keep is not None:
+            (inlet_temperature, reference_kelvin, dry_air_flow, dry_air_mass, latent_capacity, moisture,
+             grain_temperature, air_in_temperature, air_in_humidity, saturated_cells, temperature_drift) = (
+                value[keep] for value in (inlet_temperature, reference_kelvin, dry_air_flow, dry_air_mass,
+                                          latent_capacity, moisture, grain_temperature, air_in_temperature,
+                                          air_in_humidity, saturated_cells, temperature_drift))
+            inlet_column, candidates = inlet_temperature[:, None], len(inlet_temperature)
+        # Thin-layer drying under the air entering each cell
+        # RH = pv/ps with the vapour pressures from W and Ws(T)
+        air_saturation = saturation(air_in_temperature)[0]
+        air_rh = np.clip(air_in_humidity * (0.621945 + air_saturation)
+                         / (air_saturation * (0.621945 + air_in_humidity)), 1e-4, 0.999)
+        equilibrium = equilibrium_moisture(air_in_temperature, air_rh)
+        time_scale = np.exp(-activation_energy * 1000 / UNIVERSAL_GAS_CONSTANT
+                            * (1 / (air_in_temperature + 273.15) - 1 / reference_kelvin[:, None]))
+        span = np.where(np.abs(initial_moisture - equilibrium) > 1e-9, initial_moisture - equilibrium, 1e-9)
+        ratio = (moisture - equilibrium) / span
+        drying = ratio > 0
+        equivalent_time = np.interp(-np.clip(ratio, 0, 1), -table_ratio, table_hours)
+        new_ratio = np.interp(equivalent_time + time_scale * dt / 3600, table_hours, table_ratio)
+        thin_layer_moisture = np.where(drying, equilibrium + span * new_ratio,
+                                       equilibrium + (moisture - equilibrium)
+                                       * np.exp(-relaxation_rate * time_scale * dt / 3600))
+
+        # Water picked up by the air and the energy balance of grain and air, cell by cell along the air path
+        thin_layer_water = (dry_matter * (moisture - thin_layer_moisture) / 100).T  # kg per cell in this step
+        grain_capacity = (dry_matter * (GRAIN_DRY_SPECIFIC_HEAT + WATER_SPECIFIC_HEAT * moisture / 100)).T
+        previous_temperature = grain_temperature.T
+
+        # Cells upstream of the first one the thin-layer water would oversaturate are solved in one pass
+        outlet_humidity = inlet_humidity_ratio + np.cumsum(thin_layer_water, axis=0) / dry_air_mass
+        humidity_in = np.concatenate([np.full((1, candidates), float(inlet_humidity_ratio)), outlet_humidity[:-1]])
+        air_capacity = dry_air_mass * (DRY_AIR_SPECIFIC_HEAT + WATER_VAPOR_SPECIFIC_HEAT * humidity_in)
+        outlet_temperature = affine_recurrence(
+            (air_capacity / (air_capacity + grain_capacity)).T,
+            ((grain_capacity * previous_temperature - thin_layer_water * LATENT_HEAT_OF_VAPORIZATION)
+             / (air_capacity + grain_capacity)).T, inlet_temperature).T
+        oversaturated = np.any(outlet_humidity > saturation(outlet_temperature)[0], axis=1)
+        first = int(np.argmax(oversaturated)) if oversaturated.any() else cells
+        if first < cells:
+            # From the first oversaturated cell on, a cell either passes all its thin-layer water to the air or
+            # leaves it saturated, W = Ws(T), linearised about the current temperature estimate. Starting from
+            # the cells saturated in the last step at their last temperature carried on by its last change,
+            # Newton's method updates the linearisation and the saturated set until both settle.
+            if first:
+                entering = outlet_temperature[first - 1], outlet_humidity[first - 1]
+            else:
+                entering = inlet_temperature, np.full(candidates, float(inlet_humidity_ratio))
+            picked_up = (thin_layer_water[first:] / dry_air_mass).T
+            grain_heat = (grain_capacity * previous_temperature)[first:].T
+            path_capacity = grain_capacity[first:].T
+            saturated = saturated_cells[:, first:] | (outlet_humidity[first:]
+                                                      > saturation(outlet_temperature[first:])[0]).T
+            temperature = np.where(saturated, (previous_temperature[first:] + temperature_drift.T[first:]).T,
+                                   outlet_temperature[first:].T)
+            humidity = np.where(saturated, saturation(temperature)[0], outlet_humidity[first:].T)
+            change = np.full(candidates, np.inf)
+            rows = np.arange(candidates)  # candidates still iterating
+            for _ in range(50):
+                temperature_in = np.concatenate([entering[0][rows, None], temperature[rows, :-1]], axis=1)
+                humidity_in = np.concatenate([entering[1][rows, None], humidity[rows, :-1]], axis=1)
+                air_capacity = dry_air_mass[rows, None] * (DRY_AIR_SPECIFIC_HEAT
+                                                           + WATER_VAPOR_SPECIFIC_HEAT * humidity_in)
+                capacity = air_capacity + path_capacity[rows]
+                latent = latent_capacity[rows, None]
+                # A cell is saturated if the air entering it in the current estimate cannot take its water
+                free_temperature = (air_capacity * temperature_in + grain_heat[rows] - latent * picked_up[rows]
+                                    ) / capacity
+                now_saturated = humidity_in + picked_up[rows] > saturation(free_temperature)[0]
+                # The tangent lies below the convex saturation curve, so a small last step leaves the air at
+                # most saturated
+                unsettled = (change[rows] >= 1e-3) | np.any(now_saturated != saturated[rows], axis=1)
+                saturated[rows] = now_saturated
+                if not unsettled.any():
+                    break
+                rows, air_capacity, capacity, latent, free_temperature, now_saturated = (
+                    value[unsettled] for value in (rows, air_capacity, capacity, latent, free_temperature,
+                                                   now_saturated))
+                linearised = np.where(now_saturated, temperature[rows], free_temperature)
+                value, slope = saturation(linearised)
+                offset = value - slope * linearised
+                divisor = np.where(now_saturated, capacity + latent * slope, capacity)
+                a = air_capacity / divisor
+                b = np.where(now_saturated, latent / divisor, 0.0)
+                e = np.where(now_saturated, grain_heat[rows] - latent * offset,
+                             grain_heat[rows] - latent * picked_up[rows]) / divisor
+                new_temperature, humidity[rows] = coupled_affine_recurrence(
+                    (a, b, np.where(now_saturated, slope * a, 0.0), np.where(now_saturated, slope * b, 1.0), e,
+                     np.where(now_saturated, offset + slope * e, picked_up[rows])),
+                    (entering[0][rows], entering[1][rows]))
+                change[rows] = np.abs(new_temperature - temperature[rows]).max(axis=1)
+                temperature[rows] = new_temperature
+            saturated_cells[:, first:] = saturated
+            outlet_temperature[first:], outlet_humidity[first:] = temperature.T, humidity.T
+        saturated_cells[:, :first] = False
+
+        outlet_temperature, outlet_humidity = outlet_temperature.T, outlet_humidity.T
+        water_removed = dry_air_mass[:, None] * np.diff(outlet_humidity, axis=1, prepend=inlet_humidity_ratio)
+        moisture = moisture - water_removed / dry_matter * 100
+        temperature_drift = outlet_temperature - grain_temperature
+        grain_temperature = outlet_temperature
+        air_in_temperature = np.concatenate([inlet_column, outlet_temperature[:, :-1]], axis=1)
+        air_in_humidity = np.concatenate([np.full((candidates, 1), float(inlet_humidity_ratio)),
+                                          outlet_humidity[:, :-1]], axis=1)
+        keep = yield {'dry_air_flow': dry_air_flow, 'moisture': moisture, 'grain_temperature': grain_temperature,
+                      'air_humidity_ratio': outlet_humidity}
+
+
+@st.cache_data(max_entries=8)
+def simulate_deep_bed_dryer(initial_moisture, inlet_temperature, inlet_humidity_ratio, air_flow, trays=20,
+                            layers=10, tray_area=1.0, tray_loading=20.0, hours=10.0, time_step=1.0,
+                            drying_model='Newton (Lewis)', coefficients=(('k', 0.5),), activation_energy=25.0,
+                            initial_grain_temperature=25.0, grain='Wheat', isotherm_model='Henderson',
+                            pressure=STANDARD_AIR_PRESSURE, reference_temperature=None):
+    """Full histories of a stacked-tray dryer simulated by deep_bed_dryer_steps().
+
+    Returns time (h), moisture (% db) and grain temperature (°C) as (steps + 1, trays, layers) arrays, and
+    the temperature (°C), humidity ratio and relative humidity of the air leaving every tray as
+    (steps + 1, trays) arrays. With arrays of candidate inlet temperatures and air flows, every result gains
+    a leading candidate axis.
+    """
+    batch = np.ndim(inlet_temperature) > 0 or np.ndim(air_flow) > 0
+    states = list(deep_bed_dryer_steps(initial_moisture, inlet_temperature, inlet_humidity_ratio, air_flow,
+                                       trays, layers, tray_area, tray_loading, hours, time_step, drying_model,
+                                       coefficients, activation_energy, initial_grain_temperature, grain,
+                                       isotherm_model, pressure, reference_temperature))
+    steps, candidates = len(states) - 1, len(states[0]['dry_air_flow'])
+    moisture_history, grain_temperature_history, air_humidity_history = (
+        np.stack([state[name] for state in states]) for name in ('moisture', 'grain_temperature',
+                                                                 'air_humidity_ratio'))
+    air_temperature_history = grain_temperature_history
+
+    tray_outlets = np.arange(layers - 1, trays * layers, layers)
+    outlet_temperature = air_temperature_history[:, :, tray_outlets]
+    outlet_humidity = air_humidity_history[:, :, tray_outlets]
+    outlet_vapor_pressure = outlet_humidity * pressure / (0.621945 + outlet_humidity)
+    results = {
+        'moisture': moisture_history.reshape(steps + 1, candidates, trays, layers),
+        'grain_temperature': grain_temperature_history.reshape(steps + 1, candidates, trays, layers),
+        'air_temperature': outlet_temperature,
+        'air_humidity_ratio': outlet_humidity,
+        'air_rh': np.clip(outlet_vapor_pressure / saturation_vapor_pressure(outlet_temperature), 0, None),
+        'dry_air_flow': states[0]['dry_air_flow']
+    }
+    # Candidate axis first, or dropped for a single operating point
+    results = {name: np.moveaxis(value, 1, 0) if value.ndim > 1 else value for name, value in results.items()}
+    if not batch:
+        results = {name: value[0] for name, value in results.items()}
+    results['time'] = np.arange(steps + 1) * time_step / 60
+    results['dry_matter_per_tray'] = tray_loading * tray_area / (1 + initial_moisture / 100)
+    return results
+
+
+def pareto_front(objectives, feasible=None):
+    """Flag rows of an (n, objectives) array not dominated by any other feasible row (all minimised)."""
+    objectives = np.asarray(objectives, dtype=float)
+    feasible = np.ones(len(objectives), dtype=bool) if feasible is None else np.asarray(feasible, dtype=bool)
+    no_worse = np.all(objectives[:, None, :] <= objectives[None, :, :], axis=2)
+    better = np.any(objectives[:, None, :] < objectives[None, :, :], axis=2)
+    dominated = np.any(no_worse & better & feasible[:, None], axis=0)
+    return feasible & ~dominated
+
+
+def deep_bed_drying_statistics(target_moisture, initial_moisture, inlet_temperature, inlet_humidity_ratio, air_flow,
+                               trays=20, layers=10, tray_area=1.0, tray_loading=20.0, hours=10.0, time_step=1.0,
+                               drying_model='Newton (Lewis)', coefficients=(('k', 0.5),), activation_energy=25.0,
+                               initial_grain_temperature=25.0, grain='Wheat', isotherm_model='Henderson',
+                               pressure=STANDARD_AIR_PRESSURE, reference_temperature=None):
+    """Time for the bed-average moisture to reach a target, per candidate operating point.
+
+    Runs deep_bed_dryer_steps() but keeps only running per-candidate statistics, so memory does not grow
+    with the number of steps, and drops every candidate from the simulation once it has reached the target.
+    The drying time is interpolated between steps (NaN if the target is not reached within hours); the hottest
+    grain and the wettest tray (% db) are taken up to the step the target is reached, or the last step.
+    """
+    simulation = deep_bed_dryer_steps(
+        initial_moisture, inlet_temperature, inlet_humidity_ratio, air_flow, trays, layers, tray_area,
+        tray_loading, hours, time_step, drying_model, coefficients, activation_energy,
+        initial_grain_temperature, grain, isotherm_model, pressure, reference_temperature)
+    state = next(simulation)
+    dry_air_flow = state['dry_air_flow']
+    tray_moisture = state['moisture'].reshape(-1, trays, layers).mean(axis=2)
+    previous_average = tray_moisture.mean(axis=1)
+    drying_time = np.where(previous_average <= target_moisture, 0.0, np.nan)
+    max_grain, wettest_tray = state['grain_temperature'].max(axis=1), tray_moisture.max(axis=1)
+    simulated = np.arange(len(drying_time))  # candidates still in the simulation
+    for step in itertools.count(1):
+        keep = np.isnan(drying_time[simulated])
+        simulated = simulated[keep]
+        if not simulated.size:
+            break
+        try:
+            state = simulation.send(keep)
+        except StopIteration:
+            break
+        tray_moisture = state['moisture'].reshape(-1, trays, layers).mean(axis=2)
+        average = tray_moisture.mean(axis=1)
+        max_grain[simulated] = np.maximum(max_grain[simulated], state['grain_temperature'].max(axis=1))
+        wettest_tray[simulated] = tray_moisture.max(axis=1)
+        drop = previous_average[simulated] - average
+        fraction = np.clip((previous_average[simulated] - target_moisture) / np.where(drop > 0, drop, 1), 0, 1)
+        drying_time[simulated] = np.where(average <= target_moisture,
+                                          (step - 1 + np.where(drop > 0, fraction, 0)) * time_step / 60, np.nan)
+        previous_average[simulated] = average
+    return {'drying_time': drying_time, 'max_grain_temperature': max_grain, 'wettest_tray': wettest_tray,
+            'dry_air_flow': dry_air_flow}
+
+
+@st.cache_data(max_entries=16)
+def optimize_drying_schedule(initial_moisture, target_moisture, ambient_temperature, ambient_rh, temperatures,
+                             air_flows, max_grain_temperature, max_hours=24.0, fan_power_per_flow=20.0,
+                             reference_temperature=60.0, trays=20, layers=10, tray_area=1.0, tray_loading=20.0,
+                             time_step=5.0, drying_model='Newton (Lewis)', coefficients=(('k', 0.5),),
+                             activation_energy=25.0, grain='Wheat', isotherm_model='Henderson',
+                             pressure=STANDARD_AIR_PRESSURE):
+    """Search drying air temperature × air flow for the fastest and cheapest way to a target moisture.
+
+    Every (temperature, air flow) candidate is simulated at once by deep_bed_drying_statistics(), up to
+    max_hours. The drying time is when the bed-average moisture first reaches the target; the heater energy
+    is ṁa·cp·(t₁ - t₀) and the fan energy fan_power_per_flow (W per m³/min) × air flow, both over that time.
+    A candidate is feasible if it reaches the target with no grain hotter than max_grain_temperature.
+    Thin-layer coefficients are taken at reference_temperature and scaled to other temperatures by the
+    Arrhenius factor. Returns one row per candidate with the time and energy Pareto front flagged.
+    """
+    candidate_temperatures, candidate_flows = (grid.ravel() for grid in np.meshgrid(np.asarray(temperatures, float),
+                                                                                    np.asarray(air_flows, float)))
+    inlet_humidity = float(air_properties(ambient_temperature, pressure, ambient_rh)['humidity_ratio'])
+    statistics = deep_bed_drying_statistics(target_moisture, initial_moisture, candidate_temperatures,
+                                            inlet_humidity, candidate_flows, trays, layers, tray_area,
+                                            tray_loading, max_hours, time_step, drying_model, coefficients,
+                                            activation_energy, ambient_temperature, grain, isotherm_model,
+                                            pressure, reference_temperature)
+    drying_time, max_grain = statistics['drying_time'], statistics['max_grain_temperature']
+    wettest_tray, dry_air_flow = statistics['wettest_tray'], statistics['dry_air_flow']
+
+    heater_power = dry_air_flow * (DRY_AIR_SPECIFIC_HEAT + WATER_VAPOR_SPECIFIC_HEAT * inlet_humidity) * (
+        candidate_temperatures - ambient_temperature) / 1000  # kW
+    fan_power = fan_power_per_flow * candidate_flows / 1000  # kW
+    water_removed = trays * tray_loading * tray_area / (1 + initial_moisture / 100) * (
+        initial_moisture - target_moisture) / 100
+    feasible = np.isfinite(drying_time) & (max_grain <= max_grain_temperature)
+    total_energy = (heater_power + fan_power) * drying_time
+
+    schedule = pd.DataFrame({
+        'Inlet Temperature (°C)': candidate_temperatures,
+        'Air Flow (m³/min)': candidate_flows,
+        'Drying Time (h)': drying_time,
+        'Heater Energy (kWh)': heater_power * drying_time,
+        'Fan Energy (kWh)': fan_power * drying_time,
+        'Total Energy (kWh)': total_energy,
+        'SEC (kWh/kg water)': total_energy / water_removed,
+        'Max Grain Temperature (°C)': max_grain,
+        'Wettest Tray (% db)': wettest_tray,
+        'Feasible': feasible,
+        'Pareto Optimal': pareto_front(np.column_stack([np.nan_to_num(drying_time, nan=np.inf),
+                                                        np.nan_to_num(total_energy, nan=np.inf)]), feasible)
+    })
+    return schedule.sort_values(['Pareto Optimal', 'Feasible', 'Drying Time (h)'],
+                                ascending=[False, False, True]).reset_index(drop=True)
+
+
+# Helper functions for dryer energy accounting
+def dryer_energy_balance(times, heater_power, water_removed, air_flow, ambient_temp, ambient_rh, drying_temp,
+                         exhaust_temp, fan_power=0.0, pressure=STANDARD_AIR_PRESSURE):
+    """Energy balance of dryer runs from power and air temperature time series.
+
+    times (h) is a (points,) or (runs, points) array, padded with NaN where a run has fewer readings. Heater
+    and fan power (W), air flow (m³/min at the fan inlet), ambient RH (fraction) and air temperatures (°C)
+    are scalars or arrays broadcasting against times; water_removed (kg) is one value per run. Rates are
+    integrated with the trapezoidal rule. The air is heated at constant humidity ratio from t₀ to t₁,
+    and the exhaust humidity ratio follows from the water removed per kg of dry air, so
+
+        Q_air = ∫ṁa(h₁ - h₀)dθ, Q_evap = mw·hfg, Q_exhaust = ∫ṁa(h₂ - h₀)dθ - Q_evap
+        Q_other = Q_air - Q_evap - Q_exhaust, SEC = (E_heater + E_fan) / mw, η_thermal = Q_evap / Q_air
+
+    The exhaust loss excludes the latent heat carried by the evaporated water, which is Q_evap itself, so the
+    three parts add up to the heat taken up by the air.
+
+    Energies are in kWh and the result is a dictionary of per-run arrays plus the cumulative electrical
+    energy at each reading.
+    """
+    times = np.asarray(times, dtype=float)
+    shape = times.shape
+    heater_power, fan_power, air_flow, ambient_temp, drying_temp, exhaust_temp = (
+        np.asarray(value, dtype=float) for value in
+        (heater_power, fan_power, air_flow, ambient_temp, drying_temp, exhaust_temp))
+    water_removed = np.asarray(water_removed, dtype=float)
+
+    def integrate(rate):
+        # Trapezoidal rule along the last axis; NaN padding contributes nothing
+        rate = np.broadcast_to(rate, shape)
+        steps = np.diff(times, axis=-1) * (rate[..., 1:] + rate[..., :-1]) / 2
+        return np.nansum(steps, axis=-1), np.concatenate(
+            [np.zeros(shape[:-1] + (1,)), np.nancumsum(steps, axis=-1)], axis=-1)
+
+    inlet_air = air_properties(ambient_temp, pressure, ambient_rh)
+    ambient_humidity = inlet_air['humidity_ratio']
+    dry_air_rate = air_flow / 60 / inlet_air['specific_volume']  # kg dry air/s
+    ambient_enthalpy = moist_air_enthalpy(ambient_temp, ambient_humidity)
+
+    heater_energy, heater_cumulative = integrate(heater_power / 1000)
+    fan_energy, fan_cumulative = integrate(fan_power / 1000)
+    dry_air_mass = integrate(dry_air_rate)[0] * 3600
+    exhaust_humidity = (integrate(dry_air_rate * ambient_humidity)[0] * 3600 + water_removed) / dry_air_mass
+    heat_to_air = integrate(dry_air_rate * (moist_air_enthalpy(drying_temp, ambient_humidity) - ambient_enthalpy))[0]
+    evaporation_heat = water_removed * LATENT_HEAT_OF_VAPORIZATION / 3.6e6
+    exhaust_heat = integrate(dry_air_rate * (moist_air_enthalpy(exhaust_temp, exhaust_humidity[..., None])
+                                             - ambient_enthalpy))[0] - evaporation_heat
+    total_energy = heater_energy + fan_energy
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'heater_energy': heater_energy,
+            'fan_energy': fan_energy,
+            'total_energy': total_energy,
+            'cumulative_energy': heater_cumulative + fan_cumulative,
+            'dry_air_mass': dry_air_mass,
+            'exhaust_humidity_ratio': exhaust_humidity,
+            'heat_to_air': heat_to_air,
+            'exhaust_heat': exhaust_heat,
+            'evaporation_heat': evaporation_heat,
+            'other_losses': heat_to_air - evaporation_heat - exhaust_heat,
+            'specific_energy': total_energy / water_removed,
+            'thermal_efficiency': evaporation_heat / heat_to_air,
+            'heater_efficiency': heat_to_air / heater_energy,
+            'overall_efficiency': evaporation_heat / total_energy
+        }
+
+
+def dryer_energy_table(names, balance, tariff=0.0):
+    """Tabulate dryer_energy_balance results per run, ranked by specific energy consumption."""
+    table = pd.DataFrame({
+        'Run': list(names),
+        'Heater Energy (kWh)': balance['heater_energy'],
+        'Fan Energy (kWh)': balance['fan_energy'],
+        'Total Energy (kWh)': balance['total_energy'],
+        'Heat to Air (kWh)': balance['heat_to_air'],
+        'Exhaust Heat (kWh)': balance['exhaust_heat'],
+        'Evaporation Heat (kWh)': balance['evaporation_heat'],
+        'Other Losses (kWh)': balance['other_losses'],
+        'SEC (kWh/kg water)': balance['specific_energy'],
+        'SEC (MJ/kg water)': balance['specific_energy'] * 3.6,
+        'Thermal Efficiency (%)': balance['thermal_efficiency'] * 100,
+        'Overall Efficiency (%)': balance['overall_efficiency'] * 100,
+        'Energy Cost': balance['total_energy'] * tariff
+    }).sort_values('SEC (kWh/kg water)').reset_index(drop=True)
+    table.insert(1, 'Rank', np.arange(1, len(table) + 1))
+    return table
+
+
+def pad_runs(data, run_column, columns, sort_column):
+    """Split a long-format table into NaN-padded (runs, points) arrays, one per column."""
+    groups = [(name, group.sort_values(sort_column)) for name, group in data.groupby(run_column, sort=False)]
+    points = max(len(group) for _, group in groups)
+    arrays = {column: np.full((len(groups), points), np.nan) for column in columns}
+    for row, (_, group) in enumerate(groups):
+        for column in columns:
+            arrays[column][row, :len(group)] = group[column].to_numpy(dtype=float)
+    return [name for name, _ in groups], arrays
+
+
+def example_dryer_energy_log(operating_points, minutes=240, interval=1.0, seed=0):
+    """Synthetic heater/fan power and air temperature logs, one run per operating point.
+
+    Each operating point is (run, heater rating W, fan power W, drying air set point °C). The heater runs
+    flat out until the drying air reaches its set point and then cycles on a thermostat with a duty that
+    holds the set point; the exhaust lags the drying air and rises as the product dries.
+    """
+    rng = np.random.default_rng(seed)
+    time_min = np.arange(0, minutes + interval, interval)
+    frames = []
+    for run, rating, fan, set_point in operating_points:
+        ambient = 25 + rng.normal(0, 0.2, time_min.size)
+        drying = ambient + (set_point - 25) * (1 - np.exp(-time_min / 8)) + rng.normal(0, 0.3, time_min.size)
+        duty = np.where(time_min < 24, 1.0, np.clip((set_point - 25) / 60 + 0.1, 0, 1))
+        heater = np.where(rng.random(time_min.size) < duty, rating, 0.0)
+        exhaust = ambient + (drying - ambient) * (0.45 + 0.4 * (1 - np.exp(-time_min / 90)))
+        frames.append(pd.DataFrame({'Run': run, 'Time (min)': time_min, 'Heater Power (W)': heater,
+                                    'Fan Power (W)': fan, 't0 (°C)': ambient, 't1 (°C)': drying,
+                                    't2 (°C)': exhaust}))
+    return pd.concat(frames, ignore_index=True)
+
+
+# Helper functions for troughed belt conveyor cross-sections
+BELT_IDLER_CONFIGURATIONS = ("Flat", "2-Roll", "3-Roll")
+STANDARD_BELT_WIDTHS = np.array([400, 500, 650, 800, 1000, 1200, 1400, 1600, 1800, 2000])  # mm
+# Centre roll lengths of three-roll idler sets for the standard belt widths (ISO 1537), mm
+STANDARD_CENTRE_ROLL_LENGTHS = np.array([160, 200, 250, 315, 380, 465, 530, 600, 670, 750])
+
+
+def belt_cross_section(belt_width, idlers="3-Roll", trough_angle=20.0, surcharge_angle=20.0,
+                       centre_roll_length=None):
+    """Load cross-section of a flat or troughed belt (ISO 5048 / CEMA geometry), broadcast over all inputs.
+
+    Belt and centre roll widths are in m and angles in degrees. The load covers the usable width
+    b = 0.9 B − 0.05 and its free surface is a circular arc meeting the load edges at the surcharge angle θ.
+    With centre roll l₃ and trough angle λ the edges sit c = l₃ + (b − l₃) cos λ apart, the trough holds
+    (l₃ + c)/2 · (b − l₃)/2 · sin λ and the surcharge segment adds (c/2)² (θ − sin θ cos θ)/sin² θ.
+    A flat belt is the case l₃ = b and a two-roll V trough the case l₃ = 0.
+    """
+    belt_width = np.asarray(belt_width, dtype=float)
+    idlers = np.asarray(idlers)
+    usable_width = np.maximum(0.9 * belt_width - 0.05, 0.0)
+    if centre_roll_length is None:
+        centre_roll_length = np.interp(belt_width, STANDARD_BELT_WIDTHS / 1000, STANDARD_CENTRE_ROLL_LENGTHS / 1000)
+    centre_roll_length = np.minimum(np.where(idlers == "Flat", usable_width,
+                                             np.where(idlers == "2-Roll", 0.0, centre_roll_length)), usable_width)
+    trough = np.radians(np.where(idlers == "Flat", 0.0, trough_angle))
+    surcharge = np.radians(np.asarray(surcharge_angle, dtype=float))
+
+    wing_length = (usable_width - centre_roll_length) / 2
+    edge_width = centre_roll_length + 2 * wing_length * np.cos(trough)
+    trough_depth = wing_length * np.sin(trough)
+    trough_area = (centre_roll_length + edge_width) / 2 * trough_depth
+    sin_surcharge = np.sin(surcharge)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        surcharge_area = np.where(sin_surcharge > 0, (edge_width / 2) ** 2 * (surcharge - sin_surcharge * np.cos(
+            surcharge)) / sin_surcharge ** 2, 0.0)
+    surcharge_height = edge_width / 2 * np.tan(surcharge / 2)
+
+    return {
+        'usable_width': usable_width,
+        'centre_roll_length': centre_roll_length,
+        'trough_angle': np.degrees(trough),
+        'surcharge_angle': np.degrees(surcharge),
+        'edge_width': edge_width,
+        'trough_depth': trough_depth,
+        'surcharge_height': surcharge_height,
+        'load_depth': trough_depth + surcharge_height,
+        'trough_area': trough_area,
+        'surcharge_area': surcharge_area,
+        'area': trough_area + surcharge_area
+    }
+
+
+def belt_cross_section_profile(belt_width, section, points=61):
+    """Outline of the belt and of the load for one belt_cross_section result, as (x, y) arrays in m."""
+    centre = float(section['centre_roll_length'])
+    trough = np.radians(float(section['trough_angle']))
+    surcharge = np.radians(float(section['surcharge_angle']))
+    half_edge = float(section['edge_width']) / 2
+    depth = float(section['trough_depth'])
+
+    wing_end = centre / 2 + (belt_width - centre) / 2 * np.array([np.cos(trough), np.sin(trough)])
+    belt_x = np.array([-wing_end[0], -centre / 2, centre / 2, wing_end[0]])
+    belt_y = np.array([wing_end[1], 0.0, 0.0, wing_end[1]])
+
+    if surcharge > 0:
+        radius = half_edge / np.sin(surcharge)
+        arc = np.linspace(np.pi / 2 - surcharge, np.pi / 2 + surcharge, points)
+        surface_x = radius * np.cos(arc)
+        surface_y = depth - radius * np.cos(surcharge) + radius * np.sin(arc)
+    else:
+        surface_x, surface_y = np.array([half_edge, -half_edge]), np.array([depth, depth])
+    load_x = np.concatenate([[-centre / 2, centre / 2], surface_x, [-centre / 2]])
+    load_y = np.concatenate([[0.0, 0.0], surface_y, [0.0]])
+    return (belt_x, belt_y), (load_x, load_y)
+
+
+@st.cache_data
+def belt_capacity_table(belt_widths, idlers, trough_angles, surcharge_angles, belt_speed, density):
+    """Volumetric and mass capacity over every combination of belt width (mm), idler set and angles (°).
+
+    The full grid is evaluated in one broadcast belt_cross_section call; belt speed is in m/min and
+    capacity Q = 60 A S ρ in kg/h.
+    """
+    width, idler, trough, surcharge = (grid.ravel() for grid in np.meshgrid(
+        np.asarray(belt_widths, dtype=float), np.asarray(idlers), np.asarray(trough_angles, dtype=float),
+        np.asarray(surcharge_angles, dtype=float), indexing='ij'))
+    section = belt_cross_section(width / 1000, idler, trough, surcharge)
+    volume_flow = section['area'] * belt_speed * 60  # m³/h
+    return pd.DataFrame({
+        'Belt Width (mm)': width.astype(int),
+        'Idlers': idler,
+        'Trough Angle (°)': section['trough_angle'],
+        'Surcharge Angle (°)': surcharge,
+        'Load Area (m²)': section['area'],
+        'Capacity (m³/h)': volume_flow,
+        'Capacity (t/h)': volume_flow * density / 1000
+    }).drop_duplicates(['Belt Width (mm)', 'Idlers', 'Trough Angle (°)', 'Surcharge Angle (°)'],
+                       ignore_index=True)
+
+
+# Helper functions for sensitivity analysis of calculator models
+# A model is any function that takes one keyword array per parameter and returns an array of outputs,
+# so a whole batch of parameter combinations is evaluated in a single call.
+def terminal_velocity_model(particle_density, diameter, sphericity, air_density, air_viscosity):
+    """Reynolds-dependent terminal velocity (m/s); diameter in mm, viscosity in Pa·s."""
+    return solve_terminal_velocity(diameter / 1000, particle_density, sphericity, air_density,
+                                   air_viscosity)['velocity']
+
+
+def fixed_drag_terminal_velocity_model(particle_density, diameter, shape_factor, air_density, drag_coefficient):
+    """Simplified terminal velocity (m/s) with a constant drag coefficient; diameter in mm."""
+    return np.sqrt((4 / 3) * (GRAVITY * diameter / 1000 * particle_density * shape_factor) /
+                   (drag_coefficient * air_density))
+
+
+def exponential_drying_model(initial_moisture, equilibrium_moisture, drying_constant, drying_time):
+    """Moisture content (% db) after drying_time hours: M = Me + (M0 - Me) e^(-Kθ)."""
+    return equilibrium_moisture + (initial_moisture - equilibrium_moisture) * np.exp(-drying_constant * drying_time)
+
+
+# Registered models: parameter keyword -> display label
+SENSITIVITY_MODELS = {
+    'Terminal Velocity (Reynolds-dependent)': {
+        'function': terminal_velocity_model,
+        'output': 'Terminal Velocity (m/s)',
+        'parameters': {
+            'particle_density': 'Grain Density',
+            'diameter': 'Grain Diameter',
+            'sphericity': 'Shape Factor',
+            'air_density': 'Air Density',
+            'air_viscosity': 'Air Viscosity'
+        }
+    },
+    'Terminal Velocity (fixed drag coefficient)': {
+        'function': fixed_drag_terminal_velocity_model,
+        'output': 'Terminal Velocity (m/s)',
+        'parameters': {
+            'particle_density': 'Grain Density',
+            'diameter': 'Grain Diameter',
+            'shape_factor': 'Shape Factor',
+            'air_density': 'Air Density',
+            'drag_coefficient': 'Drag Coefficient'
+        }
+    },
+    'Exponential Drying': {
+        'function': exponential_drying_model,
+        'output': 'Final Moisture Content (% db)',
+        'parameters': {
+            'initial_moisture': 'Initial Moisture Content',
+            'equilibrium_moisture': 'Equilibrium Moisture Content',
+            'drying_constant': 'Drying Constant K',
+            'drying_time': 'Drying Time'
+        }
+    }
+}
+
+
+def evaluate_model_batch(model, parameter_names, samples):
+    """Evaluate a model for every row of a sample matrix (one column per parameter) in one vectorized call.
+
+    The models are numpy expressions, so even the largest Sobol batch takes milliseconds here, far less than
+    handing it to worker processes would.
+    """
+    samples = np.asarray(samples, dtype=float)
+    return np.asarray(model(**dict(zip(parameter_names, samples.T))), dtype=float)
+
+
+def local_sensitivity(model, base_values, relative_step=1e-4):
+    """Local derivatives and elasticities at a base point by central differences.
+
+    base_values maps parameter keyword -> value. The elasticity (x/y)(dy/dx) is the % change
+    in the output for a 1% change in the parameter.
+    """
+    names = list(base_values)
+    base = np.array([base_values[name] for name in names], dtype=float)
+    steps = relative_step * np.where(base != 0, np.abs(base), 1.0)
+
+    # Rows: base point, then +h and -h for each parameter
+    samples = np.tile(base, (2 * len(names) + 1, 1))
+    samples[1 + 2 * np.arange(len(names)), np.arange(len(names))] += steps
+    samples[2 + 2 * np.arange(len(names)), np.arange(len(names))] -= steps
+    outputs = evaluate_model_batch(model, names, samples)
+
+    derivatives = (outputs[1::2] - outputs[2::2]) / (2 * steps)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        elasticities = derivatives * base / outputs[0]
+
+    return pd.DataFrame({
+        'Parameter': names,
+        'Base Value': base,
+        'Derivative': derivatives,
+        'Elasticity': elasticities
+    })
+
+
+def morris_screening(model, parameter_ranges, trajectories=50, levels=4, seed=0):
+    """Morris elementary effects screening over parameter ranges {keyword: (low, high)}.
+
+    Returns μ* (mean absolute effect, overall importance), μ and σ (interaction/non-linearity)
+    of the elementary effects, in output units per full parameter range.
+    """
+    names = list(parameter_ranges)
+    k = len(names)
+    low = np.array([parameter_ranges[name][0] for name in names], dtype=float)
+    high = np.array([parameter_ranges[name][1] for name in names], dtype=float)
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+
+    # Trajectory starts on the level grid, moving +Δ or -Δ so points stay inside [0, 1]
+    start = rng.integers(0, levels, size=(trajectories, k)) / (levels - 1)
+    direction = np.where(start + delta <= 1, delta, -delta)
+    order = np.argsort(rng.random((trajectories, k)), axis=1)
+
+    steps = np.zeros((trajectories, k, k))
+    trajectory_index = np.arange(trajectories)[:, None]
+    steps[trajectory_index, np.arange(k)[None, :], order] = direction[trajectory_index, order]
+    unit_points = start[:, None, :] + np.concatenate([np.zeros((trajectories, 1, k)),
+                                                      np.cumsum(steps, axis=1)], axis=1)
+
+    samples = low + unit_points.reshape(-1, k) * (high - low)
+    outputs = evaluate_model_batch(model, names, samples).reshape(trajectories, k + 1)
+
+    effects = np.empty((trajectories, k))
+    effects[trajectory_index, order] = np.diff(outputs, axis=1) / direction[trajectory_index, order]
+
+    return pd.DataFrame({
+        'Parameter': names,
+        'mu_star': np.abs(effects).mean(axis=0),
+        'mu': effects.mean(axis=0),
+        'sigma': effects.std(axis=0, ddof=1) if trajectories > 1 else np.zeros(k)
+    })
+
+
+def sobol_indices(model, parameter_ranges, samples=1024, seed=0):
+    """First-order and total Sobol indices by Saltelli sampling.
+
+    Uses a scrambled Sobol sequence for the A and B matrices, the Saltelli (2010) estimator for
+    first-order indices and Jansen's estimator for total indices. The model is evaluated
+    samples × (k + 2) times in one batch.
+    """
+    names = list(parameter_ranges)
+    k = len(names)
+    low = np.array([parameter_ranges[name][0] for name in names], dtype=float)
+    high = np.array([parameter_ranges[name][1] for name in names], dtype=float)
+
+    base_samples = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random(samples)
+    matrix_a = low + base_samples[:, :k] * (high - low)
+    matrix_b = low + base_samples[:, k:] * (high - low)
+
+    # AB_i is A with column i taken from B; stack A, B and every AB_i for a single evaluation
+    matrix_ab = np.repeat(matrix_a[None, :, :], k, axis=0)
+    matrix_ab[np.arange(k), :, np.arange(k)] = matrix_b.T
+    all_samples = np.concatenate([matrix_a, matrix_b, matrix_ab.reshape(-1, k)])
+
+    outputs = evaluate_model_batch(model, names, all_samples)
+    output_a = outputs[:samples]
+    output_b = outputs[samples:2 * samples]
+    output_ab = outputs[2 * samples:].reshape(k, samples)
+
+    variance = np.var(np.concatenate([output_a, output_b]))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first_order = np.mean(output_b * (output_ab - output_a), axis=1) / variance
+        total = 0.5 * np.mean((output_a - output_ab) ** 2, axis=1) / variance
+
+    return pd.DataFrame({
+        'Parameter': names,
+        'First Order (S1)': first_order,
+        'Total (ST)': total
+    })
+
+
 # Navigation setup at the beginning
 st.sidebar.title("Navigation")
 
@@ -417,6 +3318,18 @@ elif page == "Summer Cooling System":
         pad_fan_distance = st.number_input("Pad-to-Fan Distance (m)", min_value=6.0, max_value=40.0, value=30.0,
                                            step=0.5)
 
+    col1, col2 = st.columns(2)
+
+    with col1:
+        outside_temp = st.number_input("Outside Air Temperature (°C)", min_value=10.0, max_value=50.0, value=35.0,
+                                       step=0.5)
+
+    with col2:
+        outside_rh = st.number_input("Outside Relative Humidity (%)", min_value=0.0, max_value=100.0, value=40.0,
+                                     step=1.0)
+        pad_efficiency = st.number_input("Pad Saturation Efficiency (%)", min_value=10.0, max_value=100.0,
+                                         value=80.0, step=1.0)
+
     # Calculation
     st.markdown("<h3 class='section-header'>Calculation Results</h3>", unsafe_allow_html=True)
 
@@ -442,6 +3355,21 @@ elif page == "Summer Cooling System":
         # Calculate pad area assuming 75 m³/min/m² air flow through pad
         pad_area = Qadj / 75
 
+        # Air properties at the site (elevation sets the pressure)
+        site_pressure = float(pressure_at_elevation(elevation))
+        site_air = air_properties(outside_temp, site_pressure, outside_rh / 100)
+        site_density = float(site_air['density'])
+        standard_density = float(air_properties(STANDARD_AIR_TEMPERATURE, STANDARD_AIR_PRESSURE,
+                                                STANDARD_AIR_RH)['density'])
+        air_mass_flow = Qadj * site_density
+
+        # Pad outlet follows the wet bulb line; the air then warms by the pad-to-fan temperature rise
+        pad_air = evaporative_cooler_outlet(outside_temp, outside_rh / 100, pad_efficiency / 100, site_pressure)
+        fan_air = psychrometric_state(pad_air['outlet_temperature'] + temp_rise, site_pressure,
+                                      humidity_ratio_value=pad_air['outlet']['humidity_ratio'])
+        dry_air_flow = Qadj / float(fan_air['specific_volume'])  # kg dry air/min at the fans
+        pad_water_use = dry_air_flow * float(pad_air['moisture_pickup']) * 60  # kg/h
+
         # Display results
         col1, col2 = st.columns(2)
 
@@ -462,6 +3390,31 @@ elif page == "Summer Cooling System":
             st.markdown(f"**Required Pad Area:** {pad_area:.2f} m²")
             st.markdown("</div>", unsafe_allow_html=True)
 
+        st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+        st.markdown("**Outside Air at the Site:**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown(f"**Atmospheric Pressure:** {site_pressure:.1f} kPa")
+            st.markdown(f"**Air Density:** {site_density:.3f} kg/m³")
+        with col2:
+            st.markdown(f"**Humidity Ratio:** {float(site_air['humidity_ratio']) * 1000:.1f} g/kg dry air")
+            st.markdown(f"**Density Ratio (standard/site):** {standard_density / site_density:.2f}")
+        with col3:
+            st.markdown(f"**Air Mass Removal Rate:** {air_mass_flow:.1f} kg/min")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown(f"**Wet Bulb Temperature:** {float(pad_air['inlet']['wet_bulb']):.1f} °C")
+            st.markdown(f"**Dew Point:** {float(pad_air['inlet']['dew_point']):.1f} °C")
+        with col2:
+            st.markdown(f"**Pad Outlet Air:** {float(pad_air['outlet_temperature']):.1f} °C, "
+                        f"{float(pad_air['outlet']['rh']) * 100:.0f}% RH")
+            st.markdown(f"**Air at the Fans:** {float(pad_air['outlet_temperature']) + temp_rise:.1f} °C, "
+                        f"{float(fan_air['rh']) * 100:.0f}% RH")
+        with col3:
+            st.markdown(f"**Moisture Pickup:** {float(pad_air['moisture_pickup']) * 1000:.1f} g/kg dry air")
+            st.markdown(f"**Pad Water Evaporation:** {pad_water_use:.0f} kg/h")
+        st.markdown("</div>", unsafe_allow_html=True)
+
         # Visualization
         st.markdown("<h3 class='section-header'>Visualization</h3>", unsafe_allow_html=True)
 
@@ -527,6 +3480,69 @@ elif page == "Summer Cooling System":
         </div>
         """, unsafe_allow_html=True)
 
+    st.markdown("<h3 class='section-header'>Hourly Weather Analysis</h3>", unsafe_allow_html=True)
+    st.markdown("""
+    Pad performance depends on the outside wet bulb temperature, so a design based on one hot afternoon says little
+    about the rest of the year. Upload hourly weather (columns 'Temperature (°C)' and 'Relative Humidity (%)',
+    optionally 'Time') or use a synthetic year. Every hour is run through the pad and the pad-to-fan temperature
+    rise above in one vectorized psychrometric calculation.
+    """)
+    uploaded_weather = st.file_uploader("Upload Hourly Weather (CSV)", type=["csv"], key="hourly_weather")
+    if uploaded_weather is not None:
+        weather = pd.read_csv(uploaded_weather)
+        if 'Time' in weather:
+            weather['Time'] = pd.to_datetime(weather['Time'])
+    else:
+        weather = example_hourly_weather()
+    weather_missing = {'Temperature (°C)', 'Relative Humidity (%)'} - set(weather.columns)
+    if weather_missing:
+        st.error(f"The weather file is missing columns: {', '.join(sorted(weather_missing))}")
+    else:
+        target_temp = st.number_input("Maximum Greenhouse Air Temperature at the Fans (°C)", min_value=15.0,
+                                      max_value=45.0, value=30.0, step=0.5)
+        weather = weather.dropna(subset=['Temperature (°C)', 'Relative Humidity (%)']).reset_index(drop=True)
+        hourly_pad = evaporative_cooler_outlet(weather['Temperature (°C)'].to_numpy(),
+                                               weather['Relative Humidity (%)'].to_numpy() / 100,
+                                               pad_efficiency / 100, float(pressure_at_elevation(elevation)))
+        weather['Wet Bulb (°C)'] = hourly_pad['inlet']['wet_bulb']
+        weather['Dew Point (°C)'] = hourly_pad['inlet']['dew_point']
+        weather['Pad Outlet (°C)'] = hourly_pad['outlet_temperature']
+        weather['Pad Outlet RH (%)'] = hourly_pad['outlet']['rh'] * 100
+        weather['At Fans (°C)'] = weather['Pad Outlet (°C)'] + temp_rise
+        hot_hours = weather['At Fans (°C)'] > target_temp
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Hours Analysed", f"{len(weather):,}")
+        with col2:
+            st.metric(f"Hours Above {target_temp:.1f} °C at the Fans", f"{int(hot_hours.sum()):,}")
+        with col3:
+            pad_cooling = (weather['Temperature (°C)'] - weather['Pad Outlet (°C)']).mean()
+            st.metric("Mean Pad Cooling", f"{pad_cooling:.1f} °C")
+
+        fig, ax = plt.subplots(figsize=(12, 5))
+        x_values = weather['Time'] if 'Time' in weather else weather.index
+        ax.plot(x_values, weather['Temperature (°C)'], color='red', alpha=0.4, linewidth=0.5, label='Outside air')
+        ax.plot(x_values, weather['At Fans (°C)'], color='blue', alpha=0.6, linewidth=0.5, label='At the fans')
+        ax.axhline(target_temp, color='black', linestyle='--', label='Maximum')
+        ax.set_ylabel('Temperature (°C)')
+        ax.set_title('Outside Air and Greenhouse Air at the Fans')
+        ax.legend()
+        ax.grid(True, linestyle='--', alpha=0.7)
+        plt.tight_layout()
+        st.pyplot(fig)
+
+        if 'Time' in weather:
+            monthly = weather.assign(**{'Hours Above Maximum': hot_hours}).groupby(weather['Time'].dt.month).agg(
+                **{'Mean Outside (°C)': ('Temperature (°C)', 'mean'),
+                   'Mean Wet Bulb (°C)': ('Wet Bulb (°C)', 'mean'),
+                   'Mean At Fans (°C)': ('At Fans (°C)', 'mean'),
+                   'Hours Above Maximum': ('Hours Above Maximum', 'sum')})
+            monthly.index.name = 'Month'
+            st.dataframe(monthly.round(1))
+        st.download_button("Download Hourly Results (CSV)", weather.to_csv(index=False),
+                           file_name="pad_cooling_hourly.csv", mime="text/csv")
+
 # Winter Cooling System Calculator
 elif page == "Winter Cooling System":
     st.markdown("<h2 class='sub-header'>Winter Cooling System Calculator</h2>", unsafe_allow_html=True)
@@ -1051,6 +4067,7 @@ elif page == "Cereal Grain Analysis":
                 sphericities.append(sphericity)
 
             df['Sphericity'] = sphericities
+            st.session_state.grain_measurements = df
 
             # Calculate statistics
             stats_df = pd.DataFrame({
@@ -1507,13 +4524,14 @@ elif page == "Bulk Density & Porosity":
                     "Replication": rep_name,
                     "Sample Mass (g)": round(all_sample_masses[i], 2),
                     "Bulk Density (g/cc)": round(all_bulk_densities[i], 4),
-                    "Bulk Density (kg/m³)": round(all_bulk_densities[i] * 1000, 2)
+                    "Bulk Density (kg/m³)": round(float(convert_units(all_bulk_densities[i], "g/cc", "kg/m³")), 2)
                 })
 
             results_df = pd.DataFrame(results_data)
             st.table(results_df)
 
-            st.markdown(f"**Average Bulk Density:** {avg_bulk_density:.4f} g/cc ({avg_bulk_density * 1000:.2f} kg/m³)")
+            avg_bulk_density_kgm3 = float(convert_units(avg_bulk_density, "g/cc", "kg/m³"))
+            st.markdown(f"**Average Bulk Density:** {avg_bulk_density:.4f} g/cc ({avg_bulk_density_kgm3:.2f} kg/m³)")
             st.markdown("</div>", unsafe_allow_html=True)
 
             # Visualization
@@ -1721,7 +4739,7 @@ elif page == "Bulk Density & Porosity":
                 # Use values from previous calculations if available
                 try:
                     grain_type_display = grain_type
-                    bulk_density_value = avg_bulk_density * 1000  # Convert g/cc to kg/m³
+                    bulk_density_value = float(convert_units(avg_bulk_density, "g/cc", "kg/m³"))
                     porosity_value = avg_porosity
                 except:
                     st.error("Previous calculation results not found. Please use 'Enter New Values' option.")
@@ -1900,27 +4918,25 @@ elif page == "Bulk Density & Porosity":
         elif viz_type == "Scatter Plot - Bulk vs True Density":
             fig, ax = plt.subplots(figsize=(10, 8))
 
-            # Create scatter plot
-            scatter = ax.scatter(
-                st.session_state.grain_data['Bulk Density (kg/m³)'],
-                st.session_state.grain_data['True Density (kg/m³)'],
-                c=st.session_state.grain_data['Porosity (%)'],
-                s=100,
+            # Create scatter plot (binned for large logs)
+            scatter, aggregated = plot_aggregated_scatter(
+                ax,
+                st.session_state.grain_data,
+                'Bulk Density (kg/m³)',
+                'True Density (kg/m³)',
+                color_column='Porosity (%)',
                 cmap='viridis',
+                s=100,
                 alpha=0.7
             )
 
-            # Add labels for each point
-            for i, txt in enumerate(st.session_state.grain_data['Grain/Seed']):
-                ax.annotate(txt,
-                            (st.session_state.grain_data['Bulk Density (kg/m³)'].iloc[i],
-                             st.session_state.grain_data['True Density (kg/m³)'].iloc[i]),
-                            xytext=(5, 5),
-                            textcoords='offset points')
+            # Add labels for each point, or for each grain in large logs
+            annotate_representative_points(ax, st.session_state.grain_data,
+                                           'Bulk Density (kg/m³)', 'True Density (kg/m³)')
 
             # Add colorbar for porosity
             cbar = plt.colorbar(scatter)
-            cbar.set_label('Porosity (%)')
+            cbar.set_label('Mean Porosity (%) per bin' if aggregated else 'Porosity (%)')
 
             # Add diagonal line for reference (where porosity = 0)
             max_val = max(st.session_state.grain_data['True Density (kg/m³)'].max(),
@@ -1939,36 +4955,35 @@ elif page == "Bulk Density & Porosity":
         elif viz_type == "Bubble Chart - Density vs Moisture":
             fig, ax = plt.subplots(figsize=(12, 8))
 
-            # Create bubble chart
-            scatter = ax.scatter(
-                st.session_state.grain_data['Moisture Content (%)'],
-                st.session_state.grain_data['Bulk Density (kg/m³)'],
-                s=st.session_state.grain_data['Porosity (%)'] * 10,  # Scale bubble size
-                c=st.session_state.grain_data['True Density (kg/m³)'],
+            # Create bubble chart (binned for large logs, where bubble sizes cannot be read)
+            scatter, aggregated = plot_aggregated_scatter(
+                ax,
+                st.session_state.grain_data,
+                'Moisture Content (%)',
+                'Bulk Density (kg/m³)',
+                color_column='True Density (kg/m³)',
                 cmap='plasma',
+                s=st.session_state.grain_data['Porosity (%)'] * 10,  # Scale bubble size
                 alpha=0.7
             )
 
-            # Add labels for each point
-            for i, txt in enumerate(st.session_state.grain_data['Grain/Seed']):
-                ax.annotate(txt,
-                            (st.session_state.grain_data['Moisture Content (%)'].iloc[i],
-                             st.session_state.grain_data['Bulk Density (kg/m³)'].iloc[i]),
-                            xytext=(5, 5),
-                            textcoords='offset points')
+            # Add labels for each point, or for each grain in large logs
+            annotate_representative_points(ax, st.session_state.grain_data,
+                                           'Moisture Content (%)', 'Bulk Density (kg/m³)')
 
             # Add colorbar for true density
             cbar = plt.colorbar(scatter)
-            cbar.set_label('True Density (kg/m³)')
+            cbar.set_label('Mean True Density (kg/m³) per bin' if aggregated else 'True Density (kg/m³)')
 
             # Add legend for bubble size
-            sizes = [20, 40, 60]
-            labels = ['2%', '4%', '6%']
-            legend_bubbles = []
-            for size in sizes:
-                legend_bubbles.append(ax.scatter([], [], s=size * 10, c='gray', alpha=0.7))
+            if not aggregated:
+                sizes = [20, 40, 60]
+                labels = ['2%', '4%', '6%']
+                legend_bubbles = []
+                for size in sizes:
+                    legend_bubbles.append(ax.scatter([], [], s=size * 10, c='gray', alpha=0.7))
 
-            ax.legend(legend_bubbles, labels, title='Porosity', loc='upper right', scatterpoints=1)
+                ax.legend(legend_bubbles, labels, title='Porosity', loc='upper right', scatterpoints=1)
 
             ax.set_xlabel('Moisture Content (%)')
             ax.set_ylabel('Bulk Density (kg/m³)')
@@ -2064,7 +5079,8 @@ elif page == "Grain Moisture Content":
                  caption="Fig 6.3: Infra-Red Moisture Meter")
 
     # Create tabs for different operations
-    tab1, tab2, tab3 = st.tabs(["Oven Method Calculator", "Moisture Content Converter", "Method Comparison"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Oven Method Calculator", "Moisture Content Converter", "Method Comparison",
+                                      "Sorption Isotherms"])
 
     with tab1:
         st.markdown("<h3 class='section-header'>Oven Method Moisture Content Calculator</h3>", unsafe_allow_html=True)
@@ -2549,6 +5565,133 @@ elif page == "Grain Moisture Content":
 
             st.markdown("</div>", unsafe_allow_html=True)
 
+    with tab4:
+        st.markdown("<h3 class='section-header'>Sorption Isotherms and Equilibrium Moisture Content</h3>",
+                    unsafe_allow_html=True)
+
+        st.markdown("""
+        Grain exposed to air of constant temperature and relative humidity gains or loses moisture until it
+        reaches its **Equilibrium Moisture Content (EMC, Me)**. The curve of EMC against RH at a fixed
+        temperature is the sorption isotherm. It sets the lower limit of drying and the safe storage moisture.
+        """)
+
+        st.markdown("""
+        <div class='formula'>
+        Henderson: 1 - RH = exp[-A (T + C) Me^N]<br>
+        Chung-Pfost: RH = exp[-A / (T + C) × exp(-B Me)]<br>
+        Oswin: Me = (A + B T) × [RH / (1 - RH)]^(1/C)<br>
+        GAB: Me = A B (C/T) RH / [(1 - B RH)(1 - B RH + (C/T) B RH)]
+        </div>
+        """, unsafe_allow_html=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            isotherm_grain = st.selectbox("Grain", list(EMC_MODEL_COEFFICIENTS['Henderson'].keys()),
+                                          key="isotherm_grain")
+            isotherm_model = st.selectbox("Isotherm Model", list(EMC_MODELS.keys()), key="isotherm_model")
+        with col2:
+            isotherm_temps = st.multiselect("Air Temperatures (°C)", [10, 20, 30, 40, 50, 60, 70, 80],
+                                            default=[10, 30, 50])
+            point_rh = st.slider("Relative Humidity for EMC Reading (%)", 5, 95, 65, 1)
+
+        coefficients = EMC_MODEL_COEFFICIENTS[isotherm_model][isotherm_grain]
+        coefficient_df = pd.DataFrame({
+            'Coefficient': EMC_MODEL_PARAMETERS[isotherm_model],
+            'Value': coefficients
+        })
+        st.table(coefficient_df)
+
+        if isotherm_temps:
+            rh_values = np.linspace(0.05, 0.95, 91)
+            # One call evaluates every temperature/RH combination
+            emc_curves = equilibrium_moisture_content(np.array(isotherm_temps)[:, None], rh_values[None, :],
+                                                      isotherm_grain, isotherm_model)
+            point_emc = equilibrium_moisture_content(np.array(isotherm_temps), point_rh / 100,
+                                                     isotherm_grain, isotherm_model)
+
+            fig, ax = plt.subplots(figsize=(10, 6))
+            for temp, curve in zip(isotherm_temps, emc_curves):
+                ax.plot(rh_values * 100, curve, linewidth=2, label=f'{temp} °C')
+            ax.axvline(x=point_rh, color='gray', linestyle=':', alpha=0.7)
+
+            ax.set_xlabel('Relative Humidity (%)')
+            ax.set_ylabel('Equilibrium Moisture Content (% d.b.)')
+            ax.set_title(f'{isotherm_model} Sorption Isotherms for {isotherm_grain}')
+            ax.grid(True, linestyle='--', alpha=0.7)
+            ax.legend(title='Air Temperature')
+
+            plt.tight_layout()
+            st.pyplot(fig)
+
+            st.table(pd.DataFrame({
+                'Air Temperature (°C)': isotherm_temps,
+                f'EMC at {point_rh}% RH (% d.b.)': np.round(point_emc, 2),
+                f'EMC at {point_rh}% RH (% w.b.)': np.round(point_emc / (100 + point_emc) * 100, 2)
+            }))
+
+        st.markdown("### Fit Isotherm Coefficients to Measured Data")
+        st.markdown("""
+        Enter or upload measured equilibrium points (CSV with columns `RH (%)`, `Temperature (°C)` and
+        `EMC (% d.b.)`). The selected model is fitted by non-linear least squares.
+        """)
+
+        uploaded_isotherm = st.file_uploader("Upload Isotherm Data (CSV)", type=["csv"], key="isotherm_upload")
+        if uploaded_isotherm is not None:
+            isotherm_data = pd.read_csv(uploaded_isotherm)
+        else:
+            isotherm_data = pd.DataFrame({
+                'RH (%)': [20, 35, 50, 65, 80, 90, 20, 35, 50, 65, 80, 90],
+                'Temperature (°C)': [25, 25, 25, 25, 25, 25, 45, 45, 45, 45, 45, 45],
+                'EMC (% d.b.)': [9.1, 11.0, 13.2, 15.9, 19.8, 24.1, 7.8, 9.6, 11.5, 14.0, 17.6, 21.7]
+            })
+        isotherm_data = st.data_editor(isotherm_data, num_rows="dynamic", key="isotherm_data_editor")
+
+        if st.button("Fit Isotherm Model"):
+            isotherm_columns = ['RH (%)', 'Temperature (°C)', 'EMC (% d.b.)']
+            isotherm_missing = set(isotherm_columns) - set(isotherm_data.columns)
+            valid_data = isotherm_data.reindex(columns=isotherm_columns).apply(pd.to_numeric, errors='coerce').dropna()
+            if isotherm_missing:
+                st.error(f"The isotherm data are missing columns: {', '.join(sorted(isotherm_missing))}")
+            elif len(valid_data) < len(EMC_MODEL_PARAMETERS[isotherm_model]) + 1:
+                st.error("Enter more data points than model coefficients to fit the isotherm.")
+            else:
+                try:
+                    fit = fit_emc_model(valid_data['RH (%)'] / 100, valid_data['Temperature (°C)'],
+                                        valid_data['EMC (% d.b.)'], isotherm_model,
+                                        initial_guess=coefficients)
+                except RuntimeError:
+                    st.error("The fit did not converge. Try another model or check the data.")
+                else:
+                    st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                    st.markdown(f"### Fitted {isotherm_model} Coefficients")
+                    st.table(pd.DataFrame({
+                        'Coefficient': EMC_MODEL_PARAMETERS[isotherm_model],
+                        'Value': fit['coefficients'],
+                        'Standard Error': fit['std_errors']
+                    }))
+                    st.markdown(f"**R²:** {fit['r_squared']:.4f} &nbsp;&nbsp; **RMSE:** {fit['rmse']:.3f}% d.b.")
+                    st.markdown("</div>", unsafe_allow_html=True)
+
+                    fig, ax = plt.subplots(figsize=(10, 6))
+                    rh_values = np.linspace(0.05, 0.95, 91)
+                    for temp in np.unique(valid_data['Temperature (°C)']):
+                        measured = valid_data[valid_data['Temperature (°C)'] == temp]
+                        line = ax.plot(rh_values * 100,
+                                       equilibrium_moisture_content(temp, rh_values, model=isotherm_model,
+                                                                    coefficients=fit['coefficients']),
+                                       linewidth=2, label=f'Fitted {temp:g} °C')
+                        ax.scatter(measured['RH (%)'], measured['EMC (% d.b.)'], color=line[0].get_color(),
+                                   edgecolor='black', s=60, zorder=3)
+
+                    ax.set_xlabel('Relative Humidity (%)')
+                    ax.set_ylabel('Equilibrium Moisture Content (% d.b.)')
+                    ax.set_title(f'Fitted {isotherm_model} Isotherms')
+                    ax.grid(True, linestyle='--', alpha=0.7)
+                    ax.legend()
+
+                    plt.tight_layout()
+                    st.pyplot(fig)
+
     # Comprehensive data log for moisture content
     st.markdown("<h3 class='section-header'>Moisture Content Data Log</h3>", unsafe_allow_html=True)
 
@@ -2743,32 +5886,37 @@ elif page == "Grain Moisture Content":
             grains = scatter_data['Grain/Seed']
             methods = scatter_data['Measurement Method']
 
-            # Create a colormap for different methods
-            method_types = methods.unique()
-            colors = plt.cm.tab10(np.linspace(0, 1, len(method_types)))
-            color_map = dict(zip(method_types, colors))
-
-            # Create scatter plot with different colors for methods
-            for method in method_types:
-                mask = methods == method
-                ax.scatter(
-                    wb_values[mask], db_values[mask],
-                    label=method,
-                    s=100,
-                    color=color_map[method],
-                    alpha=0.7,
-                    edgecolor='black'
-                )
-
-            # Add labels for each point
-            for i, txt in enumerate(grains):
-                ax.annotate(txt,
-                            (wb_values.iloc[i], db_values.iloc[i]),
-                            xytext=(5, 5), textcoords='offset points')
+            if len(scatter_data) > SCATTER_AGGREGATION_THRESHOLD:
+                # Large logs: show point density instead of individual method markers
+                density, _ = plot_aggregated_scatter(ax, scatter_data, 'Moisture Content (% w.b.)',
+                                                     'Moisture Content (% d.b.)', cmap='Blues')
+                cbar = plt.colorbar(density)
+                cbar.set_label('Number of Measurements per bin')
+            else:
+                # Create a colormap for different methods
+                method_types = methods.unique()
+                colors = plt.cm.tab10(np.linspace(0, 1, len(method_types)))
+                color_map = dict(zip(method_types, colors))
+
+                # Create scatter plot with different colors for methods
+                for method in method_types:
+                    mask = methods == method
+                    ax.scatter(
+                        wb_values[mask], db_values[mask],
+                        label=method,
+                        s=100,
+                        color=color_map[method],
+                        alpha=0.7,
+                        edgecolor='black'
+                    )
+
+            # Add labels for each point, or for each grain in large logs
+            annotate_representative_points(ax, scatter_data, 'Moisture Content (% w.b.)',
+                                           'Moisture Content (% d.b.)')
 
             # Add the theoretical relationship line
-            x_line = np.linspace(0, max(wb_values) * 1.1, 100)
-            y_line = [(x / (100 - x)) * 100 for x in x_line]
+            x_line = np.linspace(0, wb_values.max() * 1.1, 100)
+            y_line = (x_line / (100 - x_line)) * 100
             ax.plot(x_line, y_line, 'k--', alpha=0.5, label='Theoretical Relationship')
 
             # Set labels and legend
@@ -2835,8 +5983,9 @@ elif page == "Terminal Velocity":
                  caption="Fig 8.1: Apparatus for determination of terminal velocity of grains")
 
     # Create tabs for different operations
-    tab1, tab2, tab3 = st.tabs(
-        ["Terminal Velocity Calculator", "Comparative Analysis", "Factors Affecting Terminal Velocity"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["Terminal Velocity Calculator", "Comparative Analysis", "Factors Affecting Terminal Velocity",
+         "Aspirator Separation", "Pneumatic Conveying"])
 
     with tab1:
         st.markdown("<h3 class='section-header'>Terminal Velocity Measurement</h3>", unsafe_allow_html=True)
@@ -2867,6 +6016,8 @@ elif page == "Terminal Velocity":
                                                   step=0.5)
                 air_pressure = st.number_input("Atmospheric Pressure (kPa)", min_value=80.0, max_value=110.0,
                                                value=101.3, step=0.1)
+                air_rh = st.number_input("Air Relative Humidity (%)", min_value=0.0, max_value=100.0, value=60.0,
+                                         step=1.0)
 
             # Number of replications
             num_replications = st.number_input("Number of Replications", min_value=1, max_value=10, value=3, step=1)
@@ -2883,34 +6034,16 @@ elif page == "Terminal Velocity":
             calculate_button = st.form_submit_button("Calculate Statistics")
 
         if calculate_button:
-            # Convert velocity to m/s if needed
-            if velocity_units == "ft/s":
-                velocity_ms = velocity_value * 0.3048
-            elif velocity_units == "km/h":
-                velocity_ms = velocity_value / 3.6
-            elif velocity_units == "mph":
-                velocity_ms = velocity_value * 0.44704
-            else:  # m/s
-                velocity_ms = velocity_value
-
-            # Convert replications to m/s
-            all_velocities_ms = [velocity_ms]
-            for rep_velocity in replication_data:
-                if velocity_units == "ft/s":
-                    rep_velocity_ms = rep_velocity * 0.3048
-                elif velocity_units == "km/h":
-                    rep_velocity_ms = rep_velocity / 3.6
-                elif velocity_units == "mph":
-                    rep_velocity_ms = rep_velocity * 0.44704
-                else:  # m/s
-                    rep_velocity_ms = rep_velocity
-                all_velocities_ms.append(rep_velocity_ms)
+            # Convert all measurements to m/s in one step
+            velocities = with_units([velocity_value] + replication_data, velocity_units)
+            all_velocities_ms = to_units(velocities, "m/s")['values']
 
             # Calculate statistics
-            avg_velocity_ms = sum(all_velocities_ms) / len(all_velocities_ms)
-            min_velocity_ms = min(all_velocities_ms)
-            max_velocity_ms = max(all_velocities_ms)
-            std_velocity_ms = np.std(all_velocities_ms)
+            stats_ms = np.array([all_velocities_ms.mean(), all_velocities_ms.min(), all_velocities_ms.max(),
+                                 all_velocities_ms.std()])
+            stats_display = convert_units(stats_ms, "m/s", velocity_units)
+            avg_velocity_display = stats_display[0]
+            st.session_state.last_terminal_velocity = float(stats_ms[0])
 
             # Display results
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
@@ -2919,73 +6052,41 @@ elif page == "Terminal Velocity":
             st.markdown(f"**Moisture Content:** {moisture_content:.1f}% (d.b.)")
 
             # Create a table of results
-            results_data = []
-            for i in range(len(all_velocities_ms)):
-                rep_name = "Primary Measurement" if i == 0 else f"Replication {i}"
-
-                # Convert back to original units for display
-                if velocity_units == "ft/s":
-                    display_value = all_velocities_ms[i] / 0.3048
-                elif velocity_units == "km/h":
-                    display_value = all_velocities_ms[i] * 3.6
-                elif velocity_units == "mph":
-                    display_value = all_velocities_ms[i] / 0.44704
-                else:  # m/s
-                    display_value = all_velocities_ms[i]
-
-                results_data.append({
-                    "Measurement": rep_name,
-                    f"Terminal Velocity ({velocity_units})": round(display_value, 2),
-                    "Terminal Velocity (m/s)": round(all_velocities_ms[i], 2)
-                })
-
-            results_df = pd.DataFrame(results_data)
+            results_df = pd.DataFrame({
+                "Measurement": ["Primary Measurement"] + [f"Replication {i}" for i in range(1, len(all_velocities_ms))],
+                f"Terminal Velocity ({velocity_units})": np.round(velocities['values'], 2),
+                "Terminal Velocity (m/s)": np.round(all_velocities_ms, 2)
+            })
             st.table(results_df)
 
             # Display statistics
             st.markdown("### Statistical Summary:")
 
-            # Convert statistics back to selected units for display
-            if velocity_units == "ft/s":
-                avg_velocity_display = avg_velocity_ms / 0.3048
-                min_velocity_display = min_velocity_ms / 0.3048
-                max_velocity_display = max_velocity_ms / 0.3048
-                std_velocity_display = std_velocity_ms / 0.3048
-            elif velocity_units == "km/h":
-                avg_velocity_display = avg_velocity_ms * 3.6
-                min_velocity_display = min_velocity_ms * 3.6
-                max_velocity_display = max_velocity_ms * 3.6
-                std_velocity_display = std_velocity_ms * 3.6
-            elif velocity_units == "mph":
-                avg_velocity_display = avg_velocity_ms / 0.44704
-                min_velocity_display = min_velocity_ms / 0.44704
-                max_velocity_display = max_velocity_ms / 0.44704
-                std_velocity_display = std_velocity_ms / 0.44704
-            else:  # m/s
-                avg_velocity_display = avg_velocity_ms
-                min_velocity_display = min_velocity_ms
-                max_velocity_display = max_velocity_ms
-                std_velocity_display = std_velocity_ms
-
             stats_data = {
                 "Statistic": ["Average", "Minimum", "Maximum", "Standard Deviation"],
-                f"Value ({velocity_units})": [
-                    round(avg_velocity_display, 2),
-                    round(min_velocity_display, 2),
-                    round(max_velocity_display, 2),
-                    round(std_velocity_display, 2)
-                ],
-                "Value (m/s)": [
-                    round(avg_velocity_ms, 2),
-                    round(min_velocity_ms, 2),
-                    round(max_velocity_ms, 2),
-                    round(std_velocity_ms, 2)
-                ]
+                f"Value ({velocity_units})": np.round(stats_display, 2),
+                "Value (m/s)": np.round(stats_ms, 2)
             }
 
             stats_df = pd.DataFrame(stats_data)
             st.table(stats_df)
 
+            # Normalize to standard air so tests run on different days can be compared
+            test_air = air_properties(air_temperature, air_pressure, air_rh / 100)
+            standard_velocities_ms = normalize_terminal_velocity(all_velocities_ms, air_temperature, air_pressure,
+                                                                 air_rh / 100)
+
+            st.markdown("### Test Air Conditions:")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown(f"**Air Density:** {float(test_air['density']):.4f} kg/m³")
+                st.markdown(f"**Air Viscosity:** {float(test_air['viscosity']) * 1e5:.3f} ×10⁻⁵ Pa·s")
+                st.markdown(f"**Humidity Ratio:** {float(test_air['humidity_ratio']) * 1000:.2f} g/kg dry air")
+            with col2:
+                st.markdown(f"**Average Velocity at Standard Air:** {standard_velocities_ms.mean():.2f} m/s")
+                st.markdown(f"**Standard Deviation at Standard Air:** {standard_velocities_ms.std():.2f} m/s")
+                st.markdown(f"*Standard air: {STANDARD_AIR_TEMPERATURE:.0f} °C, {STANDARD_AIR_PRESSURE} kPa, dry*")
+
             st.markdown("</div>", unsafe_allow_html=True)
 
             # Visualization
@@ -2995,17 +6096,8 @@ elif page == "Terminal Velocity":
                 fig, ax = plt.subplots(figsize=(10, 6))
 
                 # Create bar chart with original units
-                if velocity_units == "ft/s":
-                    display_values = [v / 0.3048 for v in all_velocities_ms]
-                elif velocity_units == "km/h":
-                    display_values = [v * 3.6 for v in all_velocities_ms]
-                elif velocity_units == "mph":
-                    display_values = [v / 0.44704 for v in all_velocities_ms]
-                else:  # m/s
-                    display_values = all_velocities_ms
-
                 reps = ["Primary"] + [f"Rep {i + 1}" for i in range(len(replication_data))]
-                ax.bar(reps, display_values, color='lightblue', edgecolor='navy')
+                ax.bar(reps, velocities['values'], color='lightblue', edgecolor='navy')
 
                 # Add a horizontal line for the average
                 ax.axhline(y=avg_velocity_display, color='red', linestyle='--',
@@ -3048,15 +6140,12 @@ elif page == "Terminal Velocity":
         This analysis is useful for designing grain handling and separation systems that process multiple grain types.
         """)
 
-        # Create a data log for terminal velocity measurements
+        # Create a data log for terminal velocity measurements (kept in a shared file if TERMINAL_VELOCITY_LOG is set)
         if 'terminal_velocity_data' not in st.session_state:
-            st.session_state.terminal_velocity_data = pd.DataFrame({
-                'Grain/Seed': ['Wheat', 'Rice', 'Corn', 'Soybean', 'Millet'],
-                'Moisture Content (% d.b.)': [14.0, 12.0, 15.0, 12.5, 11.0],
-                'Terminal Velocity (m/s)': [9.5, 8.2, 12.3, 10.8, 6.5],
-                'Density (kg/m³)': [1250, 1150, 1300, 1180, 1100],
-                'Size (mm)': [4.0, 7.0, 10.0, 7.5, 2.5]
-            })
+            st.session_state.terminal_velocity_data = initial_terminal_velocity_log()
+        if 'terminal_velocity_models' not in st.session_state:
+            st.session_state.terminal_velocity_models = update_terminal_velocity_models(
+                {}, st.session_state.terminal_velocity_data)
 
         # Create a form for adding new data
         with st.form("terminal_velocity_log_form"):
@@ -3080,6 +6169,9 @@ elif page == "Terminal Velocity":
             add_button = st.form_submit_button("Add to Data Log")
 
         if add_button and new_grain:
+            if use_previous and 'last_terminal_velocity' in st.session_state:
+                new_velocity = st.session_state.last_terminal_velocity
+
             # Add the new data to the dataframe
             new_row = pd.DataFrame({
                 'Grain/Seed': [new_grain],
@@ -3089,10 +6181,29 @@ elif page == "Terminal Velocity":
                 'Size (mm)': [new_size]
             })
 
+            append_terminal_velocity_log(new_row, st.session_state.terminal_velocity_data)
             st.session_state.terminal_velocity_data = pd.concat([st.session_state.terminal_velocity_data, new_row],
                                                                 ignore_index=True)
+            st.session_state.terminal_velocity_models = update_terminal_velocity_models(
+                st.session_state.terminal_velocity_models, new_row)
             st.success(f"Added {new_grain} to the data log!")
 
+        uploaded_log = st.file_uploader("Import Measurements (CSV with the data log columns)", type=["csv"],
+                                        key="terminal_velocity_log_csv")
+        if uploaded_log is not None and st.button("Add Imported Rows to Data Log"):
+            imported_rows = pd.read_csv(uploaded_log)
+            missing_columns = set(TERMINAL_VELOCITY_LOG_COLUMNS) - set(imported_rows.columns)
+            if missing_columns:
+                st.error(f"The CSV file is missing columns: {', '.join(sorted(missing_columns))}")
+            else:
+                imported_rows = imported_rows[TERMINAL_VELOCITY_LOG_COLUMNS]
+                append_terminal_velocity_log(imported_rows, st.session_state.terminal_velocity_data)
+                st.session_state.terminal_velocity_data = pd.concat(
+                    [st.session_state.terminal_velocity_data, imported_rows], ignore_index=True)
+                st.session_state.terminal_velocity_models = update_terminal_velocity_models(
+                    st.session_state.terminal_velocity_models, imported_rows)
+                st.success(f"Added {len(imported_rows):,} rows to the data log!")
+
         # Display the current data
         st.dataframe(st.session_state.terminal_velocity_data)
 
@@ -3104,6 +6215,11 @@ elif page == "Terminal Velocity":
             file_name="grain_terminal_velocity_data.csv",
             mime="text/csv"
         )
+        if TERMINAL_VELOCITY_LOG_PATH is None:
+            st.caption("The data log is kept for this session only: download it to keep it, and import it again "
+                       "to carry on later.")
+        else:
+            st.caption(f"The data log is saved to {TERMINAL_VELOCITY_LOG_PATH} and shared by every session.")
 
         # Create visualizations
         if not st.session_state.terminal_velocity_data.empty and len(st.session_state.terminal_velocity_data) > 1:
@@ -3140,11 +6256,21 @@ elif page == "Terminal Velocity":
                 fig, ax = plt.subplots(figsize=(10, 6))
 
                 # Create scatter plot
-                for grain in st.session_state.terminal_velocity_data['Grain/Seed'].unique():
-                    grain_data = st.session_state.terminal_velocity_data[
-                        st.session_state.terminal_velocity_data['Grain/Seed'] == grain]
-                    ax.scatter(grain_data['Moisture Content (% d.b.)'], grain_data['Terminal Velocity (m/s)'],
-                               label=grain, s=80, alpha=0.7)
+                if len(st.session_state.terminal_velocity_data) > SCATTER_AGGREGATION_THRESHOLD:
+                    # Large logs: show point density with one label per grain
+                    density, _ = plot_aggregated_scatter(ax, st.session_state.terminal_velocity_data,
+                                                         'Moisture Content (% d.b.)', 'Terminal Velocity (m/s)',
+                                                         cmap='Blues')
+                    cbar = plt.colorbar(density)
+                    cbar.set_label('Number of Measurements per bin')
+                    annotate_representative_points(ax, st.session_state.terminal_velocity_data,
+                                                   'Moisture Content (% d.b.)', 'Terminal Velocity (m/s)')
+                else:
+                    for grain in st.session_state.terminal_velocity_data['Grain/Seed'].unique():
+                        grain_data = st.session_state.terminal_velocity_data[
+                            st.session_state.terminal_velocity_data['Grain/Seed'] == grain]
+                        ax.scatter(grain_data['Moisture Content (% d.b.)'], grain_data['Terminal Velocity (m/s)'],
+                                   label=grain, s=80, alpha=0.7)
 
                 # Add regression line if enough data points
                 if len(st.session_state.terminal_velocity_data) > 2:
@@ -3152,7 +6278,8 @@ elif page == "Terminal Velocity":
                     y = st.session_state.terminal_velocity_data['Terminal Velocity (m/s)']
                     z = np.polyfit(x, y, 1)
                     p = np.poly1d(z)
-                    ax.plot(x, p(x), "r--", alpha=0.7, label="Trend line")
+                    x_trend = np.array([x.min(), x.max()])
+                    ax.plot(x_trend, p(x_trend), "r--", alpha=0.7, label="Trend line")
 
                 ax.set_xlabel('Moisture Content (% d.b.)')
                 ax.set_ylabel('Terminal Velocity (m/s)')
@@ -3172,23 +6299,21 @@ elif page == "Terminal Velocity":
             elif viz_type == "Scatter Plot - Terminal Velocity vs Size":
                 fig, ax = plt.subplots(figsize=(10, 6))
 
-                # Create scatter plot
-                scatter = ax.scatter(
-                    st.session_state.terminal_velocity_data['Size (mm)'],
-                    st.session_state.terminal_velocity_data['Terminal Velocity (m/s)'],
-                    c=st.session_state.terminal_velocity_data['Density (kg/m³)'],
+                # Create scatter plot (binned for large logs)
+                scatter, aggregated = plot_aggregated_scatter(
+                    ax,
+                    st.session_state.terminal_velocity_data,
+                    'Size (mm)',
+                    'Terminal Velocity (m/s)',
+                    color_column='Density (kg/m³)',
+                    cmap='viridis',
                     s=80,
-                    alpha=0.7,
-                    cmap='viridis'
+                    alpha=0.7
                 )
 
-                # Add labels for each point
-                for i, txt in enumerate(st.session_state.terminal_velocity_data['Grain/Seed']):
-                    ax.annotate(txt,
-                                (st.session_state.terminal_velocity_data['Size (mm)'].iloc[i],
-                                 st.session_state.terminal_velocity_data['Terminal Velocity (m/s)'].iloc[i]),
-                                xytext=(5, 5),
-                                textcoords='offset points')
+                # Add labels for each point, or for each grain in large logs
+                annotate_representative_points(ax, st.session_state.terminal_velocity_data,
+                                               'Size (mm)', 'Terminal Velocity (m/s)')
 
                 # Add regression line if enough data points
                 if len(st.session_state.terminal_velocity_data) > 2:
@@ -3196,11 +6321,12 @@ elif page == "Terminal Velocity":
                     y = st.session_state.terminal_velocity_data['Terminal Velocity (m/s)']
                     z = np.polyfit(x, y, 1)
                     p = np.poly1d(z)
-                    ax.plot(x, p(x), "r--", alpha=0.7, label="Trend line")
+                    x_trend = np.array([x.min(), x.max()])
+                    ax.plot(x_trend, p(x_trend), "r--", alpha=0.7, label="Trend line")
 
                 # Add a color bar
                 cbar = plt.colorbar(scatter)
-                cbar.set_label('Density (kg/m³)')
+                cbar.set_label('Mean Density (kg/m³) per bin' if aggregated else 'Density (kg/m³)')
 
                 ax.set_xlabel('Size (mm)')
                 ax.set_ylabel('Terminal Velocity (m/s)')
@@ -3220,23 +6346,21 @@ elif page == "Terminal Velocity":
             elif viz_type == "Scatter Plot - Terminal Velocity vs Density":
                 fig, ax = plt.subplots(figsize=(10, 6))
 
-                # Create scatter plot
-                scatter = ax.scatter(
-                    st.session_state.terminal_velocity_data['Density (kg/m³)'],
-                    st.session_state.terminal_velocity_data['Terminal Velocity (m/s)'],
-                    c=st.session_state.terminal_velocity_data['Size (mm)'],
+                # Create scatter plot (binned for large logs)
+                scatter, aggregated = plot_aggregated_scatter(
+                    ax,
+                    st.session_state.terminal_velocity_data,
+                    'Density (kg/m³)',
+                    'Terminal Velocity (m/s)',
+                    color_column='Size (mm)',
+                    cmap='plasma',
                     s=80,
-                    alpha=0.7,
-                    cmap='plasma'
+                    alpha=0.7
                 )
 
-                # Add labels for each point
-                for i, txt in enumerate(st.session_state.terminal_velocity_data['Grain/Seed']):
-                    ax.annotate(txt,
-                                (st.session_state.terminal_velocity_data['Density (kg/m³)'].iloc[i],
-                                 st.session_state.terminal_velocity_data['Terminal Velocity (m/s)'].iloc[i]),
-                                xytext=(5, 5),
-                                textcoords='offset points')
+                # Add labels for each point, or for each grain in large logs
+                annotate_representative_points(ax, st.session_state.terminal_velocity_data,
+                                               'Density (kg/m³)', 'Terminal Velocity (m/s)')
 
                 # Add regression line if enough data points
                 if len(st.session_state.terminal_velocity_data) > 2:
@@ -3244,11 +6368,12 @@ elif page == "Terminal Velocity":
                     y = st.session_state.terminal_velocity_data['Terminal Velocity (m/s)']
                     z = np.polyfit(x, y, 1)
                     p = np.poly1d(z)
-                    ax.plot(x, p(x), "r--", alpha=0.7, label="Trend line")
+                    x_trend = np.array([x.min(), x.max()])
+                    ax.plot(x_trend, p(x_trend), "r--", alpha=0.7, label="Trend line")
 
                 # Add a color bar
                 cbar = plt.colorbar(scatter)
-                cbar.set_label('Size (mm)')
+                cbar.set_label('Mean Size (mm) per bin' if aggregated else 'Size (mm)')
 
                 ax.set_xlabel('Density (kg/m³)')
                 ax.set_ylabel('Terminal Velocity (m/s)')
@@ -3265,8 +6390,53 @@ elif page == "Terminal Velocity":
                 Denser particles require higher air velocities to remain suspended.
                 """)
 
-    with tab3:
-        st.markdown("<h3 class='section-header'>Factors Affecting Terminal Velocity</h3>", unsafe_allow_html=True)
+        # Fitted models of terminal velocity against moisture, size and density
+        st.markdown("<h4>Fitted Terminal Velocity Models:</h4>", unsafe_allow_html=True)
+
+        st.markdown(f"""
+        A linear model Vt = b0 + b1·M + b2·size + b3·density is fitted for each grain and for all grains pooled.
+        The fits are updated from running sums as rows are added, so they stay current without refitting the whole
+        log. Grains with fewer than {MIN_ROWS_PER_GRAIN_MODEL} rows are predicted with the pooled model.
+        """)
+
+        model_names = sorted(st.session_state.terminal_velocity_models,
+                             key=lambda name: (name != POOLED_MODEL_NAME, name))
+        model_rows = []
+        for grain in model_names:
+            fit = terminal_velocity_model_fit(st.session_state.terminal_velocity_models[grain])
+            model_rows.append({
+                'Grain/Seed': grain,
+                'Rows': fit['n'],
+                'b0': fit['coefficients'][0],
+                'b1 (per % d.b.)': fit['coefficients'][1],
+                'b2 (per mm)': fit['coefficients'][2],
+                'b3 (per kg/m³)': fit['coefficients'][3],
+                'R²': fit['r_squared'],
+                'RMSE (m/s)': fit['rmse'],
+                'Used for Prediction': grain == POOLED_MODEL_NAME or fit['n'] >= MIN_ROWS_PER_GRAIN_MODEL
+            })
+        st.dataframe(pd.DataFrame(model_rows).round(4))
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            predict_grain = st.selectbox("Grain/Seed", model_names,
+                                         key="predict_grain")
+        with col2:
+            predict_moisture = st.number_input("Moisture (% d.b.)", min_value=0.0, max_value=100.0, value=14.0,
+                                               step=0.1, key="predict_moisture")
+        with col3:
+            predict_size = st.number_input("Size (mm)", min_value=0.1, value=5.0, step=0.1, key="predict_size")
+        with col4:
+            predict_density = st.number_input("Density (kg/m³)", min_value=100.0, value=1200.0, step=10.0,
+                                              key="predict_density")
+
+        predicted_velocity, model_used = predict_terminal_velocity(st.session_state.terminal_velocity_models,
+                                                                   predict_grain, predict_moisture, predict_size,
+                                                                   predict_density)
+        st.markdown(f"**Predicted Terminal Velocity:** {float(predicted_velocity):.2f} m/s (model: {model_used})")
+
+    with tab3:
+        st.markdown("<h3 class='section-header'>Factors Affecting Terminal Velocity</h3>", unsafe_allow_html=True)
 
         st.markdown("""
         This interactive simulator demonstrates how different factors affect the terminal velocity of grains.
@@ -3285,80 +6455,156 @@ elif page == "Terminal Velocity":
             sim_shape_factor = st.slider("Shape Factor (0.5-1.0)", 0.5, 1.0, 0.8, 0.05)
 
         with col2:
-            sim_air_density = st.slider("Air Density (kg/m³)", 1.0, 1.4, 1.2, 0.05)
-            sim_air_viscosity = st.slider("Air Viscosity (×10⁻⁵ Pa·s)", 1.5, 2.5, 1.8, 0.1) * 1e-5
-            sim_drag_coefficient = st.slider("Drag Coefficient", 0.4, 1.0, 0.6, 0.05)
-
-        # Simple terminal velocity equation (simplified for demonstration)
-        # Terminal velocity = sqrt((4/3) * (g * d * ρp * shape_factor) / (CD * ρa))
-        # where g = gravity, d = diameter, ρp = particle density, ρa = air density, CD = drag coefficient
+            air_from_conditions = st.checkbox("Compute air properties from temperature, pressure and humidity")
+            if air_from_conditions:
+                sim_air_temperature = st.slider("Air Temperature (°C)", -10.0, 50.0, 25.0, 0.5)
+                sim_air_pressure = st.slider("Atmospheric Pressure (kPa)", 80.0, 110.0, 101.3, 0.1)
+                sim_air_rh = st.slider("Air Relative Humidity (%)", 0, 100, 60, 1)
+
+                sim_air = air_properties(sim_air_temperature, sim_air_pressure, sim_air_rh / 100)
+                sim_air_density = float(sim_air['density'])
+                sim_air_viscosity = float(sim_air['viscosity'])
+                st.markdown(f"**Air Density:** {sim_air_density:.4f} kg/m³ &nbsp;|&nbsp; "
+                            f"**Air Viscosity:** {sim_air_viscosity * 1e5:.3f} ×10⁻⁵ Pa·s")
+            else:
+                sim_air_density = st.slider("Air Density (kg/m³)", 1.0, 1.4, 1.2, 0.05)
+                sim_air_viscosity = st.slider("Air Viscosity (×10⁻⁵ Pa·s)", 1.5, 2.5, 1.8, 0.1) * 1e-5
+            drag_model = st.radio("Drag Model", ["Reynolds-dependent (iterative)", "Fixed drag coefficient"],
+                                  horizontal=True)
+            sim_drag_coefficient = st.slider("Drag Coefficient", 0.4, 1.0, 0.6, 0.05,
+                                             disabled=drag_model != "Fixed drag coefficient")
 
         g = 9.81  # m/s²
         d = sim_diameter / 1000  # Convert mm to m
 
-        terminal_velocity = np.sqrt((4 / 3) * (g * d * sim_density * sim_shape_factor) /
-                                    (sim_drag_coefficient * sim_air_density))
+        if drag_model == "Reynolds-dependent (iterative)":
+            # Drag coefficient and Reynolds number are solved together; the shape factor is used as sphericity
+            solution = solve_terminal_velocity(d, sim_density, sim_shape_factor, sim_air_density, sim_air_viscosity)
+            terminal_velocity = float(solution['velocity'])
+            convergence = (f"Converged in {solution['iterations']} iterations" if not solution['unconverged']
+                           else f"Not converged after {solution['iterations']} iterations")
 
-        st.markdown(f"""
-        <div class='result-box'>
-        <h3>Predicted Terminal Velocity: {terminal_velocity:.2f} m/s</h3>
-        </div>
-        """, unsafe_allow_html=True)
+            st.markdown(f"""
+            <div class='result-box'>
+            <h3>Predicted Terminal Velocity: {terminal_velocity:.2f} m/s</h3>
+            Reynolds Number: {float(solution['reynolds']):.0f} &nbsp;|&nbsp;
+            Drag Coefficient: {float(solution['drag_coefficient']):.3f} &nbsp;|&nbsp;
+            Flow Regime: {solution['regime']} &nbsp;|&nbsp;
+            {convergence}
+            </div>
+            """, unsafe_allow_html=True)
+            if solution['unconverged']:
+                st.warning(f"The iteration cap was reached with a relative change of "
+                           f"{solution['max_relative_change']:.2e}; the velocity may be inaccurate.")
+        else:
+            # Simple terminal velocity equation (simplified for demonstration)
+            # Terminal velocity = sqrt((4/3) * (g * d * ρp * shape_factor) / (CD * ρa))
+            # where g = gravity, d = diameter, ρp = particle density, ρa = air density, CD = drag coefficient
+            terminal_velocity = np.sqrt((4 / 3) * (g * d * sim_density * sim_shape_factor) /
+                                        (sim_drag_coefficient * sim_air_density))
+
+            st.markdown(f"""
+            <div class='result-box'>
+            <h3>Predicted Terminal Velocity: {terminal_velocity:.2f} m/s</h3>
+            </div>
+            """, unsafe_allow_html=True)
 
         # Create a radar chart to show the sensitivity of each parameter
         st.markdown("### Parameter Sensitivity Analysis")
 
-        # Calculate how much each parameter affects the terminal velocity
-        base_velocity = terminal_velocity
-
-        # Increase each parameter by 10% and see how it changes terminal velocity
-        density_sensitivity = (np.sqrt((4 / 3) * (g * d * (sim_density * 1.1) * sim_shape_factor) /
-                                       (sim_drag_coefficient * sim_air_density)) - base_velocity) / base_velocity * 100
-
-        diameter_sensitivity = (np.sqrt((4 / 3) * (g * (d * 1.1) * sim_density * sim_shape_factor) /
-                                        (sim_drag_coefficient * sim_air_density)) - base_velocity) / base_velocity * 100
-
-        shape_sensitivity = (np.sqrt((4 / 3) * (g * d * sim_density * (sim_shape_factor * 1.1)) /
-                                     (sim_drag_coefficient * sim_air_density)) - base_velocity) / base_velocity * 100
-
-        air_density_sensitivity = (np.sqrt((4 / 3) * (g * d * sim_density * sim_shape_factor) /
-                                           (sim_drag_coefficient * (
-                                                       sim_air_density * 1.1))) - base_velocity) / base_velocity * 100
-
-        drag_sensitivity = (np.sqrt((4 / 3) * (g * d * sim_density * sim_shape_factor) /
-                                    ((
-                                                 sim_drag_coefficient * 1.1) * sim_air_density)) - base_velocity) / base_velocity * 100
-
-        # Create bar chart for sensitivity analysis
-        sensitivity_data = {
-            'Parameter': ['Grain Density', 'Grain Diameter', 'Shape Factor', 'Air Density', 'Drag Coefficient'],
-            'Sensitivity (% change)': [
-                density_sensitivity,
-                diameter_sensitivity,
-                shape_sensitivity,
-                air_density_sensitivity,
-                drag_sensitivity
-            ]
-        }
+        if drag_model == "Reynolds-dependent (iterative)":
+            sensitivity_model = SENSITIVITY_MODELS['Terminal Velocity (Reynolds-dependent)']
+            base_values = {'particle_density': sim_density, 'diameter': sim_diameter, 'sphericity': sim_shape_factor,
+                           'air_density': sim_air_density, 'air_viscosity': sim_air_viscosity}
+        else:
+            sensitivity_model = SENSITIVITY_MODELS['Terminal Velocity (fixed drag coefficient)']
+            base_values = {'particle_density': sim_density, 'diameter': sim_diameter, 'shape_factor': sim_shape_factor,
+                           'air_density': sim_air_density, 'drag_coefficient': sim_drag_coefficient}
 
-        sensitivity_df = pd.DataFrame(sensitivity_data)
+        # Local derivatives at the current slider settings
+        sensitivity_df = local_sensitivity(sensitivity_model['function'], base_values)
+        sensitivity_df['Parameter'] = sensitivity_df['Parameter'].map(sensitivity_model['parameters'])
 
         fig, ax = plt.subplots(figsize=(10, 6))
 
         # Use different colors based on whether the effect is positive or negative
-        colors = ['green' if x > 0 else 'red' for x in sensitivity_df['Sensitivity (% change)']]
+        colors = ['green' if x > 0 else 'red' for x in sensitivity_df['Elasticity']]
 
-        ax.bar(sensitivity_df['Parameter'], sensitivity_df['Sensitivity (% change)'], color=colors)
+        ax.bar(sensitivity_df['Parameter'], sensitivity_df['Elasticity'], color=colors)
 
         ax.set_xlabel('Parameter')
-        ax.set_ylabel('% Change in Terminal Velocity for 10% Parameter Increase')
-        ax.set_title('Sensitivity Analysis of Terminal Velocity Parameters')
+        ax.set_ylabel('% Change in Terminal Velocity per 1% Parameter Change\n(local elasticity)')
+        ax.set_title('Local Sensitivity of Terminal Velocity Parameters')
         ax.grid(axis='y', linestyle='--', alpha=0.7)
 
         plt.xticks(rotation=45, ha='right')
         plt.tight_layout()
         st.pyplot(fig)
 
+        with st.expander("Global Sensitivity Analysis (Morris Screening and Sobol Indices)"):
+            st.markdown("""
+            Local derivatives only describe the current settings. Global methods vary all parameters together
+            over a range around the current settings: **Morris screening** ranks parameters by their mean absolute
+            elementary effect (μ\\*), and **Sobol indices** split the output variance into the share explained by
+            each parameter alone (S1) and including its interactions (ST).
+            """)
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                range_percent = st.slider("Parameter Range (± % of current value)", 5, 50, 20, 5)
+            with col2:
+                sobol_samples = st.selectbox("Sobol Base Samples", [256, 1024, 4096, 16384], index=1)
+            with col3:
+                morris_trajectories = st.number_input("Morris Trajectories", min_value=10, max_value=1000,
+                                                      value=100, step=10)
+
+            if st.button("Run Global Sensitivity Analysis"):
+                parameter_ranges = {name: (value * (1 - range_percent / 100), value * (1 + range_percent / 100))
+                                    for name, value in base_values.items()}
+                # Sphericity cannot exceed 1
+                if 'sphericity' in parameter_ranges:
+                    parameter_ranges['sphericity'] = (parameter_ranges['sphericity'][0],
+                                                      min(parameter_ranges['sphericity'][1], 1.0))
+
+                start_time = time.perf_counter()
+                morris_df = morris_screening(sensitivity_model['function'], parameter_ranges,
+                                             trajectories=int(morris_trajectories))
+                sobol_df = sobol_indices(sensitivity_model['function'], parameter_ranges, samples=sobol_samples)
+                analysis_time = time.perf_counter() - start_time
+
+                evaluations = int(morris_trajectories) * (len(base_values) + 1) + sobol_samples * (len(base_values) + 2)
+                st.markdown(f"**Model Evaluations:** {evaluations:,} &nbsp;|&nbsp; "
+                            f"**Analysis Time:** {analysis_time:.2f} s")
+
+                morris_df['Parameter'] = morris_df['Parameter'].map(sensitivity_model['parameters'])
+                sobol_df['Parameter'] = sobol_df['Parameter'].map(sensitivity_model['parameters'])
+                global_df = morris_df.merge(sobol_df, on='Parameter').rename(columns={
+                    'mu_star': 'Morris μ* (m/s)', 'mu': 'Morris μ (m/s)', 'sigma': 'Morris σ (m/s)'})
+                st.dataframe(global_df.round(4))
+
+                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+
+                ax1.scatter(morris_df['mu_star'], morris_df['sigma'], s=80, color='navy')
+                for name, mu_star, sigma in zip(morris_df['Parameter'], morris_df['mu_star'], morris_df['sigma']):
+                    ax1.annotate(name, (mu_star, sigma), xytext=(5, 5), textcoords='offset points')
+                ax1.set_xlabel('μ* (mean absolute elementary effect, m/s)')
+                ax1.set_ylabel('σ (spread of elementary effects, m/s)')
+                ax1.set_title('Morris Screening')
+                ax1.grid(True, linestyle='--', alpha=0.7)
+
+                x = np.arange(len(sobol_df))
+                ax2.bar(x - 0.2, sobol_df['First Order (S1)'], 0.4, label='First Order (S1)', color='skyblue')
+                ax2.bar(x + 0.2, sobol_df['Total (ST)'], 0.4, label='Total (ST)', color='orange')
+                ax2.set_xticks(x)
+                ax2.set_xticklabels(sobol_df['Parameter'], rotation=45, ha='right')
+                ax2.set_ylabel('Sobol Index')
+                ax2.set_title('Sobol Variance Decomposition')
+                ax2.grid(axis='y', linestyle='--', alpha=0.7)
+                ax2.legend()
+
+                plt.tight_layout()
+                st.pyplot(fig)
+
         st.markdown("""
         ### Theoretical Relationships
 
@@ -3387,6 +6633,414 @@ elif page == "Terminal Velocity":
         different grain shapes.
         """, unsafe_allow_html=True)
 
+        st.markdown("""
+        #### Reynolds-Dependent Model
+
+        The drag coefficient is not constant: it depends on the particle Reynolds number
+        **Re = ρ<sub>a</sub> V<sub>t</sub> d / μ**, which itself depends on V<sub>t</sub>. The iterative model solves
+
+        **V<sub>t</sub> = √[4 g d (ρ<sub>p</sub> - ρ<sub>a</sub>) / (3 C<sub>D</sub>(Re, ψ) ρ<sub>a</sub>)]**
+
+        with the Clift-Gauvin sphere drag curve (Stokes regime Re < 0.2, intermediate regime, Newton regime
+        Re > 1000) and Ganser's correction for sphericity ψ (the shape factor slider).
+        """, unsafe_allow_html=True)
+
+        # Solve terminal velocity for every kernel of a size/density distribution
+        st.markdown("### Particle Population Simulation")
+
+        st.markdown("""
+        Solve the Reynolds-dependent model for a whole population of kernels at once, using either an assumed
+        normal size/density distribution or measured kernels uploaded as CSV (columns `Size (mm)`,
+        `Density (kg/m³)` and optionally `Sphericity`). Air density and viscosity are taken from the simulator above.
+        """)
+
+        population_source = st.radio("Kernel Data Source", ["Normal distribution", "Upload measured kernels (CSV)"],
+                                     horizontal=True)
+
+        population_data = None
+        if population_source == "Normal distribution":
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                pop_size_mean = st.number_input("Mean Size (mm)", min_value=0.1, value=4.0, step=0.1)
+                pop_size_sd = st.number_input("Size Standard Deviation (mm)", min_value=0.0, value=0.6, step=0.1)
+            with col2:
+                pop_density_mean = st.number_input("Mean Density (kg/m³)", min_value=100.0, value=1250.0, step=10.0)
+                pop_density_sd = st.number_input("Density Standard Deviation (kg/m³)", min_value=0.0, value=60.0,
+                                                 step=5.0)
+            with col3:
+                pop_count = st.number_input("Number of Kernels", min_value=100, max_value=500000, value=100000,
+                                            step=10000)
+                pop_sphericity = st.slider("Sphericity", 0.5, 1.0, sim_shape_factor, 0.05, key="pop_sphericity")
+
+            rng = np.random.default_rng(42)
+            population_data = pd.DataFrame({
+                'Size (mm)': np.clip(rng.normal(pop_size_mean, pop_size_sd, int(pop_count)), 0.05, None),
+                'Density (kg/m³)': np.clip(rng.normal(pop_density_mean, pop_density_sd, int(pop_count)), 50, None),
+                'Sphericity': pop_sphericity
+            })
+        else:
+            uploaded_kernels = st.file_uploader("Upload Kernel Measurements (CSV)", type=["csv"])
+            if uploaded_kernels is not None:
+                population_data = pd.read_csv(uploaded_kernels)
+                if not {'Size (mm)', 'Density (kg/m³)'}.issubset(population_data.columns):
+                    st.error("The CSV file must contain 'Size (mm)' and 'Density (kg/m³)' columns.")
+                    population_data = None
+                elif 'Sphericity' not in population_data.columns:
+                    population_data['Sphericity'] = sim_shape_factor
+
+        if population_data is not None and st.button("Solve Population"):
+            start_time = time.perf_counter()
+            population_solution = solve_terminal_velocity(population_data['Size (mm)'].to_numpy() / 1000,
+                                                          population_data['Density (kg/m³)'].to_numpy(),
+                                                          population_data['Sphericity'].to_numpy(),
+                                                          sim_air_density, sim_air_viscosity)
+            solve_time = time.perf_counter() - start_time
+
+            velocities = population_solution['velocity']
+            population_data = population_data.assign(**{'Terminal Velocity (m/s)': velocities})
+            # Keep the solved population for the aspirator separation predictor
+            st.session_state.tv_population_velocities = velocities
+
+            st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+            st.markdown("### Population Results")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown(f"**Kernels Solved:** {len(velocities):,}")
+                st.markdown(f"**Solve Time:** {solve_time * 1000:.1f} ms")
+            with col2:
+                st.markdown(f"**Iterations:** {population_solution['iterations']}")
+                st.markdown(f"**Unconverged Kernels:** {population_solution['unconverged']}")
+            with col3:
+                st.markdown(f"**Max Relative Change:** {population_solution['max_relative_change']:.2e}")
+                st.markdown(f"**Max Residual:** {population_solution['max_residual']:.2e}")
+            if population_solution['unconverged']:
+                st.warning(f"{population_solution['unconverged']:,} kernels did not converge within the "
+                           "iteration cap; their velocities may be inaccurate.")
+
+            percentiles = np.percentile(velocities, [5, 50, 95])
+            st.table(pd.DataFrame({
+                'Statistic': ['Mean', 'Standard Deviation', '5th Percentile', 'Median', '95th Percentile'],
+                'Terminal Velocity (m/s)': np.round([velocities.mean(), velocities.std(), *percentiles], 3)
+            }))
+
+            regimes, regime_counts = np.unique(population_solution['regime'], return_counts=True)
+            st.table(pd.DataFrame({
+                'Flow Regime': regimes,
+                'Kernels': regime_counts,
+                'Share (%)': np.round(regime_counts / len(velocities) * 100, 1)
+            }))
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+
+            ax1.hist(velocities, bins=60, color='skyblue', edgecolor='navy')
+            ax1.axvline(x=velocities.mean(), color='red', linestyle='--',
+                        label=f'Mean: {velocities.mean():.2f} m/s')
+            ax1.set_xlabel('Terminal Velocity (m/s)')
+            ax1.set_ylabel('Number of Kernels')
+            ax1.set_title('Terminal Velocity Distribution')
+            ax1.grid(axis='y', linestyle='--', alpha=0.7)
+            ax1.legend()
+
+            scatter, aggregated = plot_aggregated_scatter(ax2, population_data, 'Size (mm)', 'Terminal Velocity (m/s)',
+                                                          color_column='Density (kg/m³)', cmap='viridis',
+                                                          s=20, alpha=0.6)
+            cbar = plt.colorbar(scatter, ax=ax2)
+            cbar.set_label('Mean Density (kg/m³) per bin' if aggregated else 'Density (kg/m³)')
+            ax2.set_xlabel('Size (mm)')
+            ax2.set_ylabel('Terminal Velocity (m/s)')
+            ax2.set_title('Terminal Velocity vs Kernel Size')
+            ax2.grid(True, linestyle='--', alpha=0.7)
+
+            plt.tight_layout()
+            st.pyplot(fig)
+
+    with tab4:
+        st.markdown("<h3 class='section-header'>Aspirator Separation Predictor</h3>", unsafe_allow_html=True)
+
+        st.markdown("""
+        Predict how an aspirator separates light impurities from grain. Terminal velocities of grain and of each
+        impurity are sampled for a large number of particles, and each particle is lifted out when the turbulent
+        local air speed exceeds its terminal velocity. The curves show, for every air speed, the grain lost to
+        the impurity outlet and the impurities carried over with the cleaned grain.
+        """)
+
+        grain_sources = ["Normal distribution", "Upload measured velocities (CSV)"]
+        if 'tv_population_velocities' in st.session_state:
+            grain_sources.append("Simulated kernel population")
+        grain_source = st.radio("Grain Velocity Distribution", grain_sources, horizontal=True)
+
+        grain_distribution = None
+        if grain_source == "Normal distribution":
+            col1, col2 = st.columns(2)
+            with col1:
+                grain_vt_mean = st.number_input("Grain Mean Terminal Velocity (m/s)", min_value=0.1, value=9.5,
+                                                step=0.1)
+            with col2:
+                grain_vt_sd = st.number_input("Grain Terminal Velocity Standard Deviation (m/s)", min_value=0.0,
+                                              value=0.8, step=0.1)
+            grain_distribution = (grain_vt_mean, grain_vt_sd)
+        elif grain_source == "Simulated kernel population":
+            grain_distribution = st.session_state.tv_population_velocities
+            st.info(f"Using {len(grain_distribution):,} kernels from the population simulation "
+                    f"(mean {grain_distribution.mean():.2f} m/s).")
+        else:
+            uploaded_grain = st.file_uploader("Upload Grain Velocities (CSV with 'Terminal Velocity (m/s)' column)",
+                                              type=["csv"], key="aspirator_grain_csv")
+            if uploaded_grain is not None:
+                grain_csv = pd.read_csv(uploaded_grain)
+                if 'Terminal Velocity (m/s)' in grain_csv.columns:
+                    grain_distribution = grain_csv['Terminal Velocity (m/s)'].dropna().to_numpy()
+                else:
+                    st.error("The CSV file must contain a 'Terminal Velocity (m/s)' column.")
+
+        st.markdown("#### Impurities in the Feed")
+        impurity_table = st.data_editor(pd.DataFrame({
+            'Component': list(IMPURITY_VELOCITY_DEFAULTS),
+            'Mass Fraction in Feed (%)': [4.0, 1.0, 3.0, 2.0],
+            'Mean Terminal Velocity (m/s)': [mean for mean, _ in IMPURITY_VELOCITY_DEFAULTS.values()],
+            'Standard Deviation (m/s)': [std for _, std in IMPURITY_VELOCITY_DEFAULTS.values()]
+        }), num_rows="dynamic", key="aspirator_impurities")
+
+        uploaded_impurities = st.file_uploader(
+            "Optional: measured impurity velocities (CSV with 'Component' and 'Terminal Velocity (m/s)' columns)",
+            type=["csv"], key="aspirator_impurity_csv")
+
+        impurity_table = impurity_table.dropna()
+        impurity_distributions = {row['Component']: (row['Mean Terminal Velocity (m/s)'],
+                                                     row['Standard Deviation (m/s)'])
+                                  for _, row in impurity_table.iterrows()}
+        impurity_fractions = dict(zip(impurity_table['Component'], impurity_table['Mass Fraction in Feed (%)'] / 100))
+        if uploaded_impurities is not None:
+            impurity_csv = pd.read_csv(uploaded_impurities)
+            if {'Component', 'Terminal Velocity (m/s)'}.issubset(impurity_csv.columns):
+                for name, group in impurity_csv.groupby('Component'):
+                    if name in impurity_distributions:
+                        impurity_distributions[name] = group['Terminal Velocity (m/s)'].dropna().to_numpy()
+            else:
+                st.error("The CSV file must contain 'Component' and 'Terminal Velocity (m/s)' columns.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            aspirator_speed = st.slider("Aspirator Air Speed (m/s)", 0.5, 20.0, 6.0, 0.1)
+        with col2:
+            turbulence_intensity = st.slider("Turbulence Intensity (%)", 0.0, 30.0, 10.0, 1.0)
+        with col3:
+            mc_particles = st.number_input("Particles per Component", min_value=10000, max_value=5000000,
+                                           value=1000000, step=100000)
+
+        if sum(impurity_fractions.values()) >= 1:
+            st.error("Impurity mass fractions must add up to less than 100%.")
+        elif grain_distribution is not None and st.button("Predict Separation"):
+            air_speeds = np.round(np.arange(0.2, 20.01, 0.05), 2)
+            start_time = time.perf_counter()
+            curves = aspirator_separation_curves(grain_distribution, impurity_distributions, impurity_fractions,
+                                                 air_speeds, int(mc_particles), turbulence_intensity / 100)
+            run_time = time.perf_counter() - start_time
+            best_speed, equal_error_speed = separation_cut_velocity(curves)
+            operating = curves.iloc[np.abs(curves['Air Speed (m/s)'].to_numpy() - aspirator_speed).argmin()]
+
+            st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+            st.markdown("### Separation Results")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown(f"**Cut Velocity (least misplaced material):** {best_speed:.2f} m/s")
+                st.markdown(f"**Equal-Error Air Speed:** {equal_error_speed:.2f} m/s")
+                st.markdown(f"**Particles Simulated:** {int(mc_particles) * (1 + len(impurity_distributions)):,} "
+                            f"in {run_time:.2f} s")
+            with col2:
+                st.markdown(f"**Grain Loss at {aspirator_speed:.1f} m/s:** {operating['Grain Loss (%)']:.2f}%")
+                st.markdown(f"**Impurity Carry-over at {aspirator_speed:.1f} m/s:** "
+                            f"{operating['Impurity Carry-over (%)']:.2f}%")
+                st.markdown(f"**Cleaned Grain Purity:** {operating['Cleaned Grain Purity (%)']:.2f}%")
+
+            st.table(pd.DataFrame({
+                'Component': list(impurity_distributions),
+                'Mass Fraction in Feed (%)': [impurity_fractions[name] * 100 for name in impurity_distributions],
+                'Carry-over (%)': [round(operating[f'{name} Carry-over (%)'], 2) for name in impurity_distributions],
+                'Removed (%)': [round(100 - operating[f'{name} Carry-over (%)'], 2) for name in impurity_distributions]
+            }))
+            st.markdown("</div>", unsafe_allow_html=True)
+
+            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+
+            rng = np.random.default_rng(1)
+            velocity_axis = np.linspace(0, 20, 400)
+            components = {'Grain': grain_distribution, **impurity_distributions}
+            for name, distribution in components.items():
+                sample = sample_terminal_velocities(distribution, 20000, rng)
+                ax1.hist(sample, bins=80, range=(0, 20), density=True, alpha=0.5, label=name)
+            lift_probability = aspirator_partition_curve(velocity_axis, aspirator_speed, turbulence_intensity / 100)
+            ax1.plot(velocity_axis, lift_probability, 'k--', label='Probability of being lifted')
+            ax1.axvline(x=aspirator_speed, color='red', linestyle=':', label=f'Air speed: {aspirator_speed:.1f} m/s')
+            ax1.set_xlabel('Terminal Velocity (m/s)')
+            ax1.set_ylabel('Probability Density / Probability')
+            ax1.set_title('Terminal Velocity Distributions')
+            ax1.grid(True, linestyle='--', alpha=0.7)
+            ax1.legend(fontsize=8)
+
+            ax2.plot(curves['Air Speed (m/s)'], curves['Grain Loss (%)'], 'b-', linewidth=2, label='Grain loss')
+            ax2.plot(curves['Air Speed (m/s)'], curves['Impurity Carry-over (%)'], 'r-', linewidth=2,
+                     label='Impurity carry-over')
+            ax2.plot(curves['Air Speed (m/s)'], curves['Misplaced Material (%)'], 'g--',
+                     label='Misplaced material (% of feed)')
+            ax2.axvline(x=best_speed, color='green', linestyle=':', label=f'Cut velocity: {best_speed:.2f} m/s')
+            ax2.axvline(x=aspirator_speed, color='red', linestyle=':', label='Operating air speed')
+            ax2.set_xlabel('Aspirator Air Speed (m/s)')
+            ax2.set_ylabel('Percentage (%)')
+            ax2.set_title('Separation Curves')
+            ax2.grid(True, linestyle='--', alpha=0.7)
+            ax2.legend(fontsize=8)
+
+            plt.tight_layout()
+            st.pyplot(fig)
+
+            with st.expander("Separation Curve Data"):
+                st.dataframe(curves)
+
+    with tab5:
+        st.markdown("<h3 class='section-header'>Dilute-Phase Pneumatic Conveying Design</h3>", unsafe_allow_html=True)
+
+        st.markdown("""
+        Size a dilute-phase pneumatic conveying line from the grain's terminal velocity. The pickup (saltation)
+        velocity for horizontal runs follows the Rizk correlation and the saturation (choking) velocity for vertical
+        runs follows the Yang correlation. Pipeline pressure drop is summed over the acceleration zone, horizontal
+        and vertical runs and bends, and the blower power is the air flow times pressure drop over blower efficiency.
+        """)
+
+        default_conveying_velocity = st.session_state.get('last_terminal_velocity', 9.5)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown("#### Material")
+            conveying_rate = st.number_input("Solids Conveying Rate (t/h)", min_value=0.1, value=3.6, step=0.1)
+            conveying_vt = st.number_input("Grain Terminal Velocity (m/s)", min_value=0.1,
+                                           value=float(default_conveying_velocity), step=0.1)
+            conveying_particle_size = st.number_input("Equivalent Particle Diameter (mm)", min_value=0.1, value=4.0,
+                                                      step=0.1)
+            conveying_particle_density = st.number_input("Particle Density (kg/m³)", min_value=100.0, value=1250.0,
+                                                         step=10.0)
+        with col2:
+            st.markdown("#### Pipeline")
+            pipeline = st.data_editor(pd.DataFrame({
+                'Segment Type': ['Horizontal', 'Bend', 'Vertical', 'Bend', 'Horizontal'],
+                'Length (m)': [30.0, 0.0, 10.0, 0.0, 15.0]
+            }), num_rows="dynamic", key="conveying_pipeline", column_config={
+                'Segment Type': st.column_config.SelectboxColumn(options=['Horizontal', 'Vertical', 'Bend'],
+                                                                 required=True)
+            })
+            bend_loss_factor = st.number_input("Bend Loss Factor (B)", min_value=0.0, value=1.0, step=0.1)
+        with col3:
+            st.markdown("#### Air and Blower")
+            conveying_air_temp = st.number_input("Conveying Air Temperature (°C)", min_value=-10.0, max_value=80.0,
+                                                 value=30.0, step=1.0)
+            conveying_air_pressure = st.number_input("Conveying Air Pressure (kPa)", min_value=80.0,
+                                                     max_value=200.0, value=101.3, step=0.1)
+            blower_efficiency = st.slider("Blower Efficiency (%)", 30, 90, 60, 1)
+            velocity_safety_factor = st.slider("Velocity Safety Factor", 1.0, 2.0, 1.3, 0.05)
+
+        conveying_air = air_properties(conveying_air_temp, conveying_air_pressure, 0.5)
+        conveying_air_density = float(conveying_air['density'])
+        conveying_air_viscosity = float(conveying_air['viscosity'])
+        solids_rate = float(convert_units(conveying_rate, "tonnes/h", "kg/s"))
+        particle_diameter_m = float(convert_units(conveying_particle_size, "mm", "m"))
+        segment_lengths = pipeline.dropna().groupby('Segment Type')['Length (m)']
+        horizontal_length = segment_lengths.sum().get('Horizontal', 0.0)
+        vertical_length = segment_lengths.sum().get('Vertical', 0.0)
+        bend_count = segment_lengths.count().get('Bend', 0)
+
+        st.markdown("#### Single Design Check")
+        col1, col2 = st.columns(2)
+        with col1:
+            design_pipe_diameter = st.selectbox("Pipe Diameter (mm)", STANDARD_PIPE_DIAMETERS_MM, index=3)
+        with col2:
+            design_air_velocity = st.slider("Conveying Air Velocity (m/s)", 5.0, 45.0, 22.0, 0.5)
+
+        pipe_diameter_m = float(convert_units(design_pipe_diameter, "mm", "m"))
+        pickup_velocity = float(saltation_velocity(solids_rate, pipe_diameter_m, particle_diameter_m,
+                                                   conveying_air_density))
+        saturation_velocity = float(choking_velocity(solids_rate, pipe_diameter_m, conveying_vt,
+                                                     conveying_particle_density, conveying_air_density))
+        design = pneumatic_conveying_pressure_drop(solids_rate, design_air_velocity, pipe_diameter_m,
+                                                   particle_diameter_m, conveying_particle_density, conveying_vt,
+                                                   horizontal_length, vertical_length, bend_count,
+                                                   conveying_air_density, conveying_air_viscosity, bend_loss_factor)
+        design_air_flow = design_air_velocity * np.pi * pipe_diameter_m ** 2 / 4
+        design_power = design_air_flow * float(design['total']) / (blower_efficiency / 100)
+
+        st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"**Pickup (Saltation) Velocity:** {pickup_velocity:.2f} m/s")
+            st.markdown(f"**Saturation (Choking) Velocity:** {saturation_velocity:.2f} m/s")
+            st.markdown(f"**Minimum Design Velocity:** "
+                        f"{max(pickup_velocity, saturation_velocity) * velocity_safety_factor:.2f} m/s")
+            st.markdown(f"**Solids Loading Ratio:** {float(design['loading_ratio']):.2f} kg solids/kg air")
+        with col2:
+            st.markdown(f"**Air Flow:** {design_air_flow * 60:.2f} m³/min")
+            st.markdown(f"**Total Pressure Drop:** {float(design['total']) / 1000:.2f} kPa")
+            st.markdown(f"**Blower Power:** {design_power / 1000:.2f} kW")
+            st.markdown(f"**Specific Energy:** {design_power / 1000 / conveying_rate:.2f} kWh/t")
+
+        if design_air_velocity < max(pickup_velocity, saturation_velocity) * velocity_safety_factor:
+            st.warning("The air velocity is below the minimum design velocity; the line may settle or choke.")
+
+        st.table(pd.DataFrame({
+            'Segment': ['Acceleration at feed point', f'Horizontal ({horizontal_length:.1f} m)',
+                        f'Vertical ({vertical_length:.1f} m)', f'Bends ({bend_count})'],
+            'Pressure Drop (kPa)': np.round([float(design[key]) / 1000
+                                             for key in ['acceleration', 'horizontal', 'vertical', 'bends']], 3)
+        }))
+        st.markdown("</div>", unsafe_allow_html=True)
+
+        st.markdown("#### Minimum-Energy Design Sweep")
+        if st.button("Find Minimum-Energy Design"):
+            sweep_velocities = np.arange(8.0, 45.01, 0.25)
+            sweep = pneumatic_conveying_sweep(solids_rate, convert_units(STANDARD_PIPE_DIAMETERS_MM, "mm", "m"),
+                                              sweep_velocities, particle_diameter_m, conveying_particle_density,
+                                              conveying_vt, horizontal_length, vertical_length, bend_count,
+                                              conveying_air_density, conveying_air_viscosity, bend_loss_factor,
+                                              velocity_safety_factor, blower_efficiency / 100)
+            feasible = sweep[sweep['Feasible']]
+
+            if feasible.empty:
+                st.error("No pipe diameter and air velocity combination meets the velocity, loading and pressure "
+                         "limits. Try a lower conveying rate or a shorter pipeline.")
+            else:
+                best = feasible.loc[feasible['Blower Power (kW)'].idxmin()]
+                st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                st.markdown("### Minimum-Energy Design")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown(f"**Pipe Diameter:** {best['Pipe Diameter (mm)']:.0f} mm")
+                    st.markdown(f"**Air Velocity:** {best['Air Velocity (m/s)']:.2f} m/s")
+                    st.markdown(f"**Solids Loading Ratio:** {best['Solids Loading Ratio']:.2f}")
+                with col2:
+                    st.markdown(f"**Pressure Drop:** {best['Pressure Drop (kPa)']:.2f} kPa")
+                    st.markdown(f"**Blower Power:** {best['Blower Power (kW)']:.2f} kW")
+                    st.markdown(f"**Specific Energy:** {best['Specific Energy (kWh/t)']:.2f} kWh/t")
+                st.markdown("</div>", unsafe_allow_html=True)
+
+                fig, ax = plt.subplots(figsize=(10, 6))
+                for diameter, group in sweep.groupby('Pipe Diameter (mm)'):
+                    group_feasible = group[group['Feasible']]
+                    if not group_feasible.empty:
+                        ax.plot(group_feasible['Air Velocity (m/s)'], group_feasible['Blower Power (kW)'],
+                                label=f'{diameter:.0f} mm')
+                ax.plot(best['Air Velocity (m/s)'], best['Blower Power (kW)'], 'r*', markersize=15,
+                        label='Minimum energy')
+                ax.set_xlabel('Air Velocity (m/s)')
+                ax.set_ylabel('Blower Power (kW)')
+                ax.set_title('Blower Power of Feasible Designs')
+                ax.grid(True, linestyle='--', alpha=0.7)
+                ax.legend(title='Pipe Diameter')
+                plt.tight_layout()
+                st.pyplot(fig)
+
+                st.dataframe(feasible.loc[feasible.groupby('Pipe Diameter (mm)')['Blower Power (kW)'].idxmin()])
+
     # Comprehensive data table
     st.markdown("<h3 class='section-header'>Typical Terminal Velocities Reference</h3>", unsafe_allow_html=True)
 
@@ -3517,7 +7171,8 @@ elif page == "Screen Cleaner Evaluation":
                  caption="Fig. Screen Cleaner/Grader Mechanism")
 
     # Create tabs for different calculations
-    tab1, tab2, tab3 = st.tabs(["Cleaning Effectiveness", "Grading Effectiveness", "Data Visualization"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Cleaning Effectiveness", "Grading Effectiveness", "Data Visualization",
+                                      "Screening Simulator"])
 
     with tab1:
         st.markdown("<h3 class='section-header'>Cleaning Effectiveness Calculator</h3>", unsafe_allow_html=True)
@@ -3529,90 +7184,153 @@ elif page == "Screen Cleaner Evaluation":
         Enter your experimental data below:
         """)
 
-        with st.form("cleaning_effectiveness_form"):
-            st.markdown("### Feed Material Samples")
-
-            # Create a table-like interface for feed samples
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                feed_sample1_total = st.number_input("Feed Sample 1 - Total (g)", min_value=0.0, value=50.0, step=0.1)
-                feed_sample1_good = st.number_input("Feed Sample 1 - Good Grains (g)", min_value=0.0, value=40.0,
-                                                    step=0.1)
-
-            with col2:
-                feed_sample2_total = st.number_input("Feed Sample 2 - Total (g)", min_value=0.0, value=50.0, step=0.1)
-                feed_sample2_good = st.number_input("Feed Sample 2 - Good Grains (g)", min_value=0.0, value=38.0,
-                                                    step=0.1)
-
-            with col3:
-                feed_sample3_total = st.number_input("Feed Sample 3 - Total (g)", min_value=0.0, value=50.0, step=0.1)
-                feed_sample3_good = st.number_input("Feed Sample 3 - Good Grains (g)", min_value=0.0, value=42.0,
-                                                    step=0.1)
+        with st.expander("Aspirator Air Setting from Terminal Velocity Models", expanded=False):
+            st.markdown("""
+            Estimate the aspirator air speed for this grain lot from the fitted terminal velocity models
+            (Terminal Velocity page, Comparative Analysis). The setting is the cut velocity that misplaces the least
+            material, assuming typical chaff, dust, shrivelled kernel and straw impurities.
+            """)
 
-            st.markdown("### Good Grain Outlet Samples")
+            if 'terminal_velocity_models' not in st.session_state:
+                st.session_state.terminal_velocity_models = update_terminal_velocity_models(
+                    {}, initial_terminal_velocity_log())
 
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                good_sample1_total = st.number_input("Good Outlet Sample 1 - Total (g)", min_value=0.0, value=50.0,
-                                                     step=0.1)
-                good_sample1_good = st.number_input("Good Outlet Sample 1 - Good Grains (g)", min_value=0.0, value=48.0,
-                                                    step=0.1)
-
+                aspirator_grain = st.selectbox("Grain", list(st.session_state.terminal_velocity_models),
+                                               key="aspirator_grain")
             with col2:
-                good_sample2_total = st.number_input("Good Outlet Sample 2 - Total (g)", min_value=0.0, value=50.0,
-                                                     step=0.1)
-                good_sample2_good = st.number_input("Good Outlet Sample 2 - Good Grains (g)", min_value=0.0, value=49.0,
-                                                    step=0.1)
-
+                aspirator_moisture = st.number_input("Moisture (% d.b.)", min_value=0.0, max_value=100.0,
+                                                     value=14.0, step=0.1, key="aspirator_moisture")
             with col3:
-                good_sample3_total = st.number_input("Good Outlet Sample 3 - Total (g)", min_value=0.0, value=50.0,
-                                                     step=0.1)
-                good_sample3_good = st.number_input("Good Outlet Sample 3 - Good Grains (g)", min_value=0.0, value=47.5,
-                                                    step=0.1)
-
-            st.markdown("### Chaff/Impurity Outlet Samples")
-
-            col1, col2, col3 = st.columns(3)
+                aspirator_size = st.number_input("Size (mm)", min_value=0.1, value=4.0, step=0.1,
+                                                 key="aspirator_size")
+            with col4:
+                aspirator_density = st.number_input("Density (kg/m³)", min_value=100.0, value=1250.0, step=10.0,
+                                                    key="aspirator_density")
+
+            lot_velocity, lot_model = predict_terminal_velocity(st.session_state.terminal_velocity_models,
+                                                                aspirator_grain, aspirator_moisture, aspirator_size,
+                                                                aspirator_density)
+            lot_velocity = float(lot_velocity)
+            lot_spread = max(terminal_velocity_model_fit(st.session_state.terminal_velocity_models[lot_model])['rmse'],
+                             0.05 * lot_velocity)
+
+            if lot_velocity <= 0:
+                st.error("The fitted model gives no valid terminal velocity for these inputs.")
+            else:
+                lot_curves = aspirator_separation_curves((lot_velocity, lot_spread), IMPURITY_VELOCITY_DEFAULTS,
+                                                         {'Chaff': 0.04, 'Dust': 0.01, 'Shrivelled kernels': 0.03,
+                                                          'Straw pieces': 0.02},
+                                                         np.round(np.arange(0.2, 20.01, 0.05), 2), 200000)
+                lot_setting, _ = separation_cut_velocity(lot_curves)
+                lot_operating = lot_curves.loc[lot_curves['Air Speed (m/s)'] == lot_setting].iloc[0]
+
+                st.markdown(f"**Predicted Grain Terminal Velocity:** {lot_velocity:.2f} ± {lot_spread:.2f} m/s "
+                            f"(model: {lot_model})")
+                st.markdown(f"**Recommended Aspirator Air Speed:** {lot_setting:.2f} m/s")
+                st.markdown(f"**Expected Grain Loss:** {lot_operating['Grain Loss (%)']:.2f}% &nbsp;|&nbsp; "
+                            f"**Expected Impurity Carry-over:** {lot_operating['Impurity Carry-over (%)']:.2f}%")
+
+        cleaning_input_method = st.radio("Sample Data Source", ["Sample table", "Upload CSV"], horizontal=True,
+                                         key="cleaning_input_method")
+
+        if cleaning_input_method == "Sample table":
+            st.markdown("""
+            Enter one row per weighed sample. Add as many samples per stream as were taken, and use the `Run`
+            column to evaluate several test runs together.
+            """)
+            cleaning_samples = st.data_editor(pd.DataFrame({
+                'Run': ['Run 1'] * 9,
+                'Stream': [stream for stream in CLEANING_STREAMS for _ in range(3)],
+                'Total (g)': [50.0] * 9,
+                'Good Grains (g)': [40.0, 38.0, 42.0, 48.0, 49.0, 47.5, 5.0, 4.5, 6.0]
+            }), num_rows="dynamic", key="cleaning_samples", column_config={
+                'Stream': st.column_config.SelectboxColumn(options=list(CLEANING_STREAMS), required=True)
+            })
+        else:
+            uploaded_cleaning = st.file_uploader(
+                "Upload Samples (CSV with 'Run', 'Stream', 'Total (g)' and 'Good Grains (g)' columns)", type=["csv"],
+                key="cleaning_samples_csv")
+            cleaning_samples = pd.read_csv(uploaded_cleaning) if uploaded_cleaning is not None else None
+
+        cleaning_missing = ({'Run', 'Stream', 'Total (g)', 'Good Grains (g)'} - set(cleaning_samples.columns)
+                            if cleaning_samples is not None else set())
+        if cleaning_missing:
+            st.error(f"The sample data is missing columns: {', '.join(sorted(cleaning_missing))}")
+        cleaning_problems = (separation_sample_problems(cleaning_samples, CLEANING_STREAMS, 'Good Grains (g)')
+                             if cleaning_samples is not None and not cleaning_missing else [])
+        for problem in cleaning_problems:
+            st.error(problem)
+
+        st.markdown("#### Mass-Balance Reconciliation")
+        reconcile_cleaning = st.checkbox("Reconcile with measured stream masses so that A = B + C holds",
+                                         key="reconcile_cleaning")
+        if reconcile_cleaning:
+            st.markdown("""
+            Enter the total mass collected from each stream in every run. Stream masses and fractions are adjusted
+            by weighted least squares so that both the total and the desired-material balances close, and the
+            effectiveness is computed from the reconciled values.
+            """)
+            cleaning_stream_masses = st.data_editor(pd.DataFrame({
+                'Run': ['Run 1'], 'Feed Mass (kg)': [10.0], 'Good Outlet Mass (kg)': [8.2],
+                'Chaff Outlet Mass (kg)': [1.7]
+            }), num_rows="dynamic", key="cleaning_stream_masses")
+            col1, col2 = st.columns(2)
             with col1:
-                chaff_sample1_total = st.number_input("Chaff Outlet Sample 1 - Total (g)", min_value=0.0, value=50.0,
-                                                      step=0.1)
-                chaff_sample1_good = st.number_input("Chaff Outlet Sample 1 - Good Grains (g)", min_value=0.0,
-                                                     value=5.0, step=0.1)
-
+                cleaning_mass_error = st.number_input("Stream Mass Uncertainty (% of reading)", min_value=0.01,
+                                                      value=1.0, step=0.1, key="cleaning_mass_error")
             with col2:
-                chaff_sample2_total = st.number_input("Chaff Outlet Sample 2 - Total (g)", min_value=0.0, value=50.0,
-                                                      step=0.1)
-                chaff_sample2_good = st.number_input("Chaff Outlet Sample 2 - Good Grains (g)", min_value=0.0,
-                                                     value=4.5, step=0.1)
-
-            with col3:
-                chaff_sample3_total = st.number_input("Chaff Outlet Sample 3 - Total (g)", min_value=0.0, value=50.0,
-                                                      step=0.1)
-                chaff_sample3_good = st.number_input("Chaff Outlet Sample 3 - Good Grains (g)", min_value=0.0,
-                                                     value=6.0, step=0.1)
-
-            calculate_button = st.form_submit_button("Calculate Cleaning Effectiveness")
-
-        if calculate_button:
-            # Calculate average values
-            feed_total_avg = (feed_sample1_total + feed_sample2_total + feed_sample3_total) / 3
-            feed_good_avg = (feed_sample1_good + feed_sample2_good + feed_sample3_good) / 3
-
-            good_total_avg = (good_sample1_total + good_sample2_total + good_sample3_total) / 3
-            good_good_avg = (good_sample1_good + good_sample2_good + good_sample3_good) / 3
-
-            chaff_total_avg = (chaff_sample1_total + chaff_sample2_total + chaff_sample3_total) / 3
-            chaff_good_avg = (chaff_sample1_good + chaff_sample2_good + chaff_sample3_good) / 3
-
-            # Calculate mass fractions
-            X = feed_good_avg / feed_total_avg  # Mass fraction of good grains in feed
-            Y = good_good_avg / good_total_avg  # Mass fraction of good grains in good outlet
-            Z = chaff_good_avg / chaff_total_avg  # Mass fraction of good grains in chaff outlet
-
-            # Calculate effectiveness
-            Eg = (Y * (X - Z)) / (X * (Y - Z))  # Effectiveness with reference to good grains
-            Ec = ((Y - X) * (1 - Z)) / ((Y - Z) * (1 - X))  # Effectiveness with reference to chaff
-            Ecl = Eg * Ec  # Overall effectiveness of cleaning
+                cleaning_fraction_error = st.number_input("Minimum Fraction Uncertainty", min_value=0.0001,
+                                                          value=0.005, step=0.001, format="%.4f",
+                                                          key="cleaning_fraction_error")
+
+        calculate_button = st.button("Calculate Cleaning Effectiveness")
+
+        if calculate_button and cleaning_samples is not None and not cleaning_missing and not cleaning_problems:
+            cleaning_results = evaluate_separation_samples(cleaning_samples, CLEANING_STREAMS, 'Good Grains (g)')
+            if reconcile_cleaning:
+                reconciled_results = reconcile_separation_results(cleaning_results, cleaning_stream_masses,
+                                                                  CLEANING_STREAMS, cleaning_mass_error / 100,
+                                                                  cleaning_fraction_error)
+                if reconciled_results.empty:
+                    st.error("No run has both sample data and stream masses; check the Run names in both tables. "
+                             "Showing the unreconciled results.")
+                    reconcile_cleaning = False
+                else:
+                    cleaning_results = reconciled_results
+            cleaning_results = cleaning_results.rename(columns={
+                'E accepted Measured': 'Eg Measured', 'E rejected Measured': 'Ec Measured',
+                'E overall Measured': 'Ecl Measured',
+                'E accepted': 'Eg', 'E accepted SE': 'Eg SE', 'E rejected': 'Ec', 'E rejected SE': 'Ec SE',
+                'E overall': 'Ecl', 'E overall SE': 'Ecl SE'
+            })
+            st.session_state.cleaning_results = cleaning_results
+
+            if reconcile_cleaning:
+                st.markdown("### Mass-Balance Reconciliation")
+                gross_errors = int(cleaning_results['Gross Error'].sum())
+                if gross_errors:
+                    st.warning(f"{gross_errors} of {len(cleaning_results)} runs fail the global test (95% confidence): "
+                               f"the measurements contain a gross error that reconciliation cannot explain by noise.")
+                else:
+                    st.success(f"All {len(cleaning_results)} runs pass the global mass-balance test (95% confidence).")
+                st.dataframe(cleaning_results[['Run', 'Total Imbalance (kg)', 'Desired Material Imbalance (kg)',
+                                               'X Measured', 'X', 'Y Measured', 'Y', 'Z Measured', 'Z',
+                                               'Ecl Measured', 'Ecl', 'Global Test (χ²)', 'Gross Error',
+                                               'Suspect Measurements']].round(4))
+
+            # Headline values: the single run, or the mean over all runs
+            X, Y, Z, Eg, Ec, Ecl = cleaning_results[['X', 'Y', 'Z', 'Eg', 'Ec', 'Ecl']].mean()
+            if len(cleaning_results) == 1:
+                spread = cleaning_results.iloc[0]
+                fraction_spread = 'SE' if reconcile_cleaning else 'SD'
+                spread_labels = {key: f" ± {spread[f'{key} {fraction_spread}']:.4f}" for key in ['X', 'Y', 'Z']}
+                spread_labels.update({key: f" ± {spread[f'{key} SE']:.4f}" for key in ['Eg', 'Ec', 'Ecl']})
+            else:
+                spread = cleaning_results[['X', 'Y', 'Z', 'Eg', 'Ec', 'Ecl']].std()
+                spread_labels = {key: f" ± {spread[key]:.4f} (mean ± SD of {len(cleaning_results)} runs)"
+                                 for key in ['X', 'Y', 'Z', 'Eg', 'Ec', 'Ecl']}
 
             # Display results
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
@@ -3620,20 +7338,20 @@ elif page == "Screen Cleaner Evaluation":
             st.markdown("### Mass Fraction Results")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.markdown(f"**X (Feed):** {X:.4f}")
+                st.markdown(f"**X (Feed):** {X:.4f}{spread_labels['X']}")
             with col2:
-                st.markdown(f"**Y (Good Outlet):** {Y:.4f}")
+                st.markdown(f"**Y (Good Outlet):** {Y:.4f}{spread_labels['Y']}")
             with col3:
-                st.markdown(f"**Z (Chaff Outlet):** {Z:.4f}")
+                st.markdown(f"**Z (Chaff Outlet):** {Z:.4f}{spread_labels['Z']}")
 
             st.markdown("### Effectiveness Results")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.markdown(f"**Eg (Good Grains):** {Eg:.4f}")
+                st.markdown(f"**Eg (Good Grains):** {Eg:.4f}{spread_labels['Eg']}")
             with col2:
-                st.markdown(f"**Ec (Chaff):** {Ec:.4f}")
+                st.markdown(f"**Ec (Chaff):** {Ec:.4f}{spread_labels['Ec']}")
             with col3:
-                st.markdown(f"**Ecl (Overall):** {Ecl:.4f}")
+                st.markdown(f"**Ecl (Overall):** {Ecl:.4f}{spread_labels['Ecl']}")
 
             # Convert to percentage for display
             Eg_percent = Eg * 100
@@ -3652,8 +7370,10 @@ elif page == "Screen Cleaner Evaluation":
             metrics = ['Eg (Good Grains)', 'Ec (Chaff)', 'Ecl (Overall)']
             values = [Eg_percent, Ec_percent, Ecl_percent]
             colors = ['green', 'red', 'blue']
+            errors = [spread[key] * 100 for key in (['Eg SE', 'Ec SE', 'Ecl SE'] if len(cleaning_results) == 1
+                                                    else ['Eg', 'Ec', 'Ecl'])]
 
-            bars = ax.bar(metrics, values, color=colors)
+            bars = ax.bar(metrics, values, color=colors, yerr=errors, capsize=8)
 
             # Add value labels on top of bars
             for bar in bars:
@@ -3669,6 +7389,20 @@ elif page == "Screen Cleaner Evaluation":
             plt.tight_layout()
             st.pyplot(fig)
 
+            if len(cleaning_results) > 1:
+                st.markdown("<h4>Results for All Runs:</h4>", unsafe_allow_html=True)
+                st.dataframe(cleaning_results.round(4))
+
+                fig, ax = plt.subplots(figsize=(10, 5))
+                ax.hist(cleaning_results['Ecl'].dropna() * 100, bins=min(30, len(cleaning_results)),
+                        color='skyblue', edgecolor='navy')
+                ax.set_xlabel('Ecl (Overall Cleaning Effectiveness, %)')
+                ax.set_ylabel('Number of Runs')
+                ax.set_title('Distribution of Cleaning Effectiveness Across Runs')
+                ax.grid(axis='y', linestyle='--', alpha=0.7)
+                plt.tight_layout()
+                st.pyplot(fig)
+
             # Add interpretation
             st.markdown("""
             ### Interpretation of Results:
@@ -3696,98 +7430,104 @@ elif page == "Screen Cleaner Evaluation":
         Enter your experimental data below:
         """)
 
-        with st.form("grading_effectiveness_form"):
-            st.markdown("### Feed Material Samples")
-
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                grade_feed_sample1_total = st.number_input("Feed Sample 1 - Total (g)", min_value=0.0, value=50.0,
-                                                           step=0.1, key="gf1t")
-                grade_feed_sample1_desired = st.number_input("Feed Sample 1 - Desired Size (g)", min_value=0.0,
-                                                             value=30.0, step=0.1, key="gf1d")
-
-            with col2:
-                grade_feed_sample2_total = st.number_input("Feed Sample 2 - Total (g)", min_value=0.0, value=50.0,
-                                                           step=0.1, key="gf2t")
-                grade_feed_sample2_desired = st.number_input("Feed Sample 2 - Desired Size (g)", min_value=0.0,
-                                                             value=28.0, step=0.1, key="gf2d")
-
-            with col3:
-                grade_feed_sample3_total = st.number_input("Feed Sample 3 - Total (g)", min_value=0.0, value=50.0,
-                                                           step=0.1, key="gf3t")
-                grade_feed_sample3_desired = st.number_input("Feed Sample 3 - Desired Size (g)", min_value=0.0,
-                                                             value=32.0, step=0.1, key="gf3d")
-
-            st.markdown("### Overflow Samples (Size above sieve opening)")
-
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                over_sample1_total = st.number_input("Overflow Sample 1 - Total (g)", min_value=0.0, value=25.0,
-                                                     step=0.1, key="of1t")
-                over_sample1_desired = st.number_input("Overflow Sample 1 - Desired Size (g)", min_value=0.0,
-                                                       value=23.0, step=0.1, key="of1d")
-
-            with col2:
-                over_sample2_total = st.number_input("Overflow Sample 2 - Total (g)", min_value=0.0, value=26.0,
-                                                     step=0.1, key="of2t")
-                over_sample2_desired = st.number_input("Overflow Sample 2 - Desired Size (g)", min_value=0.0,
-                                                       value=24.0, step=0.1, key="of2d")
-
-            with col3:
-                over_sample3_total = st.number_input("Overflow Sample 3 - Total (g)", min_value=0.0, value=24.0,
-                                                     step=0.1, key="of3t")
-                over_sample3_desired = st.number_input("Overflow Sample 3 - Desired Size (g)", min_value=0.0,
-                                                       value=22.0, step=0.1, key="of3d")
-
-            st.markdown("### Underflow Samples (Size below sieve opening)")
-
-            col1, col2, col3 = st.columns(3)
+        grading_input_method = st.radio("Sample Data Source", ["Sample table", "Upload CSV"], horizontal=True,
+                                        key="grading_input_method")
+
+        if grading_input_method == "Sample table":
+            grading_samples = st.data_editor(pd.DataFrame({
+                'Run': ['Run 1'] * 9,
+                'Stream': [stream for stream in GRADING_STREAMS for _ in range(3)],
+                'Total (g)': [50.0, 50.0, 50.0, 25.0, 26.0, 24.0, 25.0, 24.0, 26.0],
+                'Desired Size (g)': [30.0, 28.0, 32.0, 23.0, 24.0, 22.0, 7.0, 6.0, 8.0]
+            }), num_rows="dynamic", key="grading_samples", column_config={
+                'Stream': st.column_config.SelectboxColumn(options=list(GRADING_STREAMS), required=True)
+            })
+        else:
+            uploaded_grading = st.file_uploader(
+                "Upload Samples (CSV with 'Run', 'Stream', 'Total (g)' and 'Desired Size (g)' columns)", type=["csv"],
+                key="grading_samples_csv")
+            grading_samples = pd.read_csv(uploaded_grading) if uploaded_grading is not None else None
+
+        # Input for sieve opening size
+        sieve_size = st.number_input("Sieve Opening Size (mm)", min_value=0.1, value=2.0, step=0.1)
+
+        grading_missing = ({'Run', 'Stream', 'Total (g)', 'Desired Size (g)'} - set(grading_samples.columns)
+                           if grading_samples is not None else set())
+        if grading_missing:
+            st.error(f"The sample data is missing columns: {', '.join(sorted(grading_missing))}")
+        grading_problems = (separation_sample_problems(grading_samples, GRADING_STREAMS, 'Desired Size (g)')
+                            if grading_samples is not None and not grading_missing else [])
+        for problem in grading_problems:
+            st.error(problem)
+
+        st.markdown("#### Mass-Balance Reconciliation")
+        reconcile_grading = st.checkbox("Reconcile with measured stream masses so that A = B + C holds",
+                                        key="reconcile_grading")
+        if reconcile_grading:
+            st.markdown("""
+            Enter the total mass collected from each stream in every run. Stream masses and fractions are adjusted
+            by weighted least squares so that both the total and the desired-material balances close, and the
+            effectiveness is computed from the reconciled values.
+            """)
+            grading_stream_masses = st.data_editor(pd.DataFrame({
+                'Run': ['Run 1'], 'Feed Mass (kg)': [10.0], 'Overflow Mass (kg)': [5.0],
+                'Underflow Mass (kg)': [4.9]
+            }), num_rows="dynamic", key="grading_stream_masses")
+            col1, col2 = st.columns(2)
             with col1:
-                under_sample1_total = st.number_input("Underflow Sample 1 - Total (g)", min_value=0.0, value=25.0,
-                                                      step=0.1, key="uf1t")
-                under_sample1_desired = st.number_input("Underflow Sample 1 - Desired Size (g)", min_value=0.0,
-                                                        value=7.0, step=0.1, key="uf1d")
-
+                grading_mass_error = st.number_input("Stream Mass Uncertainty (% of reading)", min_value=0.01,
+                                                     value=1.0, step=0.1, key="grading_mass_error")
             with col2:
-                under_sample2_total = st.number_input("Underflow Sample 2 - Total (g)", min_value=0.0, value=24.0,
-                                                      step=0.1, key="uf2t")
-                under_sample2_desired = st.number_input("Underflow Sample 2 - Desired Size (g)", min_value=0.0,
-                                                        value=6.0, step=0.1, key="uf2d")
-
-            with col3:
-                under_sample3_total = st.number_input("Underflow Sample 3 - Total (g)", min_value=0.0, value=26.0,
-                                                      step=0.1, key="uf3t")
-                under_sample3_desired = st.number_input("Underflow Sample 3 - Desired Size (g)", min_value=0.0,
-                                                        value=8.0, step=0.1, key="uf3d")
-
-            # Input for sieve opening size
-            sieve_size = st.number_input("Sieve Opening Size (mm)", min_value=0.1, value=2.0, step=0.1)
-
-            calculate_grading_button = st.form_submit_button("Calculate Grading Effectiveness")
-
-        if calculate_grading_button:
-            # Calculate average values
-            grade_feed_total_avg = (grade_feed_sample1_total + grade_feed_sample2_total + grade_feed_sample3_total) / 3
-            grade_feed_desired_avg = (
-                                                 grade_feed_sample1_desired + grade_feed_sample2_desired + grade_feed_sample3_desired) / 3
-
-            over_total_avg = (over_sample1_total + over_sample2_total + over_sample3_total) / 3
-            over_desired_avg = (over_sample1_desired + over_sample2_desired + over_sample3_desired) / 3
-
-            under_total_avg = (under_sample1_total + under_sample2_total + under_sample3_total) / 3
-            under_desired_avg = (under_sample1_desired + under_sample2_desired + under_sample3_desired) / 3
-
-            # Calculate mass fractions for grading
-            X_grade = grade_feed_desired_avg / grade_feed_total_avg  # Mass fraction of desired size in feed
-            Y_grade = over_desired_avg / over_total_avg  # Mass fraction of desired size in overflow
-            Z_grade = under_desired_avg / under_total_avg  # Mass fraction of desired size in underflow
-
-            # Calculate effectiveness metrics for grading
-            Eo = (Y_grade * (X_grade - Z_grade)) / (
-                        X_grade * (Y_grade - Z_grade))  # Effectiveness with reference to overflow
-            Eu = ((Y_grade - X_grade) * (1 - Z_grade)) / (
-                        (Y_grade - Z_grade) * (1 - X_grade))  # Effectiveness with reference to underflow
-            Eg = Eo * Eu  # Overall effectiveness of grading
+                grading_fraction_error = st.number_input("Minimum Fraction Uncertainty", min_value=0.0001,
+                                                         value=0.005, step=0.001, format="%.4f",
+                                                         key="grading_fraction_error")
+
+        calculate_grading_button = st.button("Calculate Grading Effectiveness")
+
+        if calculate_grading_button and grading_samples is not None and not grading_missing and not grading_problems:
+            grading_results = evaluate_separation_samples(grading_samples, GRADING_STREAMS, 'Desired Size (g)')
+            if reconcile_grading:
+                reconciled_results = reconcile_separation_results(grading_results, grading_stream_masses,
+                                                                  GRADING_STREAMS, grading_mass_error / 100,
+                                                                  grading_fraction_error)
+                if reconciled_results.empty:
+                    st.error("No run has both sample data and stream masses; check the Run names in both tables. "
+                             "Showing the unreconciled results.")
+                    reconcile_grading = False
+                else:
+                    grading_results = reconciled_results
+            grading_results = grading_results.rename(columns={
+                'E accepted Measured': 'Eo Measured', 'E rejected Measured': 'Eu Measured',
+                'E overall Measured': 'Eg Measured',
+                'E accepted': 'Eo', 'E accepted SE': 'Eo SE', 'E rejected': 'Eu', 'E rejected SE': 'Eu SE',
+                'E overall': 'Eg', 'E overall SE': 'Eg SE'
+            })
+            st.session_state.grading_results = grading_results
+
+            if reconcile_grading:
+                st.markdown("### Mass-Balance Reconciliation")
+                gross_errors = int(grading_results['Gross Error'].sum())
+                if gross_errors:
+                    st.warning(f"{gross_errors} of {len(grading_results)} runs fail the global test (95% confidence): "
+                               f"the measurements contain a gross error that reconciliation cannot explain by noise.")
+                else:
+                    st.success(f"All {len(grading_results)} runs pass the global mass-balance test (95% confidence).")
+                st.dataframe(grading_results[['Run', 'Total Imbalance (kg)', 'Desired Material Imbalance (kg)',
+                                              'X Measured', 'X', 'Y Measured', 'Y', 'Z Measured', 'Z',
+                                              'Eg Measured', 'Eg', 'Global Test (χ²)', 'Gross Error',
+                                              'Suspect Measurements']].round(4))
+
+            # Headline values: the single run, or the mean over all runs
+            X_grade, Y_grade, Z_grade, Eo, Eu, Eg = grading_results[['X', 'Y', 'Z', 'Eo', 'Eu', 'Eg']].mean()
+            if len(grading_results) == 1:
+                spread = grading_results.iloc[0]
+                fraction_spread = 'SE' if reconcile_grading else 'SD'
+                spread_labels = {key: f" ± {spread[f'{key} {fraction_spread}']:.4f}" for key in ['X', 'Y', 'Z']}
+                spread_labels.update({key: f" ± {spread[f'{key} SE']:.4f}" for key in ['Eo', 'Eu', 'Eg']})
+            else:
+                spread = grading_results[['X', 'Y', 'Z', 'Eo', 'Eu', 'Eg']].std()
+                spread_labels = {key: f" ± {spread[key]:.4f} (mean ± SD of {len(grading_results)} runs)"
+                                 for key in ['X', 'Y', 'Z', 'Eo', 'Eu', 'Eg']}
 
             # Display results
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
@@ -3795,20 +7535,20 @@ elif page == "Screen Cleaner Evaluation":
             st.markdown("### Mass Fraction Results for Grading")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.markdown(f"**X (Feed):** {X_grade:.4f}")
+                st.markdown(f"**X (Feed):** {X_grade:.4f}{spread_labels['X']}")
             with col2:
-                st.markdown(f"**Y (Overflow):** {Y_grade:.4f}")
+                st.markdown(f"**Y (Overflow):** {Y_grade:.4f}{spread_labels['Y']}")
             with col3:
-                st.markdown(f"**Z (Underflow):** {Z_grade:.4f}")
+                st.markdown(f"**Z (Underflow):** {Z_grade:.4f}{spread_labels['Z']}")
 
             st.markdown("### Effectiveness Results for Grading")
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.markdown(f"**Eo (Overflow):** {Eo:.4f}")
+                st.markdown(f"**Eo (Overflow):** {Eo:.4f}{spread_labels['Eo']}")
             with col2:
-                st.markdown(f"**Eu (Underflow):** {Eu:.4f}")
+                st.markdown(f"**Eu (Underflow):** {Eu:.4f}{spread_labels['Eu']}")
             with col3:
-                st.markdown(f"**Eg (Overall):** {Eg:.4f}")
+                st.markdown(f"**Eg (Overall):** {Eg:.4f}{spread_labels['Eg']}")
 
             # Convert to percentage for display
             Eo_percent = Eo * 100
@@ -3828,8 +7568,10 @@ elif page == "Screen Cleaner Evaluation":
             metrics = ['Eo (Overflow)', 'Eu (Underflow)', 'Eg (Overall)']
             values = [Eo_percent, Eu_percent, Eg_percent]
             colors = ['orange', 'purple', 'teal']
+            errors = [spread[key] * 100 for key in (['Eo SE', 'Eu SE', 'Eg SE'] if len(grading_results) == 1
+                                                    else ['Eo', 'Eu', 'Eg'])]
 
-            bars = ax.bar(metrics, values, color=colors)
+            bars = ax.bar(metrics, values, color=colors, yerr=errors, capsize=8)
 
             # Add value labels on top of bars
             for bar in bars:
@@ -3845,6 +7587,10 @@ elif page == "Screen Cleaner Evaluation":
             plt.tight_layout()
             st.pyplot(fig)
 
+            if len(grading_results) > 1:
+                st.markdown("<h4>Results for All Runs:</h4>", unsafe_allow_html=True)
+                st.dataframe(grading_results.round(4))
+
             # Add interpretation
             st.markdown("""
             ### Interpretation of Grading Results:
@@ -3911,9 +7657,10 @@ elif page == "Screen Cleaner Evaluation":
             sieve_oscillation = st.slider("Sieve Oscillation (Hz)", 1.0, 10.0, 5.0, 0.1)
 
         # Calculate effectiveness based on sample data
-        sample_Eg = (sample_Y * (sample_X - sample_Z)) / (sample_X * (sample_Y - sample_Z))
-        sample_Ec = ((sample_Y - sample_X) * (1 - sample_Z)) / ((sample_Y - sample_Z) * (1 - sample_X))
-        sample_Ecl = sample_Eg * sample_Ec
+        sample_effectiveness = separation_effectiveness(sample_X, sample_Y, sample_Z)
+        sample_Eg = float(sample_effectiveness['accepted'])
+        sample_Ec = float(sample_effectiveness['rejected'])
+        sample_Ecl = float(sample_effectiveness['overall'])
 
         # Display calculated values
         st.markdown("<div class='result-box'>", unsafe_allow_html=True)
@@ -3932,43 +7679,64 @@ elif page == "Screen Cleaner Evaluation":
         # Create Sankey diagram for material flow
         st.markdown("### Material Flow Visualization")
 
-        # Create placeholder for Sankey diagram (would be implemented with plotly in a full application)
-        st.image("https://via.placeholder.com/800x400.png?text=Sankey+Diagram+of+Material+Flow",
-                 caption="Fig. Material Flow Through Cleaner/Grader")
+        flow_sources = ["Sample Data Generator"]
+        if 'cleaning_results' in st.session_state:
+            flow_sources.append("Last Cleaning Calculation")
+        if 'grading_results' in st.session_state:
+            flow_sources.append("Last Grading Calculation")
+        flow_source = st.radio("Flow Data", flow_sources, horizontal=True)
+
+        if flow_source == "Sample Data Generator":
+            flow_feed, flow_X, flow_Y, flow_Z = feed_rate, sample_X, sample_Y, sample_Z
+            flow_streams, flow_materials, flow_unit = CLEANING_STREAMS, ('Good Grain', 'Impurities'), 'kg/h'
+        else:
+            if flow_source == "Last Cleaning Calculation":
+                flow_results, flow_streams = st.session_state.cleaning_results, CLEANING_STREAMS
+                flow_materials = ('Good Grain', 'Impurities')
+            else:
+                flow_results, flow_streams = st.session_state.grading_results, GRADING_STREAMS
+                flow_materials = ('Desired Grade', 'Other Material')
+            flow_run = st.selectbox("Run", flow_results['Run'].tolist())
+            flow_row = flow_results[flow_results['Run'] == flow_run].iloc[0]
+            feed_mass_column = f'Reconciled {flow_streams[0]} Mass (kg)'
+            if feed_mass_column in flow_results:
+                flow_feed, flow_unit = float(flow_row[feed_mass_column]), 'kg'
+            else:
+                flow_feed = st.number_input("Feed Mass for the Run (kg)", min_value=0.1, value=100.0, step=1.0)
+                flow_unit = 'kg'
+            flow_X, flow_Y, flow_Z = float(flow_row['X']), float(flow_row['Y']), float(flow_row['Z'])
+
+        if flow_Y > flow_Z and flow_Z <= flow_X <= flow_Y:
+            st.plotly_chart(material_flow_sankey(flow_feed, flow_X, flow_Y, flow_Z, flow_streams, flow_materials,
+                                                 flow_unit), use_container_width=True)
+        else:
+            st.warning("The fractions must satisfy Z ≤ X ≤ Y with Y > Z for the outlet flows to follow from the "
+                       "mass balance.")
 
         # Create sensitivity analysis visualization
         st.markdown("### Sensitivity Analysis")
         st.markdown("This chart shows how changes in input parameters affect the overall effectiveness.")
 
-        # Generate data for sensitivity analysis
-        x_values = np.linspace(0.6, 0.9, 20)
-        y_values = np.linspace(0.85, 0.99, 20)
-        z_values = np.linspace(0.05, 0.2, 20)
+        # Evaluate the full X × Y × Z grid once (cached) and read slices from it
+        effectiveness_labels = {'Eg (Good Grains)': 'accepted', 'Ec (Chaff)': 'rejected', 'Ecl (Overall)': 'overall'}
+        grid_points = st.slider("Grid Points per Axis", 20, 150, 100, 10)
+        start_time = time.perf_counter()
+        grid_x, grid_y, grid_z, grid_effectiveness, grid_valid = effectiveness_volume(points=grid_points)
+        grid_time = time.perf_counter() - start_time
 
-        effectiveness_data = []
-
-        for x in x_values:
-            Eg_list = []
-            for y in [0.95]:  # Fixed Y for this example
-                for z in [0.1]:  # Fixed Z for this example
-                    if x < y and z < x:  # Valid condition
-                        Eg = (y * (x - z)) / (x * (y - z))
-                        Eg_list.append(Eg)
-                    else:
-                        Eg_list.append(None)
-            effectiveness_data.append(Eg_list[0] if Eg_list else None)
+        # Sensitivity of each effectiveness to X at the Y and Z chosen above
+        y_index = np.abs(grid_y - sample_Y).argmin()
+        z_index = np.abs(grid_z - sample_Z).argmin()
 
-        # Create the chart
         fig, ax = plt.subplots(figsize=(10, 6))
 
-        valid_indices = [i for i, v in enumerate(effectiveness_data) if v is not None]
-        valid_x = [x_values[i] for i in valid_indices]
-        valid_e = [effectiveness_data[i] for i in valid_indices]
-
-        ax.plot(valid_x, valid_e, 'b-', linewidth=2, label='Eg (Y=0.95, Z=0.1)')
+        for (label, key), color in zip(effectiveness_labels.items(), ['green', 'red', 'blue']):
+            ax.plot(grid_x, grid_effectiveness[key][:, y_index, z_index], color=color, linewidth=2, label=label)
+        ax.axvline(x=sample_X, color='gray', linestyle='--', label=f'X = {sample_X:.2f}')
         ax.set_xlabel('X: Mass Fraction in Feed')
-        ax.set_ylabel('Effectiveness (Eg)')
-        ax.set_title('Sensitivity of Effectiveness to Feed Quality')
+        ax.set_ylabel('Effectiveness')
+        ax.set_title(f'Sensitivity of Effectiveness to Feed Quality (Y = {grid_y[y_index]:.2f}, '
+                     f'Z = {grid_z[z_index]:.2f})')
         ax.grid(True, linestyle='--', alpha=0.7)
         ax.legend()
 
@@ -3977,39 +7745,348 @@ elif page == "Screen Cleaner Evaluation":
 
         # Create 3D visualization
         st.markdown("### 3D Relationship Visualization")
-        st.markdown(
-            "This interactive visualization shows the relationship between feed rate, air flow, and effectiveness.")
+        st.markdown("""
+        The effectiveness is evaluated over the full X × Y × Z grid; only combinations with Z < X < Y are
+        physically valid. Pick a slice axis and position to view the surface, or show iso-surfaces of the
+        whole volume.
+        """)
 
-        # Create placeholder for 3D visualization (would be implemented with plotly in a full application)
-        st.image("https://via.placeholder.com/800x400.png?text=3D+Visualization+of+Parameter+Relationships",
-                 caption="Fig. 3D Relationship between Operating Parameters and Effectiveness")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            surface_metric = st.selectbox("Effectiveness", list(effectiveness_labels), index=2)
+        with col2:
+            slice_axis = st.radio("Slice Along", ["Z (Chaff Outlet)", "Y (Good Outlet)", "X (Feed)"], horizontal=True)
+        with col3:
+            slice_value = st.slider("Slice Position", 0.01, 0.99, 0.1, 0.01)
+
+        volume = grid_effectiveness[effectiveness_labels[surface_metric]]
+        if slice_axis.startswith("Z"):
+            surface = volume[:, :, np.abs(grid_z - slice_value).argmin()].T
+            surface_axes = (grid_x, grid_y, 'X: Feed', 'Y: Good Outlet')
+        elif slice_axis.startswith("Y"):
+            surface = volume[:, np.abs(grid_y - slice_value).argmin(), :].T
+            surface_axes = (grid_x, grid_z, 'X: Feed', 'Z: Chaff Outlet')
+        else:
+            surface = volume[np.abs(grid_x - slice_value).argmin(), :, :].T
+            surface_axes = (grid_y, grid_z, 'Y: Good Outlet', 'Z: Chaff Outlet')
+
+        surface_fig = go.Figure(go.Surface(x=surface_axes[0], y=surface_axes[1], z=surface, colorscale='Viridis',
+                                           cmin=0, cmax=1, colorbar=dict(title=surface_metric.split()[0])))
+        surface_fig.update_layout(
+            title=f"{surface_metric} at {slice_axis.split()[0]} = {slice_value:.2f}",
+            scene=dict(xaxis_title=surface_axes[2], yaxis_title=surface_axes[3], zaxis_title=surface_metric),
+            height=600, margin=dict(l=0, r=0, t=40, b=0)
+        )
+        st.plotly_chart(surface_fig, use_container_width=True)
+
+        if st.checkbox("Show iso-surfaces of the whole volume"):
+            # Down-sample so the browser renders at most about 30³ points
+            stride = max(1, int(np.ceil(grid_points / 30)))
+            sub_x, sub_y, sub_z = np.meshgrid(grid_x[::stride], grid_y[::stride], grid_z[::stride], indexing='ij')
+            iso_fig = go.Figure(go.Isosurface(
+                x=sub_x.ravel(), y=sub_y.ravel(), z=sub_z.ravel(),
+                value=np.nan_to_num(volume[::stride, ::stride, ::stride], nan=-1.0).ravel(),
+                isomin=0.2, isomax=0.9, surface_count=4, colorscale='Viridis',
+                caps=dict(x_show=False, y_show=False, z_show=False)
+            ))
+            iso_fig.update_layout(scene=dict(xaxis_title='X: Feed', yaxis_title='Y: Good Outlet',
+                                             zaxis_title='Z: Chaff Outlet'),
+                                  height=600, margin=dict(l=0, r=0, t=20, b=0))
+            st.plotly_chart(iso_fig, use_container_width=True)
+
+        st.markdown(f"*Grid: {grid_points}³ = {grid_points ** 3:,} points, {grid_valid.mean() * 100:.1f}% valid, "
+                    f"evaluated in {grid_time * 1000:.0f} ms (cached after the first run).*")
 
         # Add capacity calculator
         st.markdown("### Capacity Calculator")
         st.markdown("Calculate the capacity of the cleaner cum grader.")
 
-        with st.form("capacity_form"):
-            col1, col2 = st.columns(2)
+        capacity_mode = st.radio("Capacity Data", ["Single Timed Sample", "Timed Run Log"], horizontal=True)
+
+        if capacity_mode == "Single Timed Sample":
+            with st.form("capacity_form"):
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    sample_mass = st.number_input("Sample Mass (kg)", min_value=0.1, value=1.0, step=0.1)
+                    processing_time = st.number_input("Processing Time (min)", min_value=0.1, value=1.0, step=0.1)
+
+                with col2:
+                    num_runs = st.number_input("Number of Runs", min_value=1, value=3, step=1)
+                    st.markdown("**Note:** For accurate capacity measurement, use a larger sample and measure the "
+                                "time precisely.")
 
+                calculate_capacity_button = st.form_submit_button("Calculate Capacity")
+
+            if calculate_capacity_button:
+                # Calculate capacity
+                capacity = (sample_mass / processing_time) * 60  # kg/h
+
+                st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                st.markdown(f"### Calculated Capacity: {capacity:.2f} kg/h")
+                st.markdown("</div>", unsafe_allow_html=True)
+        else:
+            st.markdown("""
+            Upload a timed run log with one row per collection interval: a time column (elapsed seconds or date-time
+            at the end of the interval), the mass collected from each outlet in that interval (kg) and optionally a
+            'Run' column. The log is read in chunks and aggregated into time bins, so multi-hour logs at second
+            resolution are handled without loading every interval into the page.
+            """)
+            uploaded_run_log = st.file_uploader("Upload Run Log (CSV)", type=["csv"], key="capacity_run_log")
+            if uploaded_run_log is not None:
+                log_columns = pd.read_csv(uploaded_run_log, nrows=0).columns.tolist()
+                uploaded_run_log.seek(0)
+            else:
+                st.info("No log uploaded; showing an example 3-hour log logged every 5 s.")
+                log_columns = example_run_log(hours=0.01).columns.tolist()
+
+            col1, col2 = st.columns(2)
             with col1:
-                sample_mass = st.number_input("Sample Mass (kg)", min_value=0.1, value=1.0, step=0.1)
-                processing_time = st.number_input("Processing Time (min)", min_value=0.1, value=1.0, step=0.1)
+                log_time_column = st.selectbox("Time Column", log_columns,
+                                               index=next((k for k, column in enumerate(log_columns)
+                                                           if 'time' in column.lower()), 0))
+                log_outlets = st.multiselect("Outlet Mass Columns (kg per interval)",
+                                             [column for column in log_columns
+                                              if column not in (log_time_column, 'Run')],
+                                             default=[column for column in log_columns
+                                                      if column not in (log_time_column, 'Run')])
+            with col2:
+                log_bin_seconds = st.number_input("Aggregation Bin (s)", min_value=1.0, value=60.0, step=10.0)
+                log_tolerance = st.slider("Steady-State Band (± % of throughput)", 1, 25, 5)
+                log_window = st.number_input("Smoothing Window (bins)", min_value=1, value=5, step=1)
+
+            if not log_outlets:
+                st.warning("Select at least one outlet mass column.")
+            else:
+                log_bins, log_runs = aggregate_run_log_csv(
+                    uploaded_run_log.getvalue() if uploaded_run_log is not None else None, log_time_column,
+                    tuple(log_outlets), log_bin_seconds)
+                capacity_summary, log_bins = run_log_capacity(log_bins, log_runs, log_outlets, log_bin_seconds,
+                                                              log_tolerance / 100, int(log_window))
+                split_columns = [f"{outlet.rsplit(' (', 1)[0]} Split (%)" for outlet in log_outlets]
+
+                st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                if len(capacity_summary) == 1:
+                    summary_row = capacity_summary.iloc[0]
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.markdown(f"**Capacity (whole run):** {summary_row['Capacity (kg/h)']:.2f} kg/h")
+                        st.markdown(f"**Steady-State Throughput:** "
+                                    f"{summary_row['Steady-State Throughput (kg/h)']:.2f} kg/h")
+                    with col2:
+                        st.markdown(f"**Start-up Transient:** {summary_row['Start-up Transient (min)']:.1f} min")
+                        st.markdown(f"**Shut-down Transient:** {summary_row['Shut-down Transient (min)']:.1f} min")
+                    with col3:
+                        for column in split_columns:
+                            st.markdown(f"**{column}:** {summary_row[column]:.2f}")
+                else:
+                    st.markdown(f"### Mean Capacity over {len(capacity_summary)} Runs: "
+                                f"{capacity_summary['Capacity (kg/h)'].mean():.2f} kg/h")
+                st.markdown("</div>", unsafe_allow_html=True)
+                st.dataframe(capacity_summary.round(3))
+
+                log_run = st.selectbox("Run to Plot", capacity_summary['Run'].tolist(), key="capacity_log_run")
+                run_bins = log_bins[log_bins['Run'] == log_run]
+                run_summary = capacity_summary[capacity_summary['Run'] == log_run].iloc[0]
+                steady_level = run_summary['Steady-State Throughput (kg/h)']
+
+                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+                ax1.plot(run_bins['Time (min)'], run_bins['Throughput (kg/h)'], color='lightgray',
+                         label='Per bin')
+                ax1.plot(run_bins['Time (min)'], run_bins['Smoothed Throughput (kg/h)'], color='blue',
+                         label='Smoothed')
+                ax1.axhspan(steady_level * (1 - log_tolerance / 100), steady_level * (1 + log_tolerance / 100),
+                            color='green', alpha=0.15, label='Steady-state band')
+                ax1.axvline(run_summary['Start-up Transient (min)'], color='red', linestyle='--',
+                            label='End of start-up')
+                ax1.axvline(run_bins['Time (min)'].max() - run_summary['Shut-down Transient (min)'],
+                            color='orange', linestyle='--', label='Start of shut-down')
+                ax1.set_ylabel('Throughput (kg/h)')
+                ax1.set_title(f'Throughput over Time — {log_run}')
+                ax1.grid(True, linestyle='--', alpha=0.7)
+                ax1.legend()
+                ax2.stackplot(run_bins['Time (min)'], run_bins[split_columns].fillna(0).T.to_numpy(),
+                              labels=split_columns, alpha=0.8)
+                ax2.set_xlabel('Time (min)')
+                ax2.set_ylabel('Outlet Split (%)')
+                ax2.set_ylim(0, 100)
+                ax2.set_title('Outlet Split over Time')
+                ax2.legend(loc='lower right')
+                plt.tight_layout()
+                st.pyplot(fig)
+
+    with tab4:
+        st.markdown("<h3 class='section-header'>Multi-Deck Screening Simulator</h3>", unsafe_allow_html=True)
+
+        st.markdown("""
+        Predict how a lot with a given particle size distribution splits over a stack of screen decks. Each size
+        class has a probability of passing an aperture in one presentation, p = f₀(1 - d/a)² (Gaudin), and gets a
+        number of presentations proportional to the deck length, reduced by crowding as the deck loading rises.
+        Oversize leaves as the deck overflow and undersize falls to the next deck; the last outlet is the pan.
+        """)
 
+        st.markdown("#### Particle Size Distribution")
+        psd_sources = ["Normal Distribution", "Sieve Analysis Table"]
+        if 'grain_measurements' in st.session_state:
+            psd_sources.append("Grain Morphology Measurements")
+        psd_source = st.radio("Size Distribution Source", psd_sources, horizontal=True)
+
+        if psd_source == "Normal Distribution":
+            col1, col2 = st.columns(2)
+            with col1:
+                psd_mean = st.number_input("Mean Governing Size (mm)", min_value=0.1, value=3.0, step=0.1)
             with col2:
-                num_runs = st.number_input("Number of Runs", min_value=1, value=3, step=1)
-                st.markdown(
-                    "**Note:** For accurate capacity measurement, use a larger sample and measure the time precisely.")
+                psd_sd = st.number_input("Standard Deviation (mm)", min_value=0.01, value=0.5, step=0.05)
+            class_sizes, feed_fractions = size_distribution_classes(mean=psd_mean, sd=psd_sd)
+        elif psd_source == "Sieve Analysis Table":
+            sieve_analysis = st.data_editor(pd.DataFrame({
+                'Size (mm)': [1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5],
+                'Mass (g)': [5.0, 20.0, 60.0, 110.0, 70.0, 25.0, 10.0]
+            }), num_rows="dynamic", key="screening_sieve_analysis").dropna()
+            sieve_analysis = sieve_analysis[(sieve_analysis['Size (mm)'] > 0) & (sieve_analysis['Mass (g)'] >= 0)]
+            if sieve_analysis['Mass (g)'].sum() <= 0:
+                st.error("Enter at least one sieve size with a positive retained mass.")
+                st.stop()
+            class_sizes, feed_fractions = size_distribution_classes(
+                sieve_analysis['Size (mm)'], sieve_analysis['Mass (g)'], classes=len(sieve_analysis) * 5)
+        else:
+            st.markdown("Sizes are taken from the Multiple Samples table of Grain Morphology, weighted by grain "
+                        "volume. Breadth governs passage through round holes and thickness through slots.")
+            governing_dimension = st.selectbox("Governing Dimension", ["Breadth", "Thickness", "Length"])
+            morphology = st.session_state.grain_measurements
+            class_sizes, feed_fractions = size_distribution_classes(
+                morphology[governing_dimension], morphology['Length'] * morphology['Breadth'] * morphology['Thickness'],
+                classes=30)
+
+        st.markdown("#### Deck Stack and Operating Conditions")
+        deck_stack = st.data_editor(pd.DataFrame({
+            'Deck': ['Deck 1', 'Deck 2'], 'Aperture (mm)': [4.0, 2.5], 'Length (m)': [1.5, 1.5]
+        }), num_rows="dynamic", key="screening_deck_stack").dropna()
+        deck_stack = deck_stack[(deck_stack['Aperture (mm)'] > 0) & (deck_stack['Length (m)'] > 0)]
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            screening_feed_rate = st.number_input("Feed Rate (kg/h)", min_value=1.0, value=2000.0, step=100.0,
+                                                  key="screening_feed_rate")
+            deck_width = st.number_input("Deck Width (m)", min_value=0.1, value=1.0, step=0.1)
+        with col2:
+            deck_open_area = st.slider("Open Area Fraction", 0.1, 0.8, 0.5, 0.05)
+            presentations_per_metre = st.number_input("Presentations per Metre of Deck", min_value=1.0, value=40.0,
+                                                      step=5.0)
+        with col3:
+            reference_loading = st.number_input("Crowding Reference Loading (kg/h per m width)", min_value=100.0,
+                                                value=3000.0, step=100.0)
 
-            calculate_capacity_button = st.form_submit_button("Calculate Capacity")
+        outlet_names = [f"{deck} Overflow" for deck in deck_stack['Deck']] + ["Pan"]
+        col1, col2 = st.columns(2)
+        with col1:
+            desired_range = st.slider("Desired Size Range (mm)", float(class_sizes.min()), float(class_sizes.max()),
+                                      (float(np.percentile(class_sizes, 30)), float(np.percentile(class_sizes, 70))))
+        with col2:
+            accepted_outlet = outlet_names.index(st.selectbox("Outlet Collecting the Desired Grade", outlet_names,
+                                                              index=min(1, len(outlet_names) - 1)))
 
-        if calculate_capacity_button:
-            # Calculate capacity
-            capacity = (sample_mass / processing_time) * 60  # kg/h
+        if deck_stack.empty:
+            st.error("Enter at least one deck with a positive aperture and length.")
+        else:
+            simulation = simulate_screen_decks(class_sizes, feed_fractions, deck_stack['Aperture (mm)'].to_numpy(),
+                                               deck_stack['Length (m)'].to_numpy(), screening_feed_rate, deck_width,
+                                               deck_open_area, presentations_per_metre, reference_loading)
+            outlets = simulation['outlets'][0]
+            performance = screen_deck_effectiveness(outlets, class_sizes, desired_range, accepted_outlet)
+            desired_mask = (class_sizes >= desired_range[0]) & (class_sizes <= desired_range[1])
 
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
-            st.markdown(f"### Calculated Capacity: {capacity:.2f} kg/h")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown(f"**X (Feed):** {performance['X']:.4f}")
+                st.markdown(f"**Y ({outlet_names[accepted_outlet]}):** {performance['Y']:.4f}")
+                st.markdown(f"**Z (Other Outlets):** {performance['Z']:.4f}")
+            with col2:
+                st.markdown(f"**Eo (Accepted Outlet):** {performance['effectiveness']['accepted']:.4f}")
+                st.markdown(f"**Eu (Other Outlets):** {performance['effectiveness']['rejected']:.4f}")
+                st.markdown(f"**Eg (Overall):** {performance['effectiveness']['overall']:.4f}")
+            with col3:
+                st.markdown(f"**Desired Material Recovery:** {performance['recovery'] * 100:.2f}%")
+                st.markdown(f"**Desired Material in Feed:** {performance['X'] * screening_feed_rate:.1f} kg/h")
             st.markdown("</div>", unsafe_allow_html=True)
 
+            outlet_table = pd.DataFrame({
+                'Outlet': outlet_names,
+                'Flow (kg/h)': outlets.sum(axis=1),
+                'Share of Feed (%)': outlets.sum(axis=1) / screening_feed_rate * 100,
+                'Desired Size Fraction': outlets[:, desired_mask].sum(axis=1) / outlets.sum(axis=1),
+                'Mean Size (mm)': (outlets * class_sizes).sum(axis=1) / outlets.sum(axis=1)
+            })
+            st.dataframe(outlet_table.round(4))
+
+            col1, col2 = st.columns(2)
+            with col1:
+                fig, ax = plt.subplots(figsize=(8, 5))
+                for deck, passing in zip(deck_stack['Deck'], simulation['passing'][0]):
+                    ax.plot(class_sizes, passing * 100, label=deck)
+                ax.axvspan(*desired_range, color='green', alpha=0.1, label='Desired range')
+                ax.set_xlabel('Particle Size (mm)')
+                ax.set_ylabel('Passing the Deck (%)')
+                ax.set_title('Deck Passage Curves')
+                ax.grid(True, linestyle='--', alpha=0.7)
+                ax.legend()
+                st.pyplot(fig)
+            with col2:
+                fig, ax = plt.subplots(figsize=(8, 5))
+                ax.stackplot(class_sizes, outlets, labels=outlet_names, alpha=0.8)
+                ax.axvspan(*desired_range, color='green', alpha=0.1)
+                ax.set_xlabel('Particle Size (mm)')
+                ax.set_ylabel('Flow per Size Class (kg/h)')
+                ax.set_title('Size Distribution of the Outlets')
+                ax.grid(True, linestyle='--', alpha=0.7)
+                ax.legend()
+                st.pyplot(fig)
+
+        st.markdown("#### Screen Selection")
+        st.markdown("Every stack built from the candidate apertures (decreasing down the stack) and deck lengths "
+                    "is simulated for this lot, keeping the desired-grade outlet chosen above.")
+        col1, col2 = st.columns(2)
+        with col1:
+            aperture_range = st.slider("Candidate Apertures (mm)", 0.5, 10.0, (1.5, 5.0), 0.1)
+            aperture_step = st.number_input("Aperture Step (mm)", min_value=0.05, value=0.1, step=0.05)
+            candidate_decks = st.number_input("Number of Decks", min_value=1, max_value=4,
+                                              value=int(np.clip(len(deck_stack), 1, 4)), step=1)
+        with col2:
+            candidate_lengths = st.multiselect("Candidate Deck Lengths (m)", [0.5, 1.0, 1.5, 2.0, 2.5, 3.0],
+                                               default=[1.0, 1.5, 2.0])
+        candidate_apertures = np.round(np.arange(aperture_range[0], aperture_range[1] + aperture_step / 2,
+                                                 aperture_step), 3)
+        configurations = (math.comb(len(candidate_apertures), candidate_decks)
+                          * len(candidate_lengths) ** candidate_decks)
+        estimated_time = configurations * candidate_decks * len(class_sizes) * SCREEN_SELECTION_SECONDS_PER_DECK_CLASS
+        st.markdown(f"*{configurations:,} deck configurations, "
+                    f"{f'about {estimated_time:.1f} s' if estimated_time >= 0.1 else 'under 0.1 s'} to evaluate.*")
+
+        if accepted_outlet > candidate_decks:
+            st.warning("The desired-grade outlet must exist in the candidate stacks; choose fewer decks above it.")
+        elif configurations == 0:
+            st.warning("Choose at least as many candidate apertures as decks and one deck length.")
+        elif configurations > SCREEN_SELECTION_MAX_CONFIGURATIONS:
+            st.warning(f"Too many configurations (at most {SCREEN_SELECTION_MAX_CONFIGURATIONS:,}); widen the "
+                       "aperture step or narrow the candidate ranges.")
+        elif st.button("Optimize Screen Selection"):
+            optimize_start = time.perf_counter()
+            ranking = optimize_screen_decks(class_sizes, feed_fractions, screening_feed_rate,
+                                            tuple(candidate_apertures), tuple(candidate_lengths), candidate_decks,
+                                            tuple(desired_range), accepted_outlet, deck_width, deck_open_area,
+                                            presentations_per_metre, reference_loading)
+            optimize_time = time.perf_counter() - optimize_start
+            best = ranking.iloc[0]
+            best_stack = ", ".join(f"Deck {deck + 1} {best[f'Deck {deck + 1} Aperture (mm)']:.2f} mm × "
+                                   f"{best[f'Deck {deck + 1} Length (m)']:.1f} m" for deck in range(candidate_decks))
+            st.success(f"Best stack: {best_stack} — Eg = {best['Eg']:.4f}, "
+                       f"purity {best['Accepted Purity Y'] * 100:.1f}%, "
+                       f"recovery {best['Desired Recovery'] * 100:.1f}%.")
+            st.dataframe(ranking.head(20).round(4))
+            st.markdown(f"*{len(ranking):,} configurations evaluated in {optimize_time:.2f} s "
+                        f"(cached for this lot and candidate set).*")
+
 # Tray Dryer Evaluation Module
 elif page == "Tray Dryer Evaluation":
     st.markdown("<h2 class='sub-header'>Performance Evaluation of Tray Dryer</h2>", unsafe_allow_html=True)
@@ -4049,6 +8126,9 @@ elif page == "Tray Dryer Evaluation":
         Rearranged to find the drying constant:
         <div class='formula'>K = (1/θ) × ln((M₀-Me)/(M-Me))</div>
 
+        The calculator fits K (and optionally Me) to all readings of a run by nonlinear least squares,
+        which uses every point instead of pairs of consecutive readings.
+
         Where:
         - M = Moisture content at time θ (% db)
         - M₀ = Initial moisture content (% db)
@@ -4087,7 +8167,8 @@ elif page == "Tray Dryer Evaluation":
                      caption="Schematic diagram of tray dryer showing air flow")
 
     # Create tabs for different sections
-    tab1, tab2, tab3 = st.tabs(["Moisture Content Analysis", "Performance Metrics", "Drying Curves"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Moisture Content Analysis", "Performance Metrics", "Drying Curves",
+                                      "Run Workspace"])
 
     with tab1:
         st.markdown("<h3 class='section-header'>Moisture Content Determination</h3>", unsafe_allow_html=True)
@@ -4181,8 +8262,15 @@ elif page == "Tray Dryer Evaluation":
             st.markdown("### Additional Parameters")
 
             power_input = st.number_input("Heater Power Input (W)", min_value=0, value=1000, step=100)
+            fan_power_input = st.number_input("Fan Power Input (W)", min_value=0, value=0, step=10)
             air_flow_rate = st.number_input("Air Flow Rate (m³/min)", min_value=0.0, value=1.5, step=0.1)
             drying_time = st.number_input("Total Drying Time (min)", min_value=0, value=120, step=5)
+            ambient_rh = st.number_input("Ambient Relative Humidity (%)", min_value=0.0, max_value=100.0,
+                                         value=60.0, step=1.0)
+            dryer_pressure = st.number_input("Atmospheric Pressure (kPa)", min_value=80.0, max_value=110.0,
+                                             value=101.3, step=0.1)
+            water_removed = st.number_input("Water Removed (kg)", min_value=0.0, value=0.5, step=0.05,
+                                            help="Product mass at the start minus product mass at the end")
 
         if st.button("Calculate Performance Metrics"):
             # Calculate HUF
@@ -4194,6 +8282,23 @@ elif page == "Tray Dryer Evaluation":
             # Calculate energy used
             energy_used_kwh = (power_input * drying_time) / (60 * 1000)  # Convert to kWh
 
+            # Heat taken up by the air, from the dry air mass flow at the (ambient) fan inlet
+            inlet_air = air_properties(ambient_temp, dryer_pressure, ambient_rh / 100)
+            dry_air_flow = air_flow_rate / 60 / float(inlet_air['specific_volume'])  # kg dry air/s
+            moist_air_cp = 1006 + 1860 * float(inlet_air['humidity_ratio'])  # J/(kg dry air·K)
+            heat_to_air = dry_air_flow * moist_air_cp * (drying_temp - ambient_temp)  # W
+
+            # Humidity picked up by the air if it cools adiabatically (along its wet bulb line) from t₁ to t₂
+            drying_air = adiabatic_moisture_pickup(ambient_temp, ambient_rh / 100, drying_temp, exhaust_temp,
+                                                   dryer_pressure)
+            moisture_pickup = float(drying_air['moisture_pickup'])
+            potential_water_removal = dry_air_flow * moisture_pickup * drying_time * 60  # kg over the run
+
+            # Energy balance over the run at constant operating conditions
+            energy_balance = dryer_energy_balance(np.array([0.0, drying_time / 60]), power_input, water_removed,
+                                                  air_flow_rate, ambient_temp, ambient_rh / 100, drying_temp,
+                                                  exhaust_temp, fan_power_input, dryer_pressure)
+
             # Display results
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
 
@@ -4207,6 +8312,40 @@ elif page == "Tray Dryer Evaluation":
             with col3:
                 st.markdown(f"**Energy Consumption:** {energy_used_kwh:.3f} kWh")
 
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown(f"**Dry Air Mass Flow:** {dry_air_flow * 60:.3f} kg/min")
+            with col2:
+                st.markdown(f"**Heat Taken Up by Air:** {heat_to_air:.0f} W")
+            with col3:
+                if power_input > 0:
+                    st.markdown(f"**Heater-to-Air Efficiency:** {heat_to_air / power_input * 100:.1f}%")
+
+            if water_removed > 0 and drying_time > 0:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.markdown(f"**Specific Energy Consumption:** {energy_balance['specific_energy']:.2f} kWh/kg "
+                                f"({energy_balance['specific_energy'] * 3.6:.1f} MJ/kg) water")
+                with col2:
+                    st.markdown(f"**Thermal Efficiency:** {energy_balance['thermal_efficiency'] * 100:.1f}%")
+                with col3:
+                    st.markdown(f"**Exhaust Heat Loss (excluding evaporation):** "
+                                f"{energy_balance['exhaust_heat']:.3f} kWh")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.markdown(f"**Drying Air:** {float(drying_air['heated']['rh']) * 100:.1f}% RH, wet bulb "
+                            f"{float(drying_air['heated']['wet_bulb']):.1f} °C")
+                st.markdown(f"**Exhaust Air (adiabatic):** {float(drying_air['exhaust']['rh']) * 100:.1f}% RH")
+            with col2:
+                st.markdown(f"**Moisture Pickup:** {moisture_pickup * 1000:.2f} g/kg dry air")
+                if water_removed > 0 and drying_time > 0:
+                    measured_pickup = (float(energy_balance['exhaust_humidity_ratio'])
+                                       - float(drying_air['heated']['humidity_ratio']))
+                    st.markdown(f"**Pickup from Water Removed:** {measured_pickup * 1000:.2f} g/kg dry air")
+            with col3:
+                st.markdown(f"**Water the Air Can Remove:** {potential_water_removal:.3f} kg over the run")
+
             # Create visualization
             fig, ax = plt.subplots(figsize=(10, 6))
 
@@ -4269,6 +8408,123 @@ elif page == "Tray Dryer Evaluation":
             - Ambient conditions
             """)
 
+        st.markdown("### Energy Accounting Across Runs")
+        st.markdown("""
+        Heater and fan power are integrated over logged time series (trapezoidal rule) to give the electrical
+        energy of each run. The heat taken up by the air comes from the moist air enthalpy rise between t₀ and t₁,
+        the exhaust humidity from the water removed per kg of dry air, and the thermal efficiency is the heat
+        needed to evaporate the water removed divided by the heat taken up by the air. Runs are ranked by specific
+        energy consumption (SEC, energy per kg of water removed).
+        """)
+        energy_source = st.radio("Energy Data", ["Logged Power Time Series", "Operating Points"], horizontal=True)
+        tariff = st.number_input("Electricity Tariff (per kWh)", min_value=0.0, value=8.0, step=0.5)
+
+        if energy_source == "Logged Power Time Series":
+            st.markdown("""
+            Upload a CSV with 'Run', 'Time (min)' and 'Heater Power (W)' columns and, optionally, 'Fan Power (W)'
+            and air temperatures 't0 (°C)', 't1 (°C)', 't2 (°C)'. Missing temperatures are taken from the inputs
+            above. The water removed and air flow of each run are entered in the table below.
+            """)
+            uploaded_energy_log = st.file_uploader("Upload Power Log (CSV)", type=["csv"], key="energy_log")
+            if uploaded_energy_log is not None:
+                energy_log = pd.read_csv(uploaded_energy_log)
+            else:
+                st.info("No log uploaded; showing three example runs at different drying air set points.")
+                energy_log = example_dryer_energy_log([('50 °C', 1500, 60, 50), ('60 °C', 2000, 60, 60),
+                                                      ('70 °C', 2500, 80, 70)])
+            energy_missing = {'Run', 'Time (min)', 'Heater Power (W)'} - set(energy_log.columns)
+            if energy_missing:
+                st.error(f"The power log is missing columns: {', '.join(sorted(energy_missing))}")
+            else:
+                energy_log = energy_log.dropna(subset=['Time (min)', 'Heater Power (W)'])
+                defaults = {'Fan Power (W)': fan_power_input, 't0 (°C)': ambient_temp, 't1 (°C)': drying_temp,
+                            't2 (°C)': exhaust_temp}
+                for column, value in defaults.items():
+                    if column not in energy_log:
+                        energy_log[column] = value
+                energy_log['Run'] = energy_log['Run'].astype(str)
+                energy_runs, energy_arrays = pad_runs(energy_log, 'Run', ['Time (min)', 'Heater Power (W)',
+                                                                          *defaults], 'Time (min)')
+                run_settings = st.data_editor(pd.DataFrame({
+                    'Run': energy_runs,
+                    'Water Removed (kg)': np.nan,
+                    'Air Flow Rate (m³/min)': air_flow_rate,
+                    'Ambient RH (%)': ambient_rh
+                }), disabled=['Run'], hide_index=True, key="energy_run_settings")
+                water_missing = run_settings.loc[~(run_settings['Water Removed (kg)'] > 0), 'Run']
+                if len(water_missing) > 0:
+                    st.warning(f"Enter the water removed in each run; missing for: {', '.join(water_missing)}.")
+                else:
+                    run_balance = dryer_energy_balance(
+                        (energy_arrays['Time (min)'] - energy_arrays['Time (min)'][:, :1]) / 60,
+                        energy_arrays['Heater Power (W)'], run_settings['Water Removed (kg)'].to_numpy(),
+                        run_settings['Air Flow Rate (m³/min)'].to_numpy()[:, None], energy_arrays['t0 (°C)'],
+                        run_settings['Ambient RH (%)'].to_numpy()[:, None] / 100, energy_arrays['t1 (°C)'],
+                        energy_arrays['t2 (°C)'], energy_arrays['Fan Power (W)'], dryer_pressure)
+                    energy_table = dryer_energy_table(energy_runs, run_balance, tariff)
+                    st.dataframe(energy_table.round(3), hide_index=True)
+
+                    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+                    for index, run in enumerate(energy_runs):
+                        ax1.plot(energy_arrays['Time (min)'][index], run_balance['cumulative_energy'][index], label=run)
+                    ax1.set_xlabel('Time (min)')
+                    ax1.set_ylabel('Cumulative Electrical Energy (kWh)')
+                    ax1.set_title('Energy Use Over the Run')
+                    ax1.legend()
+                    ax1.grid(True, linestyle='--', alpha=0.7)
+                    energy_parts = energy_table.set_index('Run')[['Evaporation Heat (kWh)', 'Exhaust Heat (kWh)',
+                                                                  'Other Losses (kWh)']].copy()
+                    energy_parts['Heater and Fan Losses (kWh)'] = (energy_table.set_index('Run')['Total Energy (kWh)']
+                                                                   - energy_table.set_index('Run')['Heat to Air (kWh)'])
+                    energy_parts.plot.bar(stacked=True, ax=ax2, color=['green', 'orange', 'gray', 'brown'], rot=0)
+                    ax2.set_ylabel('Energy (kWh)')
+                    ax2.set_title('Where the Energy Goes')
+                    ax2.grid(axis='y', linestyle='--', alpha=0.7)
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    st.download_button("Download Energy Comparison (CSV)", energy_table.to_csv(index=False),
+                                       file_name="dryer_energy_comparison.csv", mime="text/csv")
+        else:
+            st.markdown("""
+            Enter operating points held constant over a run (or upload the same columns as a CSV) to compare
+            settings; each row is integrated over its drying time.
+            """)
+            uploaded_points = st.file_uploader("Upload Operating Points (CSV)", type=["csv"], key="energy_points")
+            operating_points = pd.read_csv(uploaded_points) if uploaded_points is not None else pd.DataFrame({
+                'Run': ['Low temperature', 'Base', 'High temperature'],
+                'Heater Power (W)': [700.0, float(power_input), 1400.0],
+                'Fan Power (W)': float(fan_power_input),
+                'Drying Time (min)': [180.0, float(drying_time), 80.0],
+                'Air Flow Rate (m³/min)': air_flow_rate,
+                't0 (°C)': ambient_temp,
+                'Ambient RH (%)': ambient_rh,
+                't1 (°C)': [drying_temp - 10, drying_temp, drying_temp + 10],
+                't2 (°C)': [exhaust_temp - 7, exhaust_temp, exhaust_temp + 7],
+                'Water Removed (kg)': water_removed
+            })
+            operating_points = st.data_editor(operating_points, num_rows="dynamic", hide_index=True,
+                                              key="energy_operating_points").dropna()
+            points_missing = {'Run', 'Heater Power (W)', 'Fan Power (W)', 'Drying Time (min)',
+                              'Air Flow Rate (m³/min)', 't0 (°C)', 'Ambient RH (%)', 't1 (°C)', 't2 (°C)',
+                              'Water Removed (kg)'} - set(operating_points.columns)
+            if points_missing:
+                st.error(f"The operating points are missing columns: {', '.join(sorted(points_missing))}")
+            elif len(operating_points) > 0:
+                point_times = np.stack([np.zeros(len(operating_points)),
+                                        operating_points['Drying Time (min)'].to_numpy(dtype=float) / 60], axis=1)
+                point_values = {column: operating_points[column].to_numpy(dtype=float)[:, None]
+                                for column in operating_points.columns if column != 'Run'}
+                point_balance = dryer_energy_balance(
+                    point_times, point_values['Heater Power (W)'],
+                    point_values['Water Removed (kg)'][:, 0], point_values['Air Flow Rate (m³/min)'],
+                    point_values['t0 (°C)'], point_values['Ambient RH (%)'] / 100, point_values['t1 (°C)'],
+                    point_values['t2 (°C)'], point_values['Fan Power (W)'], dryer_pressure)
+                point_table = dryer_energy_table(operating_points['Run'].astype(str), point_balance, tariff)
+                st.dataframe(point_table.round(3), hide_index=True)
+                st.markdown(f"**Lowest SEC:** {point_table['Run'].iloc[0]} at "
+                            f"{point_table['SEC (kWh/kg water)'].iloc[0]:.2f} kWh/kg water")
+                st.bar_chart(point_table.set_index('Run')['SEC (kWh/kg water)'])
+
     with tab3:
         st.markdown("<h3 class='section-header'>Drying Characteristic Curves</h3>", unsafe_allow_html=True)
 
@@ -4279,7 +8535,7 @@ elif page == "Tray Dryer Evaluation":
 
         input_method = st.radio(
             "Select Input Method",
-            ["Use Experimental Data", "Run Simulation"]
+            ["Use Experimental Data", "Live Data Logger", "Run Simulation"]
         )
 
         if input_method == "Use Experimental Data":
@@ -4334,36 +8590,64 @@ elif page == "Tray Dryer Evaluation":
                         exhaust_temps.append(
                             st.number_input(f"t₂ {i + 1}", min_value=0.0, value=45.0, step=0.1, key=f"t2_{i}"))
 
+                me_source = st.radio("Equilibrium Moisture Content Source",
+                                     ["Enter manually", "Estimate from sorption isotherm",
+                                      "Fit to the drying curve"], horizontal=True)
+                iso_col1, iso_col2, iso_col3 = st.columns(3)
+                with iso_col1:
+                    isotherm_grain = st.selectbox("Grain (for isotherm)",
+                                                  list(EMC_MODEL_COEFFICIENTS['Henderson'].keys()))
+                with iso_col2:
+                    isotherm_model = st.selectbox("Isotherm Model", list(EMC_MODELS.keys()))
+                with iso_col3:
+                    drying_air_rh = st.number_input("Drying Air RH (%)", min_value=1.0, max_value=99.0, value=15.0,
+                                                    step=0.5)
+                smoothing_window = st.number_input("Drying Rate Smoothing Window (readings, 1 = none)", min_value=1,
+                                                   max_value=21, value=5, step=2)
+
                 plot_button = st.form_submit_button("Generate Drying Curves")
 
             if plot_button:
+                if me_source == "Estimate from sorption isotherm":
+                    # Me at the drying air condition of every reading, averaged over the run
+                    equilibrium_moisture = float(np.mean(lookup_emc(drying_temps, drying_air_rh / 100,
+                                                                    isotherm_grain, isotherm_model)))
+                    st.info(f"Equilibrium moisture content from the {isotherm_model} isotherm for "
+                            f"{isotherm_grain}: {equilibrium_moisture:.2f}% db")
+
                 # Calculate dry basis moisture content if we have initial moisture data
                 if 'probable_dry_weight' in st.session_state and 'initial_sample_weight' in st.session_state:
                     dry_weight = st.session_state.probable_dry_weight
-                    moisture_contents = [(m - dry_weight) / dry_weight * 100 for m in masses]
                 else:
                     # Estimate if we don't have initial data
                     dry_weight = masses[-1] * 100 / (100 + equilibrium_moisture)
-                    moisture_contents = [(m - dry_weight) / dry_weight * 100 for m in masses]
-
-                # Calculate HUF and COP for each time point
-                hufs = [(t1 - t2) / (t1 - t0) for t0, t1, t2 in zip(ambient_temps, drying_temps, exhaust_temps)]
-                cops = [(t2 - t0) / (t1 - t0) for t0, t1, t2 in zip(ambient_temps, drying_temps, exhaust_temps)]
-
-                # Calculate drying constants between consecutive time points
-                drying_constants = []
-                for i in range(1, len(times)):
-                    if moisture_contents[i] <= equilibrium_moisture or moisture_contents[i - 1] <= equilibrium_moisture:
-                        k = 0  # Avoid division by zero or negative values
-                    else:
-                        time_diff_hours = (times[i] - times[i - 1]) / 60  # Convert minutes to hours
-                        k = (1 / time_diff_hours) * np.log((moisture_contents[i - 1] - equilibrium_moisture) /
-                                                           (moisture_contents[i] - equilibrium_moisture))
-                    drying_constants.append(k)
 
-                # Calculate average drying constant
-                avg_drying_constant = np.mean([k for k in drying_constants if k > 0]) if any(
-                    k > 0 for k in drying_constants) else 0
+                # Moisture content, HUF, COP and drying rates for every reading
+                curve = drying_curve_analytics(times, masses=masses, dry_weight=dry_weight,
+                                               ambient_temps=ambient_temps, drying_temps=drying_temps,
+                                               exhaust_temps=exhaust_temps, equilibrium_moisture=equilibrium_moisture,
+                                               smoothing_window=smoothing_window)
+                moisture_contents, hufs, cops = curve['moisture'], curve['huf'], curve['cop']
+
+                # Fit the drying constant (and optionally Me) over the whole curve by nonlinear least squares
+                fit_me = me_source == "Fit to the drying curve"
+                drying_fit = fit_drying_constant(np.array(times) / 60, moisture_contents,
+                                                 None if fit_me else equilibrium_moisture, fit_equilibrium=fit_me)
+                drying_constant_fit = float(drying_fit['k'][0])
+                if fit_me:
+                    equilibrium_moisture = float(drying_fit['equilibrium_moisture'][0])
+
+                # Keep this run so it can be added to the run workspace
+                st.session_state.last_drying_run = {
+                    'data': pd.DataFrame({'Time (min)': times, 'Moisture Content (% db)': moisture_contents,
+                                          't0 (°C)': ambient_temps, 't1 (°C)': drying_temps,
+                                          't2 (°C)': exhaust_temps}),
+                    'metadata': {'Grain': isotherm_grain, 'Drying Temperature (°C)': float(np.mean(drying_temps)),
+                                 'Tray Load (kg/m²)': (st.session_state.initial_sample_weight
+                                                       / st.session_state.sample_area * 10
+                                                       if 'sample_area' in st.session_state else np.nan),
+                                 'Me (% db)': equilibrium_moisture, 'Source': 'Experimental'}
+                }
 
                 # Create dataframe for displaying results
                 data = {
@@ -4377,8 +8661,8 @@ elif page == "Tray Dryer Evaluation":
                     'COP': cops
                 }
 
-                if len(drying_constants) > 0:
-                    data['Drying Constant K (1/h)'] = [0] + drying_constants
+                data['Fitted Moisture (%db)'] = drying_fit['fitted'][0]
+                data['Residual (%db)'] = drying_fit['residuals'][0]
 
                 results_df = pd.DataFrame(data)
 
@@ -4388,24 +8672,84 @@ elif page == "Tray Dryer Evaluation":
                     'Moisture Content (%db)': '{:.2f}',
                     'HUF': '{:.3f}',
                     'COP': '{:.3f}',
-                    'Drying Constant K (1/h)': '{:.4f}'
+                    'Fitted Moisture (%db)': '{:.2f}',
+                    'Residual (%db)': '{:.3f}'
                 }))
 
-                st.markdown(f"**Average Drying Constant (K):** {avg_drying_constant:.4f} 1/h")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.markdown(f"**Drying Constant (K):** {drying_constant_fit:.4f} ± "
+                                f"{drying_fit['k_se'][0]:.4f} 1/h")
+                with col2:
+                    if fit_me:
+                        st.markdown(f"**Fitted Me:** {equilibrium_moisture:.2f} ± "
+                                    f"{drying_fit['equilibrium_moisture_se'][0]:.2f}% db")
+                    else:
+                        st.markdown(f"**Me (fixed):** {equilibrium_moisture:.2f}% db")
+                with col3:
+                    st.markdown(f"**Fit R²:** {drying_fit['r_squared'][0]:.4f}, "
+                                f"**RMSE:** {drying_fit['rmse'][0]:.3f}% db")
+                if len(times) <= (2 if fit_me else 1):
+                    st.warning("Too few readings to estimate the parameter uncertainty.")
                 st.markdown("</div>", unsafe_allow_html=True)
 
-                # Create drying characteristic curve
-                fig, ax = plt.subplots(figsize=(10, 6))
+                # Create drying characteristic curve with the fitted model and its residuals
+                fig, (ax, ax_residual) = plt.subplots(2, 1, figsize=(10, 8), sharex=True,
+                                                      gridspec_kw={'height_ratios': [3, 1]})
 
-                ax.plot(times, moisture_contents, 'o-', color='blue', linewidth=2)
-                ax.set_xlabel('Time (min)')
+                ax.plot(times, moisture_contents, 'o', color='blue', label='Measured')
+                fit_times = np.linspace(min(times), max(times), 200)
+                ax.plot(fit_times, equilibrium_moisture + (moisture_contents[0] - equilibrium_moisture)
+                        * np.exp(-drying_constant_fit * (fit_times - times[0]) / 60), '-', color='red',
+                        label=f'Fit: K = {drying_constant_fit:.4f} 1/h')
+                ax.axhline(equilibrium_moisture, color='gray', linestyle='--', label='Me')
                 ax.set_ylabel('Moisture Content (% db)')
                 ax.set_title('Drying Characteristic Curve')
                 ax.grid(True, linestyle='--', alpha=0.7)
+                ax.legend()
+
+                ax_residual.axhline(0, color='gray', linewidth=1)
+                ax_residual.plot(times, drying_fit['residuals'][0], 'o', color='red')
+                ax_residual.set_xlabel('Time (min)')
+                ax_residual.set_ylabel('Residual (% db)')
+                ax_residual.grid(True, linestyle='--', alpha=0.7)
 
                 plt.tight_layout()
                 st.pyplot(fig)
 
+                # Compare thin-layer models on the moisture ratio of this run
+                st.markdown("### Thin-Layer Model Comparison")
+                run_hours = (np.array(times) - times[0]) / 60
+                run_ratio = (np.array(moisture_contents) - equilibrium_moisture) / (moisture_contents[0]
+                                                                                  - equilibrium_moisture)
+                thin_layer_table = cached_thin_layer_fits({'Current run': (run_hours, run_ratio)})
+                thin_layer_display = thin_layer_table[['Rank', 'Model', 'R²', 'RMSE', 'AIC']].copy()
+                thin_layer_display['Coefficients'] = [', '.join(f"{name} = {value:.4g}" for name, value
+                                                                in coefficients.items())
+                                                      for coefficients in thin_layer_table['Coefficients']]
+                st.dataframe(thin_layer_display.round(4))
+                if len(times) <= 4:
+                    st.info("Models with as many coefficients as readings fit exactly; log more readings "
+                            "to tell the models apart.")
+
+                fig_models, ax_models = plt.subplots(figsize=(10, 6))
+                ax_models.plot(run_hours * 60, run_ratio, 'o', color='black', label='Measured')
+                curve_hours = np.linspace(0, run_hours.max(), 200)
+                for _, fit_row in thin_layer_table.iterrows():
+                    if np.isfinite(fit_row['AIC']):
+                        with np.errstate(invalid='ignore', over='ignore'):
+                            ax_models.plot(curve_hours * 60, THIN_LAYER_MODELS[fit_row['Model']](
+                                curve_hours, **fit_row['Coefficients']), label=f"{fit_row['Model']} "
+                                                                               f"(R² = {fit_row['R²']:.4f})")
+                ax_models.set_xlabel('Time (min)')
+                ax_models.set_ylabel('Moisture Ratio (M - Me)/(M₀ - Me)')
+                ax_models.set_title('Thin-Layer Drying Models')
+                ax_models.grid(True, linestyle='--', alpha=0.7)
+                ax_models.legend()
+                plt.tight_layout()
+                st.pyplot(fig_models)
+                st.markdown("*The best model of this run is kept as 'Current run' for the simulation mode.*")
+
                 # Create temperature profile plot
                 fig2, ax2 = plt.subplots(figsize=(10, 6))
 
@@ -4439,19 +8783,15 @@ elif page == "Tray Dryer Evaluation":
 
                 # Create drying rate curve (negative derivative of moisture content)
                 if len(times) > 1:
-                    drying_rates = []
-                    midpoint_times = []
-
-                    for i in range(1, len(times)):
-                        time_diff = (times[i] - times[i - 1]) / 60  # hours
-                        mc_diff = moisture_contents[i - 1] - moisture_contents[i]  # % db
-                        drying_rate = mc_diff / time_diff if time_diff > 0 else 0  # % db/h
-                        drying_rates.append(drying_rate)
-                        midpoint_times.append((times[i] + times[i - 1]) / 2)
-
                     fig4, ax4 = plt.subplots(figsize=(10, 6))
 
-                    ax4.plot(midpoint_times, drying_rates, 'o-', color='purple', linewidth=2)
+                    ax4.plot(curve['midpoint_times'], curve['interval_rates'], 'o-', color='purple', linewidth=2,
+                             label='Between readings')
+                    if smoothing_window >= 3 and len(times) >= 3:
+                        ax4.plot(times, curve['drying_rate'], '-', color='black', alpha=0.7,
+                                 label=f'Smoothed (local quadratic over {min(smoothing_window, len(times))} '
+                                       f'readings)')
+                    ax4.legend()
                     ax4.set_xlabel('Time (min)')
                     ax4.set_ylabel('Drying Rate (% db/h)')
                     ax4.set_title('Drying Rate Curve')
@@ -4460,62 +8800,304 @@ elif page == "Tray Dryer Evaluation":
                     plt.tight_layout()
                     st.pyplot(fig4)
 
+            with st.expander("Fit Thin-Layer Models to Many Runs"):
+                st.markdown(f"""
+                Upload drying runs as a CSV with 'Run', 'Time (min)' and 'Moisture Content (% db)' columns and,
+                optionally, a 'Me (% db)' column. Every model is fitted to every run, and fits are remembered per
+                run, so only new runs are fitted on later uploads. With more than one worker process, sets of
+                {PARALLEL_FIT_MIN_RUNS} or more runs are shared out over the workers; smaller sets fit faster here
+                than a worker takes to start.
+                """)
+                uploaded_runs = st.file_uploader("Upload Drying Runs (CSV)", type=["csv"], key="thin_layer_runs")
+                col1, col2 = st.columns(2)
+                with col1:
+                    batch_me = st.number_input("Me when not given per row (% db)", min_value=0.0, value=8.0,
+                                               step=0.1, key="thin_layer_me")
+                with col2:
+                    thin_layer_processes = st.number_input("Worker Processes", min_value=1, max_value=32, value=1,
+                                                           step=1)
+
+                if uploaded_runs is not None and st.button("Fit Thin-Layer Models"):
+                    drying_runs = pd.read_csv(uploaded_runs)
+                    runs_missing = {'Run', 'Time (min)', 'Moisture Content (% db)'} - set(drying_runs.columns)
+                    if runs_missing:
+                        st.error(f"The runs are missing columns: {', '.join(sorted(runs_missing))}")
+                    else:
+                        if 'Me (% db)' not in drying_runs:
+                            drying_runs['Me (% db)'] = batch_me
+                        batch_runs = {}
+                        for run_name, run_data in drying_runs.dropna().sort_values('Time (min)').groupby('Run'):
+                            run_me = run_data['Me (% db)'].iloc[0]
+                            run_mc = run_data['Moisture Content (% db)'].to_numpy()
+                            batch_runs[str(run_name)] = ((run_data['Time (min)'].to_numpy() - run_data['Time (min)']
+                                                          .iloc[0]) / 60, (run_mc - run_me) / (run_mc[0] - run_me))
+                        fit_start = time.perf_counter()
+                        batch_table = cached_thin_layer_fits(batch_runs, int(thin_layer_processes))
+                        fit_time = time.perf_counter() - fit_start
+
+                        best_table = batch_table[batch_table['Rank'] == 1][['Run', 'Model', 'R²', 'RMSE', 'AIC']]
+                        st.markdown(f"**Best model per run** ({len(batch_runs)} runs, {fit_time:.2f} s):")
+                        st.dataframe(best_table.round(4))
+                        st.markdown("**Model ranking over all runs:**")
+                        st.dataframe(batch_table.groupby('Model').agg(
+                            **{'Runs Ranked First': ('Rank', lambda rank: int((rank == 1).sum())),
+                               'Mean Rank': ('Rank', 'mean'), 'Mean R²': ('R²', 'mean'),
+                               'Mean RMSE': ('RMSE', 'mean'), 'Mean AIC': ('AIC', 'mean')}
+                        ).sort_values('Mean Rank').round(4))
+                        st.download_button("Download All Fits (CSV)", batch_table.to_csv(index=False),
+                                           file_name="thin_layer_fits.csv", mime="text/csv")
+
+        elif input_method == "Live Data Logger":
+            st.markdown("### Live Data Logger")
+            st.markdown("""
+            Pick the CSV file a data logger keeps appending to (time, sample mass and the three air temperatures
+            per reading) from the logger directory. Each refresh reads only the new lines, adds them to one-minute
+            bins and a rolling window of raw readings, and updates moisture content, HUF, COP, drying rate and K.
+            A 12-hour run at 1 Hz stays at a few hundred bins. Without a logger, the demo writes a 12-hour run of 1 Hz
+            readings to a temporary file of this session as a stand-in; the file is removed on reset.
+            """)
+
+            logger_source = st.radio("Logger Source", ["Demo logger (stand-in)", "Logger directory"],
+                                     horizontal=True)
+            if logger_source == "Logger directory":
+                demo_path = st.session_state.pop('drying_logger_demo_path', None)
+                if demo_path and os.path.exists(demo_path):
+                    os.remove(demo_path)
+                logger_file = st.selectbox("Logger CSV File", drying_logger_files(), index=None,
+                                           help=f"CSV files in {DRYING_LOGGER_DIRECTORY}")
+                logger_path = os.path.join(DRYING_LOGGER_DIRECTORY, logger_file) if logger_file else ""
+            else:
+                if 'drying_logger_demo_path' not in st.session_state:
+                    demo_handle, st.session_state.drying_logger_demo_path = tempfile.mkstemp(
+                        prefix='drying_logger_demo_', suffix='.csv')
+                    os.close(demo_handle)
+                logger_path = st.session_state.drying_logger_demo_path
+                demo_speed = st.select_slider("Demo Speed-up", [1, 10, 60, 300, 900], value=300)
+
+            logger_header = []
+            if logger_source == "Demo logger (stand-in)":
+                logger_header = list(DRYING_LOGGER_COLUMNS)
+            elif logger_path and os.path.isfile(logger_path) and os.path.getsize(logger_path) > 0:
+                logger_header = pd.read_csv(logger_path, nrows=0).columns.tolist()
+
+            if not logger_header:
+                st.info(f"Choose a logger CSV file with a header line; files are read from {DRYING_LOGGER_DIRECTORY}.")
+            else:
+                st.markdown("#### Columns and Settings")
+                column_cols = st.columns(5)
+                logger_columns = tuple(
+                    column_cols[index].selectbox(label, logger_header,
+                                                 index=logger_header.index(default) if default in logger_header
+                                                 else min(index, len(logger_header) - 1), key=f"logger_column_{index}")
+                    for index, (label, default) in enumerate(zip(["Time", "Sample Mass (g)", "Ambient t₀",
+                                                                  "Drying Air t₁", "Exhaust t₂"],
+                                                                 DRYING_LOGGER_COLUMNS)))
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    logger_initial_mc = st.number_input(
+                        "Initial Moisture Content (% db)", min_value=0.0,
+                        value=float(st.session_state.get('initial_moisture_db', 42.857)), step=0.5,
+                        key="logger_initial_mc")
+                    logger_me = st.number_input("Equilibrium Moisture Content (% db)", min_value=0.0, value=8.0,
+                                                step=0.1, key="logger_me")
+                with col2:
+                    logger_bin = st.number_input("History Bin (s)", min_value=5, value=60, step=5)
+                    logger_window = st.number_input("Rolling Window (min)", min_value=2, value=10, step=1)
+                with col3:
+                    logger_refresh = st.number_input("Refresh Every (s)", min_value=1, value=5, step=1)
+                    reset_logger = st.button("Reset Logger")
+
+                logger_key = (logger_path, logger_columns, float(logger_bin), float(logger_window))
+                if reset_logger or st.session_state.get('drying_logger_key') != logger_key:
+                    st.session_state.drying_logger_key = logger_key
+                    st.session_state.drying_logger = new_drying_logger_state(logger_bin, logger_window * 60)
+                    if reset_logger and logger_source == "Demo logger (stand-in)" and os.path.exists(logger_path):
+                        # Remove this session's own demo file; it is never shared with other sessions
+                        os.remove(logger_path)
+                    st.session_state.drying_logger_demo_start = time.time()
+
+                @st.fragment(run_every=logger_refresh)
+                def drying_logger_panel():
+                    demo_finished = logger_source == "Demo logger (stand-in)" and write_demo_logger_rows(
+                        logger_path, (time.time() - st.session_state.drying_logger_demo_start) * demo_speed)
+                    update_start = time.perf_counter()
+                    state = st.session_state.drying_logger
+                    new_readings = update_drying_logger(state, logger_path, logger_columns)
+                    if state['rows'] == 0:
+                        st.info("Waiting for logger readings...")
+                        return
+                    first_mass = (state['bins'].sort_index().iloc[0]['Mass (g)']
+                                  / state['bins'].sort_index().iloc[0]['count'])
+                    dry_matter = first_mass / (1 + logger_initial_mc / 100)
+                    history, current = drying_logger_summary(state, dry_matter, logger_me,
+                                                             max(int(logger_window * 60 / logger_bin), 3))
+                    update_time = time.perf_counter() - update_start
+
+                    st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.markdown(f"**Elapsed:** {current['elapsed_min']:.1f} min")
+                        st.markdown(f"**Moisture Content:** {current['moisture']:.2f}% db")
+                    with col2:
+                        st.markdown(f"**HUF (window):** {current['huf']:.3f}")
+                        st.markdown(f"**COP (window):** {current['cop']:.3f}")
+                    with col3:
+                        st.markdown(f"**Drying Rate (window):** {current['drying_rate']:.3f}% db/h")
+                        st.markdown(f"**K (whole run):** {current['k']:.4f} ± {current['k_se']:.4f} 1/h")
+                    st.markdown("</div>", unsafe_allow_html=True)
+
+                    fig, axes = plt.subplots(2, 2, figsize=(14, 8), sharex=True)
+                    axes[0, 0].plot(history['Time (min)'], history['Moisture Content (%db)'], color='blue')
+                    axes[0, 0].set_ylabel('Moisture Content (% db)')
+                    axes[0, 1].plot(history['Time (min)'], history['t0 (°C)'], label='Ambient (t₀)', color='green')
+                    axes[0, 1].plot(history['Time (min)'], history['t1 (°C)'], label='Drying (t₁)', color='red')
+                    axes[0, 1].plot(history['Time (min)'], history['t2 (°C)'], label='Exhaust (t₂)', color='orange')
+                    axes[0, 1].set_ylabel('Temperature (°C)')
+                    axes[0, 1].legend()
+                    axes[1, 0].plot(history['Time (min)'], history['HUF'], label='HUF', color='blue')
+                    axes[1, 0].plot(history['Time (min)'], history['COP'], label='COP', color='green')
+                    axes[1, 0].set_ylabel('Value')
+                    axes[1, 0].legend()
+                    axes[1, 1].plot(history['Time (min)'], history['Drying Rate (% db/h)'], color='purple',
+                                    label='Drying rate (% db/h)')
+                    axes[1, 1].set_ylabel('Drying Rate (% db/h)')
+                    rolling_axis = axes[1, 1].twinx()
+                    rolling_axis.plot(history['Time (min)'], history['Rolling K (1/h)'], color='black',
+                                      linestyle='--', label=f'K over last {logger_window} min')
+                    rolling_axis.set_ylabel('Rolling K (1/h)')
+                    rolling_axis.legend(loc='upper right')
+                    for axis in axes.ravel():
+                        axis.grid(True, linestyle='--', alpha=0.7)
+                    axes[1, 0].set_xlabel('Time (min)')
+                    axes[1, 1].set_xlabel('Time (min)')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
+
+                    st.markdown(f"*{current['readings']:,} readings, {len(history)} bins; {new_readings} new "
+                                f"readings processed in {update_time * 1000:.0f} ms.*")
+                    if demo_finished:
+                        st.caption("The 12-hour demo run has ended; reset the logger to start it again.")
+
+                drying_logger_panel()
+
         else:  # Simulation mode
             st.markdown("### Drying Process Simulation")
             st.markdown("""
             Adjust the parameters below to simulate a drying process and generate characteristic curves.
-            This simulation uses Newton's Law of Cooling for drying kinetics.
+            The dryer is simulated as a stack of trays with the heated air passing up through every tray in turn:
+            the air cools and picks up moisture tray by tray, and the grain moisture and temperature are tracked
+            in every layer of every tray. Thin-layer kinetics follow Newton's Law of Cooling, or the best
+            thin-layer model fitted to one of your runs, with Me from the sorption isotherm at the local air state.
             """)
 
+            best_fits = st.session_state.get('thin_layer_best_fits', {})
+            drying_model_options = ["Newton (drying constant slider)"] + [f"{run_name}: {fit['model']}"
+                                                                          for run_name, fit in best_fits.items()]
+            drying_model_choice = st.selectbox("Drying Model", drying_model_options)
+
             col1, col2 = st.columns(2)
 
             with col1:
                 initial_mc = st.slider("Initial Moisture Content (% db)", 10.0, 100.0, 50.0, 0.5)
-                equilibrium_mc = st.slider("Equilibrium Moisture Content (% db)", 1.0, 20.0, 8.0, 0.5)
                 drying_constant = st.slider("Drying Constant K (1/h)", 0.05, 2.0, 0.5, 0.01)
+                ambient_rh_sim = st.slider("Ambient Relative Humidity (%)", 5.0, 95.0, 60.0, 1.0)
 
             with col2:
                 drying_temp_sim = st.slider("Drying Air Temperature (°C)", 40.0, 100.0, 60.0, 1.0)
                 ambient_temp_sim = st.slider("Ambient Temperature (°C)", 10.0, 35.0, 25.0, 1.0)
                 simulation_time = st.slider("Simulation Time (h)", 0.5, 10.0, 4.0, 0.5)
 
+            st.markdown("#### Dryer Configuration")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                sim_trays = st.slider("Number of Trays", 1, 30, 20)
+                sim_layers = st.slider("Layers per Tray (for the moisture gradient)", 1, 20, 10)
+            with col2:
+                sim_tray_area = st.number_input("Tray Area (m²)", min_value=0.05, value=1.0, step=0.05)
+                sim_tray_loading = st.number_input("Tray Loading (kg wet grain/m²)", min_value=0.5, value=20.0,
+                                                   step=0.5)
+                sim_air_flow = st.number_input("Air Flow Rate (m³/min)", min_value=0.5, value=15.0, step=0.5,
+                                               key="sim_air_flow")
+            with col3:
+                isotherm_grain_sim = st.selectbox("Grain (for isotherm)",
+                                                  list(EMC_MODEL_COEFFICIENTS['Henderson'].keys()),
+                                                  key="isotherm_grain_sim")
+                isotherm_model_sim = st.selectbox("Isotherm Model", list(EMC_MODELS.keys()),
+                                                  key="isotherm_model_sim")
+                activation_energy_sim = st.number_input("Drying Activation Energy (kJ/mol)", min_value=0.0,
+                                                        value=25.0, step=1.0)
+
+            # Drying air is ambient air heated without adding moisture
+            inlet_humidity_sim = float(humidity_ratio(ambient_rh_sim / 100 * saturation_vapor_pressure(
+                ambient_temp_sim)))
+            inlet_rh_sim = float(inlet_humidity_sim * STANDARD_AIR_PRESSURE / (0.621945 + inlet_humidity_sim)
+                                 / saturation_vapor_pressure(drying_temp_sim))
+            equilibrium_mc = float(lookup_emc(drying_temp_sim, inlet_rh_sim, isotherm_grain_sim,
+                                              isotherm_model_sim))
+            st.info(f"Drying air: {inlet_rh_sim * 100:.1f}% RH at {drying_temp_sim:.0f} °C, "
+                    f"Me = {equilibrium_mc:.2f}% db from the {isotherm_model_sim} isotherm.")
+
+            # Moisture ratio from Newton's Law of Cooling or the chosen fitted thin-layer model
+            if drying_model_choice == drying_model_options[0]:
+                thin_layer_model, thin_layer_coefficients = 'Newton (Lewis)', {'k': drying_constant}
+            else:
+                chosen_fit = best_fits[drying_model_choice.rsplit(': ', 1)[0]]
+                thin_layer_model, thin_layer_coefficients = chosen_fit['model'], chosen_fit['coefficients']
+
             if st.button("Run Simulation"):
-                # Generate time points
-                time_hours = np.linspace(0, simulation_time, 50)
+                # Simulate the stacked trays: air passes up through every tray and layer in series
+                simulation_start = time.perf_counter()
+                deep_bed = simulate_deep_bed_dryer(initial_mc, drying_temp_sim, inlet_humidity_sim, sim_air_flow,
+                                                   sim_trays, sim_layers, sim_tray_area, sim_tray_loading,
+                                                   simulation_time, 1.0, thin_layer_model,
+                                                   tuple((name, float(value)) for name, value
+                                                         in thin_layer_coefficients.items()),
+                                                   activation_energy_sim, ambient_temp_sim, isotherm_grain_sim,
+                                                   isotherm_model_sim)
+                simulation_seconds = time.perf_counter() - simulation_start
+                time_hours = deep_bed['time']
                 time_mins = time_hours * 60
-
-                # Calculate moisture content using Newton's Law of Cooling
-                moisture_contents = []
-                for t in time_hours:
-                    mc = equilibrium_mc + (initial_mc - equilibrium_mc) * np.exp(-drying_constant * t)
-                    moisture_contents.append(mc)
-
-                # Simulate exhaust temperature (simplified model)
-                exhaust_temps_sim = []
-                for mc in moisture_contents:
-                    # Exhaust temp decreases as moisture is removed (simplified relationship)
-                    moisture_factor = (mc - equilibrium_mc) / (
-                                initial_mc - equilibrium_mc) if initial_mc != equilibrium_mc else 0
-                    temp_drop = (drying_temp_sim - ambient_temp_sim) * (0.3 + 0.4 * moisture_factor)
-                    exhaust_temp = drying_temp_sim - temp_drop
-                    exhaust_temps_sim.append(exhaust_temp)
-
-                # Calculate HUF and COP
-                hufs_sim = [(drying_temp_sim - et) / (drying_temp_sim - ambient_temp_sim) for et in exhaust_temps_sim]
-                cops_sim = [(et - ambient_temp_sim) / (drying_temp_sim - ambient_temp_sim) for et in exhaust_temps_sim]
+                tray_moisture = deep_bed['moisture'].mean(axis=2)
+                moisture_contents = tray_moisture.mean(axis=1)  # equal dry matter in every tray
+                exhaust_temps_sim = deep_bed['air_temperature'][:, -1]
+
+                # HUF, COP, drying rate and moisture ratio of the bed average
+                curve_sim = drying_curve_analytics(time_mins, moisture_contents, ambient_temps=ambient_temp_sim,
+                                                   drying_temps=drying_temp_sim, exhaust_temps=exhaust_temps_sim,
+                                                   equilibrium_moisture=equilibrium_mc, initial_moisture=initial_mc)
+                hufs_sim, cops_sim = curve_sim['huf'], curve_sim['cop']
+                st.session_state.last_drying_run = {
+                    'data': pd.DataFrame({'Time (min)': time_mins, 'Moisture Content (% db)': moisture_contents,
+                                          't0 (°C)': ambient_temp_sim, 't1 (°C)': drying_temp_sim,
+                                          't2 (°C)': exhaust_temps_sim}),
+                    'metadata': {'Grain': isotherm_grain_sim, 'Drying Temperature (°C)': drying_temp_sim,
+                                 'Tray Load (kg/m²)': sim_tray_loading, 'Me (% db)': equilibrium_mc,
+                                 'Source': 'Simulation'}
+                }
 
                 # Create drying characteristic curve
                 fig, ax = plt.subplots(figsize=(10, 6))
 
-                ax.plot(time_mins, moisture_contents, '-', color='blue', linewidth=2)
+                ax.plot(time_mins, moisture_contents, '-', color='blue', linewidth=2, label='Bed average')
+                for tray_index, tray_style in zip(sorted({0, sim_trays // 2, sim_trays - 1}), [':', '-.', '--']):
+                    ax.plot(time_mins, tray_moisture[:, tray_index], tray_style, color='gray',
+                            label=f'Tray {tray_index + 1}')
                 ax.set_xlabel('Time (min)')
                 ax.set_ylabel('Moisture Content (% db)')
                 ax.set_title('Simulated Drying Characteristic Curve')
+                ax.legend(loc='upper right')
                 ax.grid(True, linestyle='--', alpha=0.7)
 
                 # Add annotation with the drying equation
-                equation = f"M = {equilibrium_mc:.1f} + ({initial_mc:.1f} - {equilibrium_mc:.1f})e^(-{drying_constant:.3f}t)"
-                ax.annotate(equation, xy=(0.5, 0.95), xycoords='axes fraction',
+                if thin_layer_model == 'Newton (Lewis)':
+                    equation = (f"M = {equilibrium_mc:.1f} + ({initial_mc:.1f} - {equilibrium_mc:.1f})"
+                                f"e^(-{drying_constant:.3f}t)")
+                else:
+                    equation = (f"M = {equilibrium_mc:.1f} + ({initial_mc:.1f} - {equilibrium_mc:.1f})·MR(t), "
+                                f"{thin_layer_model}: " + ", ".join(f"{name} = {value:.3g}" for name, value
+                                                                    in thin_layer_coefficients.items()))
+                ax.annotate(f"Thin layer at the inlet air: {equation}", xy=(0.5, 0.95), xycoords='axes fraction',
                             bbox=dict(boxstyle="round,pad=0.3", fc="yellow", alpha=0.3),
                             ha='center')
 
@@ -4555,12 +9137,8 @@ elif page == "Tray Dryer Evaluation":
                 plt.tight_layout()
                 st.pyplot(fig3)
 
-                # Create drying rate curve
-                drying_rates = []
-                for t in time_hours:
-                    # Derivative of the moisture content equation
-                    rate = -drying_constant * (initial_mc - equilibrium_mc) * np.exp(-drying_constant * t)
-                    drying_rates.append(-rate)  # Negative sign removed to show positive drying rate
+                # Create drying rate curve of the bed average
+                drying_rates = curve_sim['drying_rate']
 
                 fig4, ax4 = plt.subplots(figsize=(10, 6))
 
@@ -4577,7 +9155,7 @@ elif page == "Tray Dryer Evaluation":
                 fig5, ax5 = plt.subplots(figsize=(10, 6))
 
                 # Calculate (M - Me)/(Mo - Me)
-                normalized_mc = [(m - equilibrium_mc) / (initial_mc - equilibrium_mc) for m in moisture_contents]
+                normalized_mc = curve_sim['moisture_ratio']
 
                 ax5.semilogy(time_hours, normalized_mc, '-', color='red', linewidth=2)
                 ax5.set_xlabel('Time (h)')
@@ -4586,15 +9164,51 @@ elif page == "Tray Dryer Evaluation":
                 ax5.grid(True, linestyle='--', alpha=0.7)
 
                 # Add line showing the expected slope
-                log_line_x = np.array([0, simulation_time])
-                log_line_y = np.exp(-drying_constant * log_line_x)
-                ax5.semilogy(log_line_x, log_line_y, '--', color='black', alpha=0.7,
-                             label=f'Slope = -K = -{drying_constant:.3f}')
-                ax5.legend()
+                if thin_layer_model == 'Newton (Lewis)':
+                    log_line_x = np.array([0, simulation_time])
+                    log_line_y = np.exp(-drying_constant * log_line_x)
+                    ax5.semilogy(log_line_x, log_line_y, '--', color='black', alpha=0.7,
+                                 label=f'Slope = -K = -{drying_constant:.3f}')
+                    ax5.legend()
 
                 plt.tight_layout()
                 st.pyplot(fig5)
 
+                # Tray-by-tray results of the deep-bed simulation
+                st.markdown("### Tray-by-Tray Profiles")
+                fig6, (ax6, ax7) = plt.subplots(1, 2, figsize=(14, 5))
+                moisture_map = ax6.imshow(tray_moisture.T, aspect='auto', origin='lower', cmap='viridis_r',
+                                          extent=[0, time_mins[-1], 0.5, sim_trays + 0.5])
+                ax6.set_xlabel('Time (min)')
+                ax6.set_ylabel('Tray (1 = air inlet)')
+                ax6.set_title('Tray Moisture Content (% db)')
+                fig6.colorbar(moisture_map, ax=ax6)
+                layer_map = ax7.imshow(deep_bed['moisture'][-1], aspect='auto', origin='lower', cmap='viridis_r',
+                                       extent=[0.5, sim_layers + 0.5, 0.5, sim_trays + 0.5])
+                ax7.set_xlabel('Layer within Tray (air-flow direction)')
+                ax7.set_ylabel('Tray (1 = air inlet)')
+                ax7.set_title(f'Final Moisture Content (% db) after {simulation_time:.1f} h')
+                fig6.colorbar(layer_map, ax=ax7)
+                plt.tight_layout()
+                st.pyplot(fig6)
+
+                fig8, (ax8, ax9) = plt.subplots(1, 2, figsize=(14, 5))
+                for tray_index in sorted({0, sim_trays // 4, sim_trays // 2, 3 * sim_trays // 4, sim_trays - 1}):
+                    ax8.plot(time_mins, deep_bed['air_temperature'][:, tray_index], label=f'Tray {tray_index + 1}')
+                    ax9.plot(time_mins, deep_bed['air_rh'][:, tray_index] * 100, label=f'Tray {tray_index + 1}')
+                ax8.set_xlabel('Time (min)')
+                ax8.set_ylabel('Air Temperature (°C)')
+                ax8.set_title('Air Leaving Each Tray: Temperature')
+                ax8.grid(True, linestyle='--', alpha=0.7)
+                ax8.legend()
+                ax9.set_xlabel('Time (min)')
+                ax9.set_ylabel('Relative Humidity (%)')
+                ax9.set_title('Air Leaving Each Tray: Relative Humidity')
+                ax9.grid(True, linestyle='--', alpha=0.7)
+                ax9.legend()
+                plt.tight_layout()
+                st.pyplot(fig8)
+
                 # Show summary of simulation parameters
                 st.markdown("<div class='result-box'>", unsafe_allow_html=True)
                 st.markdown("### Simulation Parameters Summary")
@@ -4602,18 +9216,288 @@ elif page == "Tray Dryer Evaluation":
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     st.markdown(f"**Initial Moisture Content:** {initial_mc:.1f}% db")
-                    st.markdown(f"**Equilibrium Moisture Content:** {equilibrium_mc:.1f}% db")
+                    st.markdown(f"**Equilibrium Moisture Content (inlet air):** {equilibrium_mc:.1f}% db")
+                    st.markdown(f"**Final Bed-Average Moisture:** {moisture_contents[-1]:.2f}% db")
+                    st.markdown(f"**Final Spread, Inlet to Exhaust Tray:** "
+                                f"{tray_moisture[-1, -1] - tray_moisture[-1, 0]:.2f}% db")
 
                 with col2:
-                    st.markdown(f"**Drying Constant (K):** {drying_constant:.3f} 1/h")
-                    st.markdown(f"**Drying Time (95% reduction):** {-np.log(0.05) / drying_constant:.2f} h")
+                    if thin_layer_model == 'Newton (Lewis)':
+                        st.markdown(f"**Drying Constant (K):** {drying_constant:.3f} 1/h")
+                    else:
+                        st.markdown(f"**Drying Model:** {drying_model_choice}")
+                    below = np.flatnonzero(normalized_mc <= 0.05)
+                    st.markdown("**Drying Time (95% reduction, bed average):** "
+                                + (f"{time_hours[below[0]]:.2f} h" if below.size
+                                   else f"not reached in {simulation_time:.1f} h"))
 
                 with col3:
                     st.markdown(f"**Drying Air Temperature:** {drying_temp_sim:.1f}°C")
                     st.markdown(f"**Average HUF:** {np.mean(hufs_sim):.3f}")
+                    st.markdown(f"**Dry Air Mass Flow:** {deep_bed['dry_air_flow'] * 60:.2f} kg/min")
+
+                st.markdown(f"*{sim_trays} trays × {sim_layers} layers over {simulation_time:.1f} h "
+                            f"({len(time_hours) - 1} one-minute steps) simulated in {simulation_seconds:.2f} s.*")
 
                 st.markdown("</div>", unsafe_allow_html=True)
 
+            with st.expander("Optimize Drying Schedule"):
+                st.markdown(f"""
+                Search drying air temperature and air flow for the schedules that bring the bed-average moisture
+                down to a target in the least time or the least energy, using the dryer configuration and drying
+                model above. Candidates are simulated tray by tray, many at once, over the longest schedule
+                considered; the time each takes to reach the target is its duration. Candidates that heat any
+                grain above the limit are infeasible.
+                The kinetics are taken at {drying_temp_sim:.0f} °C and scaled to other temperatures with the
+                activation energy.
+                """)
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    target_mc = st.number_input("Target Bed-Average Moisture (% db)", min_value=1.0,
+                                                max_value=float(initial_mc), value=min(16.0, float(initial_mc)),
+                                                step=0.5)
+                    max_grain_temp = st.number_input("Maximum Grain Temperature (°C)", min_value=20.0,
+                                                     max_value=120.0, value=60.0, step=1.0)
+                with col2:
+                    temperature_range = st.slider("Drying Air Temperature Range (°C)", 30.0, 100.0, (40.0, 80.0), 1.0)
+                    temperature_steps = st.number_input("Temperature Levels", min_value=2, max_value=30, value=9)
+                with col3:
+                    flow_range = st.slider("Air Flow Range (m³/min)", 1.0, 60.0, (5.0, 30.0), 0.5)
+                    flow_steps = st.number_input("Air Flow Levels", min_value=2, max_value=30, value=6)
+                col1, col2 = st.columns(2)
+                with col1:
+                    schedule_hours = st.number_input("Longest Schedule Considered (h)", min_value=1.0, value=24.0,
+                                                     step=1.0)
+                with col2:
+                    fan_power_per_flow = st.number_input("Fan Power per Air Flow (W per m³/min)", min_value=0.0,
+                                                         value=20.0, step=1.0)
+
+                if st.button("Optimize Schedule"):
+                    optimize_start = time.perf_counter()
+                    schedule = optimize_drying_schedule(
+                        initial_mc, target_mc, ambient_temp_sim, ambient_rh_sim / 100,
+                        np.linspace(*temperature_range, int(temperature_steps)),
+                        np.linspace(*flow_range, int(flow_steps)), max_grain_temp, schedule_hours,
+                        fan_power_per_flow, drying_temp_sim, sim_trays, sim_layers, sim_tray_area, sim_tray_loading,
+                        5.0, thin_layer_model,
+                        tuple((name, float(value)) for name, value in thin_layer_coefficients.items()),
+                        activation_energy_sim, isotherm_grain_sim, isotherm_model_sim)
+                    optimize_seconds = time.perf_counter() - optimize_start
+                    front = schedule[schedule['Pareto Optimal']]
+
+                    if front.empty:
+                        st.warning("No candidate reaches the target within the limits. Allow a longer schedule, "
+                                   "a higher grain temperature or a wider search range.")
+                    else:
+                        fastest = front.loc[front['Drying Time (h)'].idxmin()]
+                        cheapest = front.loc[front['Total Energy (kWh)'].idxmin()]
+                        st.markdown("<div class='result-box'>", unsafe_allow_html=True)
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.markdown(f"**Fastest:** {fastest['Inlet Temperature (°C)']:.1f} °C, "
+                                        f"{fastest['Air Flow (m³/min)']:.1f} m³/min for "
+                                        f"{fastest['Drying Time (h)']:.2f} h "
+                                        f"({fastest['Total Energy (kWh)']:.1f} kWh)")
+                        with col2:
+                            st.markdown(f"**Least Energy:** {cheapest['Inlet Temperature (°C)']:.1f} °C, "
+                                        f"{cheapest['Air Flow (m³/min)']:.1f} m³/min for "
+                                        f"{cheapest['Drying Time (h)']:.2f} h "
+                                        f"({cheapest['Total Energy (kWh)']:.1f} kWh)")
+                        st.markdown("</div>", unsafe_allow_html=True)
+
+                        fig = go.Figure()
+                        feasible_points = schedule[schedule['Feasible']]
+                        fig.add_trace(go.Scatter(
+                            x=feasible_points['Drying Time (h)'], y=feasible_points['Total Energy (kWh)'],
+                            mode='markers', name='Feasible', marker=dict(color='lightgray', size=8),
+                            text=[f"{t:.0f} °C, {q:.1f} m³/min" for t, q in
+                                  zip(feasible_points['Inlet Temperature (°C)'],
+                                      feasible_points['Air Flow (m³/min)'])]))
+                        front_sorted = front.sort_values('Drying Time (h)')
+                        fig.add_trace(go.Scatter(
+                            x=front_sorted['Drying Time (h)'], y=front_sorted['Total Energy (kWh)'],
+                            mode='lines+markers', name='Pareto front',
+                            marker=dict(color=front_sorted['Inlet Temperature (°C)'], colorscale='Reds', size=11,
+                                        showscale=True, colorbar=dict(title='t₁ (°C)')),
+                            text=[f"{t:.0f} °C, {q:.1f} m³/min" for t, q in
+                                  zip(front_sorted['Inlet Temperature (°C)'], front_sorted['Air Flow (m³/min)'])]))
+                        fig.update_layout(title='Drying Time vs Energy', xaxis_title='Drying Time (h)',
+                                          yaxis_title='Total Energy (kWh)', height=500)
+                        st.plotly_chart(fig, use_container_width=True)
+
+                    st.dataframe(schedule.round(3), hide_index=True)
+                    st.markdown(f"*{len(schedule)} candidate schedules simulated in {optimize_seconds:.1f} s; "
+                                f"{int(schedule['Feasible'].sum())} feasible, {len(front)} on the Pareto front.*")
+
+            with st.expander("Sensitivity of Final Moisture Content"):
+                drying_model = SENSITIVITY_MODELS['Exponential Drying']
+                drying_base_values = {'initial_moisture': initial_mc, 'equilibrium_moisture': equilibrium_mc,
+                                      'drying_constant': drying_constant, 'drying_time': simulation_time}
+                drying_ranges = {name: (value * 0.8, value * 1.2) for name, value in drying_base_values.items()}
+
+                drying_local_df = local_sensitivity(drying_model['function'], drying_base_values)
+                drying_sobol_df = sobol_indices(drying_model['function'], drying_ranges, samples=1024)
+                drying_sensitivity_df = drying_local_df[['Parameter', 'Elasticity']].merge(drying_sobol_df,
+                                                                                           on='Parameter')
+                drying_sensitivity_df['Parameter'] = drying_sensitivity_df['Parameter'].map(drying_model['parameters'])
+
+                st.markdown(f"""
+                Sensitivity of the final moisture content after {simulation_time:.1f} h. Elasticity is the local
+                % change for a 1% parameter change; Sobol indices are computed over ±20% of the current settings.
+                """)
+                st.dataframe(drying_sensitivity_df.round(4))
+
+
+    with tab4:
+        st.markdown("<h3 class='section-header'>Drying Run Workspace</h3>", unsafe_allow_html=True)
+        st.markdown("""
+        Collect many drying runs with their metadata (grain, drying air temperature, tray load, Me) and compare
+        them. Results are computed only for the runs you select and are kept with each run, so switching the
+        selection reuses what has already been computed; a run is recomputed only when its Me or the smoothing
+        window changes.
+        """)
+        drying_runs = st.session_state.setdefault('drying_runs', {})
+
+        st.markdown("#### Add Runs")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            last_run = st.session_state.get('last_drying_run')
+            last_run_name = st.text_input("Name for the last Drying Curves run",
+                                          value=f"Run {len(drying_runs) + 1}")
+            if st.button("Add Last Drying Curves Run", disabled=last_run is None):
+                drying_runs[last_run_name] = new_drying_run(last_run['data'], **last_run['metadata'])
+            if last_run is None:
+                st.caption("Generate drying curves or run a simulation in the Drying Curves tab first.")
+        with col2:
+            uploaded_workspace = st.file_uploader("Upload Runs (CSV)", type=["csv"], key="workspace_runs",
+                                                  help="'Run', 'Time (min)' and 'Moisture Content (% db)' columns; "
+                                                       "optionally 't0 (°C)', 't1 (°C)', 't2 (°C)' and metadata "
+                                                       "columns " + ", ".join(f"'{name}'" for name
+                                                                              in DRYING_RUN_METADATA))
+            if uploaded_workspace is not None and st.button("Add Uploaded Runs"):
+                workspace_upload = pd.read_csv(uploaded_workspace)
+                upload_missing = {'Run', 'Time (min)', 'Moisture Content (% db)'} - set(workspace_upload.columns)
+                if upload_missing:
+                    st.error(f"The runs are missing columns: {', '.join(sorted(upload_missing))}")
+                else:
+                    skipped_runs = []
+                    for run_name, run_data in workspace_upload.groupby('Run', sort=False):
+                        try:
+                            drying_runs[str(run_name)] = new_drying_run(
+                                run_data.drop(columns=['Run', *DRYING_RUN_METADATA], errors='ignore'),
+                                **{'Source': uploaded_workspace.name,
+                                   **{name: run_data[name].iloc[0] for name in DRYING_RUN_METADATA
+                                      if name in run_data}})
+                        except ValueError as error:
+                            skipped_runs.append(f"{run_name} ({error})")
+                    if skipped_runs:
+                        st.error(f"Runs not added: {'; '.join(skipped_runs)}")
+        with col3:
+            if st.button("Load Example Runs"):
+                drying_runs.update(example_drying_runs())
+            if drying_runs and st.button("Clear Workspace"):
+                drying_runs.clear()
+                st.session_state.pop("workspace_metadata", None)
+
+        if not drying_runs:
+            st.info("The workspace is empty.")
+        else:
+            st.markdown("#### Runs and Metadata")
+            metadata_table = pd.DataFrame([{'Run': name, **run['metadata']} for name, run in drying_runs.items()])
+            edited_metadata = st.data_editor(metadata_table, disabled=['Run', 'Source'], hide_index=True,
+                                             key="workspace_metadata")
+            edited_metadata = edited_metadata.assign(**{
+                name: pd.to_numeric(edited_metadata[name], errors='coerce').astype(float)
+                for name in ['Drying Temperature (°C)', 'Tray Load (kg/m²)', 'Me (% db)']})
+            for row in edited_metadata.to_dict('records'):
+                drying_runs[row.pop('Run')]['metadata'].update(row)
+            missing_me = [name for name, run in drying_runs.items() if pd.isna(run['metadata']['Me (% db)'])]
+            if missing_me:
+                st.error(f"Enter a numeric Me (% db) for {', '.join(missing_me)}; these runs are left out of the "
+                         f"comparison.")
+
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                selected_runs = st.multiselect("Runs to Compare", list(drying_runs),
+                                               default=list(drying_runs)[:min(len(drying_runs), 6)])
+                selected_runs = [name for name in selected_runs if name not in missing_me]
+            with col2:
+                workspace_smoothing = st.number_input("Smoothing Window (readings)", min_value=1, max_value=51,
+                                                      value=5, step=2, key="workspace_smoothing")
+
+            if selected_runs:
+                workspace_start = time.perf_counter()
+                workspace_results, computed_runs = drying_workspace_results(drying_runs, selected_runs,
+                                                                            workspace_smoothing)
+                workspace_seconds = time.perf_counter() - workspace_start
+                workspace_table = drying_workspace_table(drying_runs, workspace_results)
+                st.caption(f"{computed_runs} of {len(selected_runs)} selected runs computed now, the rest reused "
+                           f"({workspace_seconds * 1000:.0f} ms).")
+
+                st.markdown("#### Run Metrics")
+                st.dataframe(workspace_table.drop(columns=['Notes']).round(3), hide_index=True)
+                st.download_button("Download Run Metrics (CSV)", workspace_table.to_csv(index=False),
+                                   file_name="drying_run_metrics.csv", mime="text/csv")
+
+                curve_view = st.radio("Overlay", ["Moisture Content", "Moisture Ratio", "Drying Rate vs Moisture"],
+                                      horizontal=True)
+                fig = go.Figure()
+                for name, result in workspace_results.items():
+                    run_times = drying_runs[name]['data']['Time (min)']
+                    curve = result['curve']
+                    if curve_view == "Moisture Content":
+                        fig.add_trace(go.Scatter(x=run_times, y=curve['moisture'], mode='markers', name=name))
+                        fig.add_trace(go.Scatter(x=run_times, y=result['fitted'], mode='lines', showlegend=False,
+                                                 line=dict(dash='dot', color='gray')))
+                        axis_titles = ('Time (min)', 'Moisture Content (% db)')
+                    elif curve_view == "Moisture Ratio":
+                        fig.add_trace(go.Scatter(x=run_times, y=curve['moisture_ratio'], mode='lines+markers',
+                                                 name=name))
+                        axis_titles = ('Time (min)', 'Moisture Ratio (M - Me)/(M₀ - Me)')
+                    else:
+                        fig.add_trace(go.Scatter(x=curve['smoothed_moisture'], y=curve['drying_rate'],
+                                                 mode='lines', name=name))
+                        axis_titles = ('Moisture Content (% db)', 'Drying Rate (% db/h)')
+                fig.update_layout(xaxis_title=axis_titles[0], yaxis_title=axis_titles[1], height=500,
+                                  yaxis_type='log' if curve_view == "Moisture Ratio" else 'linear')
+                if curve_view == "Drying Rate vs Moisture":
+                    fig.update_xaxes(autorange='reversed')
+                st.plotly_chart(fig, use_container_width=True)
+
+                st.markdown("#### Drying Constant Distribution")
+                col1, col2 = st.columns(2)
+                with col1:
+                    k_figure = go.Figure(go.Bar(x=workspace_table['Run'], y=workspace_table['K (1/h)'],
+                                                error_y=dict(type='data', array=workspace_table['K SE (1/h)']),
+                                                marker_color='steelblue'))
+                    k_figure.update_layout(title='K ± SE by Run', yaxis_title='K (1/h)', height=420)
+                    st.plotly_chart(k_figure, use_container_width=True)
+                with col2:
+                    group_by = st.selectbox("Group K by", ['Grain', 'Drying Temperature (°C)', 'Tray Load (kg/m²)',
+                                                           'Source'])
+                    k_box = go.Figure()
+                    for group, group_table in workspace_table.groupby(workspace_table[group_by].astype(str)):
+                        k_box.add_trace(go.Box(y=group_table['K (1/h)'], name=group, boxpoints='all'))
+                    k_box.update_layout(title=f'K by {group_by}', yaxis_title='K (1/h)', height=420,
+                                        showlegend=False)
+                    st.plotly_chart(k_box, use_container_width=True)
+
+                # Arrhenius dependence of K on drying air temperature, per grain
+                arrhenius = workspace_table.dropna(subset=['Drying Temperature (°C)', 'K (1/h)'])
+                arrhenius = arrhenius[arrhenius['K (1/h)'] > 0]
+                arrhenius_rows = []
+                for grain_name, grain_table in arrhenius.groupby(arrhenius['Grain'].astype(str)):
+                    if grain_table['Drying Temperature (°C)'].nunique() >= 2:
+                        slope, intercept = np.polyfit(1 / (grain_table['Drying Temperature (°C)'] + 273.15),
+                                                      np.log(grain_table['K (1/h)']), 1)
+                        arrhenius_rows.append({'Grain': grain_name, 'Runs': len(grain_table),
+                                               'Activation Energy (kJ/mol)': -slope * UNIVERSAL_GAS_CONSTANT / 1000,
+                                               'Pre-exponential Factor (1/h)': np.exp(intercept)})
+                if arrhenius_rows:
+                    st.markdown("**Arrhenius fit of K against drying air temperature:** "
+                                "ln K = ln K₀ - Ea/(R·T)")
+                    st.dataframe(pd.DataFrame(arrhenius_rows).round(4), hide_index=True)
+
 
 # Belt Conveyor Evaluation Module
 elif page == "Belt Conveyor Evaluation":
@@ -4668,16 +9552,23 @@ elif page == "Belt Conveyor Evaluation":
         3. Bulk density of the material
 
         **For Troughed Belt Conveyors:**
-        - Volume of material per meter length: V = [(a+b)/2] h cm³/m
+        - Load cross-section: A = A_trough + A_surcharge m², from belt width B, idler set, trough angle λ
+          and surcharge angle θ
+        - Volume of material per meter length: V = A × 10^6 cm³/m
         - Speed of belt: S = (π D N) / 100 m/min
         - Theoretical capacity: Q theo = (ρ S V 60) 10^-6 kg/h
         - Actual capacity: Q actual = (M / T) 60 kg/h
         - Conveying efficiency: η Conveying = (Q actual / Q theo) × 100%
 
+        The load covers the usable belt width b = 0.9 B − 0.05 m. On a three-roll idler set with centre roll l₃
+        the load edges sit c = l₃ + (b − l₃) cos λ apart, so A_trough = [(l₃ + c)/2] [(b − l₃)/2] sin λ, and the
+        free surface is a circular arc meeting the edges at θ, A_surcharge = (c/2)² (θ − sin θ cos θ) / sin² θ.
+        A flat belt is the case l₃ = b and a two-roll V trough the case l₃ = 0.
+
         Where:
-        - a = Bottom width of the trough (cm)
-        - b = Top width of the trough (cm)
-        - h = Depth of material on belt (cm)
+        - B = Belt width (m)
+        - λ = Trough angle of the wing idlers (°)
+        - θ = Surcharge angle of the material (°)
         - D = Diameter of pulley/roller (cm)
         - N = Speed of the roller/pulley (rpm)
         - ρ = Bulk density of the material (kg/m³)
@@ -4747,13 +9638,14 @@ elif page == "Belt Conveyor Evaluation":
             sample_mass3 = total_mass3 - container_mass3
 
             # Calculate bulk densities
-            bulk_density1 = sample_mass1 / container_volume1  # g/cc
-            bulk_density2 = sample_mass2 / container_volume2  # g/cc
-            bulk_density3 = sample_mass3 / container_volume3  # g/cc
+            sample_masses = np.array([sample_mass1, sample_mass2, sample_mass3])
+            container_volumes = np.array([container_volume1, container_volume2, container_volume3])
+            bulk_densities_gcc = sample_masses / container_volumes  # g/cc
+            bulk_densities_kgm3 = convert_units(bulk_densities_gcc, "g/cc", "kg/m³")
 
             # Calculate average bulk density
-            avg_bulk_density_gcc = (bulk_density1 + bulk_density2 + bulk_density3) / 3
-            avg_bulk_density_kgm3 = avg_bulk_density_gcc * 1000  # Convert g/cc to kg/m³
+            avg_bulk_density_gcc = bulk_densities_gcc.mean()
+            avg_bulk_density_kgm3 = bulk_densities_kgm3.mean()
 
             # Display results
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
@@ -4765,9 +9657,8 @@ elif page == "Belt Conveyor Evaluation":
                 "Sample": ["Sample 1", "Sample 2", "Sample 3", "Average"],
                 "Sample Mass (g)": [sample_mass1, sample_mass2, sample_mass3, None],
                 "Volume (cc)": [container_volume1, container_volume2, container_volume3, None],
-                "Bulk Density (g/cc)": [bulk_density1, bulk_density2, bulk_density3, avg_bulk_density_gcc],
-                "Bulk Density (kg/m³)": [bulk_density1 * 1000, bulk_density2 * 1000, bulk_density3 * 1000,
-                                         avg_bulk_density_kgm3]
+                "Bulk Density (g/cc)": np.append(bulk_densities_gcc, avg_bulk_density_gcc),
+                "Bulk Density (kg/m³)": np.append(bulk_densities_kgm3, avg_bulk_density_kgm3)
             }
 
             results_df = pd.DataFrame(results_data)
@@ -4805,9 +9696,13 @@ elif page == "Belt Conveyor Evaluation":
         with col2:
             st.markdown("### Trough Parameters")
 
-            bottom_width = st.number_input("Bottom Width of Trough (a) [cm]", min_value=1.0, value=15.0, step=0.5)
-            top_width = st.number_input("Top Width of Trough (b) [cm]", min_value=1.0, value=45.0, step=0.5)
-            material_depth = st.number_input("Depth of Material on Belt (h) [cm]", min_value=0.1, value=20.0, step=0.5)
+            belt_width = st.number_input("Belt Width (B) [mm]", min_value=100.0, max_value=3000.0, value=500.0,
+                                         step=50.0)
+            idler_configuration = st.selectbox("Idler Configuration", BELT_IDLER_CONFIGURATIONS, index=2)
+            trough_angle = st.slider("Trough Angle (λ) [°]", min_value=0.0, max_value=60.0, value=20.0, step=5.0,
+                                     disabled=idler_configuration == "Flat")
+            surcharge_angle = st.slider("Surcharge Angle (θ) [°]", min_value=0.0, max_value=35.0, value=20.0,
+                                        step=1.0)
 
         # Get material density from session state or allow manual input
         if 'bulk_density' in st.session_state:
@@ -4821,11 +9716,12 @@ elif page == "Belt Conveyor Evaluation":
                                            min_value=100.0, max_value=3000.0, value=default_density, step=10.0)
 
         if st.button("Calculate Theoretical Capacity"):
-            # Calculate volume of material per meter length
-            volume_per_meter = ((bottom_width + top_width) / 2) * material_depth  # cm³/m
+            # Calculate the load cross-section and volume of material per meter length
+            section = belt_cross_section(belt_width / 1000, idler_configuration, trough_angle, surcharge_angle)
+            volume_per_meter = float(section['area']) * 1e6  # cm³/m
 
             # Calculate belt speed
-            belt_speed = (np.pi * pulley_diameter * pulley_speed) / 100  # m/min
+            belt_speed = float(convert_units(np.pi * pulley_diameter * pulley_speed, "cm", "m"))  # m/min
 
             # Calculate theoretical capacity
             theoretical_capacity = (material_density * belt_speed * volume_per_meter * 60) * 1e-6  # kg/h
@@ -4837,6 +9733,9 @@ elif page == "Belt Conveyor Evaluation":
 
             col1, col2 = st.columns(2)
             with col1:
+                st.markdown(f"**Load Cross-Section (A):** {float(section['area']):.4f} m² "
+                            f"(trough {float(section['trough_area']):.4f} m², "
+                            f"surcharge {float(section['surcharge_area']):.4f} m²)")
                 st.markdown(f"**Volume per meter length (V):** {volume_per_meter:.2f} cm³/m")
                 st.markdown(f"**Belt Speed (S):** {belt_speed:.2f} m/min")
 
@@ -4852,29 +9751,28 @@ elif page == "Belt Conveyor Evaluation":
             # Create a cross-section visualization of the belt
             fig, ax = plt.subplots(figsize=(8, 6))
 
-            # Belt cross-section coordinates
-            belt_x = [-bottom_width / 2, bottom_width / 2, top_width / 2, -top_width / 2, -bottom_width / 2]
-            belt_y = [0, 0, material_depth, material_depth, 0]
-
-            # Plot the belt cross-section
-            ax.plot(belt_x, belt_y, 'k-', linewidth=2)
+            (belt_x, belt_y), (load_x, load_y) = belt_cross_section_profile(belt_width / 1000, section)
+            belt_x, belt_y, load_x, load_y = (coordinate * 100 for coordinate in (belt_x, belt_y, load_x, load_y))
 
-            # Fill the cross-section to represent material
-            ax.fill(belt_x, belt_y, color='sandybrown', alpha=0.7)
+            # Fill the cross-section to represent material and draw the belt over it
+            ax.fill(load_x, load_y, color='sandybrown', alpha=0.7)
+            ax.plot(belt_x, belt_y, 'k-', linewidth=3)
 
             # Add labels
-            ax.text(0, -5, f"a = {bottom_width} cm", ha='center')
-            ax.text(0, material_depth + 5, f"b = {top_width} cm", ha='center')
-            ax.text(top_width / 2 + 5, material_depth / 2, f"h = {material_depth} cm", va='center')
-
-            # Add trough angle visualization
-            trough_angle = np.arctan((top_width - bottom_width) / (2 * material_depth)) * 180 / np.pi
-            ax.text(-top_width / 2 - 10, material_depth / 2, f"Trough Angle: {trough_angle:.1f}°", va='center')
+            edge_width = float(section['edge_width']) * 100
+            trough_depth = float(section['trough_depth']) * 100
+            load_depth = float(section['load_depth']) * 100
+            ax.text(0, -5, f"B = {belt_width:.0f} mm, {idler_configuration} idlers", ha='center')
+            ax.text(0, load_depth + 3, f"Surcharge Angle: {surcharge_angle:.0f}°", ha='center')
+            ax.text(edge_width / 2 + 3, trough_depth, f"Load depth = {load_depth:.1f} cm", va='center')
+            if idler_configuration != "Flat":
+                ax.text(-belt_x.max() - 3, trough_depth / 2, f"Trough Angle: {trough_angle:.0f}°", va='center',
+                        ha='right')
 
             # Set equal aspect ratio and limits
             ax.set_aspect('equal')
-            ax.set_xlim(-top_width / 2 - 20, top_width / 2 + 20)
-            ax.set_ylim(-10, material_depth + 20)
+            ax.set_xlim(-belt_x.max() - 30, belt_x.max() + 30)
+            ax.set_ylim(-10, max(load_depth, belt_y.max()) + 10)
 
             # Remove axes
             ax.axis('off')
@@ -4889,7 +9787,7 @@ elif page == "Belt Conveyor Evaluation":
 
             # Define ranges for speed, volume, and capacity calculation
             speeds = np.linspace(belt_speed * 0.5, belt_speed * 1.5, 100)
-            capacities = [(material_density * s * volume_per_meter * 60) * 1e-6 for s in speeds]
+            capacities = (material_density * speeds * volume_per_meter * 60) * 1e-6
 
             ax2.plot(speeds, capacities, 'b-', linewidth=2)
 
@@ -4914,13 +9812,50 @@ elif page == "Belt Conveyor Evaluation":
                 'pulley_diameter': pulley_diameter,
                 'pulley_speed': pulley_speed,
                 'belt_length': belt_length,
-                'bottom_width': bottom_width,
-                'top_width': top_width,
-                'material_depth': material_depth,
+                'belt_width': belt_width,
+                'idler_configuration': idler_configuration,
+                'trough_angle': trough_angle,
+                'surcharge_angle': surcharge_angle,
+                'cross_section_area': float(section['area']),
                 'belt_speed': belt_speed,
                 'volume_per_meter': volume_per_meter
             }
 
+        st.markdown("### Capacity Table Across Standard Belt Widths")
+
+        table_belt_speed = float(convert_units(np.pi * pulley_diameter * pulley_speed, "cm", "m"))  # m/min
+        capacity_table = belt_capacity_table(STANDARD_BELT_WIDTHS, BELT_IDLER_CONFIGURATIONS,
+                                             [20.0, 25.0, 30.0, 35.0, 40.0, 45.0], [5.0, 10.0, 15.0, 20.0, 25.0, 30.0],
+                                             table_belt_speed, material_density)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            table_idlers = st.selectbox("Idler Configuration for Table", BELT_IDLER_CONFIGURATIONS, index=2)
+        with col2:
+            table_surcharge = st.select_slider("Surcharge Angle for Table [°]",
+                                               options=[5.0, 10.0, 15.0, 20.0, 25.0, 30.0], value=20.0)
+
+        selected = capacity_table[(capacity_table['Idlers'] == table_idlers)
+                                  & (capacity_table['Surcharge Angle (°)'] == table_surcharge)]
+        st.markdown(f"Capacity (t/h) at a belt speed of {table_belt_speed:.2f} m/min and bulk density of "
+                    f"{material_density:.0f} kg/m³:")
+        st.dataframe(selected.pivot(index='Belt Width (mm)', columns='Trough Angle (°)', values='Capacity (t/h)')
+                     .rename(columns=lambda angle: f"{angle:.0f}°").style.format("{:.2f}"))
+
+        fig = go.Figure()
+        for idlers in BELT_IDLER_CONFIGURATIONS:
+            rows = capacity_table[(capacity_table['Idlers'] == idlers)
+                                  & (capacity_table['Surcharge Angle (°)'] == table_surcharge)
+                                  & capacity_table['Trough Angle (°)'].isin([0.0, 20.0])]
+            fig.add_trace(go.Scatter(x=rows['Belt Width (mm)'], y=rows['Capacity (t/h)'], mode='lines+markers',
+                                     name=idlers if idlers == "Flat" else f"{idlers}, 20° trough"))
+        fig.update_layout(title=f"Capacity vs Belt Width at {table_surcharge:.0f}° Surcharge",
+                          xaxis_title="Belt Width (mm)", yaxis_title="Capacity (t/h)")
+        st.plotly_chart(fig, use_container_width=True)
+
+        with st.expander("Full Capacity Table"):
+            st.dataframe(capacity_table)
+
     with tab3:
         st.markdown("<h3 class='section-header'>Performance Evaluation</h3>", unsafe_allow_html=True)
 
@@ -5243,13 +10178,14 @@ elif page == "Bucket Conveyor Evaluation":
             sample_mass3 = total_mass3 - container_mass3
 
             # Calculate bulk densities
-            bulk_density1 = sample_mass1 / container_volume1  # g/cc
-            bulk_density2 = sample_mass2 / container_volume2  # g/cc
-            bulk_density3 = sample_mass3 / container_volume3  # g/cc
+            sample_masses = np.array([sample_mass1, sample_mass2, sample_mass3])
+            container_volumes = np.array([container_volume1, container_volume2, container_volume3])
+            bulk_densities_gcc = sample_masses / container_volumes  # g/cc
+            bulk_densities_kgm3 = convert_units(bulk_densities_gcc, "g/cc", "kg/m³")
 
             # Calculate average bulk density
-            avg_bulk_density_gcc = (bulk_density1 + bulk_density2 + bulk_density3) / 3
-            avg_bulk_density_kgm3 = avg_bulk_density_gcc * 1000  # Convert g/cc to kg/m³
+            avg_bulk_density_gcc = bulk_densities_gcc.mean()
+            avg_bulk_density_kgm3 = bulk_densities_kgm3.mean()
 
             # Display results
             st.markdown("<div class='result-box'>", unsafe_allow_html=True)
@@ -5261,9 +10197,8 @@ elif page == "Bucket Conveyor Evaluation":
                 "Sample": ["Sample 1", "Sample 2", "Sample 3", "Average"],
                 "Sample Mass (g)": [sample_mass1, sample_mass2, sample_mass3, None],
                 "Volume (cc)": [container_volume1, container_volume2, container_volume3, None],
-                "Bulk Density (g/cc)": [bulk_density1, bulk_density2, bulk_density3, avg_bulk_density_gcc],
-                "Bulk Density (kg/m³)": [bulk_density1 * 1000, bulk_density2 * 1000, bulk_density3 * 1000,
-                                         avg_bulk_density_kgm3]
+                "Bulk Density (g/cc)": np.append(bulk_densities_gcc, avg_bulk_density_gcc),
+                "Bulk Density (kg/m³)": np.append(bulk_densities_kgm3, avg_bulk_density_kgm3)
             }
 
             results_df = pd.DataFrame(results_data)
@@ -5318,7 +10253,7 @@ elif page == "Bucket Conveyor Evaluation":
                                            min_value=1.0, max_value=500.0, value=optimal_rpm, step=1.0)
 
             # Calculate belt speed from pulley speed: V = πDN/100
-            belt_speed = (np.pi * head_pulley_diameter * pulley_speed) / 100  # m/min
+            belt_speed = float(convert_units(np.pi * head_pulley_diameter * pulley_speed, "cm", "m"))  # m/min
 
             st.markdown(f"**Calculated Belt Speed (V):** {belt_speed:.2f} m/min")
 
@@ -5350,8 +10285,8 @@ elif page == "Bucket Conveyor Evaluation":
 
             # Calculate centrifugal force: Fc = WV²/(gR)
             # Convert radius to m and belt speed to m/s
-            radius_m = head_pulley_radius / 100
-            belt_speed_ms = belt_speed / 60
+            radius_m = float(convert_units(head_pulley_radius, "cm", "m"))
+            belt_speed_ms = float(convert_units(belt_speed, "m/min", "m/s"))
             centrifugal_force = (weight_per_bucket * belt_speed_ms ** 2) / (g * radius_m)  # kg (force)
 
             # Calculate discharge effectiveness ratio (should be close to 1 for optimal discharge)
@@ -5490,15 +10425,11 @@ elif page == "Bucket Conveyor Evaluation":
 
             # Create a range of speeds
             speeds = np.linspace(belt_speed * 0.5, belt_speed * 1.5, 100)
-            capacities = [(6 * material_density * s * bucket_volume) / (bucket_spacing * 1e3) for s in speeds]
+            capacities = (6 * material_density * speeds * bucket_volume) / (bucket_spacing * 1e3)
 
             # Create discharge ratios
-            discharge_ratios = []
-            for s in speeds:
-                # Convert to m/s for calculation
-                s_ms = s / 60
-                cf = (weight_per_bucket * s_ms ** 2) / (g * radius_m)
-                discharge_ratios.append(cf / weight_per_bucket)
+            speeds_ms = convert_units(speeds, "m/min", "m/s")
+            discharge_ratios = (weight_per_bucket * speeds_ms ** 2) / (g * radius_m) / weight_per_bucket
 
             # Create the plot
             fig2, ax1 = plt.subplots(figsize=(10, 6))
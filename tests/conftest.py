@@ -0,0 +1,31 @@
+"""Load the calculator functions of Ag_Engg_Comp.py without running the Streamlit pages."""
+import ast
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+APP_PATH = Path(__file__).resolve().parent.parent / "Ag_Engg_Comp.py"
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Namespace with the imports, constants and helper functions defined above the page navigation."""
+    tree = ast.parse(APP_PATH.read_text(encoding="utf-8"))
+    definitions = []
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == "page" for target in node.targets):
+            break  # the page navigation and the pages start here
+        if isinstance(node, ast.Expr):
+            continue  # page configuration and styling calls
+        definitions.append(node)
+    # Registered as the Ag_Engg_Comp module so its functions pickle by reference; spawned worker processes
+    # import the script itself from the app directory, as they do under Streamlit
+    module = types.ModuleType("Ag_Engg_Comp")
+    module.__file__ = str(APP_PATH)
+    exec(compile(ast.Module(body=definitions, type_ignores=[]), str(APP_PATH), "exec"), module.__dict__)
+    sys.modules["Ag_Engg_Comp"] = module
+    if str(APP_PATH.parent) not in sys.path:
+        sys.path.append(str(APP_PATH.parent))
+    return module.__dict__
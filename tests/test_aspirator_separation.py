@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def test_curves_follow_the_velocity_distributions_in_still_air(app):
+    speeds = np.linspace(2.0, 12.0, 11)
+    curves = app['aspirator_separation_curves']((9.0, 1.0), {'Chaff': (3.0, 1.0)}, {'Chaff': 0.1}, speeds,
+                                                particles=200000, turbulence_intensity=0.0)
+    # Without turbulence a particle is lifted exactly when its terminal velocity is below the air speed
+    assert np.allclose(curves['Grain Loss (%)'], stats.norm.cdf(speeds, 9.0, 1.0) * 100, atol=0.5)
+    assert np.allclose(curves['Chaff Carry-over (%)'], stats.norm.sf(speeds, 3.0, 1.0) * 100, atol=0.5)
+    assert np.allclose(curves['Impurity Carry-over (%)'], curves['Chaff Carry-over (%)'])
+    assert np.allclose(curves['Misplaced Material (%)'],
+                       0.9 * curves['Grain Loss (%)'] + 0.1 * curves['Chaff Carry-over (%)'])
+
+
+def test_turbulence_blurs_the_cut(app):
+    speeds = np.array([6.0, 9.0, 12.0])
+    still, turbulent = (app['aspirator_separation_curves']((9.0, 0.5), {}, {}, speeds, particles=100000,
+                                                           turbulence_intensity=intensity)
+                        for intensity in (0.0, 0.2))
+    assert turbulent.loc[0, 'Grain Loss (%)'] > still.loc[0, 'Grain Loss (%)']
+    assert turbulent.loc[2, 'Grain Loss (%)'] < still.loc[2, 'Grain Loss (%)']
+
+
+def test_cut_velocities_of_symmetric_curves(app):
+    speeds = np.linspace(2.0, 12.0, 11)
+    grain_loss = stats.norm.cdf(speeds, 9.0, 1.0) * 100
+    carry_over = stats.norm.sf(speeds, 3.0, 1.0) * 100
+    curves = pd.DataFrame({'Air Speed (m/s)': speeds, 'Grain Loss (%)': grain_loss,
+                           'Impurity Carry-over (%)': carry_over,
+                           'Misplaced Material (%)': 0.9 * grain_loss + 0.1 * carry_over})
+    best_speed, equal_error_speed = app['separation_cut_velocity'](curves)
+    assert best_speed == 6.0
+    assert np.isclose(equal_error_speed, 6.0)
+
+
+def test_no_equal_error_speed_when_grain_loss_stays_lower(app):
+    curves = pd.DataFrame({'Air Speed (m/s)': [1.0, 2.0], 'Grain Loss (%)': [0.0, 1.0],
+                           'Impurity Carry-over (%)': [50.0, 20.0], 'Misplaced Material (%)': [5.0, 3.0]})
+    best_speed, equal_error_speed = app['separation_cut_velocity'](curves)
+    assert best_speed == 2.0
+    assert np.isnan(equal_error_speed)
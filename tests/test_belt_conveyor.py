@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+
+def test_three_roll_areas_match_the_iso_5048_table(app):
+    # ISO 5048 load areas (m²) for 3-roll idlers, 20° trough and 20° surcharge; the standard approximates the
+    # surcharge arc by a parabola, which gives about 1 % more than the circular segment
+    section = app['belt_cross_section'](np.array([0.8, 1.0, 1.2]), "3-Roll", 20.0, 20.0)
+    assert section['centre_roll_length'] == pytest.approx([0.315, 0.38, 0.465])
+    assert section['area'] == pytest.approx([0.0548, 0.0893, 0.1308], rel=0.02)
+
+
+def test_flat_and_v_troughs_are_limiting_cases(app):
+    surcharge = np.radians(20.0)
+    flat = app['belt_cross_section'](1.0, "Flat", 35.0, 20.0)
+    usable_width = 0.85
+    assert flat['trough_area'] == 0 and flat['trough_angle'] == 0
+    assert flat['area'] == pytest.approx((usable_width / 2) ** 2 * (surcharge - np.sin(surcharge) * np.cos(surcharge))
+                                         / np.sin(surcharge) ** 2)
+
+    v_trough = app['belt_cross_section'](1.0, "2-Roll", 30.0, 0.0)
+    assert v_trough['surcharge_area'] == 0
+    trough = np.radians(30.0)
+    assert v_trough['area'] == pytest.approx(usable_width ** 2 / 4 * np.sin(trough) * np.cos(trough))
+
+
+def test_deeper_troughs_and_steeper_surcharges_carry_more(app):
+    areas = app['belt_cross_section'](1.0, "3-Roll", np.array([[20.0], [35.0], [45.0]]),
+                                      np.array([10.0, 20.0, 30.0]))['area']
+    assert areas.shape == (3, 3)
+    assert np.all(np.diff(areas, axis=0) > 0) and np.all(np.diff(areas, axis=1) > 0)
+
+
+def test_capacity_table_covers_the_grid(app):
+    table = app['belt_capacity_table']((800, 1000), ("Flat", "3-Roll"), (20.0, 35.0), (20.0,), 120.0, 750.0)
+    # A flat belt has no trough angle, so its two trough angles collapse into one row
+    assert len(table) == 6
+    row = table[(table['Belt Width (mm)'] == 1000) & (table['Idlers'] == "3-Roll")
+                & (table['Trough Angle (°)'] == 20.0)].iloc[0]
+    area = float(app['belt_cross_section'](1.0, "3-Roll", 20.0, 20.0)['area'])
+    assert row['Capacity (m³/h)'] == pytest.approx(60 * area * 120.0)
+    assert row['Capacity (t/h)'] == pytest.approx(60 * area * 120.0 * 0.75)
@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("air_flow, tray_loading", [(15.0, 20.0), (0.5, 200.0)])
+def test_drying_air_is_never_oversaturated(app, air_flow, tray_loading):
+    # Default Drying Curves inputs: 50% db grain, 60 °C drying air heated from 25 °C, 60% RH ambient air
+    inlet_humidity = float(app["humidity_ratio"](0.6 * app["saturation_vapor_pressure"](25.0)))
+    bed = app["simulate_deep_bed_dryer"](50.0, 60.0, inlet_humidity, air_flow, 20, 10, 1.0, tray_loading, 4.0,
+                                         1.0, "Newton (Lewis)", (("k", 0.5),), 25.0, 25.0, "Wheat", "Henderson")
+
+    assert bed["air_rh"].max() <= 1 + 1e-6
+    # Evaporation cannot cool the grain below the wet bulb of the coldest air in the dryer, the ambient air
+    ambient_wet_bulb = float(app["wet_bulb_temperature"](25.0, inlet_humidity))
+    assert bed["grain_temperature"].min() >= ambient_wet_bulb
+    # The water the air carries away is the water the grain lost
+    dry_air = bed["dry_air_flow"] * 60 * bed["time"][-1] * 60
+    grain_water = bed["dry_matter_per_tray"] * (50.0 - bed["moisture"][-1].mean(axis=1)).sum() / 100
+    exhaust_water = dry_air * (bed["air_humidity_ratio"][1:, -1].mean() - inlet_humidity)
+    assert exhaust_water == pytest.approx(grain_water, rel=0.02)
+
+
+def test_saturated_bed_stays_at_the_inlet_wet_bulb(app):
+    # Too little air for the grain: the air saturates in the first tray, and the grain, starting at the
+    # inlet wet bulb, is not cooled below it
+    inlet_humidity = float(app["humidity_ratio"](0.6 * app["saturation_vapor_pressure"](25.0)))
+    inlet_wet_bulb = float(app["wet_bulb_temperature"](60.0, inlet_humidity))
+    bed = app["simulate_deep_bed_dryer"](50.0, 60.0, inlet_humidity, 0.5, 20, 10, 1.0, 200.0, 4.0, 1.0,
+                                         "Newton (Lewis)", (("k", 0.5),), 25.0, inlet_wet_bulb, "Wheat",
+                                         "Henderson")
+
+    assert bed["air_rh"][-1, -1] == pytest.approx(1.0, abs=1e-6)
+    assert bed["air_temperature"][-1, -1] == pytest.approx(inlet_wet_bulb, abs=0.1)
+    assert np.all(bed["grain_temperature"] >= inlet_wet_bulb - 0.1)
+
+
+def test_drying_statistics_match_the_full_simulation(app):
+    inlet_humidity = float(app["humidity_ratio"](0.6 * app["saturation_vapor_pressure"](25.0)))
+    temperatures, air_flows = np.array([45.0, 60.0, 75.0]), np.array([20.0, 10.0, 30.0])
+    arguments = (50.0, temperatures, inlet_humidity, air_flows, 6, 4, 1.0, 20.0, 12.0, 5.0, "Newton (Lewis)",
+                 (("k", 0.5),), 25.0, 25.0, "Wheat", "Henderson", app["STANDARD_AIR_PRESSURE"], 60.0)
+    statistics = app["deep_bed_drying_statistics"](20.0, *arguments)
+    bed = app["simulate_deep_bed_dryer"](*arguments)
+
+    average = bed["moisture"].mean(axis=(2, 3))
+    for candidate in range(len(temperatures)):
+        step = np.argmax(average[candidate] <= 20.0)
+        assert step > 0
+        drying_time = np.interp(20.0, average[candidate, step::-1][:2], bed["time"][step::-1][:2])
+        assert statistics["drying_time"][candidate] == pytest.approx(drying_time)
+        assert statistics["max_grain_temperature"][candidate] == pytest.approx(
+            bed["grain_temperature"][candidate, :step + 1].max())
+        assert statistics["wettest_tray"][candidate] == pytest.approx(
+            bed["moisture"][candidate, step].mean(axis=1).max())
+
+
+@pytest.mark.parametrize("air_flow, tray_loading", [(15.0, 20.0), (5.0, 20.0), (0.5, 200.0)])
+def test_full_size_dryer_runs_in_under_a_second(app, air_flow, tray_loading):
+    # 20 trays × 10 layers over 10 h in one-minute steps, the best of three runs to ride out a busy machine
+    inlet_humidity = float(app["humidity_ratio"](0.6 * app["saturation_vapor_pressure"](25.0)))
+    elapsed = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in app["deep_bed_dryer_steps"](50.0, 60.0, inlet_humidity, air_flow, 20, 10, 1.0, tray_loading,
+                                             10.0, 1.0):
+            pass
+        elapsed.append(time.perf_counter() - start)
+
+    assert min(elapsed) < 1.0
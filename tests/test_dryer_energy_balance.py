@@ -0,0 +1,17 @@
+import numpy as np
+from scipy.optimize import brentq
+
+
+def test_adiabatic_dryer_has_no_other_losses(app):
+    ambient = app['air_properties'](25.0, app['STANDARD_AIR_PRESSURE'], 0.5)
+    ambient_humidity = float(ambient['humidity_ratio'])
+    dry_air_mass = 1.0 / 60 / float(ambient['specific_volume']) * 3600 * 2
+    pickup = 0.01
+    exhaust_temp = brentq(lambda temp: app['moist_air_enthalpy'](temp, ambient_humidity + pickup)
+                          - app['moist_air_enthalpy'](60.0, ambient_humidity), 20.0, 60.0)
+    balance = app['dryer_energy_balance']([0.0, 2.0], 2000.0, pickup * dry_air_mass, 1.0, 25.0, 0.5, 60.0,
+                                          exhaust_temp)
+    assert np.isclose(balance['other_losses'], 0.0, atol=1e-9)
+    assert balance['exhaust_heat'] > 0
+    assert np.isclose(balance['evaporation_heat'] + balance['exhaust_heat'] + balance['other_losses'],
+                      balance['heat_to_air'])
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def test_padded_runs_recover_k_and_me(app):
+    times = np.tile(np.linspace(0.0, 8.0, 30), (3, 1))
+    k = np.array([0.3, 0.6, 1.0])
+    equilibrium = np.array([6.0, 8.0, 10.0])
+    moisture = equilibrium[:, None] + (30 - equilibrium[:, None]) * np.exp(-k[:, None] * times)
+    times[0, 12:] = np.nan
+    moisture[0, 12:] = np.nan
+    fixed = app['fit_drying_constant'](times, moisture, equilibrium)
+    fitted = app['fit_drying_constant'](times, moisture, fit_equilibrium=True)
+    assert fixed['converged'].all() and fitted['converged'].all()
+    assert np.allclose(fixed['k'], k, rtol=1e-6)
+    assert np.allclose(fitted['k'], k, rtol=1e-4)
+    assert np.allclose(fitted['equilibrium_moisture'], equilibrium, atol=1e-3)
+    assert list(fixed['points']) == [12, 30, 30]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('times', [np.linspace(0.0, 5.0, 21), np.sort(np.random.default_rng(0).uniform(0, 5, 21))])
+def test_local_quadratic_reproduces_a_quadratic(app, times):
+    values = 30 - 4 * times + 0.3 * times ** 2
+    smoothed, slope = app['local_polynomial_smooth'](times, values, window=7)
+    assert smoothed == pytest.approx(values)
+    assert slope == pytest.approx(-4 + 0.6 * times)
+
+
+def test_smoothing_removes_reading_noise(app):
+    times = np.linspace(0.0, 10.0, 121)
+    clean = 10 + 20 * np.exp(-0.3 * times)
+    noisy = clean + np.random.default_rng(1).normal(0, 0.3, times.size)
+    smoothed, _ = app['local_polynomial_smooth'](times, noisy, window=15)
+    assert np.abs(smoothed - clean).std() < 0.5 * np.abs(noisy - clean).std()
+
+
+def test_analytics_of_a_weighed_run(app):
+    times = np.arange(0.0, 300.0, 10.0)
+    moisture = 8 + 22 * np.exp(-0.5 * times / 60)
+    masses = 50.0 * (1 + moisture / 100)
+    results = app['drying_curve_analytics'](times, masses=masses, dry_weight=50.0, ambient_temps=25.0,
+                                            drying_temps=np.full(times.size, 60.0),
+                                            exhaust_temps=np.linspace(35.0, 50.0, times.size),
+                                            equilibrium_moisture=8.0, smoothing_window=5)
+    assert results['moisture'] == pytest.approx(moisture)
+    assert results['moisture_ratio'] == pytest.approx(np.exp(-0.5 * times / 60))
+    assert results['interval_rates'] == pytest.approx(-np.diff(moisture) / (10 / 60))
+    assert results['midpoint_times'] == pytest.approx(times[:-1] + 5)
+    assert results['huf'] + results['cop'] == pytest.approx(np.ones(times.size))
+    # -dM/dθ = k (M - Me) for an exponential curve, with k = 0.5 /h
+    assert results['drying_rate'][2:-2] == pytest.approx(0.5 * (moisture[2:-2] - 8), rel=0.01)
+
+
+def test_unsmoothed_rates_are_central_differences(app):
+    times, moisture = np.array([0.0, 60.0, 120.0, 240.0]), np.array([30.0, 24.0, 20.0, 15.0])
+    results = app['drying_curve_analytics'](times, moisture)
+    assert results['drying_rate'] == pytest.approx(-np.gradient(moisture, times / 60))
+    assert results['smoothed_moisture'] is results['moisture']
+    assert 'huf' not in results
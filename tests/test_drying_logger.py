@@ -0,0 +1,22 @@
+import os
+
+import pandas as pd
+
+
+def test_logger_files_stay_inside_the_logger_directory(app, tmp_path):
+    (tmp_path / 'run.csv').write_text('Time (s),Mass (g)\n')
+    (tmp_path / 'notes.txt').write_text('')
+    outside = tmp_path.parent / 'outside.csv'
+    outside.write_text('secret\n')
+    os.symlink(outside, tmp_path / 'link.csv')
+    assert app['drying_logger_files'](str(tmp_path)) == ['run.csv']
+    assert app['drying_logger_files'](str(tmp_path / 'missing')) == []
+
+
+def test_demo_logger_stops_at_the_end_of_its_run(app, tmp_path):
+    path = str(tmp_path / 'demo.csv')
+    assert not app['write_demo_logger_rows'](path, 59.5, run_seconds=120)
+    assert app['write_demo_logger_rows'](path, 10_000, run_seconds=120)
+    assert app['write_demo_logger_rows'](path, 20_000, run_seconds=120)
+    readings = pd.read_csv(path)
+    assert list(readings['Time (s)']) == list(range(120))
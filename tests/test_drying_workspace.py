@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_runs_need_three_readings_with_time_and_moisture(app):
+    data = pd.DataFrame({"Time (min)": [0, 30, 60, "n/a", None],
+                         "Moisture Content (% db)": [30.0, None, 22.0, 20.0, 18.0]})
+    with pytest.raises(ValueError, match="at least 3"):
+        app["new_drying_run"](data)
+    with pytest.raises(ValueError, match="at least 3"):
+        app["new_drying_run"](data.iloc[:0])
+
+
+def test_shortest_run_gets_a_drying_constant(app):
+    times = np.array([60.0, 0.0, 120.0])
+    data = pd.DataFrame({"Time (min)": times, "Moisture Content (% db)": 8 + 22 * np.exp(-0.5 * times / 60)})
+    runs = {"short": app["new_drying_run"](data, **{"Me (% db)": 8.0})}
+    results, computed = app["drying_workspace_results"](runs, ["short"])
+
+    assert computed == 1
+    assert list(runs["short"]["data"]["Time (min)"]) == [0.0, 60.0, 120.0]
+    assert results["short"]["summary"]["K (1/h)"] == pytest.approx(0.5, rel=1e-4)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+
+def test_volume_matches_the_pointwise_effectiveness(app):
+    x, y, z, volume, valid = app['effectiveness_volume'](points=25)
+    assert valid.shape == volume['overall'].shape == (25, 25, 25)
+    assert valid.sum() == sum(np.count_nonzero((z < xi) & (xi < y[:, None])) for xi in x)
+    for i, j, k in [(12, 20, 3), (5, 24, 0), (18, 19, 17)]:
+        assert valid[i, j, k]
+        pointwise = app['separation_effectiveness'](x[i], y[j], z[k])
+        for key in ('accepted', 'rejected', 'overall'):
+            assert volume[key][i, j, k] == pytest.approx(float(pointwise[key]))
+
+
+def test_only_the_valid_region_is_kept_and_bounded(app):
+    _, _, _, volume, valid = app['effectiveness_volume'](points=30)
+    for values in volume.values():
+        assert np.all(np.isnan(values[~valid]))
+        assert np.all((values[valid] >= 0) & (values[valid] <= 1))
+
+
+def test_perfect_and_no_separation(app):
+    perfect = app['separation_effectiveness'](0.8, 1.0, 0.0)
+    assert [float(perfect[key]) for key in ('accepted', 'rejected', 'overall')] == pytest.approx([1.0, 1.0, 1.0])
+    # An outlet no purer than the feed has separated nothing
+    none = app['separation_effectiveness'](0.8, 0.8, 0.3)
+    assert float(none['overall']) == pytest.approx(0.0)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+
+def test_stream_flows_close_both_mass_balances(app):
+    feed, X, Y, Z = 1000.0, np.array([0.9, 0.85]), np.array([0.98, 0.97]), np.array([0.2, 0.4])
+    flows = app['separation_stream_flows'](feed, X, Y, Z)
+    assert flows['accepted'] + flows['rejected'] == pytest.approx([feed, feed])
+    assert flows['accepted_desired'] + flows['rejected_desired'] == pytest.approx(feed * X)
+    assert flows['accepted_undesired'] + flows['accepted_desired'] == pytest.approx(flows['accepted'])
+    assert flows['accepted'][0] == pytest.approx(feed * 0.7 / 0.78)
+
+
+def test_equal_outlet_purities_leave_the_split_undefined(app):
+    flows = app['separation_stream_flows'](1000.0, 0.9, 0.9, 0.9)
+    assert np.isnan(flows['accepted']) and np.isnan(flows['rejected'])
+
+
+def test_sankey_links_carry_the_computed_flows(app):
+    figure = app['material_flow_sankey'](1000.0, 0.9, 0.98, 0.2)
+    flows = app['separation_stream_flows'](1000.0, 0.9, 0.98, 0.2)
+    sankey = figure.data[0]
+    assert len(sankey.node.label) == 5
+    assert list(sankey.link.value) == pytest.approx([float(flows[key]) for key in (
+        'accepted_desired', 'accepted_undesired', 'rejected_desired', 'rejected_undesired') * 2])
+    # What enters each outlet node leaves it again
+    values, sources, targets = np.array(sankey.link.value), np.array(sankey.link.source), np.array(sankey.link.target)
+    for node in (1, 2):
+        assert values[targets == node].sum() == pytest.approx(values[sources == node].sum())
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+
+def test_saturation_pressure_matches_the_steam_tables(app):
+    # Over ice below 0 °C: -10 °C 0.2600 kPa; over water: triple point, 20 °C, 60 °C and boiling
+    pressure = app['saturation_vapor_pressure'](np.array([-10.0, 0.01, 20.0, 60.0, 100.0]))
+    assert pressure == pytest.approx([0.2600, 0.6117, 2.339, 19.946, 101.42], rel=0.002)
+
+
+def test_air_properties_match_standard_values(app):
+    dry = app['air_properties'](20.0, app['STANDARD_AIR_PRESSURE'], 0.0)
+    assert float(dry['density']) == pytest.approx(1.204, abs=0.001)
+    assert float(dry['viscosity']) == pytest.approx(1.81e-5, rel=0.01)
+    assert float(dry['humidity_ratio']) == 0
+
+    # Water vapour is lighter than the dry air it displaces
+    humid = app['air_properties'](np.array([20.0, 40.0]), app['STANDARD_AIR_PRESSURE'], np.array([0.0, 1.0]))
+    assert humid['density'][1] < app['air_properties'](40.0)['density']
+    assert humid['humidity_ratio'][1] == pytest.approx(0.0491, rel=0.01)
+
+
+def test_pressure_falls_with_elevation(app):
+    pressure = app['pressure_at_elevation'](np.array([0.0, 500.0, 1500.0, 3000.0]))
+    assert pressure == pytest.approx([101.325, 95.46, 84.56, 70.11], rel=0.001)
+
+
+def test_velocities_are_normalized_to_standard_air(app):
+    velocity = np.array([8.0, 10.0])
+    standard = app['normalize_terminal_velocity'](velocity, 20.0, app['STANDARD_AIR_PRESSURE'])
+    assert standard == pytest.approx(velocity)
+    # Thin, hot air lets grain fall faster than it would in standard air
+    hot_and_high = app['normalize_terminal_velocity'](velocity, 35.0, app['pressure_at_elevation'](1500.0), 0.5)
+    density_ratio = (app['air_properties'](35.0, app['pressure_at_elevation'](1500.0), 0.5)['density']
+                     / app['air_properties'](20.0)['density'])
+    assert hot_and_high == pytest.approx(velocity * np.sqrt(density_ratio))
+    assert np.all(hot_and_high < velocity)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from scipy.optimize import brentq
+
+# Wheat conveyed at 2 kg/s (7.2 t/h)
+SOLIDS_RATE, PARTICLE_DIAMETER, PARTICLE_DENSITY, TERMINAL_VELOCITY = 2.0, 4e-3, 1300.0, 9.0
+PIPE_DIAMETERS = np.array([0.1, 0.15, 0.2])
+
+
+def test_saltation_velocity_satisfies_the_rizk_correlation(app):
+    velocity = app['saltation_velocity'](SOLIDS_RATE, PIPE_DIAMETERS, PARTICLE_DIAMETER)
+    loading_ratio = SOLIDS_RATE / (1.2 * velocity * np.pi * PIPE_DIAMETERS ** 2 / 4)
+    froude = velocity / np.sqrt(app['GRAVITY'] * PIPE_DIAMETERS)
+    assert loading_ratio == pytest.approx(10 ** -(1.44 * 4 + 1.96) * froude ** (1.1 * 4 + 2.5))
+
+
+def test_choking_velocity_satisfies_the_yang_correlation(app):
+    velocity = app['choking_velocity'](SOLIDS_RATE, PIPE_DIAMETERS, TERMINAL_VELOCITY, PARTICLE_DENSITY)
+    for diameter, choking in zip(PIPE_DIAMETERS, velocity):
+        flux = SOLIDS_RATE / (np.pi * diameter ** 2 / 4)
+        voidage = brentq(lambda e: 2 * app['GRAVITY'] * diameter * (e ** -4.7 - 1) - 6.81e5 * (1.2 / PARTICLE_DENSITY)
+                         ** 2.2 * (flux / (PARTICLE_DENSITY * (1 - e))) ** 2, 1e-6, 1 - 1e-9)
+        assert choking == pytest.approx(voidage * (TERMINAL_VELOCITY + flux / (PARTICLE_DENSITY * (1 - voidage))),
+                                        rel=1e-6)
+    # Almost no solids choke close to the terminal velocity
+    assert float(app['choking_velocity'](1e-6, 0.1, TERMINAL_VELOCITY, PARTICLE_DENSITY)) == pytest.approx(
+        TERMINAL_VELOCITY, rel=0.01)
+
+
+def test_pressure_drop_of_air_alone(app):
+    drop = app['pneumatic_conveying_pressure_drop'](1e-9, 20.0, 0.1, PARTICLE_DIAMETER, PARTICLE_DENSITY,
+                                                   TERMINAL_VELOCITY, 50.0, 10.0, 2)
+    dynamic_pressure = 1.2 * 20.0 ** 2 / 2
+    assert float(drop['acceleration']) == pytest.approx(dynamic_pressure)
+    assert float(drop['bends']) == pytest.approx(2 * dynamic_pressure)
+    # A smooth 100 mm pipe at Re ≈ 1.3e5 has a Darcy friction factor of about 0.017
+    assert float(drop['horizontal']) == pytest.approx(0.017 * 50.0 / 0.1 * dynamic_pressure, rel=0.05)
+    assert float(drop['vertical']) == pytest.approx(float(drop['horizontal']) / 5 + 1.2 * app['GRAVITY'] * 10.0,
+                                                    rel=1e-6)
+
+
+def test_sweep_flags_only_safe_dilute_designs(app):
+    sweep = app['pneumatic_conveying_sweep'](SOLIDS_RATE, PIPE_DIAMETERS, np.arange(10.0, 36.0, 2.0),
+                                             PARTICLE_DIAMETER, PARTICLE_DENSITY, TERMINAL_VELOCITY, 50.0, 10.0, 2)
+    assert len(sweep) == 3 * 13
+    feasible = sweep[sweep['Feasible']]
+    assert not feasible.empty
+    assert np.all(feasible['Air Velocity (m/s)'] >= feasible['Minimum Air Velocity (m/s)'])
+    assert np.all(feasible['Pressure Drop (kPa)'] <= 80.0) and np.all(feasible['Solids Loading Ratio'] <= 15.0)
+    assert sweep['Specific Energy (kWh/t)'].to_numpy() == pytest.approx(
+        sweep['Blower Power (kW)'].to_numpy() / (SOLIDS_RATE * 3.6))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+# Moist air at 101.325 kPa from the ASHRAE psychrometric chart: dry bulb (°C), RH, wet bulb (°C),
+# dew point (°C), humidity ratio (kg/kg), enthalpy (kJ/kg dry air), specific volume (m³/kg dry air)
+CHART_STATES = np.array([
+    [30.0, 0.5, 22.0, 18.4, 0.0133, 64.3, 0.877],
+    [25.0, 0.5, 17.9, 13.9, 0.0099, 50.3, 0.858],
+    [20.0, 0.6, 15.2, 12.0, 0.0087, 42.2, 0.842],
+])
+
+
+def test_states_from_rh_match_the_chart(app):
+    temperature, rh, wet_bulb, dew_point, humidity, enthalpy, volume = CHART_STATES.T
+    state = app['psychrometric_state'](temperature, rh=rh)
+    assert state['wet_bulb'] == pytest.approx(wet_bulb, abs=0.1)
+    assert state['dew_point'] == pytest.approx(dew_point, abs=0.1)
+    assert state['humidity_ratio'] == pytest.approx(humidity, abs=1e-4)
+    assert state['enthalpy'] == pytest.approx(enthalpy, abs=0.3)
+    assert state['specific_volume'] == pytest.approx(volume, abs=0.002)
+
+
+@pytest.mark.parametrize('measure', ['humidity_ratio', 'wet_bulb'])
+def test_every_humidity_measure_gives_the_same_state(app, measure):
+    temperature = CHART_STATES[:, 0]
+    reference = app['psychrometric_state'](temperature, rh=CHART_STATES[:, 1])
+    state = app['psychrometric_state'](temperature, **{'humidity_ratio_value' if measure == 'humidity_ratio'
+                                                       else measure: reference[measure]})
+    for key in ('rh', 'humidity_ratio', 'dew_point', 'wet_bulb', 'enthalpy'):
+        assert state[key] == pytest.approx(reference[key], rel=1e-4, abs=1e-6)
+
+
+def test_saturated_air_has_equal_dry_bulb_wet_bulb_and_dew_point(app):
+    temperature = np.linspace(5.0, 60.0, 12)
+    state = app['psychrometric_state'](temperature, rh=1.0)
+    assert state['wet_bulb'] == pytest.approx(temperature, abs=0.05)
+    assert state['dew_point'] == pytest.approx(temperature, abs=0.05)
+
+
+def test_exactly_one_humidity_measure_is_needed(app):
+    with pytest.raises(ValueError):
+        app['psychrometric_state'](25.0)
+    with pytest.raises(ValueError):
+        app['psychrometric_state'](25.0, rh=0.5, wet_bulb=18.0)
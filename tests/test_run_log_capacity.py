@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+
+def test_csv_log_is_aggregated_like_the_frame_it_holds(app):
+    log = app["example_run_log"](hours=0.5)
+    outlets = ("Good Outlet (kg)", "Chaff Outlet (kg)", "Overflow (kg)")
+    bins, runs = app["aggregate_run_log_csv"](log.to_csv(index=False).encode(), "Time (s)", outlets, 60.0)
+    expected_bins, expected_runs = app["aggregate_run_log"]([log], "Time (s)", outlets, 60.0)
+
+    pd.testing.assert_frame_equal(bins, expected_bins, check_dtype=False)
+    pd.testing.assert_frame_equal(runs, expected_runs, check_dtype=False)
+    assert bins["Total"].sum() == pytest.approx(log[list(outlets)].to_numpy().sum())
+
+
+def test_chunked_log_with_several_runs_is_aggregated_like_one_frame(app):
+    outlets = ["Good Outlet (kg)", "Chaff Outlet (kg)", "Overflow (kg)"]
+    log = pd.concat([app["example_run_log"](hours=0.5, seed=seed).assign(Run=f"Run {seed + 1}") for seed in range(2)],
+                    ignore_index=True)
+    chunks = [log.iloc[start:start + 317] for start in range(0, len(log), 317)]
+    bins, runs = app["aggregate_run_log"](chunks, "Time (s)", outlets, 60.0)
+    expected_bins, expected_runs = app["aggregate_run_log"]([log], "Time (s)", outlets, 60.0)
+
+    pd.testing.assert_frame_equal(bins, expected_bins)
+    pd.testing.assert_frame_equal(runs, expected_runs)
+    assert list(runs.index) == ["Run 1", "Run 2"]
+    assert list(runs["size"]) == [360, 360]
+    assert list(bins.groupby("Run")["Time (min)"].agg(["min", "max"]).to_numpy().ravel()) == [1, 30, 1, 30]
+
+
+def test_capacity_of_the_example_log(app):
+    outlets = ["Good Outlet (kg)", "Chaff Outlet (kg)", "Overflow (kg)"]
+    log = app["example_run_log"](hours=2.0, capacity=1200.0, split=(0.9, 0.07, 0.03))
+    summary, bins = app["run_log_capacity"](*app["aggregate_run_log"]([log], "Time (s)", outlets), outlets)
+    row = summary.iloc[0]
+
+    assert row["Intervals Logged"] == 1440
+    assert row["Duration (min)"] == pytest.approx(120.0)
+    assert row["Total Mass (kg)"] == pytest.approx(log[outlets].to_numpy().sum())
+    assert row["Capacity (kg/h)"] == pytest.approx(row["Total Mass (kg)"] / 2)
+    assert row["Steady-State Throughput (kg/h)"] == pytest.approx(1200.0, rel=0.02)
+    # The start-up ramp (5 min time constant) and the 4 min shut-down tail are left out of the steady state
+    assert 5.0 <= row["Start-up Transient (min)"] <= 30.0
+    assert 0.0 < row["Shut-down Transient (min)"] <= 10.0
+    assert row["Capacity (kg/h)"] < row["Steady-State Throughput (kg/h)"]
+    assert [row["Good Outlet Split (%)"], row["Chaff Outlet Split (%)"], row["Overflow Split (%)"]] == pytest.approx(
+        [90.0, 7.0, 3.0], abs=0.5)
+    assert "Smoothed Throughput (kg/h)" in bins
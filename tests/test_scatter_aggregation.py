@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.collections import PathCollection, QuadMesh
+from matplotlib.figure import Figure
+
+
+def grain_log(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Grain/Seed": rng.choice(["Wheat", "Rice", "Corn"], rows, p=[0.6, 0.3, 0.1]),
+                         "Size (mm)": rng.uniform(2, 10, rows), "Terminal Velocity (m/s)": rng.uniform(5, 12, rows),
+                         "Density (kg/m³)": rng.uniform(1100, 1350, rows)})
+
+
+def test_small_logs_are_drawn_point_by_point(app):
+    ax = Figure().subplots()
+    mappable, aggregated = app["plot_aggregated_scatter"](ax, grain_log(50), "Size (mm)", "Terminal Velocity (m/s)")
+    assert not aggregated and isinstance(mappable, PathCollection)
+    assert len(mappable.get_offsets()) == 50
+
+
+def test_large_logs_are_binned_with_cell_means(app):
+    log = grain_log(5000)
+    ax = Figure().subplots()
+    mappable, aggregated = app["plot_aggregated_scatter"](ax, log, "Size (mm)", "Terminal Velocity (m/s)",
+                                                          color_column="Density (kg/m³)", bins=10)
+    assert aggregated and isinstance(mappable, QuadMesh)
+    cells = mappable.get_array()
+    assert cells.size == 100
+    # Every cell holds the mean density of its points, which lies within the logged range
+    assert cells.min() >= log["Density (kg/m³)"].min() and cells.max() <= log["Density (kg/m³)"].max()
+
+
+def test_binned_counts_add_up_to_the_log(app):
+    ax = Figure().subplots()
+    mappable, _ = app["plot_aggregated_scatter"](ax, grain_log(5000), "Size (mm)", "Terminal Velocity (m/s)", bins=10)
+    assert np.nansum(mappable.get_array()) == 5000
+
+
+def test_large_logs_get_one_label_per_frequent_grain(app):
+    log = grain_log(2000)
+    summary = app["grain_group_summary"](log, "Size (mm)", "Terminal Velocity (m/s)")
+    assert list(summary.index) == ["Wheat", "Rice", "Corn"]
+    assert summary["count"].sum() == 2000
+    assert summary.loc["Rice", "x"] == pytest.approx(log.loc[log["Grain/Seed"] == "Rice", "Size (mm)"].median())
+
+    ax = Figure().subplots()
+    app["annotate_representative_points"](ax, log, "Size (mm)", "Terminal Velocity (m/s)", max_labels=2)
+    assert [text.get_text() for text in ax.texts] == [f"{grain} (n={summary.loc[grain, 'count']})"
+                                                      for grain in ("Wheat", "Rice")]
@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def test_every_class_leaves_by_exactly_one_outlet(app):
+    sizes, fractions = np.array([1.0, 2.0, 3.0, 4.0, 5.0]), np.array([0.1, 0.2, 0.4, 0.2, 0.1])
+    apertures = np.array([[6.0, 3.5, 2.0], [5.0, 4.0, 1.5]])
+    simulation = app['simulate_screen_decks'](sizes, fractions, apertures, np.array([[1.0, 1.5, 2.0]]), 1000.0)
+    assert simulation['outlets'].shape == (2, 4, 5)
+    assert simulation['passing'].shape == (2, 3, 5)
+    assert np.allclose(simulation['outlets'].sum(axis=1), 1000.0 * fractions)
+    # Particles at least as large as the aperture never pass a deck
+    assert np.all(simulation['passing'][sizes >= apertures[..., None]] == 0)
+    assert np.all(simulation['outlets'][1, 1:, 4] == 0)
+
+
+def test_lightly_loaded_deck_follows_repeated_presentations(app):
+    sizes, apertures, length = np.array([1.0, 2.0, 3.0]), np.array([[4.0]]), np.array([[0.5]])
+    simulation = app['simulate_screen_decks'](sizes, [0.3, 0.4, 0.3], apertures, length, 1e-6,
+                                              open_area=0.5, presentations_per_metre=40.0)
+    probability = 0.5 * (1 - sizes / 4.0) ** 2
+    assert np.allclose(simulation['passing'][0, 0], 1 - (1 - probability) ** 20)
+
+
+def test_heavier_loading_lets_less_pass(app):
+    light, heavy = (app['simulate_screen_decks']([1.0, 2.0], [0.5, 0.5], [[3.0]], [[1.0]], feed_rate)
+                    for feed_rate in (100.0, 10000.0))
+    assert np.all(heavy['passing'] < light['passing'])
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+
+def sample_results(app, runs):
+    """Evaluated samples of runs with X = 0.9, Y = 0.98 and Z = 0.2, two samples per stream."""
+    samples = pd.DataFrame({'Run': np.repeat(runs, 6),
+                            'Stream': ['Feed', 'Feed', 'Good Outlet', 'Good Outlet', 'Chaff Outlet',
+                                       'Chaff Outlet'] * len(runs),
+                            'Good Grains (g)': [89.0, 91.0, 97.0, 99.0, 19.0, 21.0] * len(runs),
+                            'Total (g)': [100.0] * 6 * len(runs)})
+    return app['evaluate_separation_samples'](samples, app['CLEANING_STREAMS'])
+
+
+def stream_masses(runs, feed, good, chaff):
+    return pd.DataFrame({'Run': runs, 'Feed Mass (kg)': feed, 'Good Outlet Mass (kg)': good,
+                         'Chaff Outlet Mass (kg)': chaff})
+
+
+def test_consistent_measurements_are_left_unchanged(app):
+    good = 100.0 * (0.9 - 0.2) / (0.98 - 0.2)
+    reconciled = app['reconcile_separation_results'](sample_results(app, [1]),
+                                                     stream_masses([1], [100.0], [good], [100.0 - good]))
+    row = reconciled.iloc[0]
+    assert np.isclose(row['Total Imbalance (kg)'], 0.0, atol=1e-9)
+    assert np.isclose(row['Desired Material Imbalance (kg)'], 0.0, atol=1e-9)
+    assert np.isclose(row['Reconciled Good Outlet Mass (kg)'], good)
+    assert np.allclose(row[['X', 'Y', 'Z']].to_numpy(dtype=float), [0.9, 0.98, 0.2])
+    assert np.isclose(row['E overall'], row['E overall Measured'])
+    assert not row['Gross Error'] and row['Suspect Measurements'] == ''
+
+
+def test_reconciled_flows_close_both_balances(app):
+    reconciled = app['reconcile_separation_results'](sample_results(app, [1, 2, 3]),
+                                                     stream_masses([1, 2], [100.0, 100.0], [91.0, 60.0],
+                                                                   [10.0, 10.0]))
+    # Run 3 has no stream masses
+    assert list(reconciled['Run']) == [1, 2]
+    feed, good, chaff = (reconciled[f'Reconciled {stream} Mass (kg)'].to_numpy()
+                         for stream in ['Feed', 'Good Outlet', 'Chaff Outlet'])
+    assert np.allclose(feed, good + chaff)
+    assert np.allclose(feed * reconciled['X'], good * reconciled['Y'] + chaff * reconciled['Z'])
+    assert np.allclose(reconciled['Total Imbalance (kg)'], [-1.0, 30.0])
+    # A 30 kg imbalance on a 100 kg feed weighed to 1 % is a gross error
+    assert list(reconciled['Gross Error']) == [False, True]
+    assert 'Good Outlet mass' in reconciled.loc[1, 'Suspect Measurements']
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_missing_stream_gives_nan_instead_of_key_error(app):
+    samples = pd.DataFrame({'Run': [1, 1, 2, 2, 2],
+                            'Stream': ['Feed', 'Good Outlet', 'Feed', 'Good Outlet', 'Chaff Outlet'],
+                            'Good Grains (g)': [90.0, 98.0, 90.0, 97.0, 20.0],
+                            'Total (g)': [100.0] * 5})
+    results = app['evaluate_separation_samples'](samples, app['CLEANING_STREAMS'])
+    assert np.isnan(results.loc[0, 'Z'])
+    assert results.loc[0, 'Z Samples'] == 0
+    assert np.isclose(results.loc[1, 'Z'], 0.2)
+
+
+def test_masses_that_are_not_numbers_are_left_out(app):
+    samples = pd.DataFrame({'Run': [1, 1, 1, 1],
+                            'Stream': ['Feed', 'Feed', 'Good Outlet', 'Chaff Outlet'],
+                            'Good Grains (g)': [90.0, 'lost', 98.0, '20'],
+                            'Total (g)': ['100', 100.0, 100.0, 'n/a']})
+    results = app['evaluate_separation_samples'](samples, app['CLEANING_STREAMS'])
+    assert results.loc[0, 'X Samples'] == 1
+    assert np.isclose(results.loc[0, 'X'], 0.9)
+    assert np.isnan(results.loc[0, 'Z'])
+
+
+@pytest.mark.parametrize('samples', [
+    pd.DataFrame({'Run': [1], 'Stream': ['Chaf Outlet'], 'Good Grains (g)': [1.0], 'Total (g)': [10.0]}),
+    pd.DataFrame({'Run': [], 'Stream': [], 'Good Grains (g)': [], 'Total (g)': []}),
+])
+def test_unusable_tables_are_rejected_with_a_message(app, samples):
+    assert app['separation_sample_problems'](samples, app['CLEANING_STREAMS'])
+    with pytest.raises(ValueError):
+        app['evaluate_separation_samples'](samples, app['CLEANING_STREAMS'])
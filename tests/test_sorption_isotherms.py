@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+TEMPERATURES = np.array([10.0, 25.0, 40.0, 60.0])
+RELATIVE_HUMIDITIES = np.array([0.2, 0.4, 0.6, 0.8, 0.9])
+
+
+@pytest.mark.parametrize('grain', ['Wheat', 'Rice', 'Corn', 'Soybean', 'Barley'])
+def test_henderson_emc_satisfies_the_isotherm(app, grain):
+    a, n, c = app['EMC_MODEL_COEFFICIENTS']['Henderson'][grain]
+    emc = app['equilibrium_moisture_content'](TEMPERATURES[:, None], RELATIVE_HUMIDITIES, grain)
+    assert np.allclose(1 - np.exp(-a * (TEMPERATURES[:, None] + c) * emc ** n), RELATIVE_HUMIDITIES)
+
+
+@pytest.mark.parametrize('model', ['Henderson', 'Chung-Pfost', 'Oswin', 'GAB'])
+def test_emc_rises_with_rh_and_falls_with_temperature(app, model):
+    emc = app['equilibrium_moisture_content'](TEMPERATURES[:, None], RELATIVE_HUMIDITIES, 'Wheat', model)
+    assert emc.shape == (4, 5)
+    assert np.all(np.diff(emc, axis=1) > 0)
+    assert np.all(np.diff(emc, axis=0) < 0)
+    # Wheat holds roughly 10-20 % d.b. in air of 40-80 % RH
+    assert np.all((emc[1, 1:4] > 9) & (emc[1, 1:4] < 20))
+
+
+@pytest.mark.parametrize('model', ['Henderson', 'Chung-Pfost'])
+def test_fit_recovers_the_tabulated_coefficients(app, model):
+    temperature, rh = (grid.ravel() for grid in np.meshgrid(TEMPERATURES, RELATIVE_HUMIDITIES))
+    coefficients = app['EMC_MODEL_COEFFICIENTS'][model]['Corn']
+    emc = app['equilibrium_moisture_content'](temperature, rh, model=model, coefficients=coefficients)
+    fit = app['fit_emc_model'](rh, temperature, emc, model)
+    assert fit['coefficients'] == pytest.approx(coefficients, rel=1e-4)
+    assert fit['r_squared'] == pytest.approx(1.0)
+    assert fit['rmse'] < 1e-6
+
+
+def test_lookup_matches_the_isotherm_between_grid_points(app):
+    temperature, rh = np.array([12.3, 33.3, 57.7]), np.array([0.237, 0.555, 0.845])
+    exact = app['equilibrium_moisture_content'](temperature, rh, 'Rice', 'Oswin')
+    assert app['lookup_emc'](temperature, rh, 'Rice', 'Oswin') == pytest.approx(exact, rel=0.005)
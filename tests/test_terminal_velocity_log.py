@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_log_is_not_written_unless_a_file_is_configured(app):
+    seed = pd.DataFrame(app["TERMINAL_VELOCITY_SEED_DATA"])
+    app["append_terminal_velocity_log"](seed.iloc[:1], seed, path=None)
+    assert app["load_terminal_velocity_log"](path=None) is None
+
+
+def test_seed_rows_are_saved_once_by_sessions_saving_together(app, tmp_path):
+    path = str(tmp_path / "log.csv")
+    seed = pd.DataFrame(app["TERMINAL_VELOCITY_SEED_DATA"])
+    first, second = seed.iloc[:1].assign(**{"Grain/Seed": "Oats"}), seed.iloc[:1].assign(**{"Grain/Seed": "Barley"})
+    # Both sessions started from the seed table before either had saved
+    app["append_terminal_velocity_log"](first, seed, path=path)
+    app["append_terminal_velocity_log"](second, seed, path=path)
+
+    log = app["load_terminal_velocity_log"](path=path)
+    assert list(log["Grain/Seed"]) == [*seed["Grain/Seed"], "Oats", "Barley"]
+
+
+def velocity_log(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    log = pd.DataFrame({"Grain/Seed": rng.choice(["Wheat", "Rice", "Corn"], rows),
+                        "Moisture Content (% d.b.)": rng.uniform(10, 25, rows),
+                        "Size (mm)": rng.uniform(2, 10, rows),
+                        "Density (kg/m³)": rng.uniform(1100, 1350, rows)})
+    log["Terminal Velocity (m/s)"] = (2.0 + 0.1 * log["Moisture Content (% d.b.)"] + 0.6 * log["Size (mm)"]
+                                      + 0.002 * log["Density (kg/m³)"] + rng.normal(0, 0.2, rows))
+    return log
+
+
+def test_incremental_models_equal_a_full_refit(app):
+    log = velocity_log(60)
+    models = {}
+    for start in range(0, len(log), 7):
+        models = app["update_terminal_velocity_models"](models, log.iloc[start:start + 7])
+    refit = app["update_terminal_velocity_models"]({}, log)
+
+    assert models.keys() == refit.keys() == {"Wheat", "Rice", "Corn", app["POOLED_MODEL_NAME"]}
+    for grain in refit:
+        incremental_fit = app["terminal_velocity_model_fit"](models[grain])
+        full_fit = app["terminal_velocity_model_fit"](refit[grain])
+        assert incremental_fit["n"] == full_fit["n"]
+        assert incremental_fit["coefficients"] == pytest.approx(full_fit["coefficients"], rel=1e-9)
+        assert incremental_fit["r_squared"] == pytest.approx(full_fit["r_squared"], rel=1e-9)
+
+
+def test_pooled_model_is_the_ridge_least_squares_fit_of_every_row(app):
+    log = velocity_log(60)
+    fit = app["terminal_velocity_model_fit"](app["update_terminal_velocity_models"]({}, log)[app["POOLED_MODEL_NAME"]])
+
+    x = log[app["TERMINAL_VELOCITY_FEATURES"]].to_numpy()
+    y = log["Terminal Velocity (m/s)"].to_numpy()
+    centred_x, centred_y = x - x.mean(axis=0), y - y.mean()
+    penalty = app["MODEL_RIDGE_PSEUDO_ROWS"] * np.diag((centred_x ** 2).mean(axis=0))
+    slopes = np.linalg.solve(centred_x.T @ centred_x + penalty, centred_x.T @ centred_y)
+    residuals = centred_y - centred_x @ slopes
+    assert fit["coefficients"] == pytest.approx([y.mean() - slopes @ x.mean(axis=0), *slopes], rel=1e-6)
+    assert fit["rmse"] == pytest.approx(np.sqrt((residuals ** 2).mean()), rel=1e-6)
+    assert fit["coefficients"][1:] == pytest.approx([0.1, 0.6, 0.002], rel=0.25)
+
+
+def test_grains_with_few_rows_are_predicted_with_the_pooled_model(app):
+    log = velocity_log(60)
+    models = app["update_terminal_velocity_models"]({}, pd.concat([log, log.iloc[:1].assign(**{"Grain/Seed": "Oats"})]))
+    assert app["predict_terminal_velocity"](models, "Oats", 14.0, 5.0, 1200.0)[1] == app["POOLED_MODEL_NAME"]
+    assert app["predict_terminal_velocity"](models, "Wheat", 14.0, 5.0, 1200.0)[1] == "Wheat"
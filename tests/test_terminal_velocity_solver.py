@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+
+def test_fine_particles_settle_at_the_stokes_velocity(app):
+    diameter = np.array([5e-6, 10e-6, 20e-6])
+    result = app['solve_terminal_velocity'](diameter, 2500.0, air_density=1.2, air_viscosity=1.8e-5)
+    stokes = app['GRAVITY'] * diameter ** 2 * (2500.0 - 1.2) / (18 * 1.8e-5)
+    assert result['velocity'] == pytest.approx(stokes, rel=0.02)
+    assert list(result['regime']) == ['Stokes'] * 3
+
+
+def test_solution_balances_weight_and_drag(app):
+    diameter = np.linspace(0.5e-3, 12e-3, 25)
+    result = app['solve_terminal_velocity'](diameter, 1250.0, sphericity=0.8)
+    assert result['unconverged'] == 0 and result['max_residual'] < 1e-6
+    drag = result['drag_coefficient'] * 1.2 * result['velocity'] ** 2 * np.pi * diameter ** 2 / 8
+    weight = app['GRAVITY'] * (1250.0 - 1.2) * np.pi * diameter ** 3 / 6
+    assert drag == pytest.approx(weight, rel=1e-6)
+    assert result['reynolds'] == pytest.approx(1.2 * result['velocity'] * diameter / 1.8e-5)
+
+
+def test_grain_kernels_fall_at_the_measured_speeds(app):
+    # Wheat-sized kernels settle at about 9 m/s, in the Newton regime
+    result = app['solve_terminal_velocity'](4e-3, 1250.0, sphericity=0.85)
+    assert 7.0 < float(result['velocity']) < 11.0
+    assert str(result['regime']) == 'Newton'
+    less_spherical = app['solve_terminal_velocity'](4e-3, 1250.0, sphericity=0.6)
+    assert float(less_spherical['velocity']) < float(result['velocity'])
+
+
+def test_sphere_drag_levels_off_in_the_newton_regime(app):
+    drag = app['sphere_drag_coefficient'](np.array([1e3, 1e4, 1e5]))
+    assert drag == pytest.approx([0.47, 0.41, 0.45], abs=0.05)
+    assert app['particle_drag_coefficient'](1e4, 1.0) == pytest.approx(drag[1])
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('value, from_unit, expected, to_unit', [
+    (36.0, 'km/h', 10.0, 'm/s'),
+    (1.0, 'ft/s', 18.288, 'm/min'),
+    (1.0, 'g/cc', 62.42796, 'lb/ft³'),
+    (1000.0, 'cfm', 1699.011, 'm³/h'),
+    (2.5, 'tonnes/h', 0.6944444, 'kg/s'),
+    (1.0, 'hp', 0.7457, 'kW'),
+    (100.0, 'mm H2O', 0.980665, 'kPa'),
+])
+def test_conversions_match_reference_values(app, value, from_unit, expected, to_unit):
+    assert float(app['convert_units'](value, from_unit, to_unit)) == pytest.approx(expected, rel=1e-4)
+
+
+def test_every_unit_converts_back_to_itself(app):
+    for units in app['UNIT_FACTORS'].values():
+        for unit in units:
+            for other in units:
+                assert app['unit_factor'](unit, other) * app['unit_factor'](other, unit) == pytest.approx(1.0)
+
+
+def test_arrays_are_converted_in_one_step(app):
+    measurement = app['with_units']([1.0, 2.5, 4.0], 'mm')
+    converted = app['to_units'](measurement, 'in')
+    assert converted['unit'] == 'in'
+    assert converted['values'] == pytest.approx(np.array([1.0, 2.5, 4.0]) / 25.4)
+
+
+@pytest.mark.parametrize('from_unit, to_unit', [('m/s', 'kg'), ('furlong', 'm'), ('m', 'parsec')])
+def test_unknown_or_mismatched_units_are_rejected(app, from_unit, to_unit):
+    with pytest.raises(ValueError):
+        app['convert_units'](1.0, from_unit, to_unit)
+    with pytest.raises(ValueError):
+        app['with_units'](1.0, 'furlong')
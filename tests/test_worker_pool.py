@@ -0,0 +1,29 @@
+import functools
+import math
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+
+def test_worker_errors_reach_the_caller(app):
+    assert app['map_chunks'](math.sqrt, [1.0, 4.0, 9.0], processes=2) == [1.0, 2.0, 3.0]
+    with pytest.raises(ValueError):
+        app['map_chunks'](math.sqrt, [1.0, -1.0], processes=2)
+
+
+def test_a_dead_worker_fails_the_call_and_the_pool_is_replaced(app):
+    with pytest.raises(BrokenProcessPool):
+        app['map_chunks'](os._exit, [1, 1], processes=2)
+    assert app['map_chunks'](math.sqrt, [1.0, 4.0], processes=2) == [1.0, 2.0]
+
+
+def test_script_functions_are_fitted_in_the_workers(app):
+    times = np.linspace(0.0, 5.0, 12)
+    runs = [(f"run {index}", times, np.exp(-k * times)) for index, k in enumerate((0.3, 0.6))]
+    fit_newton = functools.partial(app["fit_thin_layer_chunk"], ("Newton (Lewis)",))
+    pooled = app["map_chunks"](fit_newton, [runs[:1], runs[1:]], processes=2)
+
+    assert [row["Run"] for rows in pooled for row in rows] == ["run 0", "run 1"]
+    assert [rows[0]["Coefficients"]["k"] for rows in pooled] == pytest.approx([0.3, 0.6])